@@ -0,0 +1,150 @@
+# Func_app/DataSource/data_source.py
+import threading
+import contextlib
+from abc import ABC, abstractmethod
+import pandas as pd
+from typing import Dict, List, Optional
+from Func_app.config import DATA_SOURCE, FIXTURES_DIR, SYNTHETIC_SEED
+from Func_app.DataSource.replay import ReplayTicker, load_fixtures, replay_download, save_fixture
+from Func_app.DataSource.synthetic import synthetic_intraday, synthetic_ticker_history
+
+
+class DataSource(ABC):
+    """
+    Interface กลางของแหล่งข้อมูลราคา — Analyzer ทุกตัวเรียกผ่านตรงนี้แทน `yf.` โดยตรง
+    - ticker(symbol): object ที่มี history(), dividends, fast_info (หน้าตาเดียวกับ yf.Ticker)
+    - download(tickers, ...): DataFrame columns (Price, Ticker) แบบ yf.download
+    - Backend ที่ implement ไม่ครบสร้าง instance ไม่ได้ (TypeError ตั้งแต่ตอนสร้าง ไม่ใช่ตอนดึงข้อมูลครั้งแรก)
+    """
+    name = "base"
+
+    @abstractmethod
+    def ticker(self, symbol: str):
+        ...
+
+    @abstractmethod
+    def download(self, tickers: List[str], **kwargs) -> pd.DataFrame:
+        ...
+
+
+class YFinanceSource(DataSource):
+    """Live data จาก Yahoo Finance (ค่าเริ่มต้น)"""
+    name = "yfinance"
+
+    def ticker(self, symbol: str):
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+    def download(self, tickers: List[str], **kwargs) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.download(tickers=tickers, **kwargs)
+
+
+class InMemorySource(DataSource):
+    """ฐานของ Replay/Synthetic: เก็บ DataFrame ราคาดิบต่อ ticker ไว้ใน memory"""
+
+    def __init__(self):
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        return self._frames.get(symbol.upper())
+
+    def ticker(self, symbol: str):
+        return ReplayTicker(symbol, self._frame(symbol))
+
+    def download(self, tickers: List[str], start=None, end=None, period=None, auto_adjust=True, **kwargs) -> pd.DataFrame:
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {t.upper(): self._frame(t) for t in tickers}
+        return replay_download(tickers, {k: v for k, v in frames.items() if v is not None},
+                               start=start, end=end, period=period, auto_adjust=auto_adjust)
+
+    def tickers(self) -> List[str]:
+        return list(self._frames)
+
+
+class ReplaySource(InMemorySource):
+    """เล่นข้อมูลซ้ำจากไฟล์ Fixture (บันทึกด้วย record_fixtures)"""
+    name = "replay"
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, frames: Optional[Dict[str, pd.DataFrame]] = None):
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+        self._frames = frames if frames is not None else load_fixtures(fixtures_dir)
+
+
+class SyntheticSource(InMemorySource):
+    """สร้างข้อมูลจำลองแบบ deterministic ต่อ ticker เมื่อถูกขอครั้งแรก (ขอ ticker ไหนก็ได้)"""
+    name = "synthetic"
+
+    def __init__(self, seed: int = SYNTHETIC_SEED, start: str = "2016-01-01"):
+        super().__init__()
+        self.seed = seed
+        self.start = start
+
+    def preload(self, tickers: List[str]) -> "SyntheticSource":
+        for t in tickers:
+            self._frame(t)
+        return self
+
+    def _frame(self, symbol: str) -> pd.DataFrame:
+        key = symbol.upper()
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = synthetic_ticker_history(key, self.seed, self.start)
+            return self._frames[key]
+
+    def ticker(self, symbol: str):
+        # bar ระหว่างวันสร้างจากราคารายวันตอนถูกขอ (ไม่เก็บไว้ที่นี่ -> memory คุมด้วย LRU ของ PriceStore)
+        key = symbol.upper()
+        return ReplayTicker(symbol, self._frame(symbol),
+                            intraday=lambda daily, interval: synthetic_intraday(daily, key, self.seed, interval))
+
+
+def record_fixtures(tickers: List[str], fixtures_dir: str = FIXTURES_DIR, period: str = "10y") -> List[str]:
+    """บันทึกราคาดิบ + Adj Close + ปันผล จาก yfinance ลงไฟล์ Fixture (ต้องต่อ network ได้)"""
+    live = YFinanceSource()
+    saved = []
+    for t in tickers:
+        hist = live.ticker(t).history(period=period, auto_adjust=False, actions=True)
+        if hist.empty:
+            print(f"⚠️ skip {t}: no data")
+            continue
+        save_fixture(t, hist, fixtures_dir)
+        saved.append(t)
+    return saved
+
+# ==========================================
+# Active Source (เลือกด้วย STOCK_DATA_SOURCE)
+# ==========================================
+
+_SOURCES = {"yfinance": YFinanceSource, "replay": ReplaySource, "synthetic": SyntheticSource}
+_ACTIVE: Dict[str, Optional[DataSource]] = {"source": None}
+
+
+def create_data_source(name: str) -> DataSource:
+    if name not in _SOURCES:
+        raise ValueError(f"Unknown data source '{name}'. Choose one of {list(_SOURCES)}.")
+    return _SOURCES[name]()
+
+
+def get_data_source() -> DataSource:
+    if _ACTIVE["source"] is None:
+        _ACTIVE["source"] = create_data_source(DATA_SOURCE)
+    return _ACTIVE["source"]
+
+
+def set_data_source(source: DataSource) -> DataSource:
+    _ACTIVE["source"] = source
+    return source
+
+
+@contextlib.contextmanager
+def use_data_source(source: DataSource):
+    """สลับแหล่งข้อมูลชั่วคราว (Benchmark / Load test)"""
+    previous = _ACTIVE["source"]
+    set_data_source(source)
+    try:
+        yield source
+    finally:
+        _ACTIVE["source"] = previous
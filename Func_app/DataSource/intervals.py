@@ -0,0 +1,44 @@
+# Func_app/DataSource/intervals.py
+import pandas as pd
+
+# ==========================================
+# Bar Intervals (ชื่อเดียวกับ yfinance)
+# ==========================================
+
+DAILY = "1d"
+# ความยาว bar (นาที) — intraday เท่านั้น
+INTRADAY_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60}
+BAR_INTERVALS = tuple(INTRADAY_MINUTES) + (DAILY,)
+# ย้อนหลังได้สูงสุดต่อ interval (ข้อจำกัดของ Yahoo) -> ดึงช่วงนี้ครั้งเดียวแล้วตัดช่วงวันที่ใน memory
+INTRADAY_LOOKBACK = {"1m": "7d", "5m": "60d", "15m": "60d", "30m": "60d", "1h": "730d"}
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def check_interval(interval: str) -> str:
+    if interval not in BAR_INTERVALS:
+        raise ValueError(f"Unknown interval '{interval}'. Choose one of {list(BAR_INTERVALS)}.")
+    return interval
+
+
+def lookback_days(interval: str) -> int:
+    return int(INTRADAY_LOOKBACK[interval][:-1])
+
+
+def can_resample(finer: str, target: str) -> bool:
+    """bar ของ finer รวมเป็น target ได้พอดี (เช่น 5m -> 15m / 1h)"""
+    f, t = INTRADAY_MINUTES.get(finer), INTRADAY_MINUTES.get(target)
+    return f is not None and t is not None and f < t and t % f == 0
+
+
+def resample_bars(bars: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    รวม OHLCV เป็น bar ที่หยาบกว่า (label = เวลาเริ่ม bar แบบ Yahoo, ชิดต้นชั่วโมง/นาทีของวันนั้น)
+    - bin ที่ไม่มีการซื้อขาย (พักเที่ยง / นอกเวลาตลาด / วันหยุด) ถูกตัดทิ้ง
+    """
+    if bars.empty:
+        return bars
+    rule = f"{INTRADAY_MINUTES[interval]}min"
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in bars}
+    out = bars.resample(rule, label='left', closed='left', origin='start_day').agg(agg)
+    return out[out['Close'].notna()]
+
@@ -0,0 +1,261 @@
+# Func_app/DataSource/price_store.py
+import time
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from Func_app.config import PRICE_STORE_TTL_SECONDS, INTRADAY_CACHE_SIZE, INTRADAY_TTL_SECONDS
+from Func_app.DataSource.data_source import get_data_source
+from Func_app.DataSource.intervals import (DAILY, INTRADAY_LOOKBACK, INTRADAY_MINUTES, OHLCV_AGG,
+                                           can_resample, check_interval, lookback_days, resample_bars)
+from Func_app.DataSource.replay import _slice_period
+from Func_app.metrics import METRICS, span, count_failure
+
+PRICE_VIEWS = ("raw", "split", "adjusted")
+OHLC = ['Open', 'High', 'Low', 'Close']
+
+METRICS.describe("cache_evictions_total", "Entries dropped from an LRU cache to stay within its size limit")
+
+
+def _to_ticker(symbol: str) -> str:
+    return f"{symbol.upper().replace('.BK', '')}.BK"
+
+
+def build_record(hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    แปลง history(auto_adjust=False, actions=True) แบบ Yahoo -> ราคาดิบ (as traded) + Adjustment factors
+    - Yahoo: Close / Dividends ปรับ Split แล้ว, 'Stock Splits' = อัตราส่วนในวันที่แตกพาร์ (Rights issue ที่ Yahoo
+      ลงเป็น split ก็ถูกปรับผ่าน factor เดียวกัน)
+    - Split_Factor[t] = ผลคูณอัตราส่วน split หลังวัน t  -> ราคาดิบ = ราคาปรับ split × Split_Factor
+    - Div_Factor[t]   = ผลคูณ (1 - D/P_cum) ของทุก XD หลังวัน t (สูตรเดียวกับ Adj Close ของ Yahoo)
+    """
+    splits = hist['Stock Splits'].fillna(0).to_numpy(dtype=float) if 'Stock Splits' in hist else np.zeros(len(hist))
+    dividends = hist['Dividends'].fillna(0).to_numpy(dtype=float) if 'Dividends' in hist else np.zeros(len(hist))
+    close = hist['Close'].to_numpy(dtype=float)
+
+    # factor ของวัน t = ผลคูณของ event ที่เกิด "หลัง" t -> reverse cumprod แล้วเลื่อน 1 วัน
+    ratio = np.where(splits > 0, splits, 1.0)
+    split_factor = np.append(np.cumprod(ratio[::-1])[::-1][1:], 1.0)
+
+    prev_close = np.concatenate(([close[0]], close[:-1])) if len(close) else close
+    step = np.where(dividends > 0, 1 - dividends / prev_close, 1.0)
+    div_factor = np.append(np.cumprod(step[::-1])[::-1][1:], 1.0)
+
+    record = pd.DataFrame(index=hist.index)
+    for col in OHLC:
+        record[col] = hist[col].to_numpy(dtype=float) * split_factor
+    record['Volume'] = hist['Volume'].to_numpy(dtype=float) / split_factor
+    record['Dividends'] = dividends * split_factor
+    record['Split_Factor'] = split_factor
+    record['Div_Factor'] = div_factor
+    return record
+
+
+def apply_view(record: pd.DataFrame, kind: str = "split") -> pd.DataFrame:
+    """
+    View จาก record (vectorized, ไม่ดึงข้อมูลใหม่)
+    - raw:      ราคาที่ซื้อขายจริงในวันนั้น (เห็น gap ตอนแตกพาร์)
+    - split:    ปรับ split อย่างเดียว -> ราคายังตกในวัน XD (ใช้กับ T-DTS / TEMA รอบ XD / DDM)
+    - adjusted: ปรับ split + ปันผล (total return, เท่ากับ Adj Close ของ Yahoo) -> ใช้กับผลตอบแทน/Indicator
+    """
+    if kind not in PRICE_VIEWS:
+        raise ValueError(f"Unknown price view '{kind}'. Choose one of {list(PRICE_VIEWS)}.")
+    out = record[OHLC + ['Volume', 'Dividends']].copy()
+    if kind == "raw":
+        return out
+    split_factor = record['Split_Factor'].to_numpy()
+    price_factor = 1 / split_factor if kind == "split" else record['Div_Factor'].to_numpy() / split_factor
+    out[OHLC] = out[OHLC].to_numpy() * price_factor[:, None]
+    out['Volume'] = out['Volume'].to_numpy() * split_factor
+    # ปันผลคง "ต่อหุ้นปัจจุบัน" (ปรับ split) ในทั้ง split และ adjusted view
+    out['Dividends'] = out['Dividends'].to_numpy() / split_factor
+    return out
+
+
+def apply_intraday_view(bars: pd.DataFrame, record: pd.DataFrame, kind: str = "split") -> pd.DataFrame:
+    """
+    View ของ bar ระหว่างวัน (เก็บแบบปรับ split แล้วเหมือน Yahoo) ด้วย factor รายวันของ record
+    - bar ทุกตัวในวันเดียวกันใช้ factor ของวันนั้น -> ราคาตกตอนเปิดวัน XD ยังเห็นใน split view
+    """
+    if kind not in PRICE_VIEWS:
+        raise ValueError(f"Unknown price view '{kind}'. Choose one of {list(PRICE_VIEWS)}.")
+    out = bars.copy()
+    if kind == "split" or out.empty or record.empty:
+        return out
+    factors = record[['Split_Factor', 'Div_Factor']].set_axis(record.index.normalize())
+    daily = factors.reindex(out.index.normalize(), method='ffill').fillna(1.0)
+    split_factor = daily['Split_Factor'].to_numpy()
+    price_factor = split_factor if kind == "raw" else daily['Div_Factor'].to_numpy()
+    out[OHLC] = out[OHLC].to_numpy() * price_factor[:, None]
+    if kind == "raw":
+        out['Volume'] = out['Volume'].to_numpy() / split_factor
+    return out
+
+
+class PriceStore:
+    """
+    เก็บราคาดิบ + Adjustment factors ต่อ ticker (ดึงประวัติทั้งหมดครั้งเดียวต่อ TTL)
+    - Analyzer ทุกตัวขอ view ที่ต้องการ (raw / split / adjusted) + ช่วงวันที่ จาก record เดียวกัน
+      -> ไม่ต้องดึงซ้ำด้วย auto_adjust ต่างกัน และ T-DTS / TEMA / DDM ใช้ชุดข้อมูลเดียวกัน
+    - Intraday (bars): LRU ต่อ (ticker, interval) สูงสุด intraday_size ชุด; interval ที่หยาบกว่ารวมจาก
+      bar ที่ละเอียดกว่าที่โหลดไว้แล้ว (5m -> 15m / 1h) แทนการดึงใหม่
+    """
+
+    def __init__(self, ttl_seconds: int = PRICE_STORE_TTL_SECONDS, intraday_size: int = INTRADAY_CACHE_SIZE,
+                 intraday_ttl_seconds: int = INTRADAY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.intraday_size = intraday_size
+        self.intraday_ttl_seconds = intraday_ttl_seconds
+        self._records: Dict[str, pd.DataFrame] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._intraday: "OrderedDict[Tuple[str, str], Tuple[pd.DataFrame, float]]" = OrderedDict()
+        self._source = None
+        self._lock = threading.Lock()
+
+    def _check_source(self, source):
+        if source is not self._source:
+            # สลับแหล่งข้อมูล (use_data_source ใน Benchmark / Load test) -> record เดิมใช้ไม่ได้
+            self._records.clear()
+            self._fetched_at.clear()
+            self._intraday.clear()
+            self._source = source
+
+    def _is_fresh(self, ticker: str) -> bool:
+        fetched_at = self._fetched_at.get(ticker)
+        return fetched_at is not None and (time.monotonic() - fetched_at) < self.ttl_seconds
+
+    def _fetch(self, source, ticker: str) -> pd.DataFrame:
+        with span("price_store", "fetch"):
+            hist = source.ticker(ticker).history(period="max", auto_adjust=False, actions=True)
+        if hist is None or hist.empty:
+            count_failure("price_store", "no_history")
+            return pd.DataFrame(columns=OHLC + ['Volume', 'Dividends', 'Split_Factor', 'Div_Factor'])
+        return build_record(hist)
+
+    def record(self, symbol: str) -> pd.DataFrame:
+        ticker = _to_ticker(symbol)
+        source = get_data_source()
+        with self._lock:
+            self._check_source(source)
+            if self._is_fresh(ticker):
+                METRICS.inc("cache_requests_total", cache="price_store", result="hit")
+                return self._records[ticker]
+        METRICS.inc("cache_requests_total", cache="price_store", result="miss")
+        record = self._fetch(source, ticker)
+        with self._lock:
+            self._records[ticker] = record
+            self._fetched_at[ticker] = time.monotonic()
+        return record
+
+    def view(self, symbol: str, kind: str = "split", start=None, end=None, period: Optional[str] = None) -> pd.DataFrame:
+        """ราคาตาม view + ช่วงวันที่ (start/end หรือ period แบบ yfinance เช่น '5y')"""
+        record = self.record(symbol)
+        if record.empty:
+            return apply_view(record, kind)
+        return apply_view(_slice_period(record, start, end, period), kind)
+
+    # ---------- Intraday ----------
+    def _fetch_intraday(self, source, ticker: str, interval: str) -> pd.DataFrame:
+        with span("price_store", "fetch_intraday"):
+            bars = source.ticker(ticker).history(period=INTRADAY_LOOKBACK[interval], interval=interval,
+                                                 auto_adjust=False, actions=False)
+        if bars is None or bars.empty:
+            count_failure("price_store", "no_history")
+            return pd.DataFrame(columns=list(OHLCV_AGG), dtype=float)
+        return bars[list(OHLCV_AGG)].astype(float)
+
+    def _intraday_fresh(self, fetched_at: float) -> bool:
+        return (time.monotonic() - fetched_at) < self.intraday_ttl_seconds
+
+    def _finer_bars(self, ticker: str, interval: str, start=None) -> Optional[Tuple[str, pd.DataFrame]]:
+        """
+        (ถือ lock อยู่) bar ที่ละเอียดกว่าใน LRU ที่รวมเป็น interval นี้ได้และครอบคลุมช่วงที่ขอ
+        - ครอบคลุม = ย้อนหลังได้ไม่น้อยกว่า interval ที่ขอ หรือเริ่มก่อน start
+        - หลายชุด -> ใช้ชุดที่หยาบที่สุด (แถวน้อยสุด)
+        """
+        start_day = pd.Timestamp(start).date() if start is not None else None
+        best = None
+        for (t, finer), (bars, fetched_at) in self._intraday.items():
+            if t != ticker or not can_resample(finer, interval) or not self._intraday_fresh(fetched_at) or bars.empty:
+                continue
+            covers = lookback_days(finer) >= lookback_days(interval) or (
+                start_day is not None and bars.index[0].date() <= start_day)
+            if covers and (best is None or INTRADAY_MINUTES[finer] > INTRADAY_MINUTES[best[0]]):
+                best = (finer, bars)
+        return best
+
+    def intraday(self, symbol: str, interval: str, start=None) -> pd.DataFrame:
+        """bar ระหว่างวันทั้งช่วงที่ย้อนหลังได้ (ปรับ split) — จาก LRU / รวมจาก bar ที่ละเอียดกว่า / ดึงใหม่"""
+        ticker = _to_ticker(symbol)
+        source = get_data_source()
+        key = (ticker, interval)
+        with self._lock:
+            self._check_source(source)
+            entry = self._intraday.get(key)
+            if entry is not None and self._intraday_fresh(entry[1]):
+                self._intraday.move_to_end(key)
+                METRICS.inc("cache_requests_total", cache="price_store_intraday", result="hit")
+                return entry[0]
+            finer = self._finer_bars(ticker, interval, start)
+            if finer is not None:
+                self._intraday.move_to_end((ticker, finer[0]))
+        if finer is not None:
+            # ไม่เก็บผลที่รวมแล้ว -> LRU ถือเฉพาะ bar ที่ดึงมาจริง
+            METRICS.inc("cache_requests_total", cache="price_store_intraday", result="resampled")
+            with span("price_store", "resample"):
+                return resample_bars(finer[1], interval)
+
+        METRICS.inc("cache_requests_total", cache="price_store_intraday", result="miss")
+        bars = self._fetch_intraday(source, ticker, interval)
+        with self._lock:
+            self._intraday[key] = (bars, time.monotonic())
+            self._intraday.move_to_end(key)
+            while len(self._intraday) > self.intraday_size:
+                self._intraday.popitem(last=False)
+                METRICS.inc("cache_evictions_total", cache="price_store_intraday")
+        return bars
+
+    def bars(self, symbol: str, interval: str = DAILY, kind: str = "split", start=None, end=None,
+             period: Optional[str] = None) -> pd.DataFrame:
+        """OHLCV ตาม interval ('1d' = view เดิม, '5m' / '1h' ... = intraday) + view + ช่วงวันที่"""
+        check_interval(interval)
+        if interval == DAILY:
+            return self.view(symbol, kind, start, end, period)
+        bars = self.intraday(symbol, interval, start)
+        if not bars.empty:
+            bars = _slice_period(bars, start, end, period)
+        return apply_intraday_view(bars, self.record(symbol) if kind != "split" else pd.DataFrame(), kind)
+
+    def dividends(self, symbol: str, kind: str = "split") -> pd.Series:
+        """ปันผลต่อหุ้น (เฉพาะวัน XD) — kind='raw' = ตัวเลขตามที่ประกาศจริง, อื่น ๆ = ปรับ split"""
+        div = self.view(symbol, "raw" if kind == "raw" else "split")['Dividends']
+        return div[div > 0]
+
+    def invalidate(self, symbols: Optional[List[str]] = None):
+        with self._lock:
+            tickers = [_to_ticker(s) for s in symbols] if symbols else list(self._records)
+            for ticker in tickers:
+                self._records.pop(ticker, None)
+                self._fetched_at.pop(ticker, None)
+            for key in [k for k in self._intraday if not symbols or k[0] in tickers]:
+                del self._intraday[key]
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "ticker_count": len(self._records),
+                "fresh_count": sum(self._is_fresh(t) for t in self._records),
+                "rows": sum(len(r) for r in self._records.values()),
+                "intraday": {
+                    "max_entries": self.intraday_size,
+                    "ttl_seconds": self.intraday_ttl_seconds,
+                    "entries": [f"{t}@{i}" for t, i in self._intraday],
+                    "rows": sum(len(bars) for bars, _ in self._intraday.values())
+                }
+            }
+
+
+# Shared instance สำหรับทุก Analyzer
+PRICE_STORE = PriceStore()
@@ -0,0 +1,122 @@
+import time
+import threading
+import pandas as pd
+from datetime import datetime
+from typing import List, Dict, Optional
+from Func_app.config import SET50_TICKERS
+from Func_app.DataSource.data_source import get_data_source
+from Func_app.metrics import span, count_failure
+
+# ราคาล่าสุดถือว่ายังใช้ได้ภายในช่วงเวลานี้ (วินาที)
+QUOTE_TTL_SECONDS = 60
+
+
+def _to_ticker(symbol: str) -> str:
+    clean_symbol = symbol.upper().replace('.BK', '')
+    return f"{clean_symbol}.BK"
+
+
+def _to_key(symbol: str) -> str:
+    return symbol.upper().replace('.BK', '')
+
+
+class QuoteSnapshot:
+    """
+    Last-price snapshot ของทั้ง Universe ดึงครั้งเดียวด้วย bulk request
+    - เก็บราคาไว้ตาม TTL (ไม่ต้องยิง fast_info ทีละตัว)
+    - บันทึกหุ้นที่ดึงราคาไม่สำเร็จไว้ใน `failed` เพื่อให้เห็น Coverage ที่หายไป
+    """
+
+    def __init__(self, ttl_seconds: int = QUOTE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._prices: Dict[str, float] = {}
+        self._failed: Dict[str, str] = {}
+        self._fetched_at: Optional[float] = None
+        self._as_of: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._fetched_at is not None and (time.monotonic() - self._fetched_at) < self.ttl_seconds
+
+    def _covers(self, keys: List[str]) -> bool:
+        return all(k in self._prices or k in self._failed for k in keys)
+
+    def _fetch(self, tickers: List[str]):
+        """Bulk download ราคาปิดล่าสุด (ไม่ปรับปันผล) ของทุกตัวใน request เดียว"""
+        prices, failed = {}, {}
+        try:
+            df = get_data_source().download(
+                tickers=tickers, period="5d", interval="1d",
+                auto_adjust=False, progress=False, threads=True
+            )
+        except Exception as e:
+            return prices, {_to_key(t): f"bulk download failed: {e}" for t in tickers}
+
+        if df is None or df.empty or 'Close' not in df:
+            return prices, {_to_key(t): "no quote returned" for t in tickers}
+
+        close = df['Close']
+        if isinstance(close, pd.Series):
+            close = close.to_frame(name=tickers[0])
+        last_close = close.ffill().iloc[-1]
+
+        for t in tickers:
+            key = _to_key(t)
+            price = last_close.get(t)
+            if price is None or pd.isna(price) or price == 0:
+                failed[key] = "no quote returned"
+            else:
+                prices[key] = float(price)
+        return prices, failed
+
+    def refresh(self, tickers: Optional[List[str]] = None) -> Dict:
+        target = [_to_ticker(t) for t in (tickers if tickers else SET50_TICKERS)]
+        with span("quote_snapshot", "fetch"):
+            prices, failed = self._fetch(target)
+        with self._lock:
+            self._prices = prices
+            self._failed = failed
+            self._fetched_at = time.monotonic()
+            self._as_of = datetime.now()
+        if failed:
+            count_failure("quote_snapshot", "no_quote", n=len(failed))
+            print(f"⚠️ QUOTE SNAPSHOT: {len(failed)} ticker(s) without price: {sorted(failed)}")
+        return self.status()
+
+    def get_prices(self, tickers: Optional[List[str]] = None, force: bool = False) -> Dict[str, float]:
+        """คืนราคาล่าสุด keyed by symbol (ไม่มี .BK) — refresh อัตโนมัติเมื่อหมดอายุหรือไม่ครอบคลุม"""
+        target = tickers if tickers else SET50_TICKERS
+        keys = [_to_key(t) for t in target]
+        with self._lock:
+            stale = force or not self._is_fresh() or not self._covers(keys)
+        if stale:
+            # รวมรายชื่อเดิมเข้าไปด้วย เพื่อไม่ให้ snapshot หดเหลือแค่ตัวที่ขอล่าสุด
+            merged = list(dict.fromkeys(keys + list(self._prices) + list(self._failed)))
+            self.refresh(merged)
+        with self._lock:
+            return {k: self._prices[k] for k in keys if k in self._prices}
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        return self.get_prices([symbol]).get(_to_key(symbol))
+
+    def failed(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._failed)
+
+    def status(self) -> Dict:
+        with self._lock:
+            age = round(time.monotonic() - self._fetched_at, 1) if self._fetched_at is not None else None
+            return {
+                "as_of": self._as_of,
+                "age_seconds": age,
+                "ttl_seconds": self.ttl_seconds,
+                "is_fresh": self._is_fresh(),
+                "price_count": len(self._prices),
+                "failed_count": len(self._failed),
+                "failed": dict(self._failed),
+                "prices": dict(self._prices)
+            }
+
+
+# Shared instance สำหรับทุก Analyzer
+QUOTE_SNAPSHOT = QuoteSnapshot()
@@ -0,0 +1,99 @@
+# Func_app/DataSource/replay.py
+import os
+import glob
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+
+MARKET_TZ = "Asia/Bangkok"
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# ==========================================
+# 1. Fixture Files (1 ticker = 1 CSV.gz ราคาดิบ + Adj Close + Actions)
+# ==========================================
+
+def save_fixture(ticker: str, hist: pd.DataFrame, fixtures_dir: str) -> str:
+    os.makedirs(fixtures_dir, exist_ok=True)
+    path = os.path.join(fixtures_dir, f"{ticker.upper()}.csv.gz")
+    hist.reindex(columns=PRICE_COLUMNS).to_csv(path)
+    return path
+
+
+def load_fixtures(fixtures_dir: str) -> Dict[str, pd.DataFrame]:
+    market = {}
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.csv.gz"))):
+        ticker = os.path.basename(path)[:-len(".csv.gz")]
+        df = pd.read_csv(path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True).tz_convert(MARKET_TZ)
+        market[ticker] = df
+    return market
+
+# ==========================================
+# 2. yf.Ticker / yf.download look-alikes บนข้อมูลใน memory
+# ==========================================
+
+def _slice_period(df: pd.DataFrame, start=None, end=None, period=None) -> pd.DataFrame:
+    if start is not None or end is not None:
+        lo = pd.Timestamp(start, tz=MARKET_TZ) if start is not None else df.index[0]
+        hi = pd.Timestamp(end, tz=MARKET_TZ) if end is not None else df.index[-1] + pd.Timedelta(days=1)
+        return df[(df.index >= lo) & (df.index < hi)]
+    if period and period != "max":
+        unit = {'d': 'days', 'mo': 'months', 'y': 'years'}
+        for suffix in ('mo', 'd', 'y'):
+            if period.endswith(suffix):
+                offset = pd.DateOffset(**{unit[suffix]: int(period[:-len(suffix)])})
+                return df[df.index > df.index[-1] - offset]
+    return df
+
+
+class ReplayTicker:
+    """ส่วนที่ Func_app ใช้จาก yf.Ticker: history(), dividends, fast_info"""
+
+    def __init__(self, symbol: str, df: pd.DataFrame, intraday: Optional[Callable[[pd.DataFrame, str], pd.DataFrame]] = None):
+        self.ticker = symbol.upper()
+        self._df = df if df is not None else pd.DataFrame(columns=PRICE_COLUMNS)
+        # intraday(daily ช่วงที่ขอ, interval) -> OHLCV ระหว่างวัน (Fixture มีแค่รายวัน -> None = ไม่มีข้อมูล)
+        self._intraday = intraday
+
+    def history(self, start=None, end=None, period="1mo", interval="1d", auto_adjust=True, actions=True,
+                **kwargs) -> pd.DataFrame:
+        if self._df.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        if interval != "1d":
+            if self._intraday is None:
+                return pd.DataFrame(columns=PRICE_COLUMNS)
+            return self._intraday(_slice_period(self._df, start, end, None if start or end else period), interval)
+        df = _slice_period(self._df, start, end, None if start or end else period).copy()
+        if auto_adjust:
+            ratio = df['Adj Close'] / df['Close']
+            for col in ('Open', 'High', 'Low', 'Close'):
+                df[col] = df[col] * ratio
+            df = df.drop(columns=['Adj Close'])
+        if not actions:
+            df = df.drop(columns=['Dividends', 'Stock Splits'])
+        return df
+
+    @property
+    def dividends(self) -> pd.Series:
+        if self._df.empty:
+            return pd.Series(dtype=float, name='Dividends')
+        div = self._df['Dividends']
+        return div[div > 0].copy()
+
+    @property
+    def fast_info(self) -> Dict:
+        return {'last_price': float(self._df['Close'].iloc[-1]) if not self._df.empty else None}
+
+
+def replay_download(tickers: List[str], frames: Dict[str, pd.DataFrame], start=None, end=None,
+                    period=None, auto_adjust=True) -> pd.DataFrame:
+    """รูปแบบเดียวกับ yf.download: columns = (Price, Ticker)"""
+    out = {}
+    for t in tickers:
+        hist = ReplayTicker(t, frames.get(t.upper())).history(
+            start=start, end=end, period=period or "1mo", auto_adjust=auto_adjust
+        )
+        if not hist.empty:
+            out[t] = hist.drop(columns=['Dividends', 'Stock Splits'], errors='ignore')
+    if not out:
+        return pd.DataFrame()
+    return pd.concat(out, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
@@ -0,0 +1,116 @@
+# Func_app/DataSource/synthetic.py
+import zlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from Func_app.config import SET50_TICKERS_BASE, SET_SESSIONS
+from Func_app.DataSource.intervals import OHLCV_AGG, resample_bars
+from Func_app.DataSource.replay import MARKET_TZ
+
+INTRADAY_SIGMA = 0.001  # ความผันผวนต่อนาที (~30%/ปี)
+
+
+def synthetic_tickers(n_tickers: int) -> List[str]:
+    """ใช้ชื่อ SET50 จริงก่อน แล้วต่อด้วย SYN0001.BK, SYN0002.BK, ..."""
+    base = [f"{t}.BK" for t in SET50_TICKERS_BASE]
+    extra = [f"SYN{i:04d}.BK" for i in range(1, max(0, n_tickers - len(base)) + 1)]
+    return (base + extra)[:n_tickers]
+
+
+def ticker_seed(symbol: str, seed: int) -> int:
+    """Seed ต่อ ticker ไม่ขึ้นกับลำดับที่ขอข้อมูล -> ผลเหมือนเดิมทุกครั้ง"""
+    return zlib.crc32(f"{symbol.upper()}:{seed}".encode())
+
+
+def synthetic_history(rng, start: str = "2016-01-01", end: Optional[str] = None) -> pd.DataFrame:
+    """
+    ราคาดิบ (ไม่ปรับปันผล) แบบ GBM + ปันผล 2 ครั้ง/ปี (ราคาตกในวัน XD ประมาณเท่าปันผล)
+    'Adj Close' คำนวณแบบเดียวกับ Yahoo (คูณ factor 1 - D/P_cum ย้อนหลัง)
+    """
+    end = end or pd.Timestamp.today().strftime('%Y-%m-%d')
+    dates = pd.bdate_range(start, end, tz=MARKET_TZ)
+    n = len(dates)
+
+    mu, sigma = rng.uniform(-0.02, 0.10), rng.uniform(0.15, 0.45)
+    log_ret = rng.normal((mu - 0.5 * sigma ** 2) / 252, sigma / np.sqrt(252), n)
+    close = rng.uniform(5, 200) * np.exp(np.cumsum(log_ret))
+
+    dividends = np.zeros(n)
+    yield_half = rng.uniform(0.005, 0.03)
+    for year in range(dates[0].year, dates[-1].year + 1):
+        for month in (rng.integers(3, 6), rng.integers(8, 10)):
+            day = pd.Timestamp(year=year, month=int(month), day=int(rng.integers(1, 28)), tz=MARKET_TZ)
+            loc = dates.searchsorted(day)
+            if 0 < loc < n:
+                dps = round(close[loc - 1] * yield_half * rng.uniform(0.7, 1.3), 4)
+                dividends[loc] = dps
+                # ราคาตกวัน XD ~ ปันผล (มีสัดส่วนแตกต่างกันไป -> T-DTS ไม่คงที่)
+                close[loc:] *= max(1 - dps * rng.uniform(0.5, 1.5) / close[loc - 1], 0.5)
+
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.004, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, n)))
+
+    # Adjustment factor ย้อนหลังของปันผลแต่ละครั้ง
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    step = np.where(dividends > 0, 1 - dividends / prev_close, 1.0)
+    factor = np.concatenate((np.cumprod(step[::-1])[::-1][1:], [1.0]))
+
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Adj Close': close * factor,
+        'Volume': rng.integers(1e5, 5e7, n).astype(float),
+        'Dividends': dividends,
+        'Stock Splits': 0.0
+    }, index=pd.DatetimeIndex(dates, name='Date'))
+
+
+def synthetic_ticker_history(symbol: str, seed: int = 42, start: str = "2016-01-01") -> pd.DataFrame:
+    return synthetic_history(np.random.default_rng(ticker_seed(symbol, seed)), start=start)
+
+
+def synthetic_market(n_tickers: int, seed: int = 42, start: str = "2016-01-01") -> Dict[str, pd.DataFrame]:
+    return {t: synthetic_ticker_history(t, seed, start) for t in synthetic_tickers(n_tickers)}
+
+
+def session_offsets() -> np.ndarray:
+    """เวลาเริ่มของ bar 1 นาทีทุกตัวในหนึ่งวัน (นาทีนับจากเที่ยงคืน) ตาม SET_SESSIONS"""
+    minutes = []
+    for open_, close in SET_SESSIONS:
+        h0, m0 = map(int, open_.split(':'))
+        h1, m1 = map(int, close.split(':'))
+        minutes.extend(range(h0 * 60 + m0, h1 * 60 + m1))
+    return np.array(minutes)
+
+
+def synthetic_intraday(daily: pd.DataFrame, symbol: str, seed: int = 42, interval: str = "1m") -> pd.DataFrame:
+    """
+    bar ระหว่างวันของทุกวันใน daily (ราคาดิบ): Brownian bridge จาก Open ไป Close ของวันนั้น
+    - seed ต่อ (ticker, วัน) -> bar ของวันเดียวกันเหมือนเดิมไม่ว่าจะขอช่วงไหน
+    - สร้างเป็น 1m แล้วรวมเป็น interval ที่ขอ -> ทุก interval มาจาก path เดียวกัน
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=list(OHLCV_AGG))
+    offsets = pd.to_timedelta(session_offsets(), unit='min')
+    n = len(offsets)
+    steps = np.arange(1, n + 1) / n
+
+    index, columns = [], {col: [] for col in OHLCV_AGG}
+    for day, o, c, v in zip(daily.index.normalize(), daily['Open'].to_numpy(float),
+                            daily['Close'].to_numpy(float), daily['Volume'].to_numpy(float)):
+        rng = np.random.default_rng(ticker_seed(f"{symbol}:{day:%Y-%m-%d}", seed))
+        walk = np.cumsum(rng.normal(0, INTRADAY_SIGMA, n))
+        close = np.exp(np.log(o) + steps * (np.log(c) - np.log(o)) + walk - steps * walk[-1])
+        open_ = np.concatenate(([o], close[:-1]))
+        wick = np.abs(rng.normal(0, INTRADAY_SIGMA / 2, (2, n)))
+        weights = rng.random(n)
+        index.append(day + offsets)
+        columns['Open'].append(open_)
+        columns['High'].append(np.maximum(open_, close) * (1 + wick[0]))
+        columns['Low'].append(np.minimum(open_, close) * (1 - wick[1]))
+        columns['Close'].append(close)
+        columns['Volume'].append(np.round(v * weights / weights.sum()))
+
+    bars = pd.DataFrame({col: np.concatenate(parts) for col, parts in columns.items()},
+                        index=pd.DatetimeIndex(np.concatenate(index), name='Datetime'))
+    return bars if interval == "1m" else resample_bars(bars, interval)
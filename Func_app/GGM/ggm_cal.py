@@ -1,11 +1,15 @@
 # Func_app/GGM/ggm_cal.py
-import yfinance as yf
 import pandas as pd
 import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from Func_app.config import SET50_TICKERS 
+from Func_app.DataSource.quote_snapshot import QUOTE_SNAPSHOT
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import StageTimer, count_failure
+from Func_app.records import GGMResult
 
-def calculate_ddm_dynamic(symbol: str, years: int, r_expected: float, growth_rate: float = 0.0) -> Optional[Dict]:
+def calculate_ddm_dynamic(symbol: str, years: int, r_expected: float, growth_rate: float = 0.0,
+                          current_price: Optional[float] = None) -> Optional[GGMResult]:
     """
     [UPDATED LOGIC] DDM Valuation using Historical Dividends as Proxy
     
@@ -15,82 +19,116 @@ def calculate_ddm_dynamic(symbol: str, years: int, r_expected: float, growth_rat
       - Terminal Value = Current Price (Conservative).
       - Diff_Percent = (Target - Current) / Current (Upside %).
       - Threshold: +/- 2.5% considered 'Fairly Valued'.
+      - Current price comes from the shared QUOTE_SNAPSHOT (bulk fetch) unless passed in.
     """
     try:
-        symbol_input = symbol if symbol.endswith(".BK") else f"{symbol}.BK"
-        stock = yf.Ticker(symbol_input)
-        current_price = stock.fast_info['last_price']
-        
-        if current_price is None or current_price == 0: return None
-        
-        # ดึงปันผลทั้งหมด
-        dividends = stock.dividends
-        if dividends.empty: return None
-        
-        # เตรียมตัวแปรเวลา
-        now = pd.Timestamp.now(tz=datetime.timezone.utc)
+        return _calculate_ddm(symbol, years, r_expected, current_price)
+    except Exception as e:
+        # print(f"Error {symbol}: {e}") 
+        return None
 
-        calc_years = years 
-        threshold_pct = 2.5
-        
-        total_pv_dividends = 0
-        dividends_flow = {}
+def _calculate_ddm(symbol: str, years: int, r_expected: float, current_price: Optional[float]) -> GGMResult:
+    """Core DDM logic — raises ValueError with the reason when a stock cannot be valued"""
+    symbol_input = symbol if symbol.endswith(".BK") else f"{symbol}.BK"
+    timer = StageTimer("ggm")
+    if current_price is None:
+        current_price = QUOTE_SNAPSHOT.get_price(symbol_input)
+    
+    if current_price is None or current_price == 0:
+        raise ValueError("no current price")
+    
+    # ดึงปันผลทั้งหมด
+    dividends = PRICE_STORE.dividends(symbol_input)
+    timer.lap("fetch")
+    if dividends.empty:
+        raise ValueError("no dividend history")
+    
+    # เตรียมตัวแปรเวลา
+    now = pd.Timestamp.now(tz=datetime.timezone.utc)
 
-        col_names = {1: "Div(Y-2)", 2: "Div(Y-1)", 3: "Div(Y-0)"}
+    calc_years = years 
+    threshold_pct = 2.5
+    
+    total_pv_dividends = 0
+    dividends_flow = {}
 
-        for i in range(1, calc_years + 1):
-            history_year_offset = calc_years - i + 1
-            
-            start_date = now - pd.DateOffset(years=history_year_offset + 1)
-            end_date = now - pd.DateOffset(years=history_year_offset)
-            
-            d_historic = dividends[(dividends.index >= start_date) & (dividends.index < end_date)].sum()
-            
-            col_name = col_names.get(i, f"D{i}")
-            dividends_flow[col_name] = round(d_historic, 4)
-            
-            # คิดลด PV
-            pv = d_historic / ((1 + r_expected) ** i)
-            total_pv_dividends += pv
+    col_names = {1: "Div(Y-2)", 2: "Div(Y-1)", 3: "Div(Y-0)"}
 
-        pv_terminal_price = current_price / ((1 + r_expected) ** calc_years)
+    for i in range(1, calc_years + 1):
+        history_year_offset = calc_years - i + 1
         
-        target_price = total_pv_dividends + pv_terminal_price
-
-        if current_price != 0:
-            upside_percent = ((target_price - current_price) / current_price) * 100
-        else:
-            upside_percent = 0
+        start_date = now - pd.DateOffset(years=history_year_offset + 1)
+        end_date = now - pd.DateOffset(years=history_year_offset)
+        
+        d_historic = dividends[(dividends.index >= start_date) & (dividends.index < end_date)].sum()
+        
+        col_name = col_names.get(i, f"D{i}")
+        dividends_flow[col_name] = round(float(d_historic), 4)
         
-        # --- Threshold Logic (+- 2.5%) ---
-        if abs(upside_percent) <= threshold_pct:
-            meaning = "Fairly Valued"
-        elif upside_percent > threshold_pct:
-            meaning = "Undervalue"
-        else: 
-            meaning = "Overvalue"
+        # คิดลด PV
+        pv = d_historic / ((1 + r_expected) ** i)
+        total_pv_dividends += pv
 
-        return {
-            "Symbol": symbol,
-            "Current_Price": round(current_price, 2),
-            "Target_Price": round(target_price, 2), # เปลี่ยน Key เป็น Target ให้สื่อความหมาย (หรือจะใช้ Pred_Price เหมือนเดิมก็ได้)
-            "Diff_Percent": round(upside_percent, 2),
-            "Meaning": meaning,
-            "Dividends_Flow": dividends_flow
-        }
+    pv_terminal_price = current_price / ((1 + r_expected) ** calc_years)
+    
+    target_price = total_pv_dividends + pv_terminal_price
 
-    except Exception as e:
-        # print(f"Error {symbol}: {e}") 
-        return None
+    if current_price != 0:
+        upside_percent = ((target_price - current_price) / current_price) * 100
+    else:
+        upside_percent = 0
+    
+    # --- Threshold Logic (+- 2.5%) ---
+    if abs(upside_percent) <= threshold_pct:
+        meaning = "Fairly Valued"
+    elif upside_percent > threshold_pct:
+        meaning = "Undervalue"
+    else: 
+        meaning = "Overvalue"
+    timer.lap("compute")
 
-def analyze_ggm_batch(tickers: Optional[List[str]], years: int, r_expected: float, growth_rate: float) -> List[Dict]:
+    return GGMResult(
+        symbol=symbol,
+        current_price=round(float(current_price), 2),
+        target_price=round(float(target_price), 2), # Target = ราคาเหมาะสมจาก DDM
+        diff_percent=round(float(upside_percent), 2),
+        meaning=meaning,
+        dividends_flow=dividends_flow
+    )
 
-    target_tickers = tickers if tickers else SET50_TICKERS
+def analyze_ggm_batch(tickers: Optional[List[str]], years: int, r_expected: float, growth_rate: float,
+                      on_result: Optional[Callable[[str, GGMResult], None]] = None) -> Dict:
+    """
+    GGM ของทั้ง Universe — ราคาปัจจุบันดึงครั้งเดียวจาก QUOTE_SNAPSHOT
+    หุ้นที่คำนวณไม่ได้จะถูกรายงานใน 'failed' (Symbol -> เหตุผล) แทนที่จะหายไปเงียบ ๆ
+    - on_result(symbol, data): เรียกทันทีที่หุ้นแต่ละตัวคำนวณเสร็จ
+    """
+    # Retry จาก Scheduler ส่ง key ของ Cache ('PTT') -> ใช้ 'PTT.BK' เสมอ (GGMResult.symbol รูปแบบเดียวกับรอบเต็ม)
+    target_tickers = [f"{t.upper().replace('.BK', '')}.BK" for t in (tickers if tickers else SET50_TICKERS)]
+    prices = QUOTE_SNAPSHOT.get_prices(target_tickers)
+    quote_failed = QUOTE_SNAPSHOT.failed()
     
     results = []
+    failed = {}
     for stock in target_tickers:
-        res = calculate_ddm_dynamic(stock, years, r_expected, growth_rate)
-        if res:
-            results.append(res)
-    results.sort(key=lambda x: x['Diff_Percent'], reverse=True)
-    return results
\ No newline at end of file
+        key = stock.upper().replace('.BK', '')
+        if key not in prices:
+            failed[key] = quote_failed.get(key, "no current price")
+            count_failure("ggm", "no_price")
+            continue
+        try:
+            item = _calculate_ddm(stock, years, r_expected, prices[key])
+        except Exception as e:
+            failed[key] = str(e)
+            count_failure("ggm")
+            continue
+        results.append(item)
+        if on_result:
+            on_result(key, item)
+    results.sort(key=lambda x: x.diff_percent, reverse=True)
+    return {
+        "status": "success",
+        "count": len(results),
+        "data": results,
+        "failed": failed
+    }
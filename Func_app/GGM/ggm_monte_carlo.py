@@ -0,0 +1,185 @@
+# Func_app/GGM/ggm_monte_carlo.py
+import multiprocessing
+import os
+import zlib
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Optional
+from Func_app.config import SET50_TICKERS
+from Func_app.DataSource.quote_snapshot import QUOTE_SNAPSHOT
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import span, count_failure
+
+PERCENTILES = [5, 25, 50, 75, 95]
+TRADING_DAYS = 252
+
+# Worker ไม่ fork จาก process ของ uvicorn (มี thread ของ Scheduler / preload / anyio อยู่แล้ว)
+# -> forkserver (Windows มีแค่ spawn)
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# ==========================================
+# 1. Input Preparation (I/O — main process)
+# ==========================================
+
+def load_ddm_inputs(symbol: str, history_period: str = "10y") -> Dict:
+    """
+    ดึงข้อมูลที่ใช้ Bootstrap: อัตราเติบโตปันผลรายปี + ผลตอบแทนราคารายปี (log, rolling 252 วัน)
+    """
+    symbol_input = symbol if symbol.endswith(".BK") else f"{symbol}.BK"
+    hist = PRICE_STORE.view(symbol_input, "split", period=history_period)
+    if hist.empty:
+        raise ValueError("no price history")
+
+    dividends = hist['Dividends']
+    dividends = dividends[dividends > 0]
+    if dividends.empty:
+        raise ValueError("no dividend history")
+
+    # Div(Y-0) = ปันผลย้อนหลัง 12 เดือน (ตรงกับ calculate_ddm_dynamic)
+    last_date = hist.index[-1]
+    last_dividend = dividends[dividends.index > last_date - pd.DateOffset(years=1)].sum()
+
+    # อัตราเติบโตรายปี (ตัดปีปัจจุบันที่ยังจ่ายไม่ครบ)
+    annual = dividends.groupby(dividends.index.year).sum()
+    annual = annual[annual.index < last_date.year]
+    growth = annual.pct_change().replace([np.inf, -np.inf], np.nan).dropna().to_numpy()
+    if len(growth) == 0:
+        growth = np.array([0.0])
+
+    log_close = np.log(hist['Close'].to_numpy())
+    annual_log_returns = log_close[TRADING_DAYS:] - log_close[:-TRADING_DAYS]
+    if len(annual_log_returns) == 0:
+        annual_log_returns = np.array([0.0])
+
+    return {
+        "last_dividend": float(last_dividend),
+        "dividend_growth": growth,
+        "annual_log_returns": annual_log_returns
+    }
+
+# ==========================================
+# 2. Vectorized Simulation (CPU — worker processes)
+# ==========================================
+
+def simulate_ddm_paths(current_price: float, last_dividend: float, dividend_growth: np.ndarray,
+                       annual_log_returns: np.ndarray, years: int, r_expected: float,
+                       n_paths: int, seed) -> Dict:
+    """
+    Bootstrap DDM: สุ่ม (with replacement) อัตราเติบโตปันผล + ผลตอบแทนราคารายปี สำหรับทุก path พร้อมกัน
+    Target = Σ D_t / (1+r)^t + P_T / (1+r)^T
+    """
+    rng = np.random.default_rng(seed)
+
+    g = rng.choice(np.clip(dividend_growth, -1.0, None), size=(n_paths, years))
+    dividends = last_dividend * np.cumprod(1 + g, axis=1)
+
+    log_ret = rng.choice(annual_log_returns, size=(n_paths, years))
+    terminal_price = current_price * np.exp(log_ret.sum(axis=1))
+
+    discount = (1 + r_expected) ** -np.arange(1, years + 1)
+    target = dividends @ discount + terminal_price * discount[-1]
+
+    pct = np.percentile(target, PERCENTILES)
+    upside = (target - current_price) / current_price
+    return {
+        "Target_Percentiles": {f"P{p}": round(float(v), 2) for p, v in zip(PERCENTILES, pct)},
+        "Target_Mean": round(float(target.mean()), 2),
+        "Prob_Upside (%)": round(float((upside > 0).mean()) * 100, 2),
+        "Expected_Diff_Percent": round(float(upside.mean()) * 100, 2)
+    }
+
+def symbol_seed(seed: int, symbol: str) -> np.random.SeedSequence:
+    """
+    Seed ของหุ้นแต่ละตัวจาก (seed, ชื่อหุ้น) -> หุ้นตัวเดิมได้ random stream เดิมเสมอ
+    ไม่ว่าจะรันเดี่ยว, ทั้ง Universe หรือ Retry เฉพาะบางตัว
+    """
+    key = symbol.upper().replace('.BK', '')
+    return np.random.SeedSequence([seed, zlib.crc32(key.encode())])
+
+def _simulate_worker(args):
+    symbol, current_price, inputs, years, r_expected, n_paths, seed = args
+    sim = simulate_ddm_paths(current_price, inputs['last_dividend'], inputs['dividend_growth'],
+                             inputs['annual_log_returns'], years, r_expected, n_paths, seed)
+    return {
+        "Symbol": symbol,
+        "Current_Price": round(current_price, 2),
+        "Paths": n_paths,
+        "Years": years,
+        "Growth_Samples": len(inputs['dividend_growth']),
+        **sim
+    }
+
+# ==========================================
+# 3. Public API
+# ==========================================
+
+def calculate_ddm_monte_carlo(symbol: str, years: int, r_expected: float, n_paths: int = 20000,
+                              seed: int = 42, current_price: Optional[float] = None) -> Optional[Dict]:
+    """Stochastic DDM รายตัว (รันใน process ปัจจุบัน)"""
+    try:
+        if current_price is None:
+            current_price = QUOTE_SNAPSHOT.get_price(symbol)
+        if not current_price:
+            return None
+        inputs = load_ddm_inputs(symbol)
+        return _simulate_worker((symbol, current_price, inputs, years, r_expected, n_paths, symbol_seed(seed, symbol)))
+    except Exception:
+        return None
+
+def analyze_ggm_monte_carlo_batch(tickers: Optional[List[str]], years: int, r_expected: float,
+                                  n_paths: int = 20000, seed: int = 42,
+                                  max_workers: Optional[int] = None,
+                                  on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    """
+    Stochastic DDM ทั้ง Universe
+    - ดึงข้อมูลใน main process แล้วกระจาย simulation ข้าม CPU cores ด้วย ProcessPoolExecutor
+    - Seed ของแต่ละหุ้น = symbol_seed(seed, หุ้น) -> ผลลัพธ์ reproducible ไม่ขึ้นกับจำนวน worker,
+      ลำดับที่งานเสร็จ หรือรายชื่อหุ้นในรอบนั้น (Retry บางตัวได้ผลเท่ารอบเต็ม / เท่ากับ calculate_ddm_monte_carlo)
+    - on_result(symbol, data): เรียกทันทีที่ผลของหุ้นแต่ละตัวกลับมาจาก worker
+    """
+    target_tickers = tickers if tickers else SET50_TICKERS
+    prices = QUOTE_SNAPSHOT.get_prices(target_tickers)
+
+    jobs = []
+    failed = {}
+    for stock in target_tickers:
+        key = stock.upper().replace('.BK', '')
+        if key not in prices:
+            failed[key] = "no current price"
+            count_failure("ggm_mc", "no_price")
+            continue
+        try:
+            with span("ggm_mc", "fetch"):
+                inputs = load_ddm_inputs(stock)
+        except Exception as e:
+            failed[key] = str(e)
+            count_failure("ggm_mc")
+            continue
+        jobs.append((key, prices[key], inputs, years, r_expected, n_paths, symbol_seed(seed, key)))
+
+    workers = max_workers or os.cpu_count() or 1
+    results = []
+    with span("ggm_mc", "compute"):
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                     mp_context=multiprocessing.get_context(POOL_START_METHOD)) as pool:
+                for item in pool.map(_simulate_worker, jobs):
+                    results.append(item)
+                    if on_result:
+                        on_result(item['Symbol'], item)
+        else:
+            for job in jobs:
+                item = _simulate_worker(job)
+                results.append(item)
+                if on_result:
+                    on_result(item['Symbol'], item)
+
+    results.sort(key=lambda x: x['Expected_Diff_Percent'], reverse=True)
+    return {
+        "status": "success",
+        "params": {"years": years, "r_expected": r_expected, "n_paths": n_paths, "seed": seed},
+        "count": len(results),
+        "data": results,
+        "failed": failed
+    }
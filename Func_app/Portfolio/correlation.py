@@ -0,0 +1,245 @@
+# Func_app/Portfolio/correlation.py
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+from Func_app.config import CORRELATION_WINDOW, CORRELATION_MIN_PERIODS
+from Func_app.metrics import span
+
+TRADING_DAYS = 252
+
+# ==========================================
+# 1. Rolling Moments (pairwise-complete)
+# ==========================================
+
+class RollingMoments:
+    """
+    ผลรวมต่อคู่หุ้น (i, j) ของ window ผลตอบแทน — นับเฉพาะวันที่มีข้อมูลทั้งคู่ (หุ้นพักการซื้อขาย / เข้า Index ทีหลัง)
+    count[i,j] = Σ m_i m_j,  total[i,j] = Σ r_i m_j,  total_sq[i,j] = Σ r_i² m_j,  cross[i,j] = Σ r_i r_j
+    -> bar ใหม่ = push 1 แถว / bar ที่หลุด window = pop 1 แถว (O(N²) แทนการคำนวณ window ใหม่ O(W·N²))
+    """
+
+    def __init__(self, n: int):
+        self.count = np.zeros((n, n))
+        self.total = np.zeros((n, n))
+        self.total_sq = np.zeros((n, n))
+        self.cross = np.zeros((n, n))
+
+    @classmethod
+    def from_returns(cls, returns: np.ndarray) -> "RollingMoments":
+        mask = np.isfinite(returns).astype(float)
+        z = np.where(mask > 0, returns, 0.0)
+        moments = cls(returns.shape[1])
+        moments.count = mask.T @ mask
+        moments.total = z.T @ mask
+        moments.total_sq = (z * z).T @ mask
+        moments.cross = z.T @ z
+        return moments
+
+    def _apply(self, row: np.ndarray, sign: float):
+        m = np.isfinite(row).astype(float)
+        z = np.where(m > 0, row, 0.0)
+        self.count += sign * np.outer(m, m)
+        self.total += sign * np.outer(z, m)
+        self.total_sq += sign * np.outer(z * z, m)
+        self.cross += sign * np.outer(z, z)
+
+    def copy(self) -> "RollingMoments":
+        clone = RollingMoments(0)
+        clone.count, clone.total = self.count.copy(), self.total.copy()
+        clone.total_sq, clone.cross = self.total_sq.copy(), self.cross.copy()
+        return clone
+
+    def push(self, row: np.ndarray):
+        self._apply(row, 1.0)
+
+    def pop(self, row: np.ndarray):
+        self._apply(row, -1.0)
+
+    def covariance(self, min_periods: int = 2) -> np.ndarray:
+        n = self.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.cross - self.total * self.total.T / n) / (n - 1)
+        cov[n < max(min_periods, 2)] = np.nan
+        return cov
+
+    def correlation(self, min_periods: int = 2) -> np.ndarray:
+        n = self.count
+        var = n * self.total_sq - self.total ** 2  # var[i,j] = ส่วนของหุ้น i บนวันที่มีทั้ง i และ j
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = (n * self.cross - self.total * self.total.T) / np.sqrt(var * var.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        corr[n < max(min_periods, 2)] = np.nan
+        np.fill_diagonal(corr, np.where(np.diag(n) >= max(min_periods, 2), 1.0, np.nan))
+        return corr
+
+# ==========================================
+# 2. Service (ใช้ราคาปิดจาก Technical Cache)
+# ==========================================
+
+def close_matrix(columns_by_symbol: Dict[str, Dict]) -> pd.DataFrame:
+    """{symbol: {'Date': [...], 'Close': [...]}} (รูปแบบใน Technical Cache) -> DataFrame dates × symbols"""
+    series = {
+        symbol: pd.Series(cols['Close'], index=pd.to_datetime(cols['Date']), dtype=float)
+        for symbol, cols in columns_by_symbol.items() if cols.get('Date') and cols.get('Close')
+    }
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).sort_index().sort_index(axis=1)
+
+
+class CorrelationService:
+    """
+    Rolling correlation / covariance ของผลตอบแทนรายวัน (log return) ทั้ง Universe
+    - update(): เทียบกับ window เดิม -> มีแค่ bar ใหม่ต่อท้าย = push/pop ทีละแถว, อย่างอื่น (หุ้นเปลี่ยน / ข้อมูลย้อนหลังเปลี่ยน) = rebuild
+    - Matrix ถูกคำนวณเก็บไว้ตอน update -> peers() / matrix() เป็นแค่การอ่าน cache
+    """
+
+    def __init__(self, window: int = CORRELATION_WINDOW, min_periods: int = CORRELATION_MIN_PERIODS):
+        self.window = window
+        self.min_periods = min_periods
+        self.version = 0
+        self.updated_at: Optional[datetime] = None
+        self._tickers: List[str] = []
+        self._dates: List[pd.Timestamp] = []
+        self._returns = np.empty((0, 0))
+        self._moments: Optional[RollingMoments] = None
+        self._corr = np.empty((0, 0))
+        self._cov = np.empty((0, 0))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tickers)
+
+    # ---------- Write ----------
+    def update(self, columns_by_symbol: Dict[str, Dict]) -> Dict:
+        """รับ Close รายหุ้นจาก Technical Cache แล้ว update window (คืน mode ที่ใช้)"""
+        with span("correlation", "compute"):
+            close = close_matrix(columns_by_symbol)
+            if close.empty:
+                return {"mode": "empty", "added": 0}
+            returns = np.log(close).diff().iloc[1:]
+            tickers = list(returns.columns)
+            values = returns.to_numpy()
+            dates = list(returns.index)
+
+            with self._lock:
+                moments, window_rows, window_dates = self._moments, self._returns, self._dates
+                same_universe = tickers == self._tickers
+
+            mode, added = "rebuild", 0
+            if same_universe and window_dates and window_dates[-1] in returns.index:
+                last = returns.index.get_loc(window_dates[-1])
+                overlap = values[max(0, last + 1 - len(window_dates)):last + 1]
+                if overlap.shape == window_rows.shape and np.allclose(overlap, window_rows, equal_nan=True):
+                    new_rows = values[last + 1:]
+                    mode, added = ("incremental", len(new_rows)) if len(new_rows) else ("unchanged", 0)
+
+            if mode == "unchanged":
+                return {"mode": mode, "added": 0, "version": self.version}
+            if mode == "incremental":
+                # ทำบน copy -> reader ยังเห็น matrix ชุดเดิมจนกว่าจะสลับ
+                moments = moments.copy()
+                rows = np.vstack([window_rows, new_rows])
+                for row in new_rows:
+                    moments.push(row)
+                for row in rows[:max(0, len(rows) - self.window)]:
+                    moments.pop(row)
+                window_rows = rows[-self.window:]
+                window_dates = (window_dates + dates[last + 1:])[-self.window:]
+            else:
+                window_rows = values[-self.window:]
+                window_dates = dates[-self.window:]
+                moments = RollingMoments.from_returns(window_rows)
+                added = len(window_rows)
+
+            corr = moments.correlation(self.min_periods)
+            cov = moments.covariance(self.min_periods)
+
+        with self._lock:
+            self._tickers, self._dates, self._returns = tickers, window_dates, window_rows
+            self._moments, self._corr, self._cov = moments, corr, cov
+            self.version += 1
+            self.updated_at = datetime.now()
+        return {"mode": mode, "added": added, "version": self.version}
+
+    # ---------- Read ----------
+    def _select(self, attr: str, symbols: Optional[List[str]]):
+        with self._lock:
+            tickers, matrix = self._tickers, getattr(self, attr)
+            if not symbols:
+                return list(tickers), matrix
+            index = {t: i for i, t in enumerate(tickers)}
+            picked = [s for s in symbols if s in index]
+            idx = [index[s] for s in picked]
+            return picked, matrix[np.ix_(idx, idx)]
+
+    def correlation(self, symbols: Optional[List[str]] = None):
+        return self._select('_corr', symbols)
+
+    def covariance(self, symbols: Optional[List[str]] = None, annualize: bool = False):
+        tickers, cov = self._select('_cov', symbols)
+        return tickers, cov * TRADING_DAYS if annualize else cov
+
+    def matrix(self, kind: str = "corr", symbols: Optional[List[str]] = None, annualize: bool = False) -> Dict:
+        tickers, values = self.correlation(symbols) if kind == "corr" else self.covariance(symbols, annualize)
+        return {
+            "kind": kind,
+            "tickers": tickers,
+            "data": [[None if np.isnan(v) else round(float(v), 6) for v in row] for row in values],
+            **self.status()
+        }
+
+    def peers(self, symbol: str, n: int = 5, ascending: bool = False) -> Optional[List[Dict]]:
+        """หุ้นที่ correlation สูงสุด (ascending=True -> ต่ำสุด / diversifier) กับ symbol"""
+        with self._lock:
+            if symbol not in self._tickers:
+                return None
+            i = self._tickers.index(symbol)
+            row, obs, tickers = self._corr[i], self._moments.count[i], self._tickers
+        order = [j for j in np.argsort(row if ascending else -row) if j != i and not np.isnan(row[j])]
+        return [{"Symbol": tickers[j], "Correlation": round(float(row[j]), 4), "Observations": int(obs[j])}
+                for j in order[:n]]
+
+    def cluster_diversification(self, clusters: Dict[str, str]) -> Dict[str, Dict]:
+        """
+        ต่อ Cluster_Name: avg correlation ภายในกลุ่ม vs กับหุ้นนอกกลุ่ม
+        (ต่ำ = ถือหลายตัวในกลุ่มเดียวกันยังกระจายความเสี่ยงได้)
+        """
+        tickers, corr = self.correlation()
+        index = {t: i for i, t in enumerate(tickers)}
+        groups: Dict[str, List[int]] = {}
+        for symbol, name in clusters.items():
+            if symbol in index:
+                groups.setdefault(name or "Unclassified", []).append(index[symbol])
+
+        off_diag = ~np.eye(len(tickers), dtype=bool)
+        result = {}
+        for name, idx in groups.items():
+            inside = corr[np.ix_(idx, idx)][off_diag[np.ix_(idx, idx)]]
+            outside_idx = [j for j in range(len(tickers)) if j not in idx]
+            outside = corr[np.ix_(idx, outside_idx)].ravel() if outside_idx else np.array([])
+            result[name] = {
+                "Members": len(idx),
+                "Avg_Corr_Within": round(float(np.nanmean(inside)), 4) if np.isfinite(inside).any() else None,
+                "Avg_Corr_Outside": round(float(np.nanmean(outside)), 4) if np.isfinite(outside).any() else None
+            }
+        return result
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "window": self.window,
+                "min_periods": self.min_periods,
+                "ticker_count": len(self._tickers),
+                "observations": len(self._dates),
+                "start": self._dates[0].strftime('%Y-%m-%d') if self._dates else None,
+                "as_of": self._dates[-1].strftime('%Y-%m-%d') if self._dates else None,
+                "version": self.version,
+                "updated_at": self.updated_at
+            }
+
+
+# Shared instance (update หลัง Technical Cache refresh)
+CORRELATION = CorrelationService()
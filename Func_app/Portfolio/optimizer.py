@@ -0,0 +1,254 @@
+# Func_app/Portfolio/optimizer.py
+import time
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from scipy.optimize import linprog, minimize
+from Func_app.metrics import span
+
+OBJECTIVES = ("max_score", "min_risk", "max_yield", "max_upside")
+MIN_WEIGHT_REPORTED = 1e-4
+MAX_CACHED_UNIVERSES = 16
+
+# ==========================================
+# 1. Inputs จาก Cache (Scoring + GGM + Seasonality + Covariance)
+# ==========================================
+
+def dividend_yield(symbol: str, scoring: Mapping, ggm: Mapping, seasonality: Mapping) -> Optional[float]:
+    """
+    Yield ต่อปี (ทศนิยม): ปันผลย้อนหลัง 12 เดือน / ราคาปัจจุบัน จาก GGM
+    ถ้าไม่มีผล GGM -> DY (%) เฉลี่ยต่อครั้งจาก Scoring × จำนวนครั้งที่จ่ายต่อปี (Tag ใน Seasonality)
+    """
+    valuation = ggm.get(symbol)
+    if valuation and valuation.current_price:
+        trailing = (valuation.dividends_flow or {}).get('Div(Y-0)')
+        if trailing is not None:
+            return float(trailing) / float(valuation.current_price)
+    score = scoring.get(symbol)
+    if score and score.dy is not None:
+        timing = seasonality.get(symbol)
+        payments = (len(timing.tags()) if timing else 0) or 1
+        return float(score.dy) / 100 * payments
+    return None
+
+
+def payout_months(symbol: str, seasonality: Mapping) -> Dict[int, float]:
+    """สัดส่วนเงินปันผลต่อปีที่คาดว่าจะได้รับในแต่ละเดือน (จาก Est_Pay_Date / Est_Dividend_Baht)"""
+    months: Dict[int, float] = {}
+    timing = seasonality.get(symbol)
+    for tag in (timing.tags() if timing else []):
+        if not tag.est_pay_date:
+            continue
+        month = int(tag.est_pay_date[5:7])
+        months[month] = months.get(month, 0.0) + float(tag.est_dividend or 0.0)
+    total = sum(months.values())
+    return {m: v / total for m, v in months.items()} if total > 0 else {}
+
+
+def nearest_psd(cov: np.ndarray, floor: float = 1e-10) -> np.ndarray:
+    """Covariance แบบ pairwise-complete อาจไม่ PSD -> ตัด eigenvalue ติดลบ (solver ต้องการ convex)"""
+    values, vectors = np.linalg.eigh((cov + cov.T) / 2)
+    return (vectors * np.clip(values, floor, None)) @ vectors.T
+
+
+def build_universe(scoring: Mapping, ggm: Mapping, seasonality: Mapping,
+                   cov_tickers: List[str], cov: np.ndarray, symbols: Optional[List[str]] = None,
+                   exclude_clusters: Optional[List[str]] = None) -> Dict:
+    """รวม input ต่อหุ้นเป็น array เรียงตาม tickers (เฉพาะหุ้นที่มีทั้ง Score และ Covariance)"""
+    exclude = set(exclude_clusters or [])
+    cov_index = {t: i for i, t in enumerate(cov_tickers)}
+    wanted = symbols if symbols else list(scoring.keys())
+
+    tickers, idx, skipped = [], [], {}
+    for symbol in wanted:
+        row = scoring.get(symbol)
+        if row is None:
+            skipped[symbol] = "not in scoring cache"
+        elif row.cluster_name in exclude:
+            skipped[symbol] = f"excluded cluster: {row.cluster_name}"
+        elif symbol not in cov_index or not np.isfinite(cov[cov_index[symbol], cov_index[symbol]]):
+            skipped[symbol] = "no covariance (not enough price history)"
+        else:
+            tickers.append(symbol)
+            idx.append(cov_index[symbol])
+
+    sub = cov[np.ix_(idx, idx)]
+    sub = np.where(np.isfinite(sub), sub, 0.0)
+    yields = [dividend_yield(t, scoring, ggm, seasonality) for t in tickers]
+    upside = [ggm[t].diff_percent / 100 if t in ggm else None for t in tickers]
+    months = np.zeros((len(tickers), 12))
+    for i, t in enumerate(tickers):
+        for month, share in payout_months(t, seasonality).items():
+            months[i, month - 1] = share
+
+    return {
+        "tickers": tickers,
+        "clusters": [scoring[t].cluster_name or "Unclassified" for t in tickers],
+        "score": np.array([float(scoring[t].total_score or 0.0) / 100 for t in tickers]),
+        "yield": np.array([y if y is not None else 0.0 for y in yields]),
+        "upside": np.array([u if u is not None else 0.0 for u in upside]),
+        "month_share": months,
+        "cov": nearest_psd(sub) if len(tickers) else sub,
+        "missing": {
+            "yield": [t for t, y in zip(tickers, yields) if y is None],
+            "upside": [t for t, u in zip(tickers, upside) if u is None],
+            "payout_months": [t for i, t in enumerate(tickers) if not months[i].any()]
+        },
+        "skipped": skipped
+    }
+
+# ==========================================
+# 2. Solver (SLSQP + analytic gradients, warm-start)
+# ==========================================
+
+class PortfolioOptimizer:
+    """
+    หา weights (long-only, รวม = 1) ตาม objective + constraints
+    - objective: max_score | max_yield | max_upside (หัก risk_aversion × variance) หรือ min_risk
+    - constraints: min_yield, max_volatility, min_upside, max_weight, max_cluster_weight, max_month_share
+    - warm-start: เริ่มจากคำตอบล่าสุดของ universe + objective เดียวกัน (what-if ที่ปรับ constraint ทีละนิดจะเร็วขึ้น)
+    """
+
+    def __init__(self):
+        self._warm: Dict[Tuple, np.ndarray] = {}
+        self._universes: Dict[Tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def universe(self, key: Tuple, build: Callable[[], Dict]) -> Dict:
+        """Input arrays ต่อ key (version ของทุก Cache + ตัวกรอง) -> what-if ที่เปลี่ยนแค่ constraint ไม่ต้องสร้างใหม่"""
+        with self._lock:
+            cached = self._universes.get(key)
+        if cached is not None:
+            return cached
+        universe = build()
+        with self._lock:
+            if len(self._universes) >= MAX_CACHED_UNIVERSES:
+                self._universes.pop(next(iter(self._universes)))
+            self._universes[key] = universe
+        return universe
+
+    def _start(self, key: Tuple, n: int, max_weight: float) -> Tuple[np.ndarray, bool]:
+        with self._lock:
+            previous = self._warm.get(key)
+        if previous is not None and len(previous) == n:
+            return previous.copy(), True
+        return np.full(n, min(1.0 / n, max_weight)), False
+
+    def optimize(self, universe: Dict, objective: str = "max_score", risk_aversion: float = 1.0,
+                 min_yield: Optional[float] = None, max_volatility: Optional[float] = None,
+                 min_upside: Optional[float] = None, max_weight: float = 0.2,
+                 max_cluster_weight: Optional[float] = None, max_month_share: Optional[float] = None,
+                 capital: Optional[float] = None) -> Dict:
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'. Choose one of {list(OBJECTIVES)}.")
+        tickers = universe['tickers']
+        n = len(tickers)
+        if n == 0:
+            return {"status": "error", "message": "No eligible stocks (need scoring + covariance)."}
+        if max_weight * n < 1:
+            return {"status": "error", "message": f"max_weight={max_weight} cannot reach 100% with {n} stocks."}
+
+        cov = universe['cov']
+        linear = {"max_score": universe['score'], "max_yield": universe['yield'],
+                  "max_upside": universe['upside'], "min_risk": np.zeros(n)}[objective]
+        risk = 1.0 if objective == "min_risk" else risk_aversion
+
+        def fun(w):
+            return risk * (w @ cov @ w) - linear @ w
+
+        def jac(w):
+            return 2 * risk * (cov @ w) - linear
+
+        # Constraint เชิงเส้นทั้งหมดในรูป A @ w >= b (ส่งให้ solver เป็น vector เดียว)
+        rows, rhs = [], []
+        if min_yield is not None:
+            rows.append(universe['yield'])
+            rhs.append(min_yield)
+        if min_upside is not None:
+            rows.append(universe['upside'])
+            rhs.append(min_upside)
+        if max_cluster_weight is not None:
+            clusters = np.array(universe['clusters'])
+            for name in dict.fromkeys(universe['clusters']):
+                rows.append(-(clusters == name).astype(float))
+                rhs.append(-max_cluster_weight)
+        if max_month_share is not None:
+            # เงินปันผลที่เข้าเดือนเดียว <= max_month_share × ปันผลทั้งปีของพอร์ต (กระจาย Cash flow)
+            flows = universe['month_share'] * universe['yield'][:, None]
+            for m in np.flatnonzero(flows.any(axis=0)):
+                rows.append(max_month_share * universe['yield'] - flows[:, m])
+                rhs.append(0.0)
+        A, b = np.array(rows).reshape(-1, n), np.array(rhs)
+        bounds = [(0.0, max_weight)] * n
+
+        key = (tuple(tickers), objective)
+        x0, warm = self._start(key, n, max_weight)
+        t0 = time.perf_counter()
+        with span("portfolio", "compute"):
+            if len(b):
+                # Phase 1 (LP): constraint เชิงเส้นเป็นไปได้ไหม -> ตอบ infeasible ได้ทันทีแทนการวน SLSQP จนครบ maxiter
+                lp = linprog(np.zeros(n), A_ub=-A, b_ub=-b, A_eq=np.ones((1, n)), b_eq=[1.0],
+                             bounds=bounds, method="highs")
+                if lp.status == 2:
+                    return {"status": "error", "message": "Constraints are infeasible (yield / upside / cluster / month limits).",
+                            "solver": {"iterations": 0, "solve_ms": round((time.perf_counter() - t0) * 1000, 2),
+                                       "warm_start": warm}}
+                if not warm and lp.status == 0:
+                    x0 = lp.x
+
+            constraints = [{"type": "eq", "fun": lambda w: w.sum() - 1, "jac": lambda w: np.ones((1, n))}]
+            if len(b):
+                constraints.append({"type": "ineq", "fun": lambda w: A @ w - b, "jac": lambda w: A})
+            if max_volatility is not None:
+                constraints.append({"type": "ineq", "fun": lambda w: max_volatility ** 2 - w @ cov @ w,
+                                    "jac": lambda w: -2 * (cov @ w)})
+            res = minimize(fun, x0, jac=jac, method="SLSQP", bounds=bounds,
+                           constraints=constraints, options={"maxiter": 200, "ftol": 1e-10})
+        solve_ms = (time.perf_counter() - t0) * 1000
+
+        if not res.success:
+            return {"status": "error", "message": f"Infeasible or not converged: {res.message}",
+                    "solver": {"iterations": int(res.nit), "solve_ms": round(solve_ms, 2), "warm_start": warm}}
+
+        w = np.clip(res.x, 0.0, None)
+        w = w / w.sum()
+        with self._lock:
+            self._warm[key] = w
+        return {"status": "success", "objective": objective, **self.describe(universe, w, capital),
+                "solver": {"iterations": int(res.nit), "solve_ms": round(solve_ms, 2), "warm_start": warm}}
+
+    @staticmethod
+    def describe(universe: Dict, w: np.ndarray, capital: Optional[float] = None) -> Dict:
+        """สรุปพอร์ต: weights, yield / volatility / upside / score, สัดส่วนต่อ Cluster, ปันผลรายเดือน"""
+        keep = np.flatnonzero(w >= MIN_WEIGHT_REPORTED)
+        clusters: Dict[str, float] = {}
+        for i in keep:
+            clusters[universe['clusters'][i]] = clusters.get(universe['clusters'][i], 0.0) + float(w[i])
+        monthly = (universe['month_share'] * universe['yield'][:, None]).T @ w
+        allocation = [
+            {"Symbol": universe['tickers'][i], "Weight (%)": round(float(w[i]) * 100, 2),
+             "Cluster_Name": universe['clusters'][i], "Yield (%)": round(float(universe['yield'][i]) * 100, 2),
+             "Upside (%)": round(float(universe['upside'][i]) * 100, 2),
+             **({"Amount": round(float(w[i]) * capital, 2)} if capital else {})}
+            for i in keep[np.argsort(-w[keep])]
+        ]
+        return {
+            "summary": {
+                "Holdings": len(keep),
+                "Yield (%)": round(float(universe['yield'] @ w) * 100, 3),
+                "Volatility (%)": round(float(np.sqrt(max(w @ universe['cov'] @ w, 0.0))) * 100, 3),
+                "Upside (%)": round(float(universe['upside'] @ w) * 100, 3),
+                "Score (%)": round(float(universe['score'] @ w) * 100, 3)
+            },
+            "allocation": allocation,
+            "cluster_weights": {k: round(v * 100, 2) for k, v in clusters.items()},
+            "monthly_dividend_yield (%)": {m + 1: round(float(v) * 100, 4) for m, v in enumerate(monthly) if v > 0},
+            **({"monthly_dividend_amount": {m + 1: round(float(v) * capital, 2) for m, v in enumerate(monthly) if v > 0}}
+               if capital else {}),
+            "missing_inputs": universe['missing'],
+            "skipped": universe['skipped']
+        }
+
+
+# Shared instance (เก็บ warm-start ระหว่าง request)
+PORTFOLIO_OPTIMIZER = PortfolioOptimizer()
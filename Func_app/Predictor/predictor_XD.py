@@ -1,8 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta # [เพิ่ม] timedelta
+from typing import Callable, List, Optional
 from Func_app.config import SET50_TICKERS
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import StageTimer, count_failure
+from Func_app.records import SeasonalityRecord, SeasonalityTag
 
 # --- Helper Functions ---
 
@@ -54,98 +57,105 @@ def calculate_days_to_dividend(avg_month_day_str):
 
 # --- Core Analysis Functions ---
 
-def analyze_stock_seasonality(symbol: str):
-    try:
-        clean_symbol = symbol.upper().replace('.BK', '')
-        ticker = f"{clean_symbol}.BK"
-        
-        stock = yf.Ticker(ticker)
-        # ดึง 5 ปี เพื่อหาค่าเฉลี่ย
-        hist = stock.history(period="5y") 
-        
-        if hist.empty:
-            return None
-            
-        div_df = hist[['Dividends']]
-        tagged_df = tag_dividends_per_year(div_df)
+def analyze_stock_seasonality(symbol: str) -> SeasonalityRecord:
+    """Seasonality รายตัว — raises ValueError พร้อมเหตุผลเมื่อคำนวณไม่ได้ (error อื่นส่งต่อให้ Batch บันทึก)"""
+    timer = StageTimer("seasonality")
+    clean_symbol = symbol.upper().replace('.BK', '')
+    ticker = f"{clean_symbol}.BK"
+    
+    # ดึง 5 ปี เพื่อหาค่าเฉลี่ย (view 'adjusted' = auto_adjust=True เดิม; ใช้แค่ Dividends ซึ่งปรับ split เท่ากันทุก view)
+    hist = PRICE_STORE.view(ticker, "adjusted", period="5y")
+    timer.lap("fetch")
+    
+    if hist.empty:
+        count_failure("seasonality", "no_history")
+        raise ValueError("no price history")
         
-        if tagged_df.empty or 'tag' not in tagged_df.columns:
-            return None
+    div_df = hist[['Dividends']]
+    tagged_df = tag_dividends_per_year(div_df)
+    
+    if tagged_df.empty or 'tag' not in tagged_df.columns:
+        count_failure("seasonality", "no_dividends")
+        raise ValueError("no dividend history")
 
-        result_data = {'Symbol': clean_symbol}
+    tags = {}
+    
+    for t in [1, 2]:
+        subset = tagged_df[tagged_df['tag'] == t].copy()
         
-        for t in [1, 2]:
-            subset = tagged_df[tagged_df['tag'] == t].copy()
+        if not subset.empty:
+            # 1. หาค่าเฉลี่ยวันที่ (XD Date)
+            doy_values = subset.index.dayofyear
+            doy_series = pd.Series(doy_values) 
             
-            if not subset.empty:
-                # 1. หาค่าเฉลี่ยวันที่ (XD Date)
-                doy_values = subset.index.dayofyear
-                doy_series = pd.Series(doy_values) 
-                
-                avg_str = dayofyear_to_str(doy_series.mean())
-                min_str = dayofyear_to_str(doy_series.min())
-                max_str = dayofyear_to_str(doy_series.max())
-                
-                # 2. คำนวณวันที่ XD ถัดไป (Predicted XD)
-                days_remaining, next_date_iso = calculate_days_to_dividend(avg_str)
-                
-                # ======================================================
-                # [NEW] คำนวณเงินปันผล + วันจ่ายเงิน (Pay Date)
-                # ======================================================
-                
-                # lass dividend amount
-                last_dividend_amt = subset['Dividends'].iloc[-1]
-                
-                
-                # B. ประมาณการวันจ่ายเงิน (Estimated Pay Date)
-                # ปกติหุ้นไทยจ่ายเงินหลัง XD ประมาณ 15-20 วัน -> ใช้ค่ากลางคือ +18 วัน
-                est_pay_date_iso = None
-                if next_date_iso:
-                    xd_date_obj = datetime.strptime(next_date_iso, "%Y-%m-%d")
-                    pay_date_obj = xd_date_obj + timedelta(days=18)
-                    est_pay_date_iso = pay_date_obj.strftime("%Y-%m-%d")
-
-                # ======================================================
+            avg_str = dayofyear_to_str(doy_series.mean())
+            min_str = dayofyear_to_str(doy_series.min())
+            max_str = dayofyear_to_str(doy_series.max())
+            
+            # 2. คำนวณวันที่ XD ถัดไป (Predicted XD)
+            days_remaining, next_date_iso = calculate_days_to_dividend(avg_str)
+            
+            # ======================================================
+            # [NEW] คำนวณเงินปันผล + วันจ่ายเงิน (Pay Date)
+            # ======================================================
+            
+            # lass dividend amount
+            last_dividend_amt = subset['Dividends'].iloc[-1]
+            
+            
+            # B. ประมาณการวันจ่ายเงิน (Estimated Pay Date)
+            # ปกติหุ้นไทยจ่ายเงินหลัง XD ประมาณ 15-20 วัน -> ใช้ค่ากลางคือ +18 วัน
+            est_pay_date_iso = None
+            if next_date_iso:
+                xd_date_obj = datetime.strptime(next_date_iso, "%Y-%m-%d")
+                pay_date_obj = xd_date_obj + timedelta(days=18)
+                est_pay_date_iso = pay_date_obj.strftime("%Y-%m-%d")
 
-                result_data[f'Tag{t}'] = {
-                    "Stats": {
-                        "Min_Date": min_str,
-                        "Max_Date": max_str,
-                        "Avg_Date": avg_str,
-                        "Data_Points": len(subset)
-                    },
-                    "Countdown": {
-                        "Avg_Date": avg_str,          # วัน XD เฉลี่ย (DD/MM)
-                        "Next_XD_Date": next_date_iso, # วัน XD ที่คาดการณ์ (YYYY-MM-DD)
-                        "Days_Remaining": days_remaining,
-                        
-                        "Est_Dividend_Baht": round(last_dividend_amt, 4), # เงินปันผล (บาท)
-                        "Est_Pay_Date": est_pay_date_iso                 # วันจ่ายเงิน (YYYY-MM-DD)
-                    }
-                }
-            else:
-                result_data[f'Tag{t}'] = None
-        return result_data
+            # ======================================================
 
-    except Exception as e:
-        print(f"Error seasonality {symbol}: {e}")
-        return None
+            tags[t] = SeasonalityTag(
+                min_date=min_str,
+                max_date=max_str,
+                avg_date=avg_str,                           # วัน XD เฉลี่ย (DD/MM)
+                data_points=len(subset),
+                next_xd_date=next_date_iso,                 # วัน XD ที่คาดการณ์ (YYYY-MM-DD)
+                days_remaining=days_remaining,
+                est_dividend=round(float(last_dividend_amt), 4), # เงินปันผล (บาท)
+                est_pay_date=est_pay_date_iso               # วันจ่ายเงิน (YYYY-MM-DD)
+            )
+    timer.lap("compute")
+    return SeasonalityRecord(clean_symbol, tags.get(1), tags.get(2))
 
-def analyze_seasonality_batch():
+def analyze_seasonality_batch(tickers: Optional[List[str]] = None,
+                              on_result: Optional[Callable[[str, SeasonalityRecord], None]] = None):
     """
     รัน Batch สำหรับ SET50 ทั้งหมด
+    - on_result(symbol, data): เรียกทันทีที่หุ้นแต่ละตัวคำนวณเสร็จ
     """
+    target_tickers = tickers if tickers else SET50_TICKERS
     results = {}
-    print(f"Analyzing Seasonality for {len(SET50_TICKERS)} stocks...")
+    failed = {}
+    print(f"Analyzing Seasonality for {len(target_tickers)} stocks...")
     
-    for symbol in SET50_TICKERS:
-        data = analyze_stock_seasonality(symbol)
-        if data:
-            clean_sym = data['Symbol']
-            results[clean_sym] = data
+    for symbol in target_tickers:
+        key = symbol.upper().replace('.BK', '')
+        try:
+            data = analyze_stock_seasonality(symbol)
+        except ValueError as e:
+            failed[key] = str(e)
+            continue
+        except Exception as e:
+            print(f"Error seasonality {symbol}: {e}")
+            failed[key] = str(e)
+            count_failure("seasonality")
+            continue
+        results[key] = data
+        if on_result:
+            on_result(key, data)
             
     return {
         "status": "success",
         "count": len(results),
-        "data": results
+        "data": results,
+        "failed": failed
     }
\ No newline at end of file
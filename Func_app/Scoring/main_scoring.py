@@ -1,114 +1,152 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from scipy.spatial.distance import cdist
 from scipy.optimize import linear_sum_assignment
+from typing import Optional
 from Func_app.config import SET50_TICKERS 
-from Func_app.Scoring.tdts_scoring import analyze_stock_tdts
-from Func_app.Scoring.tema_scoring import analyze_stock_tema
+from Func_app.Scoring.tdts_scoring import collect_tdts_events
+from Func_app.Scoring.tema_scoring import collect_tema_events
+from Func_app.Scoring.outliers import flag_records, resolve_threshold
+from Func_app.metrics import StageTimer
+from Func_app.records import TdtsEvent, TemaEvent, ScoreRecord, records_frame, from_frame
+
+FEATURES = ['t_dts', 'ret_af', 'ret_bf']  # attribute ของ ScoreRecord (Func_app/records.py)
+MINIBATCH_MIN_ROWS = 5000  # mode='auto' ใช้ MiniBatchKMeans เมื่อ Universe ใหญ่กว่านี้
+
+IDEAL_PROFILES = {
+    'Golden Goose (Strong Trend)':    np.array([-0.5,  1.0,  1.0]),
+    'Rebound Star (Buy on Dip)':  np.array([-1.0,  1.0, -1.0]),
+    'Dividend Trap (Avoid)':        np.array([ 2.5, -3.0, -3.0]),
+    'Sell on Fact (Neutral)':       np.array([ 0.0, -1.0,  1.0])
+}
+
+# Centroids ของรอบก่อน (หน่วยเดียวกับ FEATURES, ยังไม่ scale) ใช้ warm-start + คง Cluster ID
+_CLUSTER_STATE = {"centroids": None}
+
+def reset_cluster_state():
+    _CLUSTER_STATE["centroids"] = None
+
+def fit_clusters(X_raw: np.ndarray, k: int, mode: str = "full", random_state: int = 42):
+    """
+    Clustering บน Features ที่ผ่าน StandardScaler
+    - 'full'      : KMeans(n_init=20) เหมือนเดิม
+    - 'warm'      : KMeans เริ่มจาก centroids รอบก่อน (n_init=1) — ถ้าไม่มี state จะ fallback เป็น full
+    - 'minibatch' : MiniBatchKMeans (warm-start ถ้ามี state) สำหรับ Universe ขนาดใหญ่
+    - 'auto'      : minibatch ถ้าแถว >= MINIBATCH_MIN_ROWS, ไม่งั้น warm
+    Cluster ID ถูกจับคู่กับ centroids รอบก่อน (Hungarian) เพื่อไม่ให้หุ้นเปลี่ยน label เพราะ re-init
+    คืนค่า (labels, centroids ใน scaled space, X_scaled)
+    """
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X_raw)
+
+    if mode == "auto":
+        mode = "minibatch" if len(X_raw) >= MINIBATCH_MIN_ROWS else "warm"
+
+    prev = _CLUSTER_STATE["centroids"]
+    init = scaler.transform(prev) if prev is not None and len(prev) == k else None
+
+    if mode == "minibatch":
+        model = MiniBatchKMeans(
+            n_clusters=k, random_state=random_state, batch_size=1024,
+            init=init if init is not None else "k-means++", n_init=1 if init is not None else 3
+        )
+    elif mode == "warm" and init is not None:
+        model = KMeans(n_clusters=k, init=init, n_init=1)
+    else:
+        model = KMeans(n_clusters=k, random_state=random_state, n_init=20)
+
+    labels = model.fit_predict(X_scaled)
+    centroids = model.cluster_centers_
+
+    # --- คง Cluster ID ให้ตรงกับรอบก่อน ---
+    if init is not None:
+        _, col_idx = linear_sum_assignment(cdist(init, centroids))
+        relabel = np.empty(k, dtype=int)
+        relabel[col_idx] = np.arange(k)
+        labels = relabel[labels]
+        centroids = centroids[col_idx]
+
+    _CLUSTER_STATE["centroids"] = scaler.inverse_transform(centroids)
+    return labels, centroids, X_scaled
 
 def process_cluster_and_score(
     tickers: list = None, 
     start_year: int = 2022, 
     end_year: int = 2026,
     window: int = 15,
-    threshold: float = 20.0,
-    k_clusters: int = 4
+    threshold: Optional[float] = None,
+    k_clusters: int = 4,
+    cluster_mode: str = "full",
+    outlier_method: str = "absolute"
 ):
-    
+    """
+    T-DTS + TEMA ต่อ XD event ทั้ง Universe -> คัด Outlier ครั้งเดียว (flag เก็บใน record ให้ Cache ใช้ต่อ)
+    -> เฉลี่ยต่อหุ้นเฉพาะ event ที่ผ่านทั้งสองตาราง -> Clustering + Total Score
+    """
     target_tickers = tickers if tickers else SET50_TICKERS
+    timer = StageTimer("cluster_score")
     
-    # --- Step 1: ดึงข้อมูล T-DTS ---
+    # --- Step 1: ดึงข้อมูล T-DTS (ต่อ XD event) ---
     raw_tdts_all = [] 
-    tdts_list_for_model = [] 
-    
     for stock in target_tickers:
-        res = analyze_stock_tdts(stock, start_year, end_year, threshold=threshold) 
-        if res.get('status') == 'success':
-            raw_tdts_all.extend(res['data']['raw_data'])
-            tdts_list_for_model.extend(res['data']['clean_data'])
+        try:
+            raw_tdts_all.extend(collect_tdts_events(stock, start_year, end_year))
+        except ValueError:
+            continue
     
-    if not tdts_list_for_model:
+    if not raw_tdts_all:
         return {"status": "error", "message": "No T-DTS data found."}
-    
-    df_tdts = pd.DataFrame(tdts_list_for_model)
-
-    # --- Step 2: ดึงข้อมูล TEMA ---
-    res_tema = analyze_stock_tema(
-        tickers=target_tickers, start_year=start_year, end_year=end_year,
-        window=window, threshold=threshold
-    )
-    
-    if res_tema.get('status') == 'error': return res_tema
-
-    raw_tema_all = res_tema['data'].get('raw_data', [])
-    # prefer clean_data if present, otherwise fall back to raw_data
-    tema_records = res_tema['data'].get('clean_data') or res_tema['data'].get('raw_data') or []
-    df_tema = pd.DataFrame(tema_records)
 
-    if df_tema.empty:
+    # --- Step 2: ดึงข้อมูล TEMA (ต่อ XD event) ---
+    raw_tema_all = collect_tema_events(target_tickers, start_year, end_year, window)
+    if not raw_tema_all:
         return {"status": "error", "message": "No TEMA data found."}
 
-    # --- Step 3: Merge Data ---
-    df_tdts['Stock'] = df_tdts['Stock'].str.replace('.BK', '').str.upper()
-    df_tema['Stock'] = df_tema['Stock'].str.replace('.BK', '').str.upper()
+    timer.lap("inputs")
 
-    df_tdts = df_tdts.rename(columns={'DY_percent': 'DY (%)', 'T-DTS': 'T_DTS'})
-    # normalize possible column names from tema
-    if 'Ret_Bf_TEMA_Percent' in df_tema.columns:
-        df_tema = df_tema.rename(columns={'Ret_Bf_TEMA_Percent': 'Ret_Bf_TEMA (%)', 'Ret_Af_TEMA_Percent': 'Ret_Af_TEMA (%)'})
+    # --- Step 3: Outlier flags (vectorized ทั้งตาราง ครั้งเดียวต่อ Batch) ---
+    flag_records(raw_tdts_all, outlier_method, threshold)
+    flag_records(raw_tema_all, outlier_method, threshold)
+    timer.lap("outliers")
 
-    # If tema data contains per-XD rows with Ex_Date, merge on Stock+Ex_Date
-    if 'Ex_Date' in df_tema.columns:
-        df_tdts['Ex_Date'] = pd.to_datetime(df_tdts['Ex_Date'])
-        df_tema['Ex_Date'] = pd.to_datetime(df_tema['Ex_Date'])
-        df_merged = pd.merge(df_tdts, df_tema[['Stock', 'Ex_Date', 'Ret_Bf_TEMA (%)', 'Ret_Af_TEMA (%)']], on=['Stock', 'Ex_Date'], how='inner')
-    else:
-        # tema returned aggregated per-stock (no Ex_Date) — merge on Stock only
-        df_merged = pd.merge(df_tdts, df_tema[['Stock', 'Ret_Bf_TEMA (%)', 'Ret_Af_TEMA (%)']].drop_duplicates(subset=['Stock']), on=['Stock'], how='left')
+    # --- Step 4: Merge Data (T-DTS / TEMA ใช้ schema เดียวกัน -> ไม่ต้อง rename คอลัมน์) ---
+    df_tdts = records_frame([r for r in raw_tdts_all if not r.outlier], TdtsEvent)
+    df_tema = records_frame([r for r in raw_tema_all if not r.outlier], TemaEvent)
+    df_merged = pd.merge(df_tdts, df_tema[['stock', 'ex_date', 'ret_bf', 'ret_af']], on=['stock', 'ex_date'], how='inner')
 
     if df_merged.empty:
         return {"status": "error", "message": "Merged data is empty."}
 
-    # --- Step 4: Clustering ---
-    df_agg = df_merged.groupby('Stock').aggregate({
-        'DY (%)': 'mean', 'T_DTS': 'mean', 
-        'Ret_Af_TEMA (%)': 'mean', 'Ret_Bf_TEMA (%)': 'mean'
+    # --- Step 5: Clustering ---
+    df_agg = df_merged.groupby('stock').aggregate({
+        'dy': 'mean', 't_dts': 'mean', 
+        'ret_af': 'mean', 'ret_bf': 'mean'
     }).reset_index()
 
     df_model = df_agg.dropna().copy()
     
 
-    features = ['T_DTS', 'Ret_Af_TEMA (%)', 'Ret_Bf_TEMA (%)']    
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(df_model[features])
-    
     actual_k = 4 if len(df_model) >= 4 else len(df_model)
-    kmeans = KMeans(n_clusters=actual_k, random_state=42, n_init=20)
-    df_model['Cluster'] = kmeans.fit_predict(X_scaled)
+    df_model['cluster'], _, X_scaled = fit_clusters(df_model[FEATURES].to_numpy(), actual_k, mode=cluster_mode)
     
-    df_model['Total_Score (%)'] = (df_model['DY (%)'] * (1 - df_model['T_DTS'])) + df_model['Ret_Af_TEMA (%)']
+    df_model['total_score'] = (df_model['dy'] * (1 - df_model['t_dts'])) + df_model['ret_af']
 
     # ==============================================================================
-    # 🎯 Step 5: [THE SOLUTION] Coordinate Matching (จับคู่ตามค่ากลาง)
+    # 🎯 Step 6: [THE SOLUTION] Coordinate Matching (จับคู่ตามค่ากลาง)
     # ==============================================================================
 
-    ideal_profiles = {
-        'Golden Goose (Strong Trend)':    np.array([-0.5,  1.0,  1.0]),
-        'Rebound Star (Buy on Dip)':  np.array([-1.0,  1.0, -1.0]),
-        'Dividend Trap (Avoid)':        np.array([ 2.5, -3.0, -3.0]),
-        'Sell on Fact (Neutral)':       np.array([ 0.0, -1.0,  1.0])
-    }
+    ideal_profiles = IDEAL_PROFILES
     
     profile_names = list(ideal_profiles.keys())
     ideal_vectors = np.array(list(ideal_profiles.values())) # Matrix (4, 3)
 
     cluster_centroids = []
-    cluster_ids = sorted(df_model['Cluster'].unique())
+    cluster_ids = sorted(df_model['cluster'].unique())
     
     for c_id in cluster_ids:
-        mask = df_model['Cluster'] == c_id
+        mask = df_model['cluster'] == c_id
         centroid = X_scaled[mask].mean(axis=0)
         cluster_centroids.append(centroid)
     
@@ -126,16 +164,21 @@ def process_cluster_and_score(
             assigned_name = profile_names[c]
             cluster_mapping[real_cluster_id] = assigned_name
             
-        df_model['Cluster_Name'] = df_model['Cluster'].map(cluster_mapping)
+        df_model['cluster_name'] = df_model['cluster'].map(cluster_mapping)
         
     else:
-        df_model['Cluster_Name'] = "Unclassified"
+        df_model['cluster_name'] = "Unclassified"
+
+    timer.lap("compute")
+    records = from_frame(ScoreRecord, df_model.sort_values(by='total_score', ascending=False))
+    timer.lap("serialize")
 
     return {
         "status": "success",
-        "params": {"start": start_year, "end": end_year, "k": actual_k},
+        "params": {"start": start_year, "end": end_year, "k": actual_k, "cluster_mode": cluster_mode,
+                   "outlier_method": outlier_method, "threshold": resolve_threshold(outlier_method, threshold)},
         "count": len(df_model),
-        "data": df_model.sort_values(by='Total_Score (%)', ascending=False).to_dict(orient='records'),
+        "data": records,
         "raw_tdts": raw_tdts_all,
         "raw_tema": raw_tema_all
     }
\ No newline at end of file
@@ -0,0 +1,101 @@
+# Func_app/Scoring/outliers.py
+import warnings
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from Func_app.records import Record
+
+OUTLIER_METHODS = ("absolute", "zscore", "mad", "iqr")
+
+# ค่า threshold เมื่อไม่ระบุ (หน่วยต่างกันตาม method)
+# - absolute: |x| > threshold (หน่วยเดียวกับค่า เช่น T-DTS / %)
+# - zscore:   |x - mean| / std > threshold
+# - mad:      |x - median| / (1.4826 × MAD) > threshold  (robust z-score, ไม่ถูก outlier ดึงค่ากลาง)
+# - iqr:      x < Q1 - threshold × IQR หรือ x > Q3 + threshold × IQR
+DEFAULT_THRESHOLDS = {"absolute": 20.0, "zscore": 3.0, "mad": 3.5, "iqr": 1.5}
+# GET /analyze_tdts, /analyze_tema (หุ้นรายตัว) ใช้ absolute 10 ตามค่าเดิมของ Endpoint / method อื่นเหมือน Batch
+REQUEST_THRESHOLDS = {**DEFAULT_THRESHOLDS, "absolute": 10.0}
+MAD_SCALE = 1.4826
+
+
+def resolve_threshold(method: str, threshold: Optional[float] = None, defaults: Dict[str, float] = DEFAULT_THRESHOLDS) -> float:
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method '{method}'. Choose one of {list(OUTLIER_METHODS)}.")
+    return float(defaults[method] if threshold is None else threshold)
+
+
+def resolve_request_threshold(method: str, threshold: Optional[float] = None) -> float:
+    """threshold ของ GET รายหุ้น (ว่าง = REQUEST_THRESHOLDS: absolute 10)"""
+    return resolve_threshold(method, threshold, REQUEST_THRESHOLDS)
+
+
+def _as_matrix(values: np.ndarray) -> np.ndarray:
+    x = np.asarray(values, dtype=float)
+    return x.reshape(len(x), -1)
+
+
+def distribution_stats(values: np.ndarray, method: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    ค่ากลาง / ตัวกระจายต่อคอลัมน์ที่ method ใช้ (absolute ไม่ต้องใช้ = None)
+    - zscore: mean / std, mad: median / 1.4826 × MAD, iqr: Q1 / Q3
+    -> คำนวณครั้งเดียวจากทั้ง Universe แล้วส่งให้ outlier_mask(stats=...) กับ event ของหุ้นตัวเดียวได้
+    """
+    resolve_threshold(method)
+    if method == "absolute":
+        return None
+    x = _as_matrix(values)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+        warnings.simplefilter("ignore", RuntimeWarning)  # คอลัมน์ที่เป็น NaN ทั้งหมด
+        if method == "zscore":
+            return {"center": np.nanmean(x, axis=0), "scale": np.nanstd(x, axis=0)}
+        if method == "mad":
+            median = np.nanmedian(x, axis=0)
+            return {"center": median, "scale": np.nanmedian(np.abs(x - median), axis=0) * MAD_SCALE}
+        q1, q3 = np.nanpercentile(x, [25, 75], axis=0)
+        return {"q1": q1, "q3": q3}
+
+
+def outlier_mask(values: np.ndarray, method: str = "absolute", threshold: Optional[float] = None,
+                 stats: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """
+    Flag outlier แบบ vectorized ทั้งตาราง
+    - values: (n,) หรือ (n, k) — หลายคอลัมน์ = เป็น outlier ถ้าคอลัมน์ใดคอลัมน์หนึ่งเกิน
+    - stats=None: สถิติ mean / median / quartile คิดจากทุกแถวที่ส่งเข้ามา
+      stats จาก distribution_stats: ใช้การกระจายของชุดที่ใหญ่กว่า (เช่น ทั้ง Universe ใน Cache)
+    - NaN ไม่นับเป็น outlier / ตัวกระจายเป็น 0 (ทุกค่าเท่ากัน) = ไม่มี outlier สำหรับ zscore / mad
+    """
+    threshold = resolve_threshold(method, threshold)
+    x = _as_matrix(values)
+    if x.size == 0:
+        return np.zeros(len(x), dtype=bool)
+    if stats is None:
+        stats = distribution_stats(x, method)
+
+    with np.errstate(invalid='ignore'):
+        if method == "absolute":
+            flags = np.abs(x) > threshold
+        elif method in ("zscore", "mad"):
+            scale = stats["scale"]
+            flags = (np.abs(x - stats["center"]) > threshold * scale) & (scale > 0)
+        else:
+            spread = threshold * (stats["q3"] - stats["q1"])
+            flags = (x < stats["q1"] - spread) | (x > stats["q3"] + spread)
+    return flags.any(axis=1)
+
+
+def record_values(records: Sequence[Record], fields: Optional[Sequence[str]] = None) -> np.ndarray:
+    """คอลัมน์ที่ใช้คัด outlier ของ Record (ค่าเริ่มต้น = OUTLIER_FIELDS ของ type นั้น) -> array (n, k)"""
+    if not records:
+        return np.empty((0, len(fields or ())))
+    fields = fields or type(records[0]).OUTLIER_FIELDS
+    return np.array([[getattr(r, f) for f in fields] for r in records], dtype=float)
+
+
+def flag_records(records: List[Record], method: str = "absolute", threshold: Optional[float] = None) -> np.ndarray:
+    """
+    คำนวณ flag ครั้งเดียวต่อรอบ Batch แล้วเก็บลง record.outlier (precomputed)
+    -> การอ่านจาก Cache / Clustering ใช้ flag เดิม ไม่ต้องคำนวณ mask ใหม่
+    """
+    mask = outlier_mask(record_values(records), method, threshold)
+    for row, flag in zip(records, mask.tolist()):
+        row.outlier = flag
+    return mask
@@ -0,0 +1,177 @@
+import os
+import glob
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import List, Dict, Optional
+from Func_app.records import ScoreRecord
+
+# โฟลเดอร์เก็บ Snapshot แบบ append-only (ว่าง = เก็บใน memory อย่างเดียว)
+SCORE_HISTORY_DIR = os.getenv("SCORE_HISTORY_DIR", "")
+
+
+def _load_run_time(values: np.ndarray) -> np.ndarray:
+    """ไฟล์เดิมเก็บ Run_Time เป็น int64 วินาที / ไฟล์ใหม่เก็บ datetime64[us]"""
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[us]')
+    return values.astype('datetime64[s]').astype('datetime64[us]')
+
+
+def _format_run_time(t: np.datetime64) -> str:
+    """'2026-01-05T10:00:00' (รอบที่ไม่มีเศษวินาที แสดงแบบเดิม) / '2026-01-05T10:00:00.250000'"""
+    seconds = t.astype('datetime64[s]')
+    return str(seconds) if seconds == t else str(t)
+
+
+class ScoreHistoryStore:
+    """
+    Append-only, columnar store ของผล Scoring ทุกรอบ
+    - 1 แถว = (Run_Time, Stock, Total_Score, Cluster) เก็บเป็น numpy arrays แยกคอลัมน์
+    - Stock / Cluster_Name เก็บเป็น code (int) อ้างอิงตาราง dictionary
+    - Run_Time เรียงตามเวลาเสมอ (ละเอียดระดับ microsecond -> 2 รอบในวินาทีเดียวกันยังแยกกัน) -> หา range ด้วย searchsorted
+    """
+
+    def __init__(self, directory: str = SCORE_HISTORY_DIR):
+        self.directory = directory
+        self._symbols: List[str] = []
+        self._symbol_code: Dict[str, int] = {}
+        self._clusters: List[str] = []
+        self._cluster_code: Dict[str, int] = {}
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    # ---------- Encoding ----------
+    @staticmethod
+    def _encode(value: str, table: List[str], index: Dict[str, int]) -> int:
+        if value not in index:
+            index[value] = len(table)
+            table.append(value)
+        return index[value]
+
+    # ---------- Write ----------
+    def append(self, run_time: datetime, records: List[ScoreRecord]) -> int:
+        """เพิ่ม Snapshot 1 รอบ (records = CACHE_SCORING.values())"""
+        if not records:
+            return 0
+        with self._lock:
+            if self._chunks and np.datetime64(run_time, 'us') < self._chunks[-1]['run_time'][-1]:
+                raise ValueError("Score history is append-only: run_time must not go backwards.")
+            chunk = {
+                'run_time': np.full(len(records), np.datetime64(run_time, 'us')),
+                'stock': np.array([self._encode(r.stock, self._symbols, self._symbol_code) for r in records], dtype=np.int32),
+                'score': np.array([np.nan if r.total_score is None else r.total_score for r in records], dtype=np.float32),
+                'cluster': np.array([self._encode(r.cluster_name or 'Unclassified', self._clusters, self._cluster_code)
+                                     for r in records], dtype=np.int16)
+            }
+            self._chunks.append(chunk)
+            self._columns = None
+            if self.directory:
+                self._persist(chunk, run_time, len(self._chunks))
+        return len(records)
+
+    def _persist(self, chunk: Dict[str, np.ndarray], run_time: datetime, seq: int):
+        # ชื่อไฟล์ระดับ microsecond + ลำดับ chunk -> 2 รอบในวินาทีเดียวกันไม่ทับกัน (เรียงตามชื่อ = ลำดับที่ append)
+        stamp = pd.Timestamp(run_time).strftime('%Y%m%dT%H%M%S%f')
+        np.savez(
+            os.path.join(self.directory, f"scores_{stamp}_{seq:06d}.npz"),
+            run_time=chunk['run_time'],
+            score=chunk['score'],
+            stock=np.array([self._symbols[i] for i in chunk['stock']]),
+            cluster=np.array([self._clusters[i] for i in chunk['cluster']])
+        )
+
+    def _load(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "scores_*.npz"))):
+            with np.load(path) as f:
+                self._chunks.append({
+                    'run_time': _load_run_time(f['run_time']),
+                    'stock': np.array([self._encode(str(s), self._symbols, self._symbol_code) for s in f['stock']], dtype=np.int32),
+                    'score': f['score'],
+                    'cluster': np.array([self._encode(str(c), self._clusters, self._cluster_code) for c in f['cluster']], dtype=np.int16)
+                })
+
+    # ---------- Read ----------
+    def _view(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if self._columns is None:
+                if self._chunks:
+                    self._columns = {k: np.concatenate([c[k] for c in self._chunks]) for k in self._chunks[0]}
+                else:
+                    self._columns = {
+                        'run_time': np.array([], dtype='datetime64[us]'), 'stock': np.array([], dtype=np.int32),
+                        'score': np.array([], dtype=np.float32), 'cluster': np.array([], dtype=np.int16)
+                    }
+            return self._columns
+
+    @staticmethod
+    def _range(cols: Dict[str, np.ndarray], start: Optional[str], end: Optional[str]) -> slice:
+        """start/end เป็นวันที่ 'YYYY-MM-DD' (รวมทั้งสองวัน)"""
+        ts = cols['run_time']
+        lo = np.searchsorted(ts, np.datetime64(start, 's'), side='left') if start else 0
+        hi = np.searchsorted(ts, np.datetime64(end, 'D') + np.timedelta64(1, 'D'), side='left') if end else len(ts)
+        return slice(lo, hi)
+
+    def run_times(self) -> List[str]:
+        ts = np.unique(self._view()['run_time'])
+        return [_format_run_time(t) for t in ts]
+
+    def trajectory(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> Optional[Dict]:
+        """Score + Cluster ของหุ้น 1 ตัวตามเวลา (Columnar)"""
+        code = self._symbol_code.get(symbol)
+        if code is None:
+            return None
+        cols = self._view()
+        rng = self._range(cols, start, end)
+        mask = cols['stock'][rng] == code
+        clusters = np.array(self._clusters, dtype=object)
+        return {
+            "Run_Time": [_format_run_time(t) for t in cols['run_time'][rng][mask]],
+            "Total_Score (%)": np.round(cols['score'][rng][mask].astype(float), 4).tolist(),
+            "Cluster_Name": clusters[cols['cluster'][rng][mask]].tolist()
+        }
+
+    def transition_matrix(self, start: Optional[str] = None, end: Optional[str] = None) -> Optional[Dict]:
+        """
+        Cluster transition matrix ของทั้ง Universe ระหว่าง Snapshot แรกและสุดท้ายในช่วงวันที่
+        matrix[i][j] = จำนวนหุ้นที่ย้ายจาก cluster i (ต้นช่วง) ไป cluster j (ปลายช่วง)
+        """
+        cols = self._view()
+        rng = self._range(cols, start, end)
+        ts = cols['run_time'][rng]
+        if len(ts) == 0:
+            return None
+
+        first, last = ts[0], ts[-1]
+        stock, cluster = cols['stock'][rng], cols['cluster'][rng]
+        n_sym, n_cl = len(self._symbols), len(self._clusters)
+
+        # cluster ของแต่ละหุ้น ณ ต้นช่วง/ปลายช่วง (-1 = ไม่มีข้อมูล)
+        from_cl = np.full(n_sym, -1, dtype=np.int32)
+        to_cl = np.full(n_sym, -1, dtype=np.int32)
+        m_first, m_last = ts == first, ts == last
+        from_cl[stock[m_first]] = cluster[m_first]
+        to_cl[stock[m_last]] = cluster[m_last]
+
+        both = (from_cl >= 0) & (to_cl >= 0)
+        matrix = np.zeros((n_cl, n_cl), dtype=np.int64)
+        np.add.at(matrix, (from_cl[both], to_cl[both]), 1)
+
+        return {
+            "from_run": _format_run_time(first),
+            "to_run": _format_run_time(last),
+            "clusters": list(self._clusters),
+            "matrix": matrix.tolist(),
+            "stocks_compared": int(both.sum()),
+            "changed": [self._symbols[i] for i in np.flatnonzero(both & (from_cl != to_cl))]
+        }
+
+    def __len__(self):
+        return len(self._view()['run_time'])
+
+
+SCORE_HISTORY = ScoreHistoryStore()
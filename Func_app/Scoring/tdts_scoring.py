@@ -1,12 +1,17 @@
-import yfinance as yf
-import pandas as pd
 from datetime import datetime
+from typing import List, Optional
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import StageTimer, count_failure
+from Func_app.records import TdtsEvent, split_outliers
+from Func_app.Scoring.outliers import flag_records, resolve_threshold
 
-def analyze_stock_tdts(symbol: str, start_year: int = 2022, end_year: int = 2024, threshold: float = 10.0):
+def collect_tdts_events(symbol: str, start_year: int = 2022, end_year: int = 2024) -> List[TdtsEvent]:
     """
-    Logic: คำนวณ T-DTS (Technical Dividend Trap Score) รายตัว
+    T-DTS ต่อ XD event ของหุ้น 1 ตัว (ยังไม่คัด Outlier -> ผู้เรียก flag ทีเดียวทั้งตาราง)
+    ValueError พร้อมเหตุผลเมื่อคำนวณไม่ได้
     """
     all_data = []
+    timer = StageTimer("tdts")
     
     try:
         # ป้องกันกรณีส่ง List เข้ามา
@@ -16,12 +21,11 @@ def analyze_stock_tdts(symbol: str, start_year: int = 2022, end_year: int = 2024
         # ทำความสะอาดชื่อหุ้น
         clean_symbol = symbol.upper()
         
-        # 1. ดึงข้อมูล
-        stock = yf.Ticker(clean_symbol)
-        
+        # 1. ดึงข้อมูล: ราคาปรับ split เท่านั้น (ไม่ปรับปันผล) -> P_ex ยังสะท้อนราคาที่ตกในวัน XD จริง
         # ดึงเผื่อปีเริ่มต้นไป 1 ปี เพื่อหา P_cum
-        history = stock.history(start=f"{start_year}-01-01", end=f"{end_year+1}-12-31")
-        dividends = stock.dividends
+        history = PRICE_STORE.view(clean_symbol, "split", start=f"{start_year}-01-01", end=f"{end_year+1}-12-31")
+        dividends = PRICE_STORE.dividends(clean_symbol)
+        timer.lap("fetch")
 
         # จัดการ Timezone
         if not history.empty: 
@@ -34,7 +38,8 @@ def analyze_stock_tdts(symbol: str, start_year: int = 2022, end_year: int = 2024
         target_dividends = dividends.loc[mask]
 
         if target_dividends.empty:
-            return {"status": "error", "message": f"No dividend data found for {clean_symbol} in {start_year}-{end_year}"}
+            count_failure("tdts", "no_dividends")
+            raise ValueError(f"No dividend data found for {clean_symbol} in {start_year}-{end_year}")
 
         # 2. Loop คำนวณ T-DTS
         for date, amount in target_dividends.items():
@@ -57,43 +62,58 @@ def analyze_stock_tdts(symbol: str, start_year: int = 2022, end_year: int = 2024
             # ป้องกันการหารด้วย 0
             t_dts = (pd_pct / dy) if dy != 0 else 0
 
-            all_data.append({
-                'Stock': clean_symbol.replace('.BK', ''), 
-                'Year': ex_date.year,
-                'Ex_Date': ex_date.strftime('%Y-%m-%d'),
-                'DPS': amount,
-                'P_cum': round(p_cum, 2),
-                'P_ex': round(p_ex, 2),
-                'DY (%)': round(dy, 2),
-                'PD (%)': round(pd_pct, 2),
-                'T-DTS': round(t_dts, 4)  # [FIX] ใช้ T_DTS (underscore) เพื่อลดปัญหา KeyError
-            })
+            all_data.append(TdtsEvent(
+                stock=clean_symbol.replace('.BK', ''),
+                year=ex_date.year,
+                ex_date=ex_date.strftime('%Y-%m-%d'),
+                dps=float(amount),
+                p_cum=round(float(p_cum), 2),
+                p_ex=round(float(p_ex), 2),
+                dy=round(float(dy), 2),
+                pd=round(float(pd_pct), 2),
+                t_dts=round(float(t_dts), 4)
+            ))
             
+        timer.lap("compute")
         if not all_data:
-            return {"status": "error", "message": "Insufficient price data around XD dates"}
-
-        # 3. จัดการ Data & Outlier
-        df = pd.DataFrame(all_data)
-        df = df.sort_values(by='Ex_Date', ascending=False)
-        
-        # Logic ตัด Outlier
-        is_outlier = (df['T-DTS'] < -threshold) | (df['T-DTS'] > threshold)
-        
-        # [FIX] ส่งคืนค่า 3 ส่วน: Raw, Clean, Unclean
-        return {
-            "status": "success",
-            "symbol": clean_symbol,
-            "summary": {
-                "total_count": len(df),
-                "clean_count": len(df[~is_outlier]),
-                "unclean_count": len(df[is_outlier])
-            },
-            "data": {
-                "raw_data": df.to_dict(orient='records'),           # ข้อมูลดิบทั้งหมด
-                "clean_data": df[~is_outlier].to_dict(orient='records'), # ข้อมูลที่ผ่านเกณฑ์
-                "unclean_data": df[is_outlier].to_dict(orient='records') # ข้อมูล Outlier
-            }
-        }
+            count_failure("tdts", "no_price_at_xd")
+            raise ValueError("Insufficient price data around XD dates")
 
+    except ValueError:
+        raise
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        count_failure("tdts")
+        raise ValueError(str(e)) from e
+
+    # ใหม่สุดก่อน
+    all_data.sort(key=lambda row: row.ex_date, reverse=True)
+    return all_data
+
+def analyze_stock_tdts(symbol: str, start_year: int = 2022, end_year: int = 2024,
+                       threshold: Optional[float] = None, method: str = "absolute"):
+    """
+    Logic: คำนวณ T-DTS (Technical Dividend Trap Score) รายตัว + คัด Outlier (Func_app/Scoring/outliers.py)
+    - method: absolute (|T-DTS| > threshold) / zscore / mad / iqr — threshold ว่าง = ค่า default ของ method
+    """
+    try:
+        events = collect_tdts_events(symbol, start_year, end_year)
+        timer = StageTimer("tdts")
+        flag_records(events, method, threshold)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    data = split_outliers(events)
+    timer.lap("outliers")
+    
+    # [FIX] ส่งคืนค่า 3 ส่วน: Raw, Clean, Unclean
+    return {
+        "status": "success",
+        "symbol": (symbol[0] if isinstance(symbol, list) else symbol).upper(),
+        "summary": {
+            "total_count": len(data['raw_data']),
+            "clean_count": len(data['clean_data']),
+            "unclean_count": len(data['unclean_data'])
+        },
+        "outlier_filter": {"method": method, "threshold": resolve_threshold(method, threshold)},
+        "data": data  # raw_data = ข้อมูลดิบทั้งหมด / clean_data = ผ่านเกณฑ์ / unclean_data = Outlier
+    }
@@ -1,17 +1,19 @@
-import yfinance as yf
-import pandas as pd
+from typing import List, Optional
 from Func_app.config import SET50_TICKERS # Import จากไฟล์กลาง
-
-def calculate_tema(series, span):
-    """ฟังก์ชันช่วยคำนวณ TEMA"""
-    ema1 = series.ewm(span=span, adjust=False).mean()
-    ema2 = ema1.ewm(span=span, adjust=False).mean()
-    ema3 = ema2.ewm(span=span, adjust=False).mean()
-    return (3 * ema1) - (3 * ema2) + ema3
-
-def analyze_stock_tema(tickers: list = None, start_year: int = 2022, end_year: int = 2024, threshold: float = 0.0, window: int = 15):
+from Func_app.DataSource.intervals import DAILY, check_interval
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import StageTimer, count_failure
+from Func_app.TA.indicators import calculate_tema
+from Func_app.records import TemaEvent, split_outliers
+from Func_app.Scoring.outliers import flag_records, resolve_threshold
+
+def collect_tema_events(tickers: list = None, start_year: int = 2022, end_year: int = 2024, window: int = 15,
+                        interval: str = DAILY) -> List[TemaEvent]:
     """
-    Main Logic: คำนวณ TEMA สำหรับรายชื่อหุ้นที่ระบุ
+    TEMA ก่อน/หลัง XD ต่อ event ของทุกหุ้นที่ระบุ (ยังไม่คัด Outlier -> ผู้เรียก flag ทีเดียวทั้งตาราง)
+    เรียง Stock (A-Z) แล้ว Ex_Date ใหม่สุดก่อน
+    - interval='5m' / '1h' ...: window นับเป็นจำนวน bar รอบ bar แรกของวัน XD (Price_Close = ราคาปิดของ bar นั้น)
+      ได้เฉพาะ XD ที่อยู่ในช่วงที่ย้อนหลังได้ของ interval นั้น (เช่น 5m = 60 วัน)
     """
     target_tickers = tickers if tickers else SET50_TICKERS
     all_data = []
@@ -24,19 +26,22 @@ def analyze_stock_tema(tickers: list = None, start_year: int = 2022, end_year: i
             
             # ลบ .BK ออกชั่วคราวเพื่อความสะอาดของข้อมูล
             clean_symbol = symbol.upper()
+            timer = StageTimer("tema")
 
-            stock = yf.Ticker(clean_symbol)
-            
-            # 1. ดึงข้อมูล
+            # 1. ดึงข้อมูล (ราคาปรับ split, ไม่ปรับปันผล -> ราคารอบ XD เป็นราคาที่ซื้อขายจริงเทียบกันได้)
             fetch_start = f"{start_year - 1}-01-01" 
-            history = stock.history(start=fetch_start, end=f"{end_year+1}-12-31")
-            dividends = stock.dividends
+            history = PRICE_STORE.bars(clean_symbol, interval, "split", start=fetch_start, end=f"{end_year+1}-12-31")
+            dividends = PRICE_STORE.dividends(clean_symbol)
+            timer.lap("fetch")
 
-            if history.empty: continue
+            if history.empty:
+                count_failure("tema", "no_history")
+                continue
 
             # 2. คำนวณ TEMA
             history['TEMA'] = calculate_tema(history['Close'], span=window)
-            history.index = history.index.normalize()
+            if interval == DAILY:
+                history.index = history.index.normalize()
             
             if not dividends.empty:
                 dividends.index = dividends.index.normalize()
@@ -50,9 +55,9 @@ def analyze_stock_tema(tickers: list = None, start_year: int = 2022, end_year: i
             # 3. วนลูปวิเคราะห์ XD
             for date, amount in target_dividends.items():
                 ex_date = date
-                if ex_date not in history.index: continue
-
-                loc_xd = history.index.get_loc(ex_date)
+                # bar แรกของวัน XD (รายวัน = แถวของวันนั้น)
+                loc_xd = history.index.searchsorted(ex_date)
+                if loc_xd >= len(history) or history.index[loc_xd].normalize() != ex_date: continue
 
                 # Boundary Check (ต้องมีข้อมูลหน้า-หลัง ครบตาม Window)
                 if (loc_xd - window < 0) or (loc_xd + window >= len(history)):
@@ -69,58 +74,64 @@ def analyze_stock_tema(tickers: list = None, start_year: int = 2022, end_year: i
                 ret_bf = ((tema_pre_xd - tema_prev_win) / tema_prev_win) * 100
                 ret_af = ((tema_post_win - tema_xd) / tema_xd) * 100
 
-                all_data.append({
-                    'Stock': clean_symbol.replace('.BK', ''),
-                    'Year': ex_date.year,
-                    'Ex_Date': ex_date.strftime('%Y-%m-%d'),
-                    'DPS': amount,
-                    'Price_Close': round(actual_price_xd, 2),
-                    'Price_TEMA': round(tema_xd, 2),
-                    'Ret_Bf_TEMA (%)': round(ret_bf, 2), 
-                    'Ret_Af_TEMA (%)': round(ret_af, 2)
-                })
+                all_data.append(TemaEvent(
+                    stock=clean_symbol.replace('.BK', ''),
+                    year=ex_date.year,
+                    ex_date=ex_date.strftime('%Y-%m-%d'),
+                    dps=float(amount),
+                    price_close=round(float(actual_price_xd), 2),
+                    price_tema=round(float(tema_xd), 2),
+                    ret_bf=round(float(ret_bf), 2),
+                    ret_af=round(float(ret_af), 2)
+                ))
+            timer.lap("compute")
 
         except Exception as e:
             print(f"Error checking {symbol}: {e}")
+            count_failure("tema")
             continue
 
+    # เรียงแบบ stable: Ex_Date ใหม่สุดก่อน แล้วจัดกลุ่มตาม Stock
+    all_data.sort(key=lambda row: row.ex_date, reverse=True)
+    all_data.sort(key=lambda row: row.stock)
+    return all_data
+
+def analyze_stock_tema(tickers: list = None, start_year: int = 2022, end_year: int = 2024,
+                       threshold: Optional[float] = None, window: int = 15, method: str = "absolute",
+                       interval: str = DAILY):
+    """
+    Main Logic: คำนวณ TEMA สำหรับรายชื่อหุ้นที่ระบุ + คัด Outlier ต่อ XD event (เกณฑ์เดียวกับ T-DTS)
+    - Outlier = Ret_Bf หรือ Ret_Af เกินเกณฑ์ของ method (absolute / zscore / mad / iqr)
+    - interval: '1d' (ค่าเริ่มต้น) หรือ bar ระหว่างวัน (ดู collect_tema_events)
+    """
+    target_tickers = tickers if tickers else SET50_TICKERS
+    try:
+        check_interval(interval)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    all_data = collect_tema_events(target_tickers, start_year, end_year, window, interval)
     if not all_data:
         return {"status": "error", "message": "No data found or insufficient history"}
 
-    # สร้าง DataFrame ดิบจากทุก XD
-    df = pd.DataFrame(all_data)
-    df = df.sort_values(by=['Stock', 'Ex_Date'], ascending=[True, False])
-
-    # --- Aggregate per stock (mean across all XD events) ---
-    agg = df.groupby('Stock').aggregate({
-        'Ret_Bf_TEMA (%)': 'mean',
-        'Ret_Af_TEMA (%)': 'mean',
-        'DPS': 'mean',
-        'Price_TEMA': 'mean'
-    }).reset_index()
-
-    # รอบคัดกรอง (filter) ใช้ threshold บนค่าที่ aggregated แล้ว
-    is_outlier_agg = (agg['Ret_Bf_TEMA (%)'].abs() > threshold) | (agg['Ret_Af_TEMA (%)'].abs() > threshold)
-
-    clean_agg = agg[~is_outlier_agg].copy()
-    unclean_agg = agg[is_outlier_agg].copy()
-
-    # เตรียมผลลัพธ์เป็น dicts
-    raw_records = df.to_dict(orient='records')
-    clean_records = clean_agg.round(4).to_dict(orient='records')
-    unclean_records = unclean_agg.round(4).to_dict(orient='records')
+    # คัด Outlier ทั้งตาราง = stage แยกจาก fetch / compute ต่อหุ้น (ไม่มี serialize ในนี้ -> FastAPI ทำตอนส่ง)
+    timer = StageTimer("tema")
+    try:
+        flag_records(all_data, method, threshold)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    data = split_outliers(all_data)
+    timer.lap("outliers")
 
+    last = target_tickers[-1]
     return {
         "status": "success",
-        "symbol": clean_symbol,
+        "symbol": (last[0] if isinstance(last, list) else last).upper(),
         "summary": {
-            "total_count": len(raw_records),
-            "clean_count": len(clean_records),
-            "unclean_count": len(unclean_records)
+            "total_count": len(data['raw_data']),
+            "clean_count": len(data['clean_data']),
+            "unclean_count": len(data['unclean_data'])
         },
-        "data": {
-            "raw_data": raw_records,
-            "clean_data": clean_records,
-            "unclean_data": unclean_records
-        }
-    }
\ No newline at end of file
+        "interval": interval,
+        "outlier_filter": {"method": method, "threshold": resolve_threshold(method, threshold)},
+        "data": data
+    }
@@ -0,0 +1,371 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# ==========================================
+# Indicator Registry
+# - ทุก kernel ทำงานบน Matrix (วันที่ x หุ้น) ทีเดียวทั้ง Universe
+# - warmup = จำนวนแถวก่อนหน้าที่ต้องมีเพื่อให้ค่าแรกถูกต้อง
+# - Incremental: ส่ง state จากรอบก่อนเข้า compute_indicators พร้อมเฉพาะแถวใหม่ -> ได้ค่าเท่ากับคำนวณทั้งก้อน
+#   * rolling kernel: runner ต่อท้ายแถวเก่า (tail) ให้อัตโนมัติ — window นับเฉพาะวันที่มีการซื้อขายของหุ้นนั้น
+#   * recursive kernel (EMA / สะสม): เก็บค่าล่าสุดของตัวเองไว้ใน state
+# ==========================================
+
+PRICE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+class Indicator:
+    __slots__ = ("name", "inputs", "outputs", "warmup_fn", "kernel", "defaults", "recursive")
+
+    def __init__(self, name: str, inputs: Tuple[str, ...], outputs: Tuple[str, ...], warmup_fn: Callable[..., int],
+                 kernel: Callable, defaults: Dict, recursive: bool):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.warmup_fn = warmup_fn
+        self.kernel = kernel
+        self.defaults = defaults
+        self.recursive = recursive
+
+    def warmup(self, **params) -> int:
+        return self.warmup_fn(**{**self.defaults, **params})
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name, "inputs": list(self.inputs), "outputs": list(self.outputs),
+            "params": self.defaults, "warmup": self.warmup(), "incremental": "recursive" if self.recursive else "rolling"
+        }
+
+
+INDICATORS: Dict[str, Indicator] = {}
+
+
+def register_indicator(name: str, inputs: Tuple[str, ...], outputs: Tuple[str, ...],
+                       warmup: Callable[..., int], recursive: bool = False, **defaults):
+    """Decorator: kernel(ctx, state, **params) -> ({output: DataFrame}, new_state)"""
+    def decorator(kernel):
+        INDICATORS[name] = Indicator(name, inputs, outputs, warmup, kernel, defaults, recursive)
+        return kernel
+    return decorator
+
+
+def list_indicators() -> List[Dict]:
+    return [ind.describe() for ind in INDICATORS.values()]
+
+
+class IndicatorContext:
+    """
+    Price matrices ของรอบนี้ (tail จากรอบก่อน + แถวใหม่) + ค่ากลางที่ใช้ร่วมกัน (delta, true range, log return)
+    -> ทุก indicator ใน request เดียวกันคำนวณบน context เดียว ไม่ต้องเตรียมข้อมูลซ้ำ
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], tail_len: int, last: Optional[Dict[str, pd.Series]] = None):
+        self.frames = frames
+        self.tail_len = tail_len
+        self.last = last
+        self._memo: Dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, field: str) -> pd.DataFrame:
+        return self.frames[field]
+
+    def memo(self, key: str, fn: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        if key not in self._memo:
+            self._memo[key] = fn()
+        return self._memo[key]
+
+    def new(self, df: pd.DataFrame) -> pd.DataFrame:
+        """เฉพาะแถวใหม่ (ตัด tail ออก) — recursive kernel ใช้คู่กับ state"""
+        return df.iloc[self.tail_len:] if self.tail_len else df
+
+    def prev(self, field: str) -> pd.DataFrame:
+        """
+        ค่าของวันที่มีการซื้อขายก่อนหน้า (ข้ามแถว NaN ของหุ้นที่หยุดพักการซื้อขาย) -> diff เท่ากับคำนวณแยกตัว
+        - แถวใหม่ต่อจากค่าล่าสุดของรอบก่อน (state['last']) แม้ tail ของหุ้นนั้นจะเป็น NaN ทั้งหมด
+        """
+        def calc():
+            df = self[field]
+            if self.last is None:
+                return df.ffill().shift(1)
+            seeded = pd.concat([self.last[field].to_frame().T, self.new(df)]).ffill().shift(1).iloc[1:]
+            return pd.concat([df.iloc[:self.tail_len].ffill().shift(1), seeded])
+        return self.memo(f"prev:{field}", calc)
+
+    def delta(self) -> pd.DataFrame:
+        return self.memo("delta", lambda: self["Close"] - self.prev("Close"))
+
+    def true_range(self) -> pd.DataFrame:
+        def calc():
+            prev_close = self.prev("Close")
+            high, low = self["High"], self["Low"]
+            return np.fmax(high - low, np.fmax((high - prev_close).abs(), (low - prev_close).abs()))
+        return self.memo("true_range", calc)
+
+    def log_return(self) -> pd.DataFrame:
+        return self.memo("log_return", lambda: np.log(self["Close"]) - np.log(self.prev("Close")))
+
+    def traded(self) -> pd.DataFrame:
+        """แถวที่หุ้นมีการซื้อขาย (Close ไม่เป็น NaN)"""
+        return self.memo("traded", lambda: self["Close"].notna())
+
+
+def _ewm(df: pd.DataFrame, alpha: float, seed: Optional[pd.Series] = None, min_periods: int = 0):
+    """
+    EMA (adjust=False) ที่ต่อจาก seed ได้ คืนค่า (ค่าที่ mask ตาม min_periods แล้ว, ค่าดิบแถวสุดท้ายสำหรับ state)
+    - ไม่มี seed: เหมือน df.ewm(alpha=alpha, min_periods=min_periods, adjust=False).mean()
+    - มี seed: ต่อแถว seed ไว้ด้านบนแล้วตัดทิ้ง -> ผลเท่ากับคำนวณต่อเนื่องจากรอบก่อน
+    - ignore_na: หุ้นที่เริ่มซื้อขายทีหลัง / หยุดพักการซื้อขาย (NaN ใน Matrix) ได้ผลเหมือนคำนวณแยกตัว
+      แถวที่ไม่มีข้อมูลคืน NaN (ไม่ใช่ค่าที่ลากต่อมา) -> EMA ที่ซ้อนกัน (TEMA / Signal / ADX) ข้ามแถวนั้นเช่นกัน
+    """
+    if seed is None:
+        raw = df.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+        traded = df.notna()
+        out = raw.where(traded & (traded.cumsum() >= min_periods))
+        return out, raw.iloc[-1]
+    raw = pd.concat([seed.to_frame().T, df]).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().iloc[1:]
+    return raw.where(df.notna()), raw.iloc[-1]
+
+
+def _seed(state: Optional[Dict], key: str) -> Optional[pd.Series]:
+    return state[key] if state else None
+
+
+def _rolling(df: pd.DataFrame, traded: pd.DataFrame, window: int, fn: Callable) -> pd.DataFrame:
+    """
+    Rolling ต่อหุ้นเฉพาะแถวที่มีการซื้อขาย แล้ววางกลับตามวันที่ของ Matrix
+    -> หุ้นที่หยุดพักการซื้อขาย (NaN ใน Matrix) ได้ผลเหมือนคำนวณแยกตัว แถวที่หยุดพักคืน NaN
+    """
+    out = {col: fn(df.loc[traded[col], col].rolling(window)).reindex(df.index) for col in df.columns}
+    return pd.DataFrame(out, index=df.index, columns=df.columns)
+
+# ==========================================
+# Recursive Kernels (EMA / สะสม)
+# ==========================================
+
+@register_indicator("rsi", ("Close",), ("RSI",), warmup=lambda period: period, recursive=True, period=14)
+def _rsi(ctx: IndicatorContext, state, period: int):
+    """RSI แบบ Wilder's Smoothing (เท่ากับ technical_analysis.calculate_rsi)"""
+    delta = ctx.new(ctx.delta())
+    traded = ctx.new(ctx["Close"]).notna()
+    gain = delta.where(delta > 0, 0).where(traded)
+    loss = -delta.where(delta < 0, 0).where(traded)
+    avg_gain, gain_last = _ewm(gain, 1 / period, _seed(state, "avg_gain"), min_periods=period)
+    avg_loss, loss_last = _ewm(loss, 1 / period, _seed(state, "avg_loss"), min_periods=period)
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    return {"RSI": rsi}, {"avg_gain": gain_last, "avg_loss": loss_last}
+
+
+@register_indicator("macd", ("Close",), ("MACD", "Signal", "Hist"),
+                    warmup=lambda fast, slow, signal: slow + signal, recursive=True, fast=12, slow=26, signal=9)
+def _macd(ctx: IndicatorContext, state, fast: int, slow: int, signal: int):
+    close = ctx.new(ctx["Close"])
+    ema_fast, fast_last = _ewm(close, 2 / (fast + 1), _seed(state, "ema_fast"))
+    ema_slow, slow_last = _ewm(close, 2 / (slow + 1), _seed(state, "ema_slow"))
+    macd_line = ema_fast - ema_slow
+    signal_line, signal_last = _ewm(macd_line, 2 / (signal + 1), _seed(state, "signal"))
+    return (
+        {"MACD": macd_line, "Signal": signal_line, "Hist": macd_line - signal_line},
+        {"ema_fast": fast_last, "ema_slow": slow_last, "signal": signal_last}
+    )
+
+
+@register_indicator("tema", ("Close",), ("TEMA",), warmup=lambda span: 3 * span, recursive=True, span=15)
+def _tema(ctx: IndicatorContext, state, span: int):
+    alpha = 2 / (span + 1)
+    ema1, e1 = _ewm(ctx.new(ctx["Close"]), alpha, _seed(state, "ema1"))
+    ema2, e2 = _ewm(ema1, alpha, _seed(state, "ema2"))
+    ema3, e3 = _ewm(ema2, alpha, _seed(state, "ema3"))
+    return {"TEMA": 3 * ema1 - 3 * ema2 + ema3}, {"ema1": e1, "ema2": e2, "ema3": e3}
+
+
+@register_indicator("atr", ("High", "Low", "Close"), ("ATR",), warmup=lambda period: period, recursive=True, period=14)
+def _atr(ctx: IndicatorContext, state, period: int):
+    atr, atr_last = _ewm(ctx.new(ctx.true_range()), 1 / period, _seed(state, "atr"), min_periods=period)
+    return {"ATR": atr}, {"atr": atr_last}
+
+
+@register_indicator("adx", ("High", "Low", "Close"), ("ADX", "Plus_DI", "Minus_DI"),
+                    warmup=lambda period: 2 * period, recursive=True, period=14)
+def _adx(ctx: IndicatorContext, state, period: int):
+    up = ctx["High"] - ctx.prev("High")
+    down = ctx.prev("Low") - ctx["Low"]
+    traded = ctx["Close"].notna()
+    plus_dm = ctx.new(up.where((up > down) & (up > 0), 0.0).where(traded))
+    minus_dm = ctx.new(down.where((down > up) & (down > 0), 0.0).where(traded))
+    alpha = 1 / period
+
+    tr_s, tr_last = _ewm(ctx.new(ctx.true_range()), alpha, _seed(state, "tr"), min_periods=period)
+    plus_s, plus_last = _ewm(plus_dm, alpha, _seed(state, "plus_dm"), min_periods=period)
+    minus_s, minus_last = _ewm(minus_dm, alpha, _seed(state, "minus_dm"), min_periods=period)
+
+    plus_di = 100 * plus_s / tr_s
+    minus_di = 100 * minus_s / tr_s
+    dx = (100 * (plus_di - minus_di).abs() / (plus_di + minus_di)).replace([np.inf, -np.inf], np.nan)
+    adx, adx_last = _ewm(dx, alpha, _seed(state, "adx"), min_periods=period)
+    return (
+        {"ADX": adx, "Plus_DI": plus_di, "Minus_DI": minus_di},
+        {"tr": tr_last, "plus_dm": plus_last, "minus_dm": minus_last, "adx": adx_last}
+    )
+
+
+@register_indicator("obv", ("Close", "Volume"), ("OBV",), warmup=lambda: 1, recursive=True)
+def _obv(ctx: IndicatorContext, state):
+    direction = np.sign(ctx.new(ctx.delta())).fillna(0)
+    obv = (direction * ctx.new(ctx["Volume"])).cumsum()
+    last = obv.ffill().iloc[-1]
+    if state:
+        obv = obv + state["obv"]
+        last = (last + state["obv"]).fillna(state["obv"])   # ไม่มีการซื้อขายทั้งรอบ -> ยอดสะสมเดิม
+    return {"OBV": obv}, {"obv": last}
+
+# ==========================================
+# Rolling Kernels (runner ต่อ tail ให้ -> ไม่ต้องมี state)
+# ==========================================
+
+@register_indicator("bollinger", ("Close",), ("BB_Mid", "BB_Upper", "BB_Lower"),
+                    warmup=lambda window, k: window, window=20, k=2.0)
+def _bollinger(ctx: IndicatorContext, state, window: int, k: float):
+    mid = _rolling(ctx["Close"], ctx.traded(), window, lambda r: r.mean())
+    band = k * _rolling(ctx["Close"], ctx.traded(), window, lambda r: r.std(ddof=0))
+    return {"BB_Mid": mid, "BB_Upper": mid + band, "BB_Lower": mid - band}, None
+
+
+@register_indicator("stochastic", ("High", "Low", "Close"), ("Stoch_K", "Stoch_D"),
+                    warmup=lambda k, d: k + d - 1, k=14, d=3)
+def _stochastic(ctx: IndicatorContext, state, k: int, d: int):
+    traded = ctx.traded()
+    lowest = _rolling(ctx["Low"], traded, k, lambda r: r.min())
+    highest = _rolling(ctx["High"], traded, k, lambda r: r.max())
+    stoch_k = 100 * (ctx["Close"] - lowest) / (highest - lowest)
+    return {"Stoch_K": stoch_k, "Stoch_D": _rolling(stoch_k, traded, d, lambda r: r.mean())}, None
+
+
+@register_indicator("vwap", ("High", "Low", "Close", "Volume"), ("VWAP",), warmup=lambda window: window, window=20)
+def _vwap(ctx: IndicatorContext, state, window: int):
+    """Rolling VWAP (ข้อมูลรายวัน: ใช้ราคา Typical = (H+L+C)/3)"""
+    typical = (ctx["High"] + ctx["Low"] + ctx["Close"]) / 3
+    volume = ctx["Volume"]
+    traded = ctx.traded()
+    value = _rolling(typical * volume, traded, window, lambda r: r.sum())
+    return {"VWAP": value / _rolling(volume, traded, window, lambda r: r.sum())}, None
+
+
+@register_indicator("volatility", ("Close",), ("Volatility",),
+                    warmup=lambda window, periods_per_year: window + 1, window=20, periods_per_year=252)
+def _volatility(ctx: IndicatorContext, state, window: int, periods_per_year: int):
+    """Rolling Volatility ของ log return (annualized)"""
+    volatility = _rolling(ctx.log_return(), ctx.traded(), window, lambda r: r.std())
+    return {"Volatility": volatility * np.sqrt(periods_per_year)}, None
+
+# ==========================================
+# Runner (Fused Pass)
+# ==========================================
+
+IndicatorRequest = Union[List[str], Dict[str, Dict]]
+
+
+def resolve_indicators(requested: IndicatorRequest) -> List[Tuple[Indicator, Dict]]:
+    """['rsi', 'macd'] หรือ {'rsi': {'period': 14}, 'bollinger': {}} -> [(Indicator, params)]"""
+    items = requested.items() if isinstance(requested, dict) else ((name, {}) for name in requested)
+    specs = []
+    for name, params in items:
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator '{name}'. Choose from {list(INDICATORS)}.")
+        ind = INDICATORS[name]
+        unknown = set(params or {}) - set(ind.defaults)
+        if unknown:
+            raise ValueError(f"Unknown params {sorted(unknown)} for indicator '{name}'.")
+        specs.append((ind, {**ind.defaults, **(params or {})}))
+    return specs
+
+
+def compute_indicators(prices: Dict[str, pd.DataFrame], requested: IndicatorRequest,
+                       state: Optional[Dict] = None) -> Tuple[Dict[str, pd.DataFrame], Dict]:
+    """
+    คำนวณทุก indicator ที่ขอในรอบเดียวบน Price matrices (field -> DataFrame วันที่ x หุ้น)
+    - state=None: คำนวณจากข้อมูลทั้งหมด
+    - state จากรอบก่อน: prices = เฉพาะแถวใหม่ (หุ้นชุดเดิม) -> ผลเฉพาะแถวใหม่ เท่ากับคำนวณทั้งก้อน
+    คืนค่า ({output: DataFrame}, state ใหม่)
+    """
+    specs = resolve_indicators(requested)
+    fields = sorted({f for ind, _ in specs for f in ind.inputs} | {"Close"})
+    missing = [f for f in fields if f not in prices]
+    if missing:
+        raise ValueError(f"Missing price fields {missing}")
+
+    spec_params = {ind.name: params for ind, params in specs}
+    n_new = len(prices["Close"])
+    if state and n_new == 0:
+        return {col: prices["Close"].iloc[:0] for ind, _ in specs for col in ind.outputs}, state
+    if state:
+        if state["specs"] != spec_params:
+            raise ValueError("Indicator state was built with different indicators or params.")
+        frames = {f: pd.concat([state["tail"][f], prices[f]]) for f in fields}
+        tail_len = len(state["tail"]["Close"])
+    else:
+        frames = {f: prices[f] for f in fields}
+        tail_len = 0
+
+    ctx = IndicatorContext(frames, tail_len, state["last"] if state else None)
+    outputs, new_state = {}, {"specs": spec_params, "kernels": {}}
+    for ind, params in specs:
+        out, kernel_state = ind.kernel(ctx, (state or {}).get("kernels", {}).get(ind.name), **params)
+        for col, df in out.items():
+            outputs[col] = df.iloc[-n_new:]
+        new_state["kernels"][ind.name] = kernel_state
+
+    rows = _tail_rows(frames["Close"], _tail_length(spec_params))
+    new_state["tail"] = {f: frames[f][rows] for f in fields}
+    # ค่าล่าสุดที่มีการซื้อขายต่อหุ้น (ctx.prev ของรอบถัดไป) — หยุดพักนานกว่า tail ใช้ค่าจากรอบก่อน
+    last = {f: frames[f].ffill().iloc[-1] for f in fields}
+    new_state["last"] = {f: last[f].fillna(state["last"][f]) for f in fields} if state else last
+    return outputs, new_state
+
+
+def _tail_length(spec_params: Dict[str, Dict]) -> int:
+    return max([1] + [INDICATORS[name].warmup(**params) for name, params in spec_params.items()])
+
+
+def _tail_rows(close: pd.DataFrame, keep: int) -> np.ndarray:
+    """
+    แถวที่ต้องเก็บเป็น tail: keep แถวล่าสุด + keep แถวล่าสุดที่มีการซื้อขายของแต่ละหุ้น
+    (หุ้นที่หยุดพักนานกว่า keep แถวยังมีข้อมูลพอให้ rolling kernel รอบถัดไป)
+    """
+    traded = close.notna().to_numpy()
+    remaining = traded[::-1].cumsum(axis=0)[::-1]          # จำนวนแถวที่ซื้อขาย ตั้งแต่แถวนี้ถึงแถวสุดท้าย
+    recent = np.arange(len(close)) >= len(close) - keep
+    return recent | (traded & (remaining <= keep)).any(axis=1)
+
+
+def select_state(state: Dict, column: str) -> Dict:
+    """state ของ Matrix -> state ของหุ้นตัวเดียว (เก็บแยกต่อหุ้นไว้ต่อรอบถัดไป)"""
+    rows = _tail_rows(state["tail"]["Close"][[column]], _tail_length(state["specs"]))
+    return {
+        "specs": state["specs"],
+        "kernels": {name: None if ks is None else {k: v[[column]] for k, v in ks.items()}
+                    for name, ks in state["kernels"].items()},
+        "tail": {f: df.loc[rows, [column]] for f, df in state["tail"].items()},
+        "last": {f: s[[column]] for f, s in state["last"].items()}
+    }
+
+
+def merge_states(states: List[Dict]) -> Dict:
+    """state ของหลายหุ้น (จาก select_state) -> state ของ Matrix เดียว สำหรับคำนวณแถวใหม่ในรอบเดียว"""
+    first = states[0]
+    if any(s["specs"] != first["specs"] for s in states):
+        raise ValueError("Cannot merge indicator states built with different indicators or params.")
+    return {
+        "specs": first["specs"],
+        "kernels": {name: None if ks is None else {k: pd.concat([s["kernels"][name][k] for s in states]) for k in ks}
+                    for name, ks in first["kernels"].items()},
+        "tail": {f: pd.concat([s["tail"][f] for s in states], axis=1) for f in first["tail"]},
+        "last": {f: pd.concat([s["last"][f] for s in states]) for f in first["last"]}
+    }
+
+
+def calculate_tema(series, span):
+    """TEMA แบบ one-shot (Series หรือ DataFrame) ใช้ใน tema_scoring"""
+    alpha = 2 / (span + 1)
+    ema1, _ = _ewm(series, alpha)
+    ema2, _ = _ewm(ema1, alpha)
+    ema3, _ = _ewm(ema2, alpha)
+    return (3 * ema1) - (3 * ema2) + ema3
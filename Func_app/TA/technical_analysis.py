@@ -1,9 +1,15 @@
-import yfinance as yf
+import threading
 import pandas as pd
 import numpy as np
+from bisect import bisect_left, bisect_right
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
+from typing import Callable, Dict, List, Optional
 from Func_app.config import SET50_TICKERS
+from Func_app.DataSource.intervals import DAILY, check_interval
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.metrics import StageTimer, count_failure
+from Func_app.TA.indicators import PRICE_FIELDS, INDICATORS, compute_indicators, merge_states, select_state
 
 # ==========================================
 # 1. Core Calculation Logic (RSI & MACD)
@@ -36,92 +42,259 @@ def calculate_macd(series, fast=12, slow=26, signal=9):
     
     return macd_line, signal_line, histogram
 
+# ==========================================
+# 1.1 Columnar History (รูปแบบที่เก็บใน Cache)
+# ==========================================
+
+# Momentum ไม่เก็บใน Cache — คำนวณจากเครื่องหมายของ Hist ตอนขอเท่านั้น
+TECHNICAL_FIELDS = ["Close", "RSI", "MACD", "Signal", "Hist", "Momentum"]
+BASE_INDICATORS = ["rsi", "macd"]
+OUTPUT_DECIMALS = {"Close": 2, "RSI": 2}  # ค่าอื่นปัดทศนิยม 4 ตำแหน่ง
+BATCH_CHUNK_SIZE = 10
+# Intraday: Date เป็น 'YYYY-MM-DD HH:MM' (เวลาตลาด) / Indicator เพิ่มเติมเมื่อไม่ระบุ field
+INTRADAY_DATE_FORMAT = '%Y-%m-%d %H:%M'
+INTRADAY_INDICATORS = ["tema"]
+
+def technical_fields() -> List[str]:
+    """ทุก field ที่ขอได้ (พื้นฐาน + output ของทุก Indicator ใน Registry)"""
+    extra = [out for ind in INDICATORS.values() for out in ind.outputs if out not in TECHNICAL_FIELDS]
+    return TECHNICAL_FIELDS + extra
+
+def momentum_labels(hist: List[float]) -> List[str]:
+    return ["Bullish" if h > 0 else "Bearish" if h < 0 else "Neutral" for h in hist]
+
+def slice_history(columns: Dict[str, list], start: Optional[str] = None, end: Optional[str] = None,
+                  last_n: Optional[int] = None, fields: Optional[List[str]] = None) -> Dict[str, list]:
+    """
+    ตัดช่วงวันที่ (start/end แบบ 'YYYY-MM-DD', รวมปลายทั้งสองข้าง) + last_n วันล่าสุด + เลือก field
+    Date เรียงจากเก่าไปใหม่ -> หา index ด้วย bisect แทนการกรองทีละแถว
+    - ใช้ได้ทั้งรายวันและ Intraday ('YYYY-MM-DD HH:MM': end รวมทุก bar ของวันนั้น)
+    - fields=None: ทุก field ที่มีใน Cache + Momentum / field ที่หุ้นนี้ไม่มีจะถูกข้าม
+    """
+    dates = columns['Date']
+    lo = bisect_left(dates, start) if start else 0
+    hi = bisect_right(dates, end if len(end) > 10 else f"{end} 23:59") if end else len(dates)
+    if last_n:
+        lo = max(lo, hi - last_n)
+    
+    out = {"Date": dates[lo:hi]}
+    for field in (fields or [k for k in columns if k != 'Date'] + ["Momentum"]):
+        if field == "Momentum":
+            out[field] = momentum_labels(columns['Hist'][lo:hi])
+        elif field in columns:
+            out[field] = columns[field][lo:hi]
+    return out
+
+def indicators_for_fields(fields: Optional[List[str]]) -> List[str]:
+    """field ที่ขอ (เช่น ['RSI', 'TEMA']) -> Indicator ใน Registry ที่ต้องคำนวณสด (None = INTRADAY_INDICATORS)"""
+    if not fields:
+        return list(INTRADAY_INDICATORS)
+    return [name for name, ind in INDICATORS.items() if set(ind.outputs) & set(fields)]
+
+def columns_to_rows(columns: Dict[str, list]) -> List[Dict]:
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
 # ==========================================
 # 2. Function: Get History (Single Stock Time Series)
 # ==========================================
 
-def get_technical_history(symbol: str, start_date: str, end_date: str):
+def _requested_indicators(indicators: Optional[List[str]]) -> List[str]:
+    """RSI + MACD มีเสมอ (Momentum/ค่าเดิมของ Cache) + Indicator เพิ่มเติมที่ขอ"""
+    return BASE_INDICATORS + [name for name in (indicators or []) if name not in BASE_INDICATORS]
+
+def _history_columns(close: pd.Series, outputs: Dict[str, pd.Series], start_date: Optional[str],
+                     date_format: str = '%Y-%m-%d') -> Dict[str, list]:
+    """ราคาปิด + Indicators ของหุ้นหนึ่งตัว -> Columnar (ตัดแถวที่ยัง warm-up ไม่ครบ และก่อน start_date)"""
+    df = pd.DataFrame({"Close": close, **outputs}).dropna()
+    if start_date:
+        df = df[df.index >= start_date]
+    columns = {"Date": df.index.strftime(date_format).tolist()}
+    for col in df.columns:
+        columns[col] = df[col].round(OUTPUT_DECIMALS.get(col, 4)).tolist()
+    return columns
+
+def get_technical_history(symbol: str, start_date: Optional[str], end_date: Optional[str], columnar: bool = False,
+                          indicators: Optional[List[str]] = None, interval: str = DAILY):
     """
     ดึงข้อมูลราคา + MACD + RSI แบบรายวัน (Time Series)
     ใช้สำหรับคำนวณ Batch และเป็น Fallback สำหรับ GET รายตัว
+    - columnar=True: คืน {"Date": [...], "Close": [...], ...} (ไม่มี Momentum) สำหรับเก็บใน Cache
+    - indicators: Indicator เพิ่มเติมจาก Registry (เช่น ['bollinger', 'atr'])
+    - ราคาจาก PriceStore (view 'adjusted' = ปรับ split + ปันผล เท่ากับ auto_adjust=True เดิม) ไม่ดึงซ้ำ
+    - interval='5m' / '1h' ...: bar ระหว่างวันทั้งช่วงที่ย้อนหลังได้
+      -> warm-up ใช้ bar ก่อน start_date ที่มีอยู่แล้ว / start_date=None = ทุก bar
     """
+    timer = StageTimer("technical")
     try:
+        check_interval(interval)
         clean_symbol = symbol.upper().replace('.BK', '')
         ticker = f"{clean_symbol}.BK"
         
-        # [CRITICAL STEP] เผื่อช่วงเวลา 6 เดือนก่อน start_date เพื่อให้คำนวณ MACD/RSI ได้
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        fetch_start = (start_dt - relativedelta(months=6)).strftime('%Y-%m-%d')
-        
-        stock = yf.Ticker(ticker)
-        df = stock.history(start=fetch_start, end=end_date)
+        if interval == DAILY:
+            # [CRITICAL STEP] เผื่อช่วงเวลา 6 เดือนก่อน start_date เพื่อให้คำนวณ MACD/RSI ได้
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            fetch_start = (start_dt - relativedelta(months=6)).strftime('%Y-%m-%d')
+            df = PRICE_STORE.bars(ticker, DAILY, "adjusted", start=fetch_start, end=end_date)
+        else:
+            df = PRICE_STORE.bars(clean_symbol, interval, "adjusted", end=end_date)
+        timer.lap("fetch")
         
         if df.empty:
+            count_failure("technical", "no_history")
             return {"status": "error", "message": f"No data found for {symbol}"}
             
-        # คำนวณ Indicators
-        df['RSI'] = calculate_rsi(df['Close'])
-        df['MACD'], df['Signal'], df['Hist'] = calculate_macd(df['Close'])
-        
-        # ลบค่า NaN ช่วงแรก และ กรองวันที่ตามที่ User Request (start_date ถึง end_date)
-        df = df.dropna()
-        df = df[df.index >= start_date]
+        # คำนวณ Indicators (Matrix 1 คอลัมน์)
+        prices = {f: df[[f]] for f in PRICE_FIELDS if f in df}
+        outputs, _ = compute_indicators(prices, _requested_indicators(indicators))
+        columns = _history_columns(df['Close'], {name: out.iloc[:, 0] for name, out in outputs.items()}, start_date,
+                                   '%Y-%m-%d' if interval == DAILY else INTRADAY_DATE_FORMAT)
+        timer.lap("compute")
 
-        history_data = []
-        for date_index, row in df.iterrows():
-            signal_status = "Neutral"
-            if row['Hist'] > 0: signal_status = "Bullish"
-            elif row['Hist'] < 0: signal_status = "Bearish"
-
-            history_data.append({
-                "Date": date_index.strftime('%Y-%m-%d'),
-                "Close": round(row['Close'], 2),
-                "RSI": round(row['RSI'], 2),
-                "MACD": round(row['MACD'], 4),
-                "Signal": round(row['Signal'], 4),
-                "Hist": round(row['Hist'], 4),
-                "Momentum": signal_status
-            })
+        history_data = columns if columnar else columns_to_rows(slice_history(columns))
+        timer.lap("serialize")
             
         return {
             "status": "success",
             "symbol": clean_symbol,
-            "count": len(history_data),
+            "interval": interval,
+            "count": len(columns['Date']),
             "data": history_data
         }
 
     except Exception as e:
+        count_failure("technical")
         return {"status": "error", "message": str(e)}
 
 # ==========================================
 # 3. Function: Batch Analysis (สำหรับ Cache)
 # ==========================================
 
-def analyze_technical_batch(start_year: int):
+# Incremental state ต่อหุ้นจากรอบ Batch ก่อน (key = 'PTT')
+# {"requested", "start_date", "last_date" (แถวสุดท้ายของ Matrix), "check_date", "last_close", "state", "columns"}
+_BATCH_STATE: Dict[str, Dict] = {}
+_BATCH_STATE_LOCK = threading.Lock()
+
+def _reusable_state(key: str, df: pd.DataFrame, requested: List[str], start_date: str) -> Optional[Dict]:
+    """
+    state รอบก่อนใช้ต่อได้เมื่อ Indicator / start_date เดิม และราคาปิด (adjusted) ณ วันสุดท้ายที่คำนวณไว้ยังเท่าเดิม
+    -> ปันผล / split ใหม่ทำให้ราคาย้อนหลังถูกปรับทั้งเส้น = ต้องคำนวณใหม่ทั้งก้อน
+    """
+    with _BATCH_STATE_LOCK:
+        entry = _BATCH_STATE.get(key)
+    if entry is None or entry["requested"] != requested or entry["start_date"] != start_date:
+        return None
+    if entry["check_date"] not in df.index:
+        return None
+    close = df.at[entry["check_date"], 'Close']
+    return entry if np.isclose(close, entry["last_close"], rtol=1e-9, atol=0) else None
+
+def _save_state(key: str, close: pd.Series, state: Dict, columns: Dict[str, list], requested: List[str], start_date: str):
+    traded = close.dropna()
+    with _BATCH_STATE_LOCK:
+        _BATCH_STATE[key] = {
+            "requested": requested, "start_date": start_date,
+            "last_date": close.index[-1], "check_date": traded.index[-1], "last_close": float(traded.iloc[-1]),
+            "state": state, "columns": columns
+        }
+
+def _price_matrices(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Matrix (วันที่ x หุ้น) ต่อ field — หุ้นที่ไม่มีแถวในวันนั้นเป็น NaN"""
+    return {f: pd.DataFrame({key: df[f] for key, df in frames.items()}) for f in PRICE_FIELDS}
+
+def analyze_technical_batch(start_year: int, tickers: Optional[List[str]] = None,
+                            on_result: Optional[Callable[[str, list], None]] = None,
+                            indicators: Optional[List[str]] = None):
     """
     คำนวณ MACD/RSI ของหุ้น SET50 ทั้งหมดตั้งแต่ปีเริ่มต้นจนถึงปัจจุบัน
     ใช้สำหรับ Endpoint POST /update_indicator_cache
+    - ราคา (view 'adjusted') จาก PriceStore ที่ Analyzer อื่นใช้ร่วมกัน -> ไม่ดาวน์โหลดซ้ำ
+    - รวมเป็น Matrix ชุดละ BATCH_CHUNK_SIZE ตัว แล้วคำนวณทุก Indicator ในรอบเดียว
+    - Incremental: หุ้นที่มี state จากรอบก่อน (Indicator / start_year เดิม และราคาไม่ถูกปรับย้อนหลัง)
+      คำนวณเฉพาะ bar ใหม่ต่อจาก state แล้วต่อท้าย Column เดิม / ที่เหลือคำนวณทั้งก้อน
+    - on_result(symbol, data): เรียกทันทีที่หุ้นแต่ละตัวคำนวณเสร็จ (อัปเดต Cache ทีละชุด)
+    - data ของแต่ละหุ้นเป็นแบบ Columnar (ดู slice_history)
     """
-    target_tickers = SET50_TICKERS
+    # Retry จาก Scheduler ส่ง key ของ Cache ('PTT') -> เติม .BK ให้ครบก่อนดึงราคา (yfinance ไม่รู้จักชื่อที่ไม่มี suffix)
+    target_tickers = [f"{t.upper().replace('.BK', '')}.BK" for t in (tickers if tickers else SET50_TICKERS)]
+    requested = _requested_indicators(indicators)
     
-    # กำหนดช่วงเวลา: 2022-01-01 จนถึงวันปัจจุบัน
+    # กำหนดช่วงเวลา: 2022-01-01 จนถึงวันปัจจุบัน (เผื่อ 6 เดือนก่อนหน้าสำหรับ warm-up)
     start_date = f"{start_year}-01-01"
     end_date = date.today().strftime('%Y-%m-%d')
+    fetch_start = (datetime.strptime(start_date, '%Y-%m-%d') - relativedelta(months=6)).strftime('%Y-%m-%d')
     
     full_cache_data = {}
+    failed = {}
+    incremental = []
     
     print(f"Starting technical batch analysis from {start_date} to {end_date}...")
     
-    for symbol in target_tickers:
-        # เรียกใช้ get_technical_history เพื่อคำนวณประวัติของแต่ละตัว
-        res = get_technical_history(symbol, start_date=start_date, end_date=end_date)
-        if res['status'] == 'success':
-            # เก็บผลลัพธ์ทั้งหมด (ประวัติรายวันตั้งแต่ 2022) ลงใน Dictionary Keyed by Symbol
-            full_cache_data[res['symbol']] = res['data']
+    for i in range(0, len(target_tickers), BATCH_CHUNK_SIZE):
+        chunk = target_tickers[i:i + BATCH_CHUNK_SIZE]
+        timer = StageTimer("technical_batch")
+        frames = {}
+        for symbol in chunk:
+            key = symbol.upper().replace('.BK', '')
+            try:
+                df = PRICE_STORE.view(symbol, "adjusted", start=fetch_start, end=end_date)
+            except Exception as e:
+                failed[key] = f"price fetch failed: {e}"
+                count_failure("technical")
+                continue
+            if df.empty or df['Close'].dropna().empty:
+                failed[key] = f"No data found for {symbol}"
+                count_failure("technical", "no_history")
+                continue
+            frames[key] = df
+        timer.lap("fetch")
+        
+        if not frames:
+            continue
+        
+        reused = {key: entry for key, df in frames.items()
+                  if (entry := _reusable_state(key, df, requested, start_date)) is not None}
+        results = {key: entry["columns"] for key, entry in reused.items()}
+        
+        # คำนวณทั้งก้อน (รอบแรก / params เปลี่ยน / ราคาถูกปรับย้อนหลัง)
+        full = {key: df for key, df in frames.items() if key not in reused}
+        if full:
+            prices = _price_matrices(full)
+            outputs, state = compute_indicators(prices, requested)
+            for key in full:
+                # เก็บผลลัพธ์ทั้งหมด (ประวัติรายวันตั้งแต่ 2022) ลงใน Dictionary Keyed by Symbol
+                columns = _history_columns(prices['Close'][key], {name: out[key] for name, out in outputs.items()}, start_date)
+                _save_state(key, prices['Close'][key], select_state(state, key), columns, requested, start_date)
+                results[key] = columns
+        
+        # Incremental: เฉพาะ bar หลังแถวสุดท้ายของรอบก่อน (หุ้นที่ไม่มี bar ใหม่ใช้ Column เดิม)
+        new_rows = {key: frames[key][frames[key].index > entry["last_date"]] for key, entry in reused.items()}
+        new_rows = {key: df for key, df in new_rows.items() if df['Close'].notna().any()}
+        if new_rows:
+            prices = _price_matrices(new_rows)
+            outputs, state = compute_indicators(prices, requested, merge_states([reused[key]["state"] for key in new_rows]))
+            for key in new_rows:
+                added = _history_columns(prices['Close'][key], {name: out[key] for name, out in outputs.items()}, start_date)
+                # สร้าง list ใหม่ (ไม่แก้ list เดิมที่ผู้อ่าน Cache ถืออยู่)
+                columns = {col: values + added[col] for col, values in reused[key]["columns"].items()}
+                _save_state(key, prices['Close'][key], select_state(state, key), columns, requested, start_date)
+                results[key] = columns
+        incremental.extend(reused)
+        timer.lap("compute")
+        
+        for key in frames:
+            full_cache_data[key] = results[key]
+            if on_result:
+                on_result(key, results[key])
+        timer.lap("serialize")
             
+    if incremental:
+        print(f"♻️ Technical batch: {len(incremental)} symbol(s) updated incrementally")
     return {
         "status": "success",
         "start_date": start_date,
         "end_date": end_date,
-        "data": full_cache_data
-    }
\ No newline at end of file
+        "data": full_cache_data,
+        "failed": failed,
+        "incremental": incremental
+    }
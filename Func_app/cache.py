@@ -0,0 +1,246 @@
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from Func_app.config import CACHE_TTL
+from Func_app.market_hours import TZ, market_now, is_market_open, last_settled_close
+from Func_app.metrics import METRICS
+
+METRICS.describe("cache_swaps_total", "Snapshot swaps per cache (replace / put / refreshed)")
+METRICS.describe("cache_lock_contended_total", "Cache writes that found the write lock already held")
+METRICS.describe("cache_lock_wait_seconds", "Time a contended cache writer waited for the write lock")
+
+
+def params_fingerprint(params: Optional[Dict]) -> Optional[str]:
+    """Hash สั้นของ Parameter ที่ใช้คำนวณ (ลำดับ key ไม่มีผล)"""
+    if params is None:
+        return None
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+# Retry queue: backoff = RETRY_BASE_SECONDS * 2^(attempts-1) (สูงสุด RETRY_MAX_SECONDS)
+# เกิน RETRY_MAX_ATTEMPTS แล้วรอรอบ refresh เต็มถัดไป
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+RETRY_MAX_ATTEMPTS = 5
+
+
+class _Snapshot:
+    """สถานะของ Cache ณ หนึ่ง version — สลับทั้งก้อนด้วย assignment เดียว (atomic สำหรับผู้อ่าน)"""
+    __slots__ = ("data", "entry_meta", "computed_at", "params", "fingerprint", "version")
+
+    def __init__(self, data, entry_meta, computed_at, params, fingerprint, version):
+        self.data = data
+        self.entry_meta = entry_meta
+        self.computed_at = computed_at
+        self.params = params
+        self.fingerprint = fingerprint
+        self.version = version
+
+
+class VersionedCache(Mapping):
+    """
+    Cache แบบอ่านอย่างเดียวสำหรับ Endpoint (ใช้แทน dict ได้: in / [] / get / values / len)
+    - ทุก entry มี computed_at + fingerprint ของ parameter ที่ใช้คำนวณ
+    - TTL ต่อประเภท Cache (config.CACHE_TTL) และรู้เวลาเปิด-ปิดตลาด SET (market_bound)
+    - replace() สลับข้อมูลชุดใหม่ทีเดียว: ระหว่างคำนวณ ผู้อ่านยังได้ข้อมูลชุดเดิม
+    - put() อัปเดตทีละหุ้นทันทีที่คำนวณเสร็จ (copy-on-write + version ใหม่ทุกครั้ง)
+      หุ้นที่ล้มเหลวเก็บค่าเดิมไว้ (ไม่ทำให้ coverage หายเงียบ ๆ) และเข้า Retry queue
+    - add_listener(fn): fn(cache, kind, keys, old_data, new_data, version) ถูกเรียกหลังทุกการเขียน
+      kind = "put" | "replace" (keys=None: ทุก key) | "refreshed" (จบรอบ refresh)
+    """
+
+    def __init__(self, name: str, ttl_seconds: Optional[int] = None, market_bound: Optional[bool] = None):
+        cfg = CACHE_TTL.get(name, {})
+        self.name = name
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else cfg.get("ttl", 24 * 3600)
+        self.market_bound = market_bound if market_bound is not None else cfg.get("market_bound", False)
+        self._state = _Snapshot({}, {}, None, None, None, 0)
+        self._write_lock = threading.Lock()
+        self._retry: Dict[str, Dict] = {}
+        self._listeners: List[Callable] = []
+
+    # ---------- Mapping (Readers) ----------
+    def __getitem__(self, key):
+        return self._state.data[key]
+
+    def __iter__(self):
+        return iter(self._state.data)
+
+    def __len__(self):
+        return len(self._state.data)
+
+    # อ่านจาก snapshot เดียวกันทั้งก้อน (ไม่ปนข้อมูลคนละ version ระหว่างวน)
+    def keys(self):
+        return self._state.data.keys()
+
+    def values(self):
+        return self._state.data.values()
+
+    def items(self):
+        return self._state.data.items()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """dict ของ version ปัจจุบัน (ห้ามแก้ไข — ทุกการเขียนสร้าง dict ใหม่เสมอ)"""
+        return self._state.data
+
+    def versioned_snapshot(self) -> Tuple[Dict[str, Any], int]:
+        """(dict, version) จาก state เดียวกัน — ใช้เมื่อต้องรายงาน / memo ด้วย version ของข้อมูลที่อ่านจริง"""
+        state = self._state
+        return state.data, state.version
+
+    # ---------- Writers ----------
+    @contextlib.contextmanager
+    def _writing(self, kind: Optional[str] = None):
+        """ถือ write lock + นับ contention (รอ writer อื่น) และจำนวน snapshot ที่สลับ (kind) — ผู้อ่านไม่ต้องรอ lock"""
+        if not self._write_lock.acquire(blocking=False):
+            METRICS.inc("cache_lock_contended_total", cache=self.name)
+            t0 = time.perf_counter()
+            self._write_lock.acquire()
+            METRICS.observe("cache_lock_wait_seconds", time.perf_counter() - t0, cache=self.name)
+        try:
+            yield
+        finally:
+            self._write_lock.release()
+        if kind:
+            METRICS.inc("cache_swaps_total", cache=self.name, kind=kind)
+
+    def add_listener(self, fn: Callable):
+        self._listeners.append(fn)
+
+    def _notify(self, kind: str, keys, old_data: Dict, new_data: Dict, version: int):
+        for fn in self._listeners:
+            try:
+                fn(self, kind, keys, old_data, new_data, version)
+            except Exception as e:
+                print(f"⚠️ Cache listener error ({self.name}): {e}")
+
+    def replace(self, data: Dict[str, Any], params: Optional[Dict] = None) -> int:
+        """สลับข้อมูลทั้งชุด คืนค่า version ใหม่"""
+        computed_at = market_now()
+        fp = params_fingerprint(params)
+        entry_meta = {key: (computed_at, fp) for key in data}
+        with self._writing("replace"):
+            old_data = self._state.data
+            version = self._state.version + 1
+            new_data = dict(data)
+            self._state = _Snapshot(new_data, entry_meta, computed_at, params, fp, version)
+            self._retry = {}
+        self._notify("replace", None, old_data, new_data, version)
+        return version
+
+    def put(self, key: str, value: Any, params: Optional[Dict] = None) -> int:
+        """อัปเดตหุ้นตัวเดียว (ตัวอื่นไม่ถูกแตะ) คืนค่า version ใหม่"""
+        meta = (market_now(), params_fingerprint(params))
+        with self._writing("put"):
+            state = self._state
+            data = dict(state.data)
+            data[key] = value
+            entry_meta = dict(state.entry_meta)
+            entry_meta[key] = meta
+            self._state = _Snapshot(data, entry_meta, state.computed_at, state.params,
+                                    state.fingerprint, state.version + 1)
+            self._retry.pop(key, None)
+            version = self._state.version
+        self._notify("put", [key], state.data, data, version)
+        return version
+
+    def mark_refreshed(self, params: Optional[Dict] = None, started_at: Optional[datetime] = None) -> int:
+        """จบรอบ refresh เต็ม (ทีละหุ้นผ่าน put): ตั้ง computed_at / params ระดับ Cache"""
+        with self._writing("refreshed"):
+            state = self._state
+            self._state = _Snapshot(state.data, state.entry_meta, started_at or market_now(), params,
+                                    params_fingerprint(params), state.version + 1)
+            version = self._state.version
+        self._notify("refreshed", [], state.data, state.data, version)
+        return version
+
+    # ---------- Retry Queue ----------
+    def mark_failed(self, key: str, reason: str):
+        with self._writing():
+            entry = self._retry.get(key, {"attempts": 0})
+            attempts = entry["attempts"] + 1
+            delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+            self._retry[key] = {
+                "reason": reason,
+                "attempts": attempts,
+                "next_retry_at": time.time() + delay if attempts < RETRY_MAX_ATTEMPTS else None
+            }
+
+    def failed(self) -> Dict[str, str]:
+        """Symbol -> เหตุผลที่ล้มเหลวล่าสุด (ยังอยู่ใน Retry queue)"""
+        return {key: entry["reason"] for key, entry in list(self._retry.items())}
+
+    def due_retries(self, now: Optional[float] = None) -> List[str]:
+        now = now or time.time()
+        return [key for key, entry in list(self._retry.items())
+                if entry["next_retry_at"] is not None and entry["next_retry_at"] <= now]
+
+    # ---------- Freshness ----------
+    @property
+    def computed_at(self) -> Optional[datetime]:
+        return self._state.computed_at
+
+    @property
+    def params(self) -> Optional[Dict]:
+        return self._state.params
+
+    @property
+    def version(self) -> int:
+        return self._state.version
+
+    def age_seconds(self, now: Optional[datetime] = None) -> Optional[float]:
+        computed_at = self._state.computed_at
+        if computed_at is None:
+            return None
+        return ((now or market_now()) - computed_at).total_seconds()
+
+    def is_stale(self, now: Optional[datetime] = None) -> bool:
+        """
+        - ยังไม่เคยคำนวณ = stale
+        - market_bound และตลาดปิด: stale ถ้ายังไม่ได้คำนวณหลังราคาปิดรอบล่าสุด (ไม่ refresh ซ้ำทั้งคืน)
+        - นอกนั้น: เกิน TTL
+        """
+        state = self._state
+        if state.computed_at is None:
+            return True
+        now = now or market_now()
+        if self.market_bound and not is_market_open(now):
+            last_close = last_settled_close(now)
+            if last_close is not None:
+                return state.computed_at < last_close
+        return (now - state.computed_at).total_seconds() > self.ttl_seconds
+
+    def entry_meta(self, key: str) -> Optional[Dict]:
+        meta = self._state.entry_meta.get(key)
+        if meta is None:
+            return None
+        computed_at, fp = meta
+        return {"computed_at": computed_at.isoformat(timespec='seconds'), "fingerprint": fp}
+
+    def status(self) -> Dict:
+        state = self._state
+        age = self.age_seconds()
+        return {
+            "name": self.name,
+            "count": len(state.data),
+            "version": state.version,
+            "computed_at": state.computed_at.isoformat(timespec='seconds') if state.computed_at else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "params": state.params,
+            "fingerprint": state.fingerprint,
+            "ttl_seconds": self.ttl_seconds,
+            "market_bound": self.market_bound,
+            "stale": self.is_stale(),
+            "retry_queue": {
+                key: {"reason": e["reason"], "attempts": e["attempts"],
+                      "next_retry_at": datetime.fromtimestamp(e["next_retry_at"], TZ).isoformat(timespec='seconds')
+                      if e["next_retry_at"] else None}
+                for key, e in list(self._retry.items())
+            }
+        }
@@ -1,68 +1,99 @@
-def calculate_thai_income_tax(net_income: float) -> float:
+import numpy as np
+
+# อัตราภาษีปีปัจจุบัน (เงินได้สุทธิ, อัตราภาษี)
+TAX_BRACKETS = [
+    (150000, 0.00),   # 0 - 150,000 ยกเว้น
+    (300000, 0.05),   # 150,001 - 300,000 ร้อยละ 5
+    (500000, 0.10),   # 300,001 - 500,000 ร้อยละ 10
+    (750000, 0.15),
+    (1000000, 0.20),
+    (2000000, 0.25),
+    (5000000, 0.30),
+    (float('inf'), 0.35)
+]
+
+WITHHOLDING_RATE = 0.10
+
+# ตารางขั้นบันไดแบบ Vector: ขอบล่างของแต่ละขั้น + ภาษีสะสมที่ขอบล่าง
+_BRACKET_LOWER = np.array([0.0] + [limit for limit, _ in TAX_BRACKETS[:-1]])
+_BRACKET_RATES = np.array([rate for _, rate in TAX_BRACKETS])
+_BRACKET_BASE_TAX = np.concatenate(([0.0], np.cumsum(np.diff(_BRACKET_LOWER) * _BRACKET_RATES[:-1])))
+
+
+def calculate_thai_income_tax(net_income):
     """
     ฟังก์ชันช่วยคำนวณภาษีเงินได้บุคคลธรรมดา (แบบขั้นบันได)
+    รับได้ทั้ง float และ array — หาขั้นด้วย np.searchsorted แล้วใช้ภาษีสะสมของขั้นนั้น
     """
-    # อัตราภาษีปีปัจจุบัน (เงินได้สุทธิ, อัตราภาษี)
-    tax_brackets = [
-        (150000, 0.00),   # 0 - 150,000 ยกเว้น
-        (300000, 0.05),   # 150,001 - 300,000 ร้อยละ 5
-        (500000, 0.10),   # 300,001 - 500,000 ร้อยละ 10
-        (750000, 0.15),
-        (1000000, 0.20),
-        (2000000, 0.25),
-        (5000000, 0.30),
-        (float('inf'), 0.35)
-    ]
-    
-    tax = 0.0
-    previous_limit = 0.0
-    
-    for limit, rate in tax_brackets:
-        if net_income > previous_limit:
-            # คำนวณยอดเงินที่ตกอยู่ในช่วงนี้
-            taxable_amount = min(net_income, limit) - previous_limit
-            tax += taxable_amount * rate
-            previous_limit = limit
-        else:
-            break
-            
-    return tax
-
-def optimize_dividend_tax(base_net_income: float, dividend_amount: float, corporate_tax_rate: float):
+    income = np.maximum(np.asarray(net_income, dtype=float), 0.0)
+    idx = np.searchsorted(_BRACKET_LOWER, income, side='right') - 1
+    tax = _BRACKET_BASE_TAX[idx] + (income - _BRACKET_LOWER[idx]) * _BRACKET_RATES[idx]
+    return float(tax) if tax.ndim == 0 else tax
+
+
+def compare_dividend_tax_options(base_net_income, dividend_amount, corporate_tax_rate):
     """
-    Logic: คำนวณเปรียบเทียบ Final Tax vs เครดิตภาษีเงินปันผล
+    Vectorized core: คำนวณ Option 1 (Final Tax) vs Option 2 (เครดิตภาษี) สำหรับ array ของโปรไฟล์
+    Inputs broadcast กันได้ (เช่น รายได้เป็น array, ปันผล/CIT เป็นค่าเดียว)
+    คืนค่าเป็น dict ของ numpy arrays
     """
-    
+    base, dividend, cit = np.broadcast_arrays(
+        np.asarray(base_net_income, dtype=float),
+        np.asarray(dividend_amount, dtype=float),
+        np.asarray(corporate_tax_rate, dtype=float)
+    )
+
+    res = compare_tax_with_credit(base, dividend, dividend * tax_credit_ratio(cit))
+    return {"base_income": base, "dividend": dividend, "cit_rate": cit, **res}
+
+
+def tax_credit_ratio(corporate_tax_rate):
+    """สูตรเครดิตภาษี = ปันผล * (อัตราภาษี / (100 - อัตราภาษี)) — คืนเฉพาะส่วน ratio (vectorized)"""
+    cit = np.asarray(corporate_tax_rate, dtype=float)
+    return np.divide(cit, 100 - cit, out=np.zeros_like(cit), where=(cit > 0) & (cit < 100))
+
+
+def compare_tax_with_credit(base_net_income, dividend_amount, tax_credit_amount):
+    """
+    Net wealth ของทั้ง 2 ทางเลือก เมื่อรู้ยอดปันผลรวมและเครดิตภาษีรวมแล้ว (vectorized)
+    ใช้ร่วมกันระหว่างรายหุ้น (compare_dividend_tax_options) และทั้งพอร์ต (tax_planner)
+    """
+    base = np.asarray(base_net_income, dtype=float)
+    dividend = np.asarray(dividend_amount, dtype=float)
+    credit = np.asarray(tax_credit_amount, dtype=float)
+
     # --- Option 1: Final Tax (หัก ณ ที่จ่าย 10% จบเลย) ---
-    withholding_tax = dividend_amount * 0.10
-    net_dividend_received = dividend_amount - withholding_tax
-    
-    # คำนวณภาษีจากรายได้ปกติ (ไม่รวมปันผล)
-    tax_normal = calculate_thai_income_tax(base_net_income)
-    
-    # ความมั่งคั่งสุทธิ (รายได้ปกติหลังภาษี + ปันผลหลังหัก ณ ที่จ่าย)
-    wealth_option1 = (base_net_income - tax_normal) + net_dividend_received
+    net_dividend_received = dividend * (1 - WITHHOLDING_RATE)
+    tax_normal = calculate_thai_income_tax(base)
+    wealth_option1 = (base - tax_normal) + net_dividend_received
 
     # --- Option 2: ยื่นภาษี (ใช้สิทธิเครดิตภาษี) ---
-    if corporate_tax_rate > 0:
-        # สูตรเครดิตภาษี = ปันผล * (อัตราภาษี / (100 - อัตราภาษี))
-        tax_credit_ratio = corporate_tax_rate / (100 - corporate_tax_rate)
-        tax_credit_val = dividend_amount * tax_credit_ratio
-    else:
-        tax_credit_val = 0 
-
     # รายได้รวมเพื่อคำนวณภาษี = รายได้ปกติ + ปันผล + เครดิตภาษี
-    gross_dividend = dividend_amount + tax_credit_val
-    total_assessable_income = base_net_income + gross_dividend
-    
-    total_tax_liability = calculate_thai_income_tax(total_assessable_income)
-    
-    # ความมั่งคั่งสุทธิ = รายได้รวมทั้งหมด - ภาษีที่ต้องจ่ายจริง
-    wealth_option2 = total_assessable_income - total_tax_liability
+    total_assessable_income = base + dividend + credit
+    wealth_option2 = total_assessable_income - calculate_thai_income_tax(total_assessable_income)
+
+    return {
+        "option1_net_wealth": wealth_option1,
+        "option2_net_wealth": wealth_option2,
+        "tax_credit_amount": np.broadcast_to(credit, np.shape(wealth_option2)),
+        "difference": wealth_option2 - wealth_option1
+    }
+
+
+def optimize_dividend_tax(base_net_income, dividend_amount, corporate_tax_rate):
+    """
+    Logic: คำนวณเปรียบเทียบ Final Tax vs เครดิตภาษีเงินปันผล
+    - Input เป็น float: คืน dict รายคน (รูปแบบเดิม)
+    - Input เป็น list/array: คืนผลแบบ Columnar (list ต่อ field) สำหรับ Batch
+    """
+    res = compare_dividend_tax_options(base_net_income, dividend_amount, corporate_tax_rate)
 
-    # --- เปรียบเทียบ ---
-    diff = wealth_option2 - wealth_option1
+    if res["difference"].ndim > 0:
+        columns = {k: np.round(v, 2).tolist() for k, v in res.items()}
+        columns["should_claim"] = (res["difference"] > 0).tolist()
+        return columns
 
+    diff = float(res["difference"])
     return {
         "input": {
             "base_income": base_net_income,
@@ -71,15 +102,39 @@ def optimize_dividend_tax(base_net_income: float, dividend_amount: float, corpor
         },
         "option1_final_tax": {
             "description": "Withholding Tax 10%",
-            "net_wealth": round(wealth_option1, 2)
+            "net_wealth": round(float(res["option1_net_wealth"]), 2)
         },
         "option2_credit_tax": {
             "description": "Tax Credit Claim",
-            "net_wealth": round(wealth_option2, 2),
-            "tax_credit_amount": round(tax_credit_val, 2)
+            "net_wealth": round(float(res["option2_net_wealth"]), 2),
+            "tax_credit_amount": round(float(res["tax_credit_amount"]), 2)
         },
         "analysis": {
             "difference": round(diff, 2),
             "recommendation": "✅ Should Claim Credit (ยื่นภาษี)" if diff > 0 else "❌ Final Tax (ไม่ต้องยื่น)"
         }
-    }
\ No newline at end of file
+    }
+
+
+def tax_crossover_curve(income_min: float, income_max: float, steps: int,
+                        dividend_amount: float, corporate_tax_rate: float):
+    """
+    เส้นกราฟ Option 1 vs Option 2 ตามช่วงรายได้ + จุดที่เลิกคุ้มยื่นภาษี (Crossover)
+    """
+    incomes = np.linspace(income_min, income_max, steps)
+    res = compare_dividend_tax_options(incomes, dividend_amount, corporate_tax_rate)
+    claim = res["difference"] > 0
+
+    # รายได้แรกที่ผลการตัดสินใจเปลี่ยน (ถ้ามี)
+    flips = np.flatnonzero(claim[1:] != claim[:-1])
+    crossover = round(float(incomes[flips[0] + 1]), 2) if len(flips) else None
+
+    return {
+        "crossover_income": crossover,
+        "curve": {
+            "base_income": np.round(incomes, 2).tolist(),
+            "option1_net_wealth": np.round(res["option1_net_wealth"], 2).tolist(),
+            "option2_net_wealth": np.round(res["option2_net_wealth"], 2).tolist(),
+            "difference": np.round(res["difference"], 2).tolist()
+        }
+    }
@@ -1,3 +1,5 @@
+import os
+
 # --- Base Tickers
 SET50_TICKERS_BASE = [
     "ADVANC", "AOT", "AWC", "BANPU", "BBL", "BDMS", "BEM", "BGRIM", "BH", "BJC",
@@ -11,4 +13,45 @@ SET50_TICKERS = [f"{ticker}.BK" for ticker in SET50_TICKERS_BASE if ticker != "D
 # --- Helper Function ---
 def get_tickers(suffix=".BK"):
 
-    return [f"{ticker}{suffix}" for ticker in SET50_TICKERS_BASE]
\ No newline at end of file
+    return [f"{ticker}{suffix}" for ticker in SET50_TICKERS_BASE]
+
+# --- Market Data Source ---
+# yfinance (default) | replay (fixture files) | synthetic (generated, deterministic)
+DATA_SOURCE = os.getenv("STOCK_DATA_SOURCE", "yfinance")
+FIXTURES_DIR = os.getenv("STOCK_FIXTURES_DIR", "benchmarks/fixtures")
+SYNTHETIC_SEED = int(os.getenv("STOCK_SYNTHETIC_SEED", "42"))
+# ราคาดิบ + Adjustment factors ต่อ ticker (PriceStore) ถือว่าใช้ได้ภายในช่วงเวลานี้ (วินาที)
+PRICE_STORE_TTL_SECONDS = int(os.getenv("STOCK_PRICE_STORE_TTL", str(30 * 60)))
+# ราคาระหว่างวัน (5m / 1h ...) เก็บแบบ LRU ต่อ (ticker, interval) -> จำกัด memory ของ minute data
+INTRADAY_CACHE_SIZE = int(os.getenv("STOCK_INTRADAY_CACHE_SIZE", "64"))
+INTRADAY_TTL_SECONDS = int(os.getenv("STOCK_INTRADAY_TTL", str(5 * 60)))
+
+# --- SET Trading Hours (Asia/Bangkok, จันทร์-ศุกร์; ยังไม่รวมวันหยุดตลาด) ---
+MARKET_TZ = "Asia/Bangkok"
+SET_SESSIONS = [("10:00", "12:30"), ("14:30", "16:30")]
+
+# --- Cache TTL (วินาที) ต่อประเภท Cache ---
+# market_bound=True: ระหว่างตลาดเปิดใช้ TTL, หลังตลาดปิดถือว่า stale จนกว่าจะคำนวณด้วยราคาปิดล่าสุด
+CACHE_TTL = {
+    "scoring":     {"ttl": 24 * 3600, "market_bound": False},
+    "tdts":        {"ttl": 24 * 3600, "market_bound": False},
+    "tema":        {"ttl": 24 * 3600, "market_bound": False},
+    "technical":   {"ttl": 30 * 60,   "market_bound": True},
+    "seasonality": {"ttl": 24 * 3600, "market_bound": False},
+    "ggm":         {"ttl": 30 * 60,   "market_bound": True},
+    "ggm_mc":      {"ttl": 2 * 3600,  "market_bound": True},
+}
+
+# --- Startup ---
+# 1 = import analytics modules (pandas / sklearn / scipy) ใน background thread ทันทีหลัง start
+# 0 = โหลดตอน endpoint ถูกเรียกครั้งแรก (request แรกช้ากว่า)
+PRELOAD_ANALYTICS = os.getenv("STOCK_PRELOAD", "1") == "1"
+
+# --- Correlation / Covariance (ผลตอบแทนรายวัน, rolling window เป็นจำนวนวันทำการ) ---
+CORRELATION_WINDOW = int(os.getenv("STOCK_CORRELATION_WINDOW", "120"))
+CORRELATION_MIN_PERIODS = int(os.getenv("STOCK_CORRELATION_MIN_PERIODS", "60"))
+
+# --- Auto Refresh Scheduler ---
+AUTO_REFRESH = os.getenv("STOCK_AUTO_REFRESH", "1") == "1"
+REFRESH_POLL_SECONDS = int(os.getenv("STOCK_REFRESH_POLL_SECONDS", "60"))
+REFRESH_STAGGER_SECONDS = int(os.getenv("STOCK_REFRESH_STAGGER_SECONDS", "120"))
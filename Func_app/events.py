@@ -0,0 +1,162 @@
+import json
+import asyncio
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set
+from Func_app.cache import VersionedCache
+from Func_app.metrics import METRICS
+from Func_app.records import to_plain
+
+# Event ที่ค้างใน queue ของผู้ฟังได้สูงสุดเท่านี้ (client ช้า -> ทิ้ง event แล้วส่ง 'resync' ให้ไปดึงใหม่)
+MAX_QUEUE_EVENTS = 1000
+
+
+def diff_value(old: Any, new: Any) -> Dict:
+    """
+    Diff ของค่าใน Cache หนึ่งหุ้น (ส่งเฉพาะส่วนที่เปลี่ยน แทน snapshot ทั้งก้อน)
+    - ไม่มีค่าเดิม: set / ถูกลบ: delete
+    - Columnar time series (มี 'Date'): tail — แถวตั้งแต่วันสุดท้ายของค่าเดิม (แถวนั้นอาจถูกแก้ระหว่างวัน)
+    - dict / Record: patch — เฉพาะ field ที่เปลี่ยน + field ที่หายไป (Record แปลงเป็น dict ตรงนี้ = ขอบของ SSE)
+    """
+    old, new = to_plain(old), to_plain(new)
+    if old is None:
+        return {"op": "set", "value": new}
+    if new is None:
+        return {"op": "delete"}
+    if isinstance(old, dict) and isinstance(new, dict):
+        if isinstance(new.get("Date"), list):
+            old_dates = old.get("Date") or []
+            start = bisect_left(new["Date"], old_dates[-1]) if old_dates else 0
+            return {"op": "tail", "columns": {k: v[start:] for k, v in new.items()}}
+        return {
+            "op": "patch",
+            "changed": {k: v for k, v in new.items() if old.get(k) != v},
+            "removed": [k for k in old if k not in new]
+        }
+    return {"op": "set", "value": new}
+
+
+class Subscriber:
+    """ผู้ฟังหนึ่งราย (หนึ่ง SSE connection) ผูกกับ event loop ที่สร้างมัน"""
+    __slots__ = ("loop", "queue", "symbols", "caches", "overflowed")
+
+    def __init__(self, loop, symbols: Optional[Set[str]], caches: Optional[Set[str]], max_events: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_events)
+        self.symbols = symbols
+        self.caches = caches
+        self.overflowed = False
+
+    def wants(self, cache: str, symbol: Optional[str] = None) -> bool:
+        if self.caches is not None and cache not in self.caches:
+            return False
+        return symbol is None or self.symbols is None or symbol in self.symbols
+
+    def push(self, event: Dict):
+        # รันใน event loop ของ subscriber เท่านั้น (ผ่าน call_soon_threadsafe)
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            METRICS.inc("cache_events_dropped_total")
+
+
+class CacheEventBus:
+    """
+    กระจายการเปลี่ยนแปลงของ VersionedCache ไปยังผู้ฟัง (SSE)
+    - ผู้เขียน Cache อยู่ใน thread ของ Background task / Scheduler -> ส่งเข้า event loop ด้วย call_soon_threadsafe
+    - ไม่มีผู้ฟัง = ไม่คำนวณ diff เลย (ไม่มี overhead ตอน refresh)
+    """
+
+    def __init__(self, max_events: int = MAX_QUEUE_EVENTS):
+        self.max_events = max_events
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def watch(self, cache: VersionedCache):
+        cache.add_listener(self._on_change)
+
+    def subscribe(self, symbols: Optional[List[str]] = None, caches: Optional[List[str]] = None) -> Subscriber:
+        """ต้องเรียกจากใน event loop (เช่น async endpoint)"""
+        sub = Subscriber(
+            asyncio.get_running_loop(),
+            {s.upper().replace('.BK', '') for s in symbols} if symbols else None,
+            set(caches) if caches else None,
+            self.max_events
+        )
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _deliver(self, sub: Subscriber, event: Dict):
+        try:
+            sub.loop.call_soon_threadsafe(sub.push, event)
+        except RuntimeError:
+            # loop ปิดไปแล้ว (client หลุด) 
+            self.unsubscribe(sub)
+
+    def _on_change(self, cache: VersionedCache, kind: str, keys, old_data: Dict, new_data: Dict, version: int):
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.wants(cache.name)]
+        if not subscribers:
+            return
+
+        base = {"cache": cache.name, "version": version}
+        if kind == "refreshed":
+            computed_at = cache.computed_at
+            event = {"type": "refreshed", **base,
+                     "computed_at": computed_at.isoformat(timespec='seconds') if computed_at else None}
+            for sub in subscribers:
+                self._deliver(sub, event)
+            return
+
+        for key in (keys if keys is not None else set(old_data) | set(new_data)):
+            targets = [s for s in subscribers if s.wants(cache.name, key)]
+            if not targets:
+                continue
+            old, new = old_data.get(key), new_data.get(key)
+            if old == new:
+                continue
+            event = {"type": "update", **base, "symbol": key, "diff": diff_value(old, new)}
+            for sub in targets:
+                self._deliver(sub, event)
+
+
+async def stream_events(sub: Subscriber, is_disconnected, heartbeat_seconds: float = 15.0):
+    """Async generator ของ SSE frames + heartbeat (กัน proxy ตัด connection) จนกว่า client จะหลุด"""
+    yield "retry: 5000\n\n"
+    while True:
+        if sub.overflowed and sub.queue.empty():
+            # client ตามไม่ทัน: event บางส่วนหายไป -> บอกให้ดึง snapshot ใหม่ (เช่น /bulk_query)
+            sub.overflowed = False
+            yield format_sse({"type": "resync"})
+        try:
+            event = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat_seconds)
+        except asyncio.TimeoutError:
+            if await is_disconnected():
+                return
+            yield ": keep-alive\n\n"
+            continue
+        yield format_sse(event)
+
+
+def format_sse(event: Dict) -> str:
+    """Event -> SSE frame (id = cache:version ให้ client รู้ว่าถึง version ไหนแล้ว)"""
+    if event.get("type") == "resync":
+        return "event: resync\ndata: {}\n\n"
+    payload = json.dumps(event, default=str, separators=(",", ":"))
+    return f"id: {event['cache']}:{event['version']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+CACHE_EVENTS = CacheEventBus()
+METRICS.describe("cache_events_dropped_total", "Cache events dropped because a stream client fell behind")
@@ -0,0 +1,245 @@
+# Func_app/export.py
+import io
+import csv
+import json
+import math
+import zipfile
+from itertools import islice, repeat
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+from Func_app.records import Record, TdtsEvent, TemaEvent
+
+# ==========================================
+# Research Export: stream ทั้ง Cache เป็น NDJSON / CSV / Parquet ทีละ chunk
+# - อ่านจาก snapshot ของ Cache (version เดียวทั้งไฟล์ ไม่ copy) -> memory ต่อ request = แค่ 1 chunk
+# - หลาย dataset ใน request เดียว: NDJSON = ทุกแถวมี "Dataset" / CSV, Parquet = ZIP (1 ไฟล์ต่อ dataset)
+# ==========================================
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "zip": "application/zip",
+}
+CHUNK_ROWS = 5000
+
+
+class Dataset:
+    """ตารางหนึ่งชุด: ชื่อคอลัมน์ + type (str / int / float / bool / json) + ฟังก์ชันสร้าง iterator ของแถว (tuple)"""
+    __slots__ = ("name", "columns", "types", "rows")
+
+    def __init__(self, name: str, columns: List[str], types: List[str], rows: Callable[[], Iterator[tuple]]):
+        self.name = name
+        self.columns = columns
+        self.types = types
+        self.rows = rows
+
+
+def _symbols(snapshot: Mapping, symbols: Optional[List[str]]) -> List[str]:
+    return sorted(s for s in snapshot if not symbols or s in symbols)
+
+
+def event_dataset(name: str, snapshot: Mapping[str, List[Record]], cls, types: List[str],
+                  symbols: Optional[List[str]] = None) -> Dataset:
+    """T-DTS / TEMA events (ทุกหุ้นต่อกัน) + Outlier flag ที่คำนวณไว้ตอน Batch"""
+    attrs = [attr for _, attr in cls.FIELDS] + ["outlier"]
+
+    def rows():
+        for symbol in _symbols(snapshot, symbols):
+            for event in snapshot[symbol]:
+                yield tuple(getattr(event, a) for a in attrs)
+
+    return Dataset(name, [key for key, _ in cls.FIELDS] + ["Outlier"], types + ["bool"], rows)
+
+
+def technical_dataset(snapshot: Mapping[str, Dict[str, list]], symbols: Optional[List[str]] = None) -> Dataset:
+    """Columnar ต่อหุ้นใน Technical Cache -> แถวละ (Symbol, Date, ค่าทุก field) — Momentum ไม่เก็บ (ดูเครื่องหมาย Hist)"""
+    keys = _symbols(snapshot, symbols)
+    fields: List[str] = []
+    for symbol in keys:
+        fields += [f for f in snapshot[symbol] if f != 'Date' and f not in fields]
+
+    def rows():
+        for symbol in keys:
+            columns = snapshot[symbol]
+            values = [columns.get(f) or repeat(None) for f in fields]
+            for row in zip(columns['Date'], *values):
+                yield (symbol,) + row
+
+    return Dataset("technical", ["Symbol", "Date"] + fields, ["str", "str"] + ["float"] * len(fields), rows)
+
+
+def record_dataset(name: str, snapshot: Mapping[str, Record], types: List[str],
+                   symbols: Optional[List[str]] = None) -> Dataset:
+    """Cache ที่เก็บ 1 Record ต่อหุ้น (เช่น GGMResult)"""
+    keys = _symbols(snapshot, symbols)
+    columns = list(snapshot[keys[0]]) if keys else []
+
+    def rows():
+        for symbol in keys:
+            record = snapshot[symbol]
+            yield tuple(getattr(record, attr) for _, attr in record.FIELDS)
+
+    return Dataset(name, columns, types, rows)
+
+
+TDTS_TYPES = ["str", "int", "str", "float", "float", "float", "float", "float", "float"]
+TEMA_TYPES = ["str", "int", "str", "float", "float", "float", "float", "float"]
+GGM_TYPES = ["str", "float", "float", "float", "str", "json"]
+
+
+def build_dataset(name: str, snapshot: Mapping, symbols: Optional[List[str]] = None) -> Dataset:
+    if name == "tdts":
+        return event_dataset(name, snapshot, TdtsEvent, TDTS_TYPES, symbols)
+    if name == "tema":
+        return event_dataset(name, snapshot, TemaEvent, TEMA_TYPES, symbols)
+    if name == "technical":
+        return technical_dataset(snapshot, symbols)
+    if name == "ggm":
+        return record_dataset(name, snapshot, GGM_TYPES, symbols)
+    raise ValueError(f"Unknown dataset '{name}'. Choose one of ['tdts', 'tema', 'technical', 'ggm'].")
+
+# ==========================================
+# Writers: Dataset -> bytes ทีละ chunk (CHUNK_ROWS แถว)
+# ==========================================
+
+def _batches(rows: Iterator[tuple], size: int = CHUNK_ROWS) -> Iterator[List[tuple]]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _plain(value):
+    """NaN / Inf -> None (JSON / CSV ไม่มีค่าเหล่านี้)"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def ndjson_chunks(dataset: Dataset, tag: bool = False) -> Iterator[bytes]:
+    prefix = {"Dataset": dataset.name} if tag else {}
+    for batch in _batches(dataset.rows()):
+        lines = [json.dumps({**prefix, **dict(zip(dataset.columns, map(_plain, row)))}, ensure_ascii=False, default=str)
+                 for row in batch]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _cell(value, kind: str):
+    value = _plain(value)
+    if kind == "json" and value is not None:
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def csv_chunks(dataset: Dataset) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(dataset.columns)
+    for batch in _batches(dataset.rows()):
+        writer.writerows([_cell(v, t) for v, t in zip(row, dataset.types)] for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ByteSink(io.RawIOBase):
+    """
+    ปลายทางที่ผู้เขียน (ParquetWriter / ZipFile) เขียนต่อเนื่องไปเรื่อย ๆ แล้ว drain() ออกไปเป็น chunk
+    - tell() = จำนวน byte ที่เขียนไปทั้งหมด (offset ใน footer ของ Parquet / ZIP ถูกต้อง)
+    - seek ไม่ได้ -> ZipFile ใช้ data descriptor แทนการย้อนกลับไปแก้ header
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("format=parquet requires the 'pyarrow' package")
+    return pa, pq
+
+
+def check_format(fmt: str):
+    """ตรวจก่อนเริ่ม stream (หลังส่ง header แล้วเปลี่ยน status code ไม่ได้)"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose one of {list(EXPORT_FORMATS)}.")
+    if fmt == "parquet":
+        _pyarrow()
+
+
+def parquet_chunks(dataset: Dataset) -> Iterator[bytes]:
+    """1 chunk = 1 row group (schema กำหนดจาก Dataset.types -> ทุก row group ชนิดเดียวกัน)"""
+    pa, pq = _pyarrow()
+    arrow_types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "json": pa.string()}
+    schema = pa.schema([(c, arrow_types[t]) for c, t in zip(dataset.columns, dataset.types)])
+    sink = _ByteSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in _batches(dataset.rows()):
+            columns = [[_cell(v, t) if t == "json" else v for v in values]
+                       for values, t in zip(zip(*batch), dataset.types)]
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                                    schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+WRITERS: Dict[str, Callable[[Dataset], Iterator[bytes]]] = {
+    "ndjson": ndjson_chunks, "csv": csv_chunks, "parquet": parquet_chunks,
+}
+
+
+def _non_empty(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    return (chunk for chunk in chunks if chunk)
+
+
+def stream_dataset(dataset: Dataset, fmt: str) -> Tuple[Iterator[bytes], str, str]:
+    """คืน (iterator ของ bytes, media type, ชื่อไฟล์)"""
+    return _non_empty(WRITERS[fmt](dataset)), EXPORT_MEDIA_TYPES[fmt], f"{dataset.name}.{fmt}"
+
+
+def _zip_chunks(datasets: List[Dataset], fmt: str) -> Iterator[bytes]:
+    sink = _ByteSink()
+    # Parquet บีบอัดในตัวแล้ว -> ZIP แค่รวมไฟล์ / CSV -> deflate
+    compression = zipfile.ZIP_STORED if fmt == "parquet" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+        for dataset in datasets:
+            with archive.open(f"{dataset.name}.{fmt}", "w", force_zip64=True) as entry:
+                for chunk in WRITERS[fmt](dataset):
+                    entry.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_datasets(datasets: List[Dataset], fmt: str, name: str = "research") -> Tuple[Iterator[bytes], str, str]:
+    """หลาย dataset ใน response เดียว: NDJSON ต่อกัน (มีคอลัมน์ Dataset) / CSV, Parquet เป็น ZIP"""
+    if fmt == "ndjson":
+        chunks = (chunk for dataset in datasets for chunk in ndjson_chunks(dataset, tag=True))
+        return _non_empty(chunks), EXPORT_MEDIA_TYPES["ndjson"], f"{name}.ndjson"
+    return _non_empty(_zip_chunks(datasets, fmt)), EXPORT_MEDIA_TYPES["zip"], f"{name}_{fmt}.zip"
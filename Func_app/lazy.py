@@ -0,0 +1,130 @@
+import sys
+import time
+import importlib
+import threading
+from typing import Dict, List, Optional
+
+from Func_app.metrics import METRICS
+
+# Modules ที่ import แล้วลาก pandas / numpy / scikit-learn / scipy ตามมา (~2 วินาทีตอน cold start)
+# เรียงตามลำดับที่ endpoint ใช้บ่อย -> preload thread โหลดตัวที่ใช้บ่อยก่อน
+HEAVY_MODULES = [
+    "Func_app.DataSource.data_source",
+    "Func_app.DataSource.quote_snapshot",
+    "Func_app.DataSource.intervals",
+    "Func_app.DataSource.price_store",
+    "Func_app.TA.technical_analysis",
+    "Func_app.Scoring.score_history",
+    "Func_app.Scoring.outliers",
+    "Func_app.Scoring.tdts_scoring",
+    "Func_app.Scoring.tema_scoring",
+    "Func_app.Scoring.main_scoring",
+    "Func_app.Predictor.predictor_XD",
+    "Func_app.GGM.ggm_cal",
+    "Func_app.GGM.ggm_monte_carlo",
+    "Func_app.Portfolio.correlation",
+    "Func_app.Portfolio.optimizer",
+    "Func_app.calculate_text",
+    "Func_app.tax_planner",
+]
+
+METRICS.describe("module_import_seconds", "Time spent importing analytics modules (lazy or preload)")
+
+_LOADED: Dict[str, float] = {}
+_PRELOAD = {"state": "idle", "started_at": None, "seconds": None, "error": None}
+
+
+def load_module(name: str):
+    """import module (ครั้งแรกเท่านั้นที่เสียเวลา) + บันทึกเวลาที่ใช้ import"""
+    if name in _LOADED:
+        return sys.modules[name]
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    if name not in _LOADED:
+        _LOADED[name] = round(time.perf_counter() - t0, 4)
+        METRICS.observe("module_import_seconds", _LOADED[name], module=name)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    return name in _LOADED
+
+
+class LazyAttr:
+    """
+    ตัวแทนของ `from <module> import <attr>` ที่ import จริงตอนใช้ครั้งแรก
+    - เรียกเป็นฟังก์ชันได้, อ่าน attribute ได้, ใช้ len / in / for ได้ (สำหรับ object เช่น SCORE_HISTORY, INDICATORS)
+    - .loaded: True เมื่อ module ถูก import แล้ว -> ใช้ใน Health Check ที่ต้องไม่บังคับ import
+    """
+    __slots__ = ("module", "attr", "_target")
+
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = getattr(load_module(self.module), self.attr)
+        return self._target
+
+    @property
+    def loaded(self) -> bool:
+        return is_loaded(self.module)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __contains__(self, item):
+        return item in self.resolve()
+
+    def __repr__(self):
+        return f"<lazy {self.module}.{self.attr} loaded={self.loaded}>"
+
+
+def lazy(module: str, *attrs: str):
+    """lazy('Func_app.GGM.ggm_cal', 'analyze_ggm_batch') -> LazyAttr (หลายชื่อ -> tuple)"""
+    refs = tuple(LazyAttr(module, attr) for attr in attrs)
+    return refs[0] if len(refs) == 1 else refs
+
+# ==========================================
+# Background Preload (หลัง Server เริ่มรับ request)
+# ==========================================
+
+def _preload_worker(modules: List[str]):
+    t0 = time.perf_counter()
+    try:
+        for name in modules:
+            load_module(name)
+        _PRELOAD["state"] = "done"
+    except Exception as e:
+        # ไม่ให้ thread ล้ม: endpoint ที่ใช้ module นั้นจะ import (และแจ้ง error) เองตอนถูกเรียก
+        _PRELOAD["state"] = "failed"
+        _PRELOAD["error"] = f"{name}: {e}"
+        print(f"⚠️ Preload failed at {name}: {e}")
+    _PRELOAD["seconds"] = round(time.perf_counter() - t0, 3)
+
+
+def preload_modules(modules: Optional[List[str]] = None) -> Optional[threading.Thread]:
+    """เริ่ม daemon thread ที่ import analytics modules ล่วงหน้า (เรียกซ้ำได้, เริ่มแค่ครั้งเดียว)"""
+    if _PRELOAD["state"] != "idle":
+        return None
+    _PRELOAD["state"] = "running"
+    _PRELOAD["started_at"] = time.time()
+    thread = threading.Thread(target=_preload_worker, args=(list(modules or HEAVY_MODULES),),
+                              name="analytics-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def preload_status() -> Dict:
+    return {**_PRELOAD, "loaded": dict(_LOADED)}
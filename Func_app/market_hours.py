@@ -0,0 +1,49 @@
+from datetime import datetime, date, time as dtime, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from Func_app.config import MARKET_TZ, SET_SESSIONS
+
+TZ = ZoneInfo(MARKET_TZ)
+
+# ราคาปิดจาก Data vendor มักมาช้ากว่าเวลาปิดจริงเล็กน้อย
+CLOSE_SETTLE_MINUTES = 30
+
+
+def market_now() -> datetime:
+    return datetime.now(TZ)
+
+
+def _as_market_time(now: Optional[datetime]) -> datetime:
+    if now is None:
+        return market_now()
+    return now.astimezone(TZ) if now.tzinfo else now.replace(tzinfo=TZ)
+
+
+def sessions_on(day: date) -> List[Tuple[datetime, datetime]]:
+    """ช่วงเวลาซื้อขายของวันนั้น (เสาร์-อาทิตย์ = ไม่มี)"""
+    if day.weekday() >= 5:
+        return []
+    return [
+        (datetime.combine(day, dtime.fromisoformat(start), TZ), datetime.combine(day, dtime.fromisoformat(end), TZ))
+        for start, end in SET_SESSIONS
+    ]
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    now = _as_market_time(now)
+    return any(start <= now < end for start, end in sessions_on(now.date()))
+
+
+def last_settled_close(now: Optional[datetime] = None, settle_minutes: int = CLOSE_SETTLE_MINUTES) -> Optional[datetime]:
+    """
+    เวลาปิด Session ล่าสุด (+ settle) ที่ผ่านมาแล้ว — รวมพักเที่ยง
+    ข้อมูลที่คำนวณก่อนเวลานี้ยังไม่เห็นราคาปิดรอบล่าสุด
+    """
+    now = _as_market_time(now)
+    settle = timedelta(minutes=settle_minutes)
+    for days_back in range(8):
+        day = now.date() - timedelta(days=days_back)
+        closes = [end + settle for _, end in sessions_on(day) if end + settle <= now]
+        if closes:
+            return max(closes)
+    return None
@@ -0,0 +1,132 @@
+import time
+import bisect
+import threading
+import contextlib
+from typing import Dict, Tuple
+
+# Buckets (วินาที) — ครอบคลุมตั้งแต่ cache lookup (~ms) จนถึง batch ทั้ง Universe (~นาที)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """
+    Counters + Histograms แบบ in-process (ไม่มี dependency เพิ่ม) และ export เป็น Prometheus text format
+    - overhead ต่อการบันทึก = lock 1 ครั้ง + bisect บน bucket ~15 ช่อง
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # [count ต่อ bucket..., +Inf, sum]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[idx] += 1
+            state[-1] += value
+
+    @contextlib.contextmanager
+    def span(self, module: str, stage: str):
+        """จับเวลา 1 ช่วงงาน (fetch / compute / serialize) -> stage_duration_seconds{module,stage}"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - t0, module=module, stage=stage)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "counters": {n: dict(s) for n, s in self._counters.items()},
+                "histograms": {n: {k: list(v) for k, v in s.items()} for n, s in self._histograms.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---------- Prometheus Export ----------
+    @staticmethod
+    def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render_prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = []
+        for name, series in sorted(snap["counters"].items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{self._fmt_labels(key)} {value:g}")
+        for name, series in sorted(snap["histograms"].items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, state in series.items():
+                cumulative = 0
+                for le, count in zip(self.buckets + ("+Inf",), state[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._fmt_labels(key, (('le', str(le)),))} {cumulative}")
+                lines.append(f"{name}_sum{self._fmt_labels(key)} {state[-1]:.6f}")
+                lines.append(f"{name}_count{self._fmt_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("stage_duration_seconds", "Duration of fetch/compute/serialize stages in Func_app modules")
+METRICS.describe("ticker_failures_total", "Tickers that failed inside an analyzer")
+METRICS.describe("cache_requests_total", "Cache lookups by result (hit / miss / fallback)")
+METRICS.describe("http_request_duration_seconds", "Endpoint latency")
+
+
+class StageTimer:
+    """
+    จับเวลาแบบ lap: เรียก lap('fetch') หลังดึงข้อมูลเสร็จ, lap('compute') หลังคำนวณเสร็จ ฯลฯ
+    แต่ละ lap = เวลาตั้งแต่ lap ก่อนหน้า (หรือตอนสร้าง) -> ไม่ต้องครอบโค้ดเดิมด้วย with-block
+    """
+    __slots__ = ("module", "_t")
+
+    def __init__(self, module: str):
+        self.module = module
+        self._t = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        METRICS.observe("stage_duration_seconds", now - self._t, module=self.module, stage=stage)
+        self._t = now
+
+
+# Shortcuts ที่ Analyzer ใช้
+span = METRICS.span
+
+
+def count_failure(module: str, reason: str = "error", n: int = 1):
+    METRICS.inc("ticker_failures_total", n, module=module, reason=reason)
@@ -0,0 +1,152 @@
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ==========================================
+# Typed Records (schema เดียวทั้ง Analyzer / Cache / Endpoint)
+# ==========================================
+
+class Record(Mapping):
+    """
+    Base ของผลลัพธ์แบบ typed: __slots__ (ไม่มี __dict__ ต่อแถว -> ใช้ memory ราวครึ่งหนึ่งของ dict)
+    - FIELDS = ((key ภายนอก, attribute), ...) เรียงตามลำดับใน JSON
+    - ภายใน Func_app ใช้ attribute (row.t_dts, row.tag1.est_dividend) ไม่ต้อง rename คอลัมน์ไปมา
+    - ที่ขอบ (FastAPI / SSE) อ่านได้เหมือน dict ด้วย key ภายนอก (row['T-DTS']) -> JSON เหมือนเดิม
+    """
+    __slots__ = ()
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+    OUTLIER_FIELDS: Tuple[str, ...] = ()  # attribute ที่ใช้คัด outlier (Func_app/Scoring/outliers.py)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._ATTR = dict(cls.FIELDS)
+
+    def __init__(self, *values, **named):
+        slots = type(self).__slots__
+        if len(values) > len(slots):
+            raise TypeError(f"{type(self).__name__} takes at most {len(slots)} values")
+        for attr, value in zip(slots, values):
+            setattr(self, attr, value)
+        for attr in slots[len(values):]:
+            setattr(self, attr, named.pop(attr, None))
+        if named:
+            raise TypeError(f"{type(self).__name__} got unexpected fields {sorted(named)}")
+
+    # ---------- Mapping (key ภายนอก) ----------
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, self._ATTR[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return (key for key, _ in self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: to_plain(getattr(self, attr)) for key, attr in self.FIELDS}
+
+    def __repr__(self):
+        body = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr in self.__slots__)
+        return f"{type(self).__name__}({body})"
+
+
+def to_plain(value: Any) -> Any:
+    """Record (หรือ list ของ Record) -> dict สำหรับ json.dumps / JSONResponse; ค่าอื่นคืนตามเดิม"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list) and value and isinstance(value[0], Record):
+        return [row.to_dict() for row in value]
+    return value
+
+
+def records_frame(records: List[Record], cls: Optional[type] = None):
+    """List ของ Record -> DataFrame (คอลัมน์ = attribute) สำหรับ groupby / merge"""
+    import pandas as pd
+    cls = cls or (type(records[0]) if records else None)
+    if cls is None:
+        return pd.DataFrame()
+    return pd.DataFrame([[getattr(r, a) for a in cls.__slots__] for r in records], columns=list(cls.__slots__))
+
+
+def from_frame(cls, df) -> List[Record]:
+    """DataFrame (คอลัมน์ = attribute) -> List ของ Record (ค่าเป็น Python native)"""
+    attrs = [a for a in cls.__slots__ if a in df.columns]
+    return [cls(**dict(zip(attrs, row))) for row in zip(*(df[a].tolist() for a in attrs))]
+
+
+def split_outliers(records: List[Record], mask: Optional[Sequence[bool]] = None) -> Dict[str, List[Record]]:
+    """Raw / Clean / Unclean (ลำดับเดิม) จาก mask ที่ส่งมา หรือ flag ที่คำนวณไว้แล้วใน record.outlier"""
+    flags = mask if mask is not None else [row.outlier for row in records]
+    clean, unclean = [], []
+    for row, flag in zip(records, flags):
+        (unclean if flag else clean).append(row)
+    return {"raw_data": list(records), "clean_data": clean, "unclean_data": unclean}
+
+# ==========================================
+# 1. T-DTS / TEMA (ต่อ XD event)
+# ==========================================
+
+class TdtsEvent(Record):
+    # outlier: flag จาก Func_app/Scoring/outliers.py (คำนวณครั้งเดียวต่อ Batch, ไม่ส่งออกใน JSON)
+    __slots__ = ("stock", "year", "ex_date", "dps", "p_cum", "p_ex", "dy", "pd", "t_dts", "outlier")
+    FIELDS = (("Stock", "stock"), ("Year", "year"), ("Ex_Date", "ex_date"), ("DPS", "dps"),
+              ("P_cum", "p_cum"), ("P_ex", "p_ex"), ("DY (%)", "dy"), ("PD (%)", "pd"), ("T-DTS", "t_dts"))
+    OUTLIER_FIELDS = ("t_dts",)
+
+
+class TemaEvent(Record):
+    __slots__ = ("stock", "year", "ex_date", "dps", "price_close", "price_tema", "ret_bf", "ret_af", "outlier")
+    FIELDS = (("Stock", "stock"), ("Year", "year"), ("Ex_Date", "ex_date"), ("DPS", "dps"),
+              ("Price_Close", "price_close"), ("Price_TEMA", "price_tema"),
+              ("Ret_Bf_TEMA (%)", "ret_bf"), ("Ret_Af_TEMA (%)", "ret_af"))
+    OUTLIER_FIELDS = ("ret_bf", "ret_af")
+
+# ==========================================
+# 2. Scoring & Clustering (ต่อหุ้น)
+# ==========================================
+
+class ScoreRecord(Record):
+    __slots__ = ("stock", "dy", "t_dts", "ret_af", "ret_bf", "cluster", "total_score", "cluster_name")
+    FIELDS = (("Stock", "stock"), ("DY (%)", "dy"), ("T_DTS", "t_dts"), ("Ret_Af_TEMA (%)", "ret_af"),
+              ("Ret_Bf_TEMA (%)", "ret_bf"), ("Cluster", "cluster"), ("Total_Score (%)", "total_score"),
+              ("Cluster_Name", "cluster_name"))
+
+# ==========================================
+# 3. Dividend Seasonality (ต่อหุ้น, Tag1 / Tag2)
+# ==========================================
+
+class SeasonalityTag(Record):
+    """สถิติวัน XD ของปันผลงวดหนึ่ง — ภายนอกเห็นเป็น {"Stats": {...}, "Countdown": {...}}"""
+    __slots__ = ("min_date", "max_date", "avg_date", "data_points",
+                 "next_xd_date", "days_remaining", "est_dividend", "est_pay_date")
+    FIELDS = (("Stats", "stats"), ("Countdown", "countdown"))
+
+    @property
+    def stats(self) -> Dict:
+        return {"Min_Date": self.min_date, "Max_Date": self.max_date,
+                "Avg_Date": self.avg_date, "Data_Points": self.data_points}
+
+    @property
+    def countdown(self) -> Dict:
+        return {"Avg_Date": self.avg_date, "Next_XD_Date": self.next_xd_date, "Days_Remaining": self.days_remaining,
+                "Est_Dividend_Baht": self.est_dividend, "Est_Pay_Date": self.est_pay_date}
+
+
+class SeasonalityRecord(Record):
+    __slots__ = ("symbol", "tag1", "tag2")
+    FIELDS = (("Symbol", "symbol"), ("Tag1", "tag1"), ("Tag2", "tag2"))
+
+    def tags(self) -> List[SeasonalityTag]:
+        """งวดที่มีข้อมูล (จำนวนครั้งที่จ่ายต่อปี)"""
+        return [t for t in (self.tag1, self.tag2) if t is not None]
+
+# ==========================================
+# 4. GGM Valuation (ต่อหุ้น)
+# ==========================================
+
+class GGMResult(Record):
+    __slots__ = ("symbol", "current_price", "target_price", "diff_percent", "meaning", "dividends_flow")
+    FIELDS = (("Symbol", "symbol"), ("Current_Price", "current_price"), ("Target_Price", "target_price"),
+              ("Diff_Percent", "diff_percent"), ("Meaning", "meaning"), ("Dividends_Flow", "dividends_flow"))
@@ -0,0 +1,151 @@
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+from Func_app.config import REFRESH_POLL_SECONDS, REFRESH_STAGGER_SECONDS
+from Func_app.cache import VersionedCache
+from Func_app.market_hours import is_market_open
+from Func_app.metrics import METRICS
+
+# ถ้ารันแล้ว Cache ยัง stale (งานล้มเหลว) รอนานขึ้นก่อนลองใหม่
+FAILURE_BACKOFF_SECONDS = 15 * 60
+
+
+class RefreshJob:
+    __slots__ = ("name", "cache", "fn", "default_params", "lock", "not_before",
+                 "runs", "last_error", "last_duration", "last_finished_at")
+
+    def __init__(self, name: str, cache: VersionedCache, fn: Callable[..., None], default_params: Dict):
+        self.name = name
+        self.cache = cache
+        self.fn = fn
+        self.default_params = default_params
+        self.lock = threading.Lock()
+        self.not_before = 0.0
+        self.runs = 0
+        self.last_error: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.last_finished_at: Optional[float] = None
+
+
+class RefreshScheduler:
+    """
+    Stale-while-revalidate ใน process เดียวกับ API (ไม่ต้องตั้ง cron ยิง POST /update_*)
+    - ทุก poll_seconds ตรวจ Cache ที่ stale (TTL / เวลาเปิด-ปิดตลาด SET) แล้ว refresh ทีละ job
+    - stagger: หลังรันงานหนึ่ง จะรออย่างน้อย stagger_seconds ก่อนเริ่มงานถัดไป -> ไม่ refresh ทุก Cache พร้อมกัน
+    - ระหว่าง refresh ผู้อ่านยังได้ข้อมูลชุดเดิม (VersionedCache.replace สลับทีเดียวตอนเสร็จ)
+    - Job เดียวกันไม่รันซ้อนกัน (ทั้งจาก scheduler และ POST /update_* ที่เรียก run_job)
+    - ถ้าไม่มี Cache ไหน stale จะรันเฉพาะหุ้นที่ถึงกำหนด retry (fn(params, tickers=[...]))
+    """
+
+    def __init__(self, poll_seconds: int = REFRESH_POLL_SECONDS, stagger_seconds: int = REFRESH_STAGGER_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.stagger_seconds = stagger_seconds
+        self._jobs: Dict[str, RefreshJob] = {}
+        self._next_slot = 0.0
+        self._started_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, cache: VersionedCache, fn: Callable[..., None], default_params: Optional[Dict] = None):
+        job = RefreshJob(name, cache, fn, default_params or {})
+        # เลื่อนรอบแรกของแต่ละ job ออกจากกัน (ตอน start ทุก Cache ว่าง = stale พร้อมกันหมด)
+        job.not_before = len(self._jobs) * self.stagger_seconds
+        self._jobs[name] = job
+        return job
+
+    def is_busy(self, name: str) -> bool:
+        """Job กำลังรันอยู่ (POST /update_* ตรวจก่อนรับงาน -> ตอบ 409 แทนการทิ้ง params ใหม่เงียบ ๆ)"""
+        return self._jobs[name].lock.locked()
+
+    def run_job(self, name: str, params: Optional[Dict] = None, tickers: Optional[List[str]] = None) -> bool:
+        """
+        รัน refresh ทันที (ใช้ params ล่าสุดของ Cache ถ้าไม่ระบุ) คืนค่า False ถ้ากำลังรันอยู่แล้ว
+        - tickers: refresh เฉพาะบางตัว (Retry) ไม่นับเป็นรอบเต็ม
+        - fn ล้มเหลว = raise -> เก็บไว้ใน last_error (แสดงใน cache_status / load test)
+        """
+        job = self._jobs[name]
+        if not job.lock.acquire(blocking=False):
+            print(f"⚠️ Refresh '{name}' already running, skipped")
+            return False
+        try:
+            run_params = params if params is not None else (job.cache.params or job.default_params)
+            t0 = time.perf_counter()
+            try:
+                job.fn(dict(run_params), tickers=tickers)
+                job.last_error = None
+            except Exception as e:
+                job.last_error = str(e)
+                print(f"❌ Refresh '{name}' failed: {e}")
+            job.last_duration = time.perf_counter() - t0
+            job.last_finished_at = time.time()
+            job.runs += 1
+            METRICS.observe("stage_duration_seconds", job.last_duration, module="scheduler", stage=name)
+            return True
+        finally:
+            job.lock.release()
+
+    def tick(self) -> Optional[str]:
+        """ตรวจหนึ่งรอบ: refresh job ที่ stale ได้มากสุด 1 job คืนชื่อ job ที่รัน"""
+        now = time.monotonic() - self._started_at
+        if now < self._next_slot:
+            return None
+        for job in self._jobs.values():
+            if now < job.not_before or job.lock.locked() or not job.cache.is_stale():
+                continue
+            self.run_job(job.name)
+            finished = time.monotonic() - self._started_at
+            self._next_slot = finished + self.stagger_seconds
+            if job.cache.is_stale():
+                job.not_before = finished + FAILURE_BACKOFF_SECONDS
+            return job.name
+        for job in self._jobs.values():
+            due = job.cache.due_retries()
+            if not due or job.lock.locked():
+                continue
+            print(f"🔄 Retrying {len(due)} ticker(s) for '{job.name}': {due}")
+            self.run_job(job.name, tickers=due)
+            self._next_slot = time.monotonic() - self._started_at
+            return f"{job.name}:retry"
+        return None
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Refresh scheduler error: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="cache-refresh", daemon=True)
+        self._thread.start()
+        print(f"🔄 Cache refresh scheduler started ({len(self._jobs)} jobs, poll={self.poll_seconds}s, stagger={self.stagger_seconds}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def status(self) -> Dict:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "market_open": is_market_open(),
+            "poll_seconds": self.poll_seconds,
+            "stagger_seconds": self.stagger_seconds,
+            "jobs": {
+                name: {
+                    "busy": job.lock.locked(),
+                    "runs": job.runs,
+                    "last_duration_seconds": round(job.last_duration, 2) if job.last_duration is not None else None,
+                    "last_error": job.last_error,
+                    "cache": job.cache.status()
+                }
+                for name, job in self._jobs.items()
+            }
+        }
+
+
+REFRESH_SCHEDULER = RefreshScheduler()
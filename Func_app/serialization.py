@@ -0,0 +1,35 @@
+from typing import Dict, Tuple
+
+# Binary encodings (optional dependency — ติดตั้งเพิ่มเมื่อต้องการ: pip install msgpack pyarrow)
+BINARY_MEDIA_TYPES = {
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def encode_columns(columns: Dict[str, list], fmt: str) -> Tuple[bytes, str]:
+    """
+    เข้ารหัสข้อมูลแบบ Columnar ({"Date": [...], "RSI": [...]}) เป็น binary
+    - msgpack: dict ของ list ตรง ๆ
+    - arrow: Arrow IPC stream (1 record batch) อ่านได้ด้วย pyarrow / apache-arrow (JS)
+    คืนค่า (payload, media_type) / ValueError ถ้า format ไม่รู้จักหรือยังไม่ได้ติดตั้ง library
+    """
+    if fmt == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError("format=msgpack requires the 'msgpack' package")
+        return msgpack.packb(columns, use_bin_type=True), BINARY_MEDIA_TYPES[fmt]
+
+    if fmt == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("format=arrow requires the 'pyarrow' package")
+        table = pa.table(columns)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), BINARY_MEDIA_TYPES[fmt]
+
+    raise ValueError(f"Unknown format '{fmt}'. Choose one of {list(BINARY_MEDIA_TYPES)}.")
@@ -0,0 +1,241 @@
+import threading
+import numpy as np
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from typing import Hashable, List, Dict, Optional, Tuple
+from Func_app.calculate_text import tax_credit_ratio, compare_tax_with_credit, WITHHOLDING_RATE
+from Func_app.records import GGMResult, SeasonalityRecord
+
+DEFAULT_CIT_RATE = 20.0
+MAX_CALENDAR_MONTHS = 36
+
+
+def projected_dps_from_seasonality(item: Optional[SeasonalityRecord]) -> Optional[float]:
+    """ปันผลต่อหุ้นที่คาดว่าจะได้ใน 12 เดือนข้างหน้า = Est_Dividend_Baht ของ Tag1 + Tag2"""
+    if not item:
+        return None
+    amounts = [tag.est_dividend for tag in item.tags()]
+    return float(sum(amounts)) if amounts else None
+
+
+def projected_dps_from_ggm(item: Optional[GGMResult]) -> Optional[float]:
+    """ปันผลต่อหุ้นย้อนหลัง 12 เดือนล่าสุด (Div(Y-0) จาก GGM) ใช้เป็น Proxy"""
+    if not item or not item.dividends_flow:
+        return None
+    return float(list(item.dividends_flow.values())[-1])
+
+
+def plan_portfolio_dividend_tax(holdings: List[Dict], base_net_income: float,
+                                seasonality_cache: Dict[str, SeasonalityRecord], ggm_cache: Dict[str, GGMResult],
+                                income_levels: Optional[List[float]] = None,
+                                source: str = "seasonality") -> Dict:
+    """
+    วางแผนภาษีปันผลทั้งพอร์ต (ต้องเลือก Final Tax หรือ ยื่นเครดิตภาษี สำหรับปันผลทุกตัวในปีเดียวกัน)
+    - holdings: [{"symbol", "shares", "cit_rate" (optional)}]
+    - source: 'seasonality' (Tag1+Tag2 ที่คาดการณ์) หรือ 'ggm' (Div(Y-0)) — ถ้าไม่มีจะ fallback อีกแหล่ง
+    - income_levels: รายได้ที่ต้องการ sweep (คำนวณแบบ vectorized ทีเดียว)
+    """
+    lookups = {
+        "seasonality": (projected_dps_from_seasonality, seasonality_cache),
+        "ggm": (projected_dps_from_ggm, ggm_cache)
+    }
+    order = [source] + [name for name in lookups if name != source]
+
+    symbols, shares, cit_rates, dps, dps_source = [], [], [], [], []
+    missing = []
+    for h in holdings:
+        key = h['symbol'].upper().replace('.BK', '')
+        value, used = None, None
+        for name in order:
+            fn, cache = lookups[name]
+            value = fn(cache.get(key))
+            if value is not None:
+                used = name
+                break
+        if value is None:
+            missing.append(key)
+            continue
+        symbols.append(key)
+        shares.append(h['shares'])
+        cit = h.get('cit_rate')
+        cit_rates.append(DEFAULT_CIT_RATE if cit is None else cit)
+        dps.append(value)
+        dps_source.append(used)
+
+    shares = np.asarray(shares, dtype=float)
+    cit_rates = np.asarray(cit_rates, dtype=float)
+    gross = np.asarray(dps, dtype=float) * shares
+    credit = gross * tax_credit_ratio(cit_rates)
+    total_gross, total_credit = float(gross.sum()), float(credit.sum())
+
+    # --- ภาษีที่รายได้ฐานของผู้ใช้ ---
+    base = compare_tax_with_credit(base_net_income, total_gross, total_credit)
+    diff = float(base['difference'])
+
+    result = {
+        "holdings": [
+            {
+                "Symbol": s, "Shares": float(sh), "DPS": round(float(d), 4), "DPS_Source": src,
+                "CIT_Rate": float(c), "Gross_Dividend": round(float(g), 2), "Tax_Credit": round(float(cr), 2)
+            }
+            for s, sh, d, src, c, g, cr in zip(symbols, shares, dps, dps_source, cit_rates, gross, credit)
+        ],
+        "missing": missing,
+        "totals": {
+            "gross_dividend": round(total_gross, 2),
+            "tax_credit_amount": round(total_credit, 2),
+            "withholding_tax": round(total_gross * WITHHOLDING_RATE, 2)
+        },
+        "option1_final_tax": {"description": "Withholding Tax 10%", "net_wealth": round(float(base['option1_net_wealth']), 2)},
+        "option2_credit_tax": {"description": "Tax Credit Claim (all holdings)", "net_wealth": round(float(base['option2_net_wealth']), 2)},
+        "analysis": {
+            "difference": round(diff, 2),
+            "recommendation": "✅ Should Claim Credit (ยื่นภาษี)" if diff > 0 else "❌ Final Tax (ไม่ต้องยื่น)"
+        }
+    }
+
+    # --- Scenario Sweep ตามระดับรายได้ ---
+    if income_levels:
+        levels = np.asarray(income_levels, dtype=float)
+        sweep = compare_tax_with_credit(levels, total_gross, total_credit)
+        result["scenarios"] = {
+            "base_income": levels.tolist(),
+            "option1_net_wealth": np.round(sweep['option1_net_wealth'], 2).tolist(),
+            "option2_net_wealth": np.round(sweep['option2_net_wealth'], 2).tolist(),
+            "difference": np.round(sweep['difference'], 2).tolist(),
+            "should_claim": (sweep['difference'] > 0).tolist()
+        }
+
+    return result
+
+
+# ==========================================
+# Dividend Cash-flow Calendar
+# ==========================================
+
+def build_payout_schedule(seasonality_cache: Dict[str, SeasonalityRecord], today: Optional[date] = None,
+                          horizon_months: int = MAX_CALENDAR_MONTHS) -> Dict:
+    """
+    ตารางการจ่ายปันผลล่วงหน้าของทุกหุ้น (1 แถว = 1 ครั้งที่จ่าย) เป็น numpy arrays
+    - Tag1/Tag2 จาก Seasonality = ครั้งถัดไป, ปีต่อ ๆ ไปใช้วันเดิม + ปันผลเดิม (วนซ้ำรายปีจนครบ horizon)
+    - month = จำนวนเดือนนับจากเดือนปัจจุบันถึงเดือนที่ได้รับเงิน (Est_Pay_Date)
+    """
+    today = today or date.today()
+    symbols, index = [], {}
+    row_symbol, month, dps, xd_dates, pay_dates = [], [], [], [], []
+    for key, item in seasonality_cache.items():
+        for tag in (item.tags() if item else []):
+            if not tag.next_xd_date or not tag.est_pay_date:
+                continue
+            if key not in index:
+                index[key] = len(symbols)
+                symbols.append(key)
+            xd, pay = date.fromisoformat(tag.next_xd_date), date.fromisoformat(tag.est_pay_date)
+            first = (pay.year - today.year) * 12 + pay.month - today.month
+            for year in range(0, horizon_months // 12 + 1):
+                offset = first + 12 * year
+                if offset < 0 or offset >= horizon_months:
+                    continue
+                row_symbol.append(index[key])
+                month.append(offset)
+                dps.append(float(tag.est_dividend or 0.0))
+                xd_dates.append((xd + relativedelta(years=year)).isoformat())
+                pay_dates.append((pay + relativedelta(years=year)).isoformat())
+
+    order = np.lexsort((np.array(pay_dates, dtype=object), np.array(month, dtype=int))) if month else np.array([], dtype=int)
+    return {
+        "as_of": today,
+        "symbols": symbols,
+        "index": index,
+        "row_symbol": np.asarray(row_symbol, dtype=int)[order],
+        "month": np.asarray(month, dtype=int)[order],
+        "dps": np.asarray(dps, dtype=float)[order],
+        "xd_date": np.asarray(xd_dates, dtype=object)[order],
+        "pay_date": np.asarray(pay_dates, dtype=object)[order]
+    }
+
+
+# ตารางล่าสุด ((version, วันที่), schedule) — สลับทั้ง tuple ด้วย assignment เดียว ผู้อ่านไม่เห็นครึ่ง ๆ กลาง ๆ
+# สร้างใหม่เมื่อ Seasonality Cache เปลี่ยน version หรือขึ้นวันใหม่ (lock กันสร้างซ้ำพร้อมกันหลาย request)
+_SCHEDULE: Tuple[Optional[Tuple[Hashable, date]], Optional[Dict]] = (None, None)
+_SCHEDULE_LOCK = threading.Lock()
+
+
+def payout_schedule(snapshot: Tuple[Dict[str, SeasonalityRecord], Hashable]) -> Dict:
+    """snapshot = (data, version) จาก VersionedCache.versioned_snapshot() -> ตารางของข้อมูลชุดนั้นพอดี"""
+    global _SCHEDULE
+    data, version = snapshot
+    key = (version, date.today())
+    cached_key, schedule = _SCHEDULE
+    if cached_key == key:
+        return schedule
+    with _SCHEDULE_LOCK:
+        if _SCHEDULE[0] != key:
+            _SCHEDULE = (key, build_payout_schedule(data, today=key[1]))
+        return _SCHEDULE[1]
+
+
+def project_dividend_calendar(holdings: List[Dict], schedule: Dict, months: int = 12) -> Dict:
+    """
+    ปันผลที่คาดว่าจะได้รับรายเดือน (ก่อนภาษี / หัก ณ ที่จ่าย 10% / เครดิตภาษี) ของ holdings
+    Join แบบ vectorized: shares ต่อหุ้น -> ดึงด้วย row_symbol ของตาราง -> np.bincount ตามเดือน
+    (จำนวนหุ้นในพอร์ตไม่เพิ่มงาน: ทุก request ทำงานบนตารางขนาดเดียวกัน)
+    """
+    months = min(int(months), MAX_CALENDAR_MONTHS)
+    n_symbols = len(schedule['symbols'])
+    shares = np.zeros(n_symbols)
+    cit_rates = np.full(n_symbols, DEFAULT_CIT_RATE)
+    missing = []
+    for h in holdings:
+        key = h['symbol'].upper().replace('.BK', '')
+        i = schedule['index'].get(key)
+        if i is None:
+            missing.append(key)
+            continue
+        shares[i] += h['shares']
+        if h.get('cit_rate') is not None:
+            cit_rates[i] = h['cit_rate']
+
+    row_symbol, month = schedule['row_symbol'], schedule['month']
+    held = (month < months) & (shares[row_symbol] > 0)
+    rows = np.flatnonzero(held)
+    gross = schedule['dps'][rows] * shares[row_symbol[rows]]
+    credit = gross * tax_credit_ratio(cit_rates[row_symbol[rows]])
+
+    monthly_gross = np.bincount(month[rows], weights=gross, minlength=months)
+    monthly_credit = np.bincount(month[rows], weights=credit, minlength=months)
+    withholding = monthly_gross * WITHHOLDING_RATE
+
+    start = schedule['as_of']
+    labels = [f"{start.year + (start.month - 1 + m) // 12}-{(start.month - 1 + m) % 12 + 1:02d}" for m in range(months)]
+    events: Dict[int, List[Dict]] = {}
+    for r, amount in zip(rows, gross):
+        events.setdefault(int(month[r]), []).append({
+            "Symbol": schedule['symbols'][row_symbol[r]],
+            "XD_Date": schedule['xd_date'][r],
+            "Pay_Date": schedule['pay_date'][r],
+            "DPS": round(float(schedule['dps'][r]), 4),
+            "Shares": float(shares[row_symbol[r]]),
+            "Gross": round(float(amount), 2)
+        })
+
+    return {
+        "calendar": [
+            {
+                "Month": labels[m],
+                "Gross_Dividend": round(float(monthly_gross[m]), 2),
+                "Withholding_Tax": round(float(withholding[m]), 2),
+                "Net_Dividend": round(float(monthly_gross[m] - withholding[m]), 2),
+                "Tax_Credit": round(float(monthly_credit[m]), 2),
+                "Payments": events.get(m, [])
+            }
+            for m in range(months)
+        ],
+        "totals": {
+            "gross_dividend": round(float(monthly_gross.sum()), 2),
+            "withholding_tax": round(float(withholding.sum()), 2),
+            "net_dividend": round(float(monthly_gross.sum() - withholding.sum()), 2),
+            "tax_credit_amount": round(float(monthly_credit.sum()), 2)
+        },
+        "missing": missing
+    }
@@ -0,0 +1,65 @@
+"""
+Benchmark: KMeans(n_init=20) แบบเดิม vs warm-start vs MiniBatchKMeans
+
+Usage:
+    python -m benchmarks.bench_clustering --sizes 50 500 5000 50000 --refreshes 5
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from Func_app.Scoring.main_scoring import fit_clusters, reset_cluster_state, IDEAL_PROFILES
+
+K = 4
+
+
+def make_universe(n_stocks: int, rng) -> np.ndarray:
+    """Features (T_DTS, Ret_Af, Ret_Bf) รอบ ๆ ideal profiles + noise"""
+    centers = np.array(list(IDEAL_PROFILES.values()))
+    labels = rng.integers(0, K, size=n_stocks)
+    return centers[labels] + rng.normal(0, 0.6, size=(n_stocks, 3))
+
+
+def run_mode(mode: str, X0: np.ndarray, refreshes: int, rng) -> dict:
+    """Refresh หลายรอบบนข้อมูลที่ขยับเล็กน้อย (เหมือนมี bar ใหม่เข้ามา)"""
+    reset_cluster_state()
+    timings, stability = [], []
+    prev_labels = None
+    X = X0.copy()
+    for _ in range(refreshes):
+        X = X + rng.normal(0, 0.02, size=X.shape)
+        t0 = time.perf_counter()
+        labels, _, _ = fit_clusters(X, K, mode=mode)
+        timings.append(time.perf_counter() - t0)
+        if prev_labels is not None:
+            # สัดส่วนหุ้นที่ Cluster ID ไม่เปลี่ยน (ต่างจาก ARI ที่ไม่สนใจชื่อ label)
+            stability.append(float((labels == prev_labels).mean()))
+        prev_labels = labels
+    return {
+        "first_fit_ms": timings[0] * 1000,
+        "refresh_ms": float(np.mean(timings[1:])) * 1000 if len(timings) > 1 else None,
+        "label_stability": float(np.mean(stability)) if stability else None,
+        "labels": prev_labels
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000, 50000])
+    parser.add_argument("--refreshes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'n_stocks':>9} {'mode':>10} {'first_fit_ms':>13} {'refresh_ms':>11} {'id_stable':>10} {'ARI_vs_full':>12}")
+    for n in args.sizes:
+        X0 = make_universe(n, np.random.default_rng(args.seed))
+        results = {mode: run_mode(mode, X0, args.refreshes, np.random.default_rng(args.seed + 1))
+                   for mode in ("full", "warm", "minibatch")}
+        for mode, r in results.items():
+            ari = adjusted_rand_score(results["full"]["labels"], r["labels"])
+            print(f"{n:>9} {mode:>10} {r['first_fit_ms']:>13.1f} {r['refresh_ms']:>11.1f} "
+                  f"{r['label_stability']:>10.3f} {ari:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: Cold start ของ API (process ใหม่ทุกรอบ)
+- import_s:       เวลา `import main_app` เปล่า ๆ
+- first_health_s: ตั้งแต่สั่ง uvicorn จน GET / ตอบ 200
+- analytics_s:    ตั้งแต่สั่ง uvicorn จน preload analytics modules เสร็จ (analytics_ready=true)
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --no-preload     # โหลด module ตอน request แรกแทน
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c",
+                          "import time; t0 = time.perf_counter(); import main_app; print(time.perf_counter() - t0)"],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def _get(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return json.loads(r.read())
+    except OSError:
+        return None
+
+
+def measure_server(env: dict, timeout: float) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main_app:app", "--port", str(port), "--log-level", "warning"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_health = analytics = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            body = _get(url)
+            if body is not None:
+                now = time.perf_counter() - t0
+                first_health = first_health or now
+                if body.get("analytics_ready"):
+                    analytics = now
+                    break
+                if env.get("STOCK_PRELOAD") == "0":
+                    # ไม่มี preload: วัดเวลาของ request แรกที่ต้อง import analytics เอง
+                    t1 = time.perf_counter()
+                    _get(f"http://127.0.0.1:{port}/main_app/indicators")
+                    analytics = now + time.perf_counter() - t1
+                    break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"first_health_s": first_health, "analytics_s": analytics}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-preload", action="store_true", help="STOCK_PRELOAD=0 (lazy import on first use)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    env = {**os.environ, "STOCK_AUTO_REFRESH": "0", "STOCK_PRELOAD": "0" if args.no_preload else "1",
+           "PYTHONPATH": os.getcwd()}
+    runs = []
+    for _ in range(args.repeat):
+        runs.append({"import_s": measure_import(env), **measure_server(env, args.timeout)})
+
+    print(f"{'metric':>15} {'min':>8} {'median':>8} {'max':>8}")
+    for key in ("import_s", "first_health_s", "analytics_s"):
+        values = [r[key] for r in runs if r[key] is not None]
+        if not values:
+            print(f"{key:>15} {'n/a':>8}")
+            continue
+        print(f"{key:>15} {min(values):>8.3f} {statistics.median(values):>8.3f} {max(values):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
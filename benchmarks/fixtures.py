@@ -0,0 +1,27 @@
+"""
+บันทึก Market-data fixtures จาก yfinance สำหรับ ReplaySource (STOCK_DATA_SOURCE=replay)
+
+Usage (ต้องต่อ network ได้):
+    python -m benchmarks.fixtures record --out benchmarks/fixtures --period 10y
+"""
+import argparse
+from Func_app.config import SET50_TICKERS, FIXTURES_DIR
+from Func_app.DataSource.data_source import record_fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="Record fixtures from yfinance (needs network)")
+    rec.add_argument("--out", default=FIXTURES_DIR)
+    rec.add_argument("--period", default="10y")
+    rec.add_argument("--tickers", nargs="*", default=SET50_TICKERS)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        saved = record_fixtures(args.tickers, args.out, args.period)
+        print(f"✅ Recorded {len(saved)} tickers to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Load test ของ API (uvicorn process จริง + ข้อมูล Offline) ภายใต้ผู้อ่านพร้อมกันจำนวนมาก + Refresh ระหว่างทาง
+
+Phases (แต่ละ phase ยาว --duration วินาที, Cache ถูกเติมครบก่อนเริ่ม):
+- read:  readers อย่างเดียว (baseline)
+- mixed: readers + refresher ที่ POST /update_* ทีละ job ต่อกัน -> BackgroundTasks สลับ Cache ระหว่างที่ถูกอ่าน
+
+รายงานต่อ phase x endpoint: จำนวน request, error, throughput (req/s), p50 / p95 / p99 / max (ms)
++ Cache swaps / write-lock contention (diff ของ /metrics), RSS ของ server (start / peak / end) และเวลาแต่ละรอบ refresh
+ลำดับ endpoint / หุ้นที่ยิงกำหนดด้วย --seed (ต่อ reader) -> workload เหมือนเดิมทุกครั้ง
+
+Usage:
+    python -m benchmarks.load_test                          # synthetic data, 200 readers, 20s ต่อ phase
+    python -m benchmarks.load_test --readers 500 --duration 60
+    python -m benchmarks.load_test --source fixtures --fixtures-dir benchmarks/fixtures
+    python -m benchmarks.load_test --url http://127.0.0.1:8000   # server ที่รันอยู่แล้ว (ไม่วัด RSS)
+    python -m benchmarks.load_test --compare load_results_old.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import threading
+import statistics
+import subprocess
+import http.client
+import urllib.parse
+from datetime import datetime
+from typing import Dict, List, Optional
+from benchmarks.bench_startup import free_port
+from Func_app.config import SET50_TICKERS_BASE
+
+SYMBOLS = [t for t in SET50_TICKERS_BASE if t != "DELTA"]  # DELTA ไม่อยู่ใน Universe ของ Batch
+
+# ==========================================
+# 1. Workload
+# ==========================================
+
+# (ชื่อ = route template, น้ำหนัก, symbol -> (method, path, body))
+READ_MIX = [
+    ("GET /", 1, lambda s: ("GET", "/", None)),
+    ("GET /stock_recommendation/{symbol}", 4, lambda s: ("GET", f"/main_app/stock_recommendation/{s}", None)),
+    ("GET /analyze_tdts/{symbol}", 2, lambda s: ("GET", f"/main_app/analyze_tdts/{s}", None)),
+    ("GET /analyze_tema/{symbol}", 2, lambda s: ("GET", f"/main_app/analyze_tema/{s}", None)),
+    ("GET /technical_history/{symbol}", 4, lambda s: ("GET", f"/main_app/technical_history/{s}?last_n=60", None)),
+    ("GET /valuation_ggm/{symbol}", 2, lambda s: ("GET", f"/main_app/valuation_ggm/{s}", None)),
+    ("GET /dividend_countdown/{symbol}", 2, lambda s: ("GET", f"/main_app/dividend_countdown/{s}", None)),
+    ("POST /bulk_query", 1, lambda s: ("POST", "/main_app/bulk_query",
+                                       {"symbols": [s, "PTT", "AOT"], "metrics": ["scoring", "technical", "ggm"]})),
+]
+
+# (scheduler job, endpoint, body) — ใช้ทั้งตอนเติม Cache และใน phase mixed
+REFRESH_JOBS = [
+    ("scoring", "/main_app/update_scoring_cache", {}),
+    ("technical", "/main_app/update_indicator_cache", {}),
+    ("ggm", "/main_app/update_ggm_cache", {}),
+    ("seasonality", "/main_app/update_seasonality_cache", None),
+]
+
+
+class Client:
+    """HTTP keep-alive 1 connection ต่อ thread (ต่อใหม่เมื่อ connection หลุด)"""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port, self.timeout = url.hostname, url.port or 80, timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body=None):
+        """คืน (status, วินาที, body bytes) — status 0 = connection error"""
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        t0 = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._conn.request(method, path, body=payload, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+            return response.status, time.perf_counter() - t0, data
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, time.perf_counter() - t0, b""
+
+    def json(self, method: str, path: str, body=None):
+        status, _, data = self.request(method, path, body)
+        return json.loads(data) if status == 200 else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def reader(base_url: str, seed: int, stop: threading.Event, samples: List):
+    """ยิง READ_MIX แบบสุ่มตามน้ำหนักจนกว่าจะหมดเวลา -> samples: [(endpoint, status, seconds), ...]"""
+    rng = random.Random(seed)
+    client = Client(base_url)
+    names = [m[0] for m in READ_MIX]
+    weights = [m[1] for m in READ_MIX]
+    builders = {m[0]: m[2] for m in READ_MIX}
+    while not stop.is_set():
+        name = rng.choices(names, weights)[0]
+        method, path, body = builders[name](rng.choice(SYMBOLS))
+        status, seconds, _ = client.request(method, path, body)
+        samples.append((name, status, seconds))
+    client.close()
+
+
+def run_refresh(client: Client, job: str, path: str, body, timeout: float, samples: Optional[List] = None) -> Dict:
+    """POST /update_* แล้วรอจน scheduler job นั้นรันจบ (runs เพิ่ม + ไม่ busy)"""
+    before = client.json("GET", "/main_app/cache_status")["scheduler"]["jobs"][job]["runs"]
+    status, seconds, _ = client.request("POST", path, body)
+    if samples is not None:
+        samples.append((f"POST {path.replace('/main_app', '')}", status, seconds))
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        state = client.json("GET", "/main_app/cache_status")
+        info = state["scheduler"]["jobs"][job] if state else None
+        if info and info["runs"] > before and not info["busy"]:
+            return {"job": job, "seconds": round(time.perf_counter() - t0, 3), "error": info["last_error"]}
+        time.sleep(0.1)
+    return {"job": job, "seconds": None, "error": "timeout"}
+
+
+def refresher(base_url: str, stop: threading.Event, samples: List, refreshes: List, timeout: float):
+    client = Client(base_url)
+    while not stop.is_set():
+        for job, path, body in REFRESH_JOBS:
+            if stop.is_set():
+                break
+            refreshes.append(run_refresh(client, job, path, body, timeout, samples))
+    client.close()
+
+# ==========================================
+# 2. Server-side Probes (RSS / Cache contention จาก /metrics)
+# ==========================================
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident memory ของ server process (Linux /proc เท่านั้น)"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler:
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid, self.interval = pid, interval
+        self.values: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            value = rss_mb(self.pid)
+            if value is not None:
+                self.values.append(value)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> Optional[Dict]:
+        if not self.values:
+            return None
+        start, end = self.values[0], self.values[-1]
+        return {"rss_start_mb": round(start, 1), "rss_peak_mb": round(max(self.values), 1),
+                "rss_end_mb": round(end, 1), "growth_mb": round(end - start, 1)}
+
+
+_METRIC_LINE = re.compile(r'^(\w+)(?:\{(.*)\})? ([-+\d.eE]+|NaN|[+-]Inf)$')
+CONTENTION_METRICS = ("cache_swaps_total", "cache_lock_contended_total", "cache_lock_wait_seconds_sum")
+
+
+def scrape_cache_metrics(base_url: str) -> Dict[str, Dict[str, float]]:
+    """/metrics -> {cache: {metric: ค่า}} เฉพาะ metric ของ Cache swap / lock (รวมทุก kind)"""
+    client = Client(base_url)  # connection ใหม่ทุกครั้ง (keep-alive เดิมอาจหมดอายุระหว่าง phase)
+    status, _, body = client.request("GET", "/metrics")
+    client.close()
+    out: Dict[str, Dict[str, float]] = {}
+    if status != 200:
+        return out
+    for line in body.decode().splitlines():
+        match = _METRIC_LINE.match(line)
+        if not match or match.group(1) not in CONTENTION_METRICS:
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ""))
+        cache = out.setdefault(labels.get("cache", "?"), {})
+        cache[match.group(1)] = cache.get(match.group(1), 0.0) + float(match.group(3))
+    return out
+
+
+def diff_cache_metrics(before: Dict, after: Dict) -> Dict[str, Dict]:
+    result = {}
+    for cache, values in after.items():
+        prev = before.get(cache, {})
+        delta = {name: values.get(name, 0.0) - prev.get(name, 0.0) for name in CONTENTION_METRICS}
+        if any(delta.values()):
+            result[cache] = {
+                "swaps": int(delta["cache_swaps_total"]),
+                "lock_contended": int(delta["cache_lock_contended_total"]),
+                "lock_wait_ms": round(delta["cache_lock_wait_seconds_sum"] * 1000, 3)
+            }
+    return result
+
+# ==========================================
+# 3. Runner
+# ==========================================
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        v = values[0] * 1000 if values else None
+        return {"p50_ms": v, "p95_ms": v, "p99_ms": v, "max_ms": v}
+    q = statistics.quantiles(values, n=100, method='inclusive')
+    return {"p50_ms": round(q[49] * 1000, 2), "p95_ms": round(q[94] * 1000, 2),
+            "p99_ms": round(q[98] * 1000, 2), "max_ms": round(max(values) * 1000, 2)}
+
+
+def summarize(samples: List, seconds: float) -> Dict[str, Dict]:
+    by_endpoint: Dict[str, List] = {}
+    for name, status, latency in samples:
+        by_endpoint.setdefault(name, []).append((status, latency))
+    by_endpoint["ALL"] = [(status, latency) for _, status, latency in samples]
+
+    result = {}
+    for name, rows in by_endpoint.items():
+        errors: Dict[str, int] = {}
+        for status, _ in rows:
+            if status == 0 or status >= 400:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        result[name] = {
+            "requests": len(rows),
+            "errors": sum(errors.values()),
+            "error_status": errors,
+            "rps": round(len(rows) / seconds, 1),
+            **percentiles([latency for _, latency in rows])
+        }
+    return result
+
+
+def run_phase(name: str, base_url: str, pid: Optional[int], readers: int, duration: float, seed: int,
+              with_refresh: bool, refresh_timeout: float) -> Dict:
+    metrics_before = scrape_cache_metrics(base_url)
+    stop = threading.Event()
+    per_reader = [[] for _ in range(readers)]
+    refresh_samples, refreshes = [], []
+    threads = [threading.Thread(target=reader, args=(base_url, seed * 100003 + i, stop, per_reader[i]), daemon=True)
+               for i in range(readers)]
+    if with_refresh:
+        threads.append(threading.Thread(target=refresher, args=(base_url, stop, refresh_samples, refreshes,
+                                                                refresh_timeout), daemon=True))
+
+    with MemorySampler(pid) as memory:
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+    samples = [s for rows in per_reader for s in rows] + refresh_samples
+    result = {
+        "seconds": round(elapsed, 2),
+        "endpoints": summarize(samples, elapsed),
+        "cache": diff_cache_metrics(metrics_before, scrape_cache_metrics(base_url)),
+        "memory": memory.summary(),
+        "refreshes": refreshes
+    }
+    print_phase(name, result)
+    return result
+
+
+def print_phase(name: str, result: Dict):
+    print(f"\n=== phase: {name} ({result['seconds']}s) ===")
+    print(f"{'endpoint':<38} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for endpoint, r in sorted(result['endpoints'].items(), key=lambda kv: (kv[0] == "ALL", kv[0])):
+        cells = [f"{r[k]:>8.1f}" if r[k] is not None else f"{'n/a':>8}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{endpoint:<38} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} {' '.join(cells)}")
+    for cache, c in sorted(result['cache'].items()):
+        print(f"  cache {cache:<12} swaps={c['swaps']:<6} contended={c['lock_contended']:<4} wait={c['lock_wait_ms']}ms")
+    if result['memory']:
+        m = result['memory']
+        print(f"  rss start={m['rss_start_mb']}MB peak={m['rss_peak_mb']}MB end={m['rss_end_mb']}MB growth={m['growth_mb']:+}MB")
+    for r in result['refreshes']:
+        print(f"  refresh {r['job']:<12} {r['seconds']}s" + (f" ❌ {r['error']}" if r['error'] else ""))
+
+
+def start_server(env: Dict, timeout: float):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main_app:app", "--port", str(port),
+                             "--log-level", "warning"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    client = Client(base_url, timeout=1)
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            sys.exit(f"❌ Server exited with code {proc.returncode}")
+        body = client.json("GET", "/")
+        if body is not None and body.get("analytics_ready"):
+            client.close()
+            return proc, base_url
+        time.sleep(0.1)
+    proc.terminate()
+    sys.exit(f"❌ Server not ready within {timeout}s")
+
+
+def warm_caches(base_url: str, timeout: float):
+    """เติมทุก Cache ที่ READ_MIX อ่าน (ไม่งั้น request แรก ๆ ตกไป Live fallback และวัดผิด)"""
+    client = Client(base_url)
+    for job, path, body in REFRESH_JOBS:
+        r = run_refresh(client, job, path, body, timeout)
+        print(f"🔄 warm {job:<12} {r['seconds']}s" + (f" ❌ {r['error']}" if r['error'] else ""))
+    client.close()
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(current: Dict, baseline_path: str, tolerance: float) -> bool:
+    """p95 ต่อ phase x endpoint ช้าลง หรือ throughput รวมลดลงเกิน tolerance -> regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('git_commit')})")
+    regressed = False
+    for phase, result in current['phases'].items():
+        base_phase = baseline['phases'].get(phase)
+        if not base_phase:
+            continue
+        for endpoint, r in result['endpoints'].items():
+            b = base_phase['endpoints'].get(endpoint)
+            if not b or not b['p95_ms'] or r['p95_ms'] is None:
+                continue
+            ratio = r['p95_ms'] / b['p95_ms']
+            slower = ratio > 1 + tolerance
+            fewer = endpoint == "ALL" and r['rps'] < b['rps'] * (1 - tolerance)
+            flag = "❌ REGRESSION" if slower or fewer else ""
+            regressed |= bool(flag)
+            print(f"{phase:>6} {endpoint:<38} p95 {b['p95_ms']:>8.1f} -> {r['p95_ms']:>8.1f}ms x{ratio:.2f} "
+                  f"rps {b['rps']:>8.1f} -> {r['rps']:>8.1f} {flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "fixtures"], default="synthetic")
+    parser.add_argument("--fixtures-dir", default="benchmarks/fixtures")
+    parser.add_argument("--url", help="Target a running server instead of starting one (no RSS probe)")
+    parser.add_argument("--readers", type=int, default=200, help="Concurrent reader connections")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--phases", nargs="+", choices=["read", "mixed"], default=["read", "mixed"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--refresh-timeout", type=float, default=300.0)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown / rps drop (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base_url, pid = args.url.rstrip("/"), None
+    else:
+        env = {**os.environ, "STOCK_AUTO_REFRESH": "0", "STOCK_PRELOAD": "1", "PYTHONPATH": os.getcwd(),
+               "STOCK_SYNTHETIC_SEED": str(args.seed)}
+        if args.source == "fixtures":
+            if not os.path.isdir(args.fixtures_dir):
+                sys.exit(f"No fixtures in {args.fixtures_dir}. Run: python -m benchmarks.fixtures record")
+            env.update({"STOCK_DATA_SOURCE": "replay", "STOCK_FIXTURES_DIR": args.fixtures_dir})
+        else:
+            env["STOCK_DATA_SOURCE"] = "synthetic"
+        proc, base_url = start_server(env, args.startup_timeout)
+        pid = proc.pid
+
+    try:
+        warm_caches(base_url, args.refresh_timeout)
+        phases = {
+            phase: run_phase(phase, base_url, pid, args.readers, args.duration, args.seed,
+                             with_refresh=(phase == "mixed"), refresh_timeout=args.refresh_timeout)
+            for phase in args.phases
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {"meta": {**environment(), "source": args.url or args.source, "readers": args.readers,
+                       "duration": args.duration, "seed": args.seed},
+              "phases": phases}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare and compare(report, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark suite ของทุก Analyzer ใน Func_app (Offline — ไม่เรียก Yahoo)
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 50 200 1000
+    python -m benchmarks.run_benchmarks --source fixtures --fixtures-dir benchmarks/fixtures
+    python -m benchmarks.run_benchmarks --compare bench_results_old.json
+
+ผลลัพธ์ (JSON) เก็บเวลา (min/median ของ --repeat รอบ) + memory peak (tracemalloc) ต่อ stage
+--compare จะเทียบกับไฟล์ผลเก่าและคืน exit code 1 ถ้าช้าลงเกิน --tolerance
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sklearn
+from Func_app.DataSource.data_source import ReplaySource, SyntheticSource, use_data_source
+from Func_app.DataSource.synthetic import synthetic_tickers
+from Func_app.Scoring.tdts_scoring import analyze_stock_tdts
+from Func_app.Scoring.tema_scoring import analyze_stock_tema
+from Func_app.Scoring.main_scoring import process_cluster_and_score, reset_cluster_state
+from Func_app.TA.technical_analysis import get_technical_history, analyze_technical_batch
+from Func_app.Predictor.predictor_XD import analyze_seasonality_batch
+from Func_app.GGM.ggm_cal import analyze_ggm_batch
+from Func_app.DataSource.quote_snapshot import QUOTE_SNAPSHOT
+
+START_YEAR, END_YEAR = 2022, 2026
+
+# ==========================================
+# Stages: แต่ละ stage = ฟังก์ชันที่รับ tickers แล้วคืนจำนวนหุ้นที่คำนวณสำเร็จ
+# ==========================================
+
+def stage_tdts(tickers):
+    return sum(analyze_stock_tdts(t, START_YEAR, END_YEAR, threshold=20.0)['status'] == 'success' for t in tickers)
+
+def stage_tema(tickers):
+    res = analyze_stock_tema(tickers, START_YEAR, END_YEAR, threshold=20.0, window=15)
+    return len({r.stock for r in res['data']['raw_data']}) if res['status'] == 'success' else 0
+
+def stage_technical_history(tickers):
+    end = pd.Timestamp.today().strftime('%Y-%m-%d')
+    return sum(get_technical_history(t, f"{START_YEAR}-01-01", end)['status'] == 'success' for t in tickers)
+
+def stage_technical_batch(tickers):
+    return len(analyze_technical_batch(START_YEAR, tickers=tickers)['data'])
+
+def stage_seasonality(tickers):
+    return analyze_seasonality_batch(tickers=tickers)['count']
+
+def stage_ggm(tickers):
+    QUOTE_SNAPSHOT.refresh(tickers)
+    return analyze_ggm_batch(tickers, years=3, r_expected=0.05, growth_rate=0.04)['count']
+
+def stage_cluster_and_score(tickers):
+    reset_cluster_state()
+    res = process_cluster_and_score(tickers, START_YEAR, END_YEAR, window=15, threshold=20.0)
+    return res.get('count', 0)
+
+STAGES = {
+    "tdts": stage_tdts,
+    "tema": stage_tema,
+    "technical_history": stage_technical_history,
+    "technical_batch": stage_technical_batch,
+    "seasonality": stage_seasonality,
+    "ggm": stage_ggm,
+    "cluster_and_score": stage_cluster_and_score,
+}
+
+# ==========================================
+# Runner
+# ==========================================
+
+def measure(fn, tickers, repeat: int) -> dict:
+    timings = []
+    ok = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ok = fn(tickers)
+        timings.append(time.perf_counter() - t0)
+
+    # memory peak วัดแยกอีกรอบ เพราะ tracemalloc ทำให้ช้าลง
+    tracemalloc.start()
+    fn(tickers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds_min": round(min(timings), 4),
+        "seconds_median": round(statistics.median(timings), 4),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "ok_count": int(ok)
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__
+    }
+
+
+def compare(current: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base_index = {(r['stage'], r['n_tickers']): r for r in baseline['results']}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('git_commit')})")
+    regressed = False
+    for r in current['results']:
+        b = base_index.get((r['stage'], r['n_tickers']))
+        if not b:
+            continue
+        ratio = r['seconds_min'] / b['seconds_min'] if b['seconds_min'] else float('inf')
+        flag = "❌ REGRESSION" if ratio > 1 + tolerance else ""
+        regressed |= bool(flag)
+        print(f"{r['stage']:>18} n={r['n_tickers']:<5} {b['seconds_min']:>8.3f}s -> {r['seconds_min']:>8.3f}s  x{ratio:.2f} {flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "fixtures"], default="synthetic")
+    parser.add_argument("--fixtures-dir", default="benchmarks/fixtures")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="Universe sizes (synthetic)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed slowdown before flagging (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    if args.source == "fixtures":
+        replay = ReplaySource(args.fixtures_dir)
+        if not replay.tickers():
+            sys.exit(f"No fixtures in {args.fixtures_dir}. Run: python -m benchmarks.fixtures record")
+        universes = [(replay, replay.tickers())]
+    else:
+        # สร้างข้อมูลล่วงหน้า เพื่อไม่ให้เวลา generate ปนกับเวลาของ Analyzer
+        universes = [(SyntheticSource(seed=args.seed).preload(synthetic_tickers(n)), synthetic_tickers(n))
+                     for n in args.sizes]
+
+    results = []
+    for source, tickers in universes:
+        with use_data_source(source):
+            for name in args.stages:
+                r = measure(STAGES[name], tickers, args.repeat)
+                results.append({"stage": name, "n_tickers": len(tickers), **r})
+                print(f"{name:>18} n={len(tickers):<5} min={r['seconds_min']:.3f}s "
+                      f"median={r['seconds_median']:.3f}s peak={r['peak_mb']:.1f}MB ok={r['ok_count']}")
+
+    report = {"meta": {**environment(), "source": args.source, "repeat": args.repeat, "seed": args.seed},
+              "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare and compare(report, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
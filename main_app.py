@@ -1,19 +1,48 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
+from fastapi.responses import PlainTextResponse, JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
-import pandas as pd
+import time
 
 # --- Local Modules (Logic) ---
 # from Func_app.config import SET50_TICKERS
-from Func_app.calculate_text import optimize_dividend_tax 
-from Func_app.Scoring.tdts_scoring import analyze_stock_tdts
-from Func_app.Scoring.tema_scoring import analyze_stock_tema
-from Func_app.Scoring.main_scoring import process_cluster_and_score
-from Func_app.TA.technical_analysis import analyze_technical_batch
-from Func_app.Predictor.predictor_XD import analyze_seasonality_batch
-from Func_app.GGM.ggm_cal import analyze_ggm_batch
+from Func_app.config import AUTO_REFRESH, DATA_SOURCE, PRELOAD_ANALYTICS
+from Func_app.lazy import lazy, preload_modules, preload_status
+# Analytics modules (pandas / sklearn / scipy) โหลดตอนใช้ครั้งแรก หรือ preload หลัง Server start
+# -> import main_app + Health Check ไม่ต้องรอ import ทั้งหมด (~2s)
+optimize_dividend_tax, tax_crossover_curve = lazy("Func_app.calculate_text", "optimize_dividend_tax", "tax_crossover_curve")
+plan_portfolio_dividend_tax, payout_schedule, project_dividend_calendar = lazy(
+    "Func_app.tax_planner", "plan_portfolio_dividend_tax", "payout_schedule", "project_dividend_calendar")
+analyze_stock_tdts = lazy("Func_app.Scoring.tdts_scoring", "analyze_stock_tdts")
+analyze_stock_tema = lazy("Func_app.Scoring.tema_scoring", "analyze_stock_tema")
+outlier_mask, record_values, resolve_threshold, resolve_request_threshold, distribution_stats = lazy(
+    "Func_app.Scoring.outliers", "outlier_mask", "record_values", "resolve_threshold", "resolve_request_threshold",
+    "distribution_stats")
+process_cluster_and_score = lazy("Func_app.Scoring.main_scoring", "process_cluster_and_score")
+SCORE_HISTORY = lazy("Func_app.Scoring.score_history", "SCORE_HISTORY")
+analyze_technical_batch, get_technical_history, slice_history, columns_to_rows, technical_fields, indicators_for_fields = lazy(
+    "Func_app.TA.technical_analysis", "analyze_technical_batch", "get_technical_history", "slice_history",
+    "columns_to_rows", "technical_fields", "indicators_for_fields")
+INDICATORS, list_indicators = lazy("Func_app.TA.indicators", "INDICATORS", "list_indicators")
+analyze_seasonality_batch = lazy("Func_app.Predictor.predictor_XD", "analyze_seasonality_batch")
+analyze_ggm_batch = lazy("Func_app.GGM.ggm_cal", "analyze_ggm_batch")
+analyze_ggm_monte_carlo_batch = lazy("Func_app.GGM.ggm_monte_carlo", "analyze_ggm_monte_carlo_batch")
+QUOTE_SNAPSHOT = lazy("Func_app.DataSource.quote_snapshot", "QUOTE_SNAPSHOT")
+get_data_source = lazy("Func_app.DataSource.data_source", "get_data_source")
+PRICE_STORE = lazy("Func_app.DataSource.price_store", "PRICE_STORE")
+CORRELATION = lazy("Func_app.Portfolio.correlation", "CORRELATION")
+PORTFOLIO_OPTIMIZER, build_universe = lazy("Func_app.Portfolio.optimizer", "PORTFOLIO_OPTIMIZER", "build_universe")
+from Func_app.metrics import METRICS
+from Func_app.cache import VersionedCache
+from Func_app.market_hours import market_now
+from Func_app.serialization import encode_columns
+from Func_app.export import build_dataset, check_format, stream_dataset, stream_datasets
+from Func_app.records import split_outliers, to_plain
+from Func_app.events import CACHE_EVENTS, stream_events
+from Func_app.scheduler import REFRESH_SCHEDULER
 
 
 tags_metadata = [
@@ -41,24 +70,79 @@ tags_metadata = [
         "name": "Technical Analysis(macd+rsi)",
         "description": "Historical Technical Indicators",
     },
+    {
+        "name": "Correlation & Covariance",
+        "description": "Cross-sectional return correlation over the SET50 universe",
+    },
+    {
+        "name": "Portfolio Optimizer",
+        "description": "Weight allocation from scoring, valuation, dividend timing and covariance",
+    },
+    {
+        "name": "Research Export",
+        "description": "Stream full cached datasets as NDJSON / CSV / Parquet",
+    },
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start/Stop Background Cache Refresh (ปิดได้ด้วย STOCK_AUTO_REFRESH=0)
+    + Preload analytics modules ใน background thread (ปิดได้ด้วย STOCK_PRELOAD=0 -> โหลดตอนใช้ครั้งแรก)
+    """
+    if PRELOAD_ANALYTICS:
+        preload_modules()
+    if AUTO_REFRESH:
+        REFRESH_SCHEDULER.start()
+    yield
+    REFRESH_SCHEDULER.stop()
+
 app = FastAPI(
     title="Stock Analysis API",
     description="API for SET50 Stock Analysis: Scoring, Clustering, T-DTS, TEMA, and Technical Indicators",
     version="1.0.0",
-    openapi_tags=tags_metadata 
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
 
 # ======================================================
 # 1. GLOBAL CACHES (In-Memory Database)
 # ======================================================
-CACHE_SCORING: Dict[str, dict] = {}   # Scoring Results & Cluster Info
-CACHE_TDTS: Dict[str, list] = {}      # T-DTS Raw History
-CACHE_TEMA: Dict[str, list] = {}      # TEMA Raw History
-TECHNICAL_CACHE: Dict[str, list] = {} # MACD/RSI Historical Data
-CACHE_SEASONALITY: Dict[str, dict] = {} # Seasonality Analysis
-CACHE_GGM: Dict[str, dict] = {}
+# VersionedCache: อ่านได้เหมือน dict + computed_at / params fingerprint / TTL (ดู Func_app/cache.py)
+CACHE_SCORING = VersionedCache("scoring")         # Scoring Results & Cluster Info
+CACHE_TDTS = VersionedCache("tdts")               # T-DTS Raw History (refresh พร้อม Scoring)
+CACHE_TEMA = VersionedCache("tema")               # TEMA Raw History (refresh พร้อม Scoring)
+TECHNICAL_CACHE = VersionedCache("technical")     # MACD/RSI Historical Data
+CACHE_SEASONALITY = VersionedCache("seasonality") # Seasonality Analysis
+CACHE_GGM = VersionedCache("ggm")                 # หุ้นที่คำนวณไม่ได้: CACHE_GGM.failed() (Retry queue)
+CACHE_GGM_MC = VersionedCache("ggm_mc")           # Monte Carlo DDM (Percentile Targets)
+
+# Push การเปลี่ยนแปลงรายหุ้นไปยัง GET /main_app/stream (SSE)
+for _cache in (CACHE_SCORING, TECHNICAL_CACHE, CACHE_SEASONALITY, CACHE_GGM, CACHE_GGM_MC):
+    CACHE_EVENTS.watch(_cache)
+
+def _count_cache(cache_name: str, result: str):
+    """นับ Cache lookup: hit / miss / fallback (คำนวณสดแทน)"""
+    METRICS.inc("cache_requests_total", cache=cache_name, result=result)
+
+@app.middleware("http")
+async def _record_latency(request: Request, call_next):
+    """
+    Latency ต่อ Endpoint (label ด้วย route template เพื่อไม่ให้ series บวมตามชื่อหุ้น)
+    - handler raise (ไม่มี response) -> บันทึกเป็น status 500 แล้วส่ง exception ต่อ
+    """
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        METRICS.observe(
+            "http_request_duration_seconds", time.perf_counter() - t0,
+            method=request.method, path=route.path if route else "unmatched", status=status
+        )
 
 # ======================================================
 # 2. PYDANTIC MODELS (Request Schemas)
@@ -68,14 +152,45 @@ class TaxInput(BaseModel):
     dividend_amount: float
     corporate_tax_rate: float
 
+class TaxBatchInput(BaseModel):
+    profiles: List[TaxInput] = Field(..., max_length=100000, description="Investor Profiles")
+
+class HoldingInput(BaseModel):
+    symbol: str
+    shares: float = Field(..., ge=0)
+    cit_rate: Optional[float] = Field(default=None, description="Corporate Tax Rate (%) (Empty = 20)")
+
+class PortfolioTaxInput(BaseModel):
+    holdings: List[HoldingInput]
+    base_net_income: float
+    income_levels: Optional[List[float]] = Field(default=None, description="Income Scenarios to Sweep")
+    source: Literal["seasonality", "ggm"] = Field("seasonality", description="Projected Dividend Source")
+
+class DividendCalendarInput(BaseModel):
+    holdings: List[HoldingInput]
+    months: int = Field(12, ge=1, le=36, description="Projection Horizon (Months from Current Month)")
+
+class TaxCurveInput(BaseModel):
+    income_min: float = Field(0.0, ge=0, description="Lowest Base Net Income")
+    income_max: float = Field(5000000.0, gt=0, description="Highest Base Net Income")
+    steps: int = Field(200, ge=2, le=20000, description="Points on the Curve")
+    dividend_amount: float
+    corporate_tax_rate: float
+
+OutlierMethod = Literal["absolute", "zscore", "mad", "iqr"]  # Func_app/Scoring/outliers.py
+BarInterval = Literal["1m", "5m", "15m", "30m", "1h", "1d"]    # Func_app/DataSource/intervals.py
+
 class BatchInput(BaseModel):
     start_year: int = Field(2022, description="Start Year")
     end_year: int = Field(2026, description="End Year")
     window: int = Field(15, description="TEMA Window")
-    threshold: float = Field(20.0, description="Outlier Threshold (%)")
+    threshold: Optional[float] = Field(default=None, description="Outlier Threshold (Empty = Method Default: absolute 20 / zscore 3 / mad 3.5 / iqr 1.5)")
+    outlier_method: OutlierMethod = Field("absolute", description="Outlier Filter (applied once per batch over all XD events)")
+    cluster_mode: Literal["full", "warm", "minibatch", "auto"] = Field("full", description="KMeans Mode (warm = start from previous centroids)")
 
 class TechnicalBatchInput(BaseModel):
     start_year: int = Field(2022, description="Start Year for Technical Data")
+    indicators: List[str] = Field(default_factory=list, description="Extra Indicators on top of RSI/MACD (see GET /indicators)")
 
 class GGMInput(BaseModel):
     tickers: Optional[List[str]] = Field(default=None, description="List of tickers (Empty = All SET50)")
@@ -83,6 +198,35 @@ class GGMInput(BaseModel):
     r_expected: float = Field(0.05, description="Expected Return")
     growth_rate: float = Field(0.04, description="Growth Rate")
 
+BULK_METRICS = ["scoring", "tdts", "tema", "technical", "seasonality", "ggm", "ggm_mc"]
+
+class BulkQueryInput(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=100, description="Stocks (e.g. ['PTT', 'AOT'])")
+    metrics: List[Literal["scoring", "tdts", "tema", "technical", "seasonality", "ggm", "ggm_mc"]] = Field(
+        default_factory=lambda: list(BULK_METRICS), description="Metric Families")
+    technical_last_n: int = Field(20, ge=1, le=2000, description="Technical: Last N Days")
+    technical_fields: Optional[List[str]] = Field(default=None, description="Technical: Fields (Empty = All)")
+
+class GGMMonteCarloInput(BaseModel):
+    years: int = Field(3, ge=1, le=20, description="Projection Years")
+    r_expected: float = Field(0.05, gt=-1, le=1, description="Expected Return")
+    n_paths: int = Field(20000, ge=100, le=500000, description="Simulated Paths per Stock")
+    seed: int = Field(42, description="Random Seed (Reproducible)")
+    max_workers: Optional[int] = Field(default=None, ge=1, le=64, description="Process Pool Size (Empty = All Cores)")
+
+class PortfolioInput(BaseModel):
+    objective: Literal["max_score", "min_risk", "max_yield", "max_upside"] = Field("max_score", description="Optimization Goal")
+    risk_aversion: float = Field(1.0, ge=0, description="Variance Penalty (max_* objectives)")
+    min_yield: Optional[float] = Field(default=None, description="Target Dividend Yield (%/year)")
+    max_volatility: Optional[float] = Field(default=None, gt=0, description="Max Volatility (%/year)")
+    min_upside: Optional[float] = Field(default=None, description="Min GGM Upside (%)")
+    max_weight: float = Field(20.0, gt=0, le=100, description="Max Weight per Stock (%)")
+    max_cluster_weight: Optional[float] = Field(default=None, gt=0, le=100, description="Max Weight per Cluster (%)")
+    max_month_share: Optional[float] = Field(default=None, gt=0, le=100, description="Max Share of Annual Dividend Paid in One Month (%)")
+    exclude_clusters: List[str] = Field(default_factory=list, description="Cluster_Name to Exclude")
+    symbols: Optional[List[str]] = Field(default=None, description="Universe (Empty = All in Scoring Cache)")
+    capital: Optional[float] = Field(default=None, gt=0, description="Capital (THB) for Amounts")
+
 # ======================================================
 # 3. GENERAL ENDPOINTS
 # ======================================================
@@ -92,14 +236,71 @@ def home():
     return {
         "status": "Online",
         "timestamp": datetime.now(),
+        # Health Check ต้องไม่บังคับ import analytics modules -> ใช้ค่าจาก config จนกว่าจะโหลดเสร็จ
+        "data_source": get_data_source().name if get_data_source.loaded else DATA_SOURCE,
+        "analytics_ready": preload_status()["state"] == "done",
         "cache_status": {
             "scoring_count": len(CACHE_SCORING),
+            "score_history_rows": len(SCORE_HISTORY) if SCORE_HISTORY.loaded else None,
             "tdts_count": len(CACHE_TDTS),
             "tema_count": len(CACHE_TEMA),
             "technical_count": len(TECHNICAL_CACHE),
             "seasonality_count": len(CACHE_SEASONALITY),
-            "ggm_count": len(CACHE_GGM)  
+            "ggm_count": len(CACHE_GGM),
+            "ggm_failed_count": len(CACHE_GGM.failed()),
+            "ggm_mc_count": len(CACHE_GGM_MC)
+        }
+    }
+
+@app.get("/main_app/quote_snapshot", tags=["General"])
+def api_quote_snapshot(refresh: bool = False):
+    """
+    [GET] Last-price snapshot (bulk fetch, TTL cached) + tickers ที่ดึงราคาไม่ได้
+    - refresh=true: บังคับดึงใหม่ทั้ง Universe
+    """
+    if refresh:
+        QUOTE_SNAPSHOT.get_prices(force=True)
+    return {"status": "success", "data": QUOTE_SNAPSHOT.status()}
+
+@app.get("/metrics", tags=["General"], response_class=PlainTextResponse)
+def api_metrics():
+    """Prometheus metrics: stage timings, ticker failures, cache hit/miss, endpoint latency, cache sizes"""
+    caches = {
+        "scoring": CACHE_SCORING, "tdts": CACHE_TDTS, "tema": CACHE_TEMA, "technical": TECHNICAL_CACHE,
+        "seasonality": CACHE_SEASONALITY, "ggm": CACHE_GGM, "ggm_mc": CACHE_GGM_MC
+    }
+    gauges = ["# HELP cache_entries Entries currently held per cache", "# TYPE cache_entries gauge"]
+    gauges += [f'cache_entries{{cache="{name}"}} {len(cache)}' for name, cache in caches.items()]
+    gauges += ["# HELP cache_retry_queue Tickers waiting for retry per cache", "# TYPE cache_retry_queue gauge"]
+    gauges += [f'cache_retry_queue{{cache="{name}"}} {len(cache.failed())}' for name, cache in caches.items()]
+    gauges += ["# HELP stream_subscribers Open /main_app/stream connections", "# TYPE stream_subscribers gauge",
+               f"stream_subscribers {CACHE_EVENTS.subscriber_count()}"]
+    return PlainTextResponse(
+        METRICS.render_prometheus() + "\n".join(gauges) + "\n",
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/main_app/cache_status", tags=["General"])
+def api_cache_status(symbol: Optional[str] = None):
+    """
+    [GET] Freshness ของทุก Cache (computed_at, params fingerprint, TTL, stale) + สถานะ Refresh Scheduler
+    - symbol: ดู computed_at / fingerprint ของหุ้นตัวนั้นในแต่ละ Cache
+    """
+    caches = {
+        "scoring": CACHE_SCORING, "tdts": CACHE_TDTS, "tema": CACHE_TEMA, "technical": TECHNICAL_CACHE,
+        "seasonality": CACHE_SEASONALITY, "ggm": CACHE_GGM, "ggm_mc": CACHE_GGM_MC
+    }
+    if symbol:
+        stock_key = symbol.upper().replace('.BK', '')
+        return {
+            "status": "success", "symbol": stock_key,
+            "data": {name: cache.entry_meta(stock_key) for name, cache in caches.items()}
         }
+    return {
+        "status": "success",
+        "data": {name: cache.status() for name, cache in caches.items()},
+        "scheduler": REFRESH_SCHEDULER.status(),
+        "price_store": PRICE_STORE.status() if PRICE_STORE.loaded else None
     }
 
 @app.post("/main_app/calculate_tax", tags=["General"])
@@ -111,6 +312,117 @@ def api_calculate_tax(payload: TaxInput):
         payload.corporate_tax_rate
     )
 
+@app.post("/main_app/calculate_tax_batch", tags=["General"])
+def api_calculate_tax_batch(payload: TaxBatchInput):
+    """Dividend Tax Optimization for many investors in one call (Columnar result, same order as input)"""
+    result = optimize_dividend_tax(
+        [p.base_net_income for p in payload.profiles],
+        [p.dividend_amount for p in payload.profiles],
+        [p.corporate_tax_rate for p in payload.profiles]
+    )
+    return {"status": "success", "count": len(payload.profiles), "data": result}
+
+@app.post("/main_app/tax_crossover", tags=["General"])
+def api_tax_crossover(payload: TaxCurveInput):
+    """Final Tax vs Tax Credit net wealth over a range of incomes + crossover income"""
+    if payload.income_max <= payload.income_min:
+        raise HTTPException(status_code=400, detail="income_max must be greater than income_min.")
+    return {"status": "success", "data": tax_crossover_curve(**payload.model_dump())}
+
+@app.post("/main_app/portfolio_tax_plan", tags=["General"])
+def api_portfolio_tax_plan(payload: PortfolioTaxInput):
+    """
+    Portfolio Dividend Tax Planner: ปันผลคาดการณ์จาก Seasonality/GGM Cache ของทุกตัวในพอร์ต
+    แล้วเทียบ Final Tax vs ยื่นเครดิตภาษี (ต้องเลือกแบบเดียวกันทั้งปี) + Sweep ตามระดับรายได้
+    """
+    if not CACHE_SEASONALITY and not CACHE_GGM:
+        raise HTTPException(status_code=400, detail="Cache empty. Run POST /update_seasonality_cache or /update_ggm_cache first.")
+    
+    plan = plan_portfolio_dividend_tax(
+        holdings=[h.model_dump() for h in payload.holdings],
+        base_net_income=payload.base_net_income,
+        seasonality_cache=CACHE_SEASONALITY,
+        ggm_cache=CACHE_GGM,
+        income_levels=payload.income_levels,
+        source=payload.source
+    )
+    return {"status": "success", "data": plan}
+
+@app.get("/main_app/stream", tags=["General"])
+async def api_stream(request: Request, symbols: Optional[str] = None, caches: Optional[str] = None):
+    """
+    [GET] Server-Sent Events: แจ้งทันทีเมื่อ Cache เปลี่ยน (แทนการ Poll)
+    - event: update — diff รายหุ้น (patch / tail / set / delete) พร้อม cache + version
+    - event: refreshed — จบรอบ refresh ของทั้ง Cache
+    - event: resync — client ตามไม่ทัน ให้ดึงข้อมูลใหม่ผ่าน /bulk_query
+    - symbols='PTT,AOT' / caches='scoring,technical,ggm,seasonality,ggm_mc' (ว่าง = ทั้งหมด)
+    """
+    watched = ["scoring", "technical", "seasonality", "ggm", "ggm_mc"]
+    cache_filter = _parse_fields(caches, watched)
+    sub = CACHE_EVENTS.subscribe(
+        symbols=[s.strip() for s in symbols.split(',') if s.strip()] if symbols else None,
+        caches=cache_filter
+    )
+    
+    async def event_stream():
+        try:
+            async for frame in stream_events(sub, request.is_disconnected):
+                yield frame
+        finally:
+            CACHE_EVENTS.unsubscribe(sub)
+    
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/main_app/bulk_query", tags=["General"])
+def api_bulk_query(payload: BulkQueryInput):
+    """
+    [POST] อ่านผลจาก Cache หลายหุ้น x หลาย Metric ใน request เดียว (แทนการยิง GET ทีละหุ้นทีละ Endpoint)
+    - tdts / tema: raw history จาก Cache (ไม่แยก clean/unclean)
+    - technical: Columnar, N วันล่าสุด
+    - missing: หุ้น -> Metric ที่ยังไม่มีใน Cache
+    """
+    caches = {
+        "scoring": CACHE_SCORING, "tdts": CACHE_TDTS, "tema": CACHE_TEMA, "technical": TECHNICAL_CACHE,
+        "seasonality": CACHE_SEASONALITY, "ggm": CACHE_GGM, "ggm_mc": CACHE_GGM_MC
+    }
+    selected_fields = _parse_fields(",".join(payload.technical_fields or []), technical_fields())
+    
+    # จับ snapshot ของแต่ละ Cache ครั้งเดียว -> ทุกหุ้นใน response มาจาก version เดียวกัน (และตรงกับ "versions")
+    metrics = list(dict.fromkeys(payload.metrics))
+    snapshots, versions = {}, {}
+    for m in metrics:
+        snapshots[m], versions[m] = caches[m].versioned_snapshot()
+    keys = list(dict.fromkeys(s.upper().replace('.BK', '') for s in payload.symbols))
+    
+    data, missing = {}, {}
+    for key in keys:
+        row = {}
+        for m in metrics:
+            value = snapshots[m].get(key)
+            if value is None:
+                missing.setdefault(key, []).append(m)
+                continue
+            if m == "technical":
+                value = slice_history(value, last_n=payload.technical_last_n, fields=selected_fields)
+            row[m] = to_plain(value)
+        data[key] = row
+    
+    for m in metrics:
+        hits = sum(key in snapshots[m] for key in keys)
+        METRICS.inc("cache_requests_total", hits, cache=m, result="hit")
+        METRICS.inc("cache_requests_total", len(keys) - hits, cache=m, result="miss")
+    
+    return JSONResponse({
+        "status": "success",
+        "count": len(keys),
+        "versions": versions,
+        "data": data,
+        "missing": missing
+    })
+
 # ======================================================
 # 4. SCORING(tdts+tema) & CLUSTERING (Batch & Get)
 # ======================================================
@@ -119,11 +431,8 @@ def api_update_scoring_cache(payload: BatchInput, background_tasks: BackgroundTa
     """
     [POST] Trigger Background Task to calculate Scores & Clusters for ALL SET50 stocks.
     """
-    background_tasks.add_task(_run_scoring_batch_analysis, payload_dict=payload.model_dump())
-    return {
-        "status": "processing", 
-        "message": "Scoring batch analysis started in background."
-    }
+    return _queue_refresh(background_tasks, "scoring", payload.model_dump(),
+                          "Scoring batch analysis started in background.")
 
 @app.get("/main_app/stock_recommendation/{symbol}", tags=["Scoring(tdts+tema) & Clustering"])
 def api_get_stock_score(symbol: str):
@@ -131,46 +440,90 @@ def api_get_stock_score(symbol: str):
     [GET] Retrieve Score & Cluster for a stock (or 'SET50' for all).
     """
     if not CACHE_SCORING:
+        _count_cache("scoring", "miss")
         raise HTTPException(status_code=400, detail="Cache empty. Run POST /update_scoring_cache first.")
         
     symbol_upper = symbol.upper()
     
     # Case A: Get All SET50 Ranked
     if symbol_upper == 'SET50':
+        _count_cache("scoring", "hit")
         all_stocks = list(CACHE_SCORING.values())
-        sorted_stocks = sorted(all_stocks, key=lambda x: x.get('Total_Score (%)', -999), reverse=True)
+        sorted_stocks = sorted(all_stocks, key=lambda x: x.total_score, reverse=True)
         return {"status": "success", "source": "cache", "count": len(sorted_stocks), "data": sorted_stocks}
         
     # Case B: Get Single Stock
     stock_key = symbol_upper.replace('.BK', '')
     if stock_key in CACHE_SCORING:
+        _count_cache("scoring", "hit")
         return {"status": "success", "source": "cache", "data": CACHE_SCORING[stock_key]}
     
+    _count_cache("scoring", "miss")
     raise HTTPException(status_code=404, detail=f"Stock '{stock_key}' not found.")
 
+@app.get("/main_app/score_history/{symbol}", tags=["Scoring(tdts+tema) & Clustering"])
+def api_get_score_history(symbol: str, start: Optional[date] = None, end: Optional[date] = None):
+    """
+    [GET] Score & Cluster trajectory ของหุ้นรายตัว ตลอดทุกรอบ Scoring ในช่วง start..end
+    """
+    stock_key = symbol.upper().replace('.BK', '')
+    data = SCORE_HISTORY.trajectory(stock_key, start and start.isoformat(), end and end.isoformat())
+    
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Stock '{stock_key}' has no score history.")
+    
+    return {"status": "success", "symbol": stock_key, "count": len(data['Run_Time']), "data": data}
+
+@app.get("/main_app/cluster_transitions", tags=["Scoring(tdts+tema) & Clustering"])
+def api_get_cluster_transitions(start: Optional[date] = None, end: Optional[date] = None):
+    """
+    [GET] Cluster transition matrix ของทั้ง Universe (Snapshot แรก vs สุดท้าย ในช่วง start..end)
+    """
+    data = SCORE_HISTORY.transition_matrix(start and start.isoformat(), end and end.isoformat())
+    
+    if data is None:
+        raise HTTPException(status_code=404, detail="No scoring snapshots in this date range.")
+    
+    return {"status": "success", "data": data}
+
 # ======================================================
 # 5. INDIVIDUAL METRICS (T-DTS & TEMA) (ย้ายมาไว้ตรงนี้ตามลำดับ)
 # ======================================================
 @app.get("/main_app/analyze_tdts/{input_stock}", tags=["Individual Metrics(T-DTS & TEMA)"])
-def api_analyze_tdts(input_stock: str, threshold: float = 10.0, start_year: int = 2022, end_year: int = 2026):
-    """Get T-DTS Analysis (Cache -> Live Fallback)"""
+def api_analyze_tdts(input_stock: str, threshold: Optional[float] = None, method: OutlierMethod = "absolute",
+                     start_year: int = 2022, end_year: int = 2026):
+    """
+    Get T-DTS Analysis (Cache -> Live Fallback)
+    - threshold ว่าง: absolute 10 (ค่าเดิมของ Endpoint) / zscore 3 / mad 3.5 / iqr 1.5
+    - method + threshold ตรงกับรอบ Batch: ใช้ Outlier flags ที่คำนวณไว้ (ไม่คำนวณใหม่)
+    """
     stock_key = input_stock.upper().replace('.BK', '')
+    threshold = resolve_request_threshold(method, threshold)
     
     if stock_key in CACHE_TDTS:
-        return _format_cache_response(stock_key, CACHE_TDTS[stock_key], threshold, score_col='T-DTS')
+        _count_cache("tdts", "hit")
+        return _format_cache_response(stock_key, CACHE_TDTS, threshold, method)
     
-    return analyze_stock_tdts(input_stock, start_year, end_year, threshold)
+    _count_cache("tdts", "fallback")
+    return analyze_stock_tdts(input_stock, start_year, end_year, threshold, method)
 
 @app.get("/main_app/analyze_tema/{input_stock}", tags=["Individual Metrics(T-DTS & TEMA)"])
-def api_analyze_tema(input_stock: str, threshold: float = 10.0, start_year: int = 2022, end_year: int = 2026, window: int = 15):
-    """Get TEMA Analysis (Cache -> Live Fallback)"""
+def api_analyze_tema(input_stock: str, threshold: Optional[float] = None, method: OutlierMethod = "absolute",
+                     start_year: int = 2022, end_year: int = 2026, window: int = 15, interval: BarInterval = "1d"):
+    """
+    Get TEMA Analysis (Cache -> Live Fallback)
+    - Outlier = Ret_Bf หรือ Ret_Af เกินเกณฑ์ / threshold ว่าง: absolute 10 (ค่าเดิม) / zscore 3 / mad 3.5 / iqr 1.5
+    - interval='5m' / '1h' ...: TEMA รอบ XD บน bar ระหว่างวัน (window = จำนวน bar) คำนวณสดเสมอ (Cache เป็นรายวัน)
+    """
     stock_key = input_stock.upper().replace('.BK', '')
+    threshold = resolve_request_threshold(method, threshold)
     
-    if stock_key in CACHE_TEMA:
-        # TEMA logic checks both Bf and Af columns
-        return _format_cache_response(stock_key, CACHE_TEMA[stock_key], threshold, score_col='TEMA_Multi')
+    if interval == "1d" and stock_key in CACHE_TEMA:
+        _count_cache("tema", "hit")
+        return _format_cache_response(stock_key, CACHE_TEMA, threshold, method)
         
-    return analyze_stock_tema([input_stock], start_year, end_year, threshold, window)
+    _count_cache("tema", "fallback")
+    return analyze_stock_tema([input_stock], start_year, end_year, threshold, window, method, interval)
 
 # ======================================================
 # 6. DIVIDEND SEASONALITY (pred_XD) (ย้ายมาไว้ตรงนี้ตามลำดับ)
@@ -180,8 +533,7 @@ def api_update_seasonality_cache(background_tasks: BackgroundTasks):
     """
     [POST] คำนวณสถิติปันผล SET50 ทั้งหมดเก็บลง Cache (Min/Max/Avg/Countdown)
     """
-    background_tasks.add_task(_run_seasonality_batch)
-    return {"status": "processing", "message": "Dividend seasonality analysis started in background."}
+    return _queue_refresh(background_tasks, "seasonality", {}, "Dividend seasonality analysis started in background.")
 
 @app.get("/main_app/dividend_statistics/{symbol}", tags=["Dividend Seasonality(pred_XD)"])
 def api_dividend_stats(symbol: str):
@@ -192,17 +544,17 @@ def api_dividend_stats(symbol: str):
         output = []
         for item in raw_data:
             output.append({
-                "Symbol": item['Symbol'],
-                "Tag1_Stats": item.get('Tag1', {}).get('Stats') if item.get('Tag1') else None,
-                "Tag2_Stats": item.get('Tag2', {}).get('Stats') if item.get('Tag2') else None
+                "Symbol": item.symbol,
+                "Tag1_Stats": item.tag1.stats if item.tag1 else None,
+                "Tag2_Stats": item.tag2.stats if item.tag2 else None
             })
         return {"status": "success", "mode": "SET50", "data": output}
     
     return {
         "status": "success",
-        "symbol": raw_data['Symbol'],
-        "Tag1_Stats": raw_data.get('Tag1', {}).get('Stats') if raw_data.get('Tag1') else None,
-        "Tag2_Stats": raw_data.get('Tag2', {}).get('Stats') if raw_data.get('Tag2') else None
+        "symbol": raw_data.symbol,
+        "Tag1_Stats": raw_data.tag1.stats if raw_data.tag1 else None,
+        "Tag2_Stats": raw_data.tag2.stats if raw_data.tag2 else None
     }
 
 @app.get("/main_app/dividend_countdown/{symbol}", tags=["Dividend Seasonality(pred_XD)"])
@@ -217,9 +569,9 @@ def api_dividend_countdown(symbol: str):
         output = []
         for item in raw_data:
             output.append({
-                "Symbol": item['Symbol'],
-                "Tag1_Countdown": item.get('Tag1', {}).get('Countdown') if item.get('Tag1') else None,
-                "Tag2_Countdown": item.get('Tag2', {}).get('Countdown') if item.get('Tag2') else None
+                "Symbol": item.symbol,
+                "Tag1_Countdown": item.tag1.countdown if item.tag1 else None,
+                "Tag2_Countdown": item.tag2.countdown if item.tag2 else None
             })
         try:
             output.sort(key=lambda x: x['Tag1_Countdown']['Days_Remaining'] if x['Tag1_Countdown'] else 999)
@@ -230,11 +582,25 @@ def api_dividend_countdown(symbol: str):
     # ถ้าเป็นรายตัว
     return {
         "status": "success",
-        "symbol": raw_data['Symbol'],
-        "Tag1_Countdown": raw_data.get('Tag1', {}).get('Countdown') if raw_data.get('Tag1') else None,
-        "Tag2_Countdown": raw_data.get('Tag2', {}).get('Countdown') if raw_data.get('Tag2') else None
+        "symbol": raw_data.symbol,
+        "Tag1_Countdown": raw_data.tag1.countdown if raw_data.tag1 else None,
+        "Tag2_Countdown": raw_data.tag2.countdown if raw_data.tag2 else None
     }
 
+@app.post("/main_app/dividend_calendar", tags=["Dividend Seasonality(pred_XD)"])
+def api_dividend_calendar(payload: DividendCalendarInput):
+    """
+    [POST] ปฏิทินเงินปันผลรายเดือนของพอร์ต (symbol + shares) จาก Seasonality Cache
+    - Gross / หัก ณ ที่จ่าย 10% / Net + เครดิตภาษี (ตาม cit_rate ของแต่ละตัว, ค่าเริ่มต้น 20%)
+    - ปีถัดไปใช้วันที่และปันผลเดิมซ้ำ (สูงสุด 36 เดือน)
+    """
+    snapshot = CACHE_SEASONALITY.versioned_snapshot()
+    if not snapshot[0]:
+        raise HTTPException(status_code=400, detail="Cache empty. Run POST /update_seasonality_cache first.")
+    schedule = payout_schedule(snapshot)
+    data = project_dividend_calendar([h.model_dump() for h in payload.holdings], schedule, payload.months)
+    return {"status": "success", "as_of": schedule['as_of'], "months": payload.months, "data": data}
+
 # ======================================================
 # 7. TECHNICAL ANALYSIS (macd+rsi) (ย้ายมาไว้ตรงนี้ตามลำดับ)
 # ======================================================
@@ -243,31 +609,90 @@ def api_update_indicator_cache(payload: TechnicalBatchInput, background_tasks: B
     """
     [POST] Trigger Background Task to calculate MACD/RSI for ALL SET50 stocks.
     """
-    background_tasks.add_task(_run_technical_batch_analysis, start_year=payload.start_year)
-    return {
-        "status": "processing", 
-        "message": f"Technical analysis started from {payload.start_year} in background."
-    }
+    unknown = [name for name in payload.indicators if name not in INDICATORS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown indicators {unknown}. Choose from {list(INDICATORS)}.")
+    return _queue_refresh(background_tasks, "technical", payload.model_dump(),
+                          f"Technical analysis started from {payload.start_year} in background.")
+
+def _parse_fields(fields: Optional[str], allowed: List[str]) -> Optional[List[str]]:
+    """'RSI,Hist' -> ['RSI', 'Hist'] (None = ทุก field)"""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in selected if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}. Choose from {allowed}.")
+    return selected
+
+@app.get("/main_app/indicators", tags=["Technical Analysis(macd+rsi)"])
+def api_list_indicators():
+    """[GET] Indicator Registry: inputs / outputs / params / warm-up ของแต่ละตัว"""
+    return {"status": "success", "data": list_indicators()}
 
 @app.get("/main_app/technical_history/{symbol}", tags=["Technical Analysis(macd+rsi)"])
-def api_get_technical_history(symbol: str):
+def api_get_technical_history(
+    symbol: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    last_n: Optional[int] = Query(default=None, ge=1),
+    fields: Optional[str] = None,
+    shape: Literal["rows", "columns"] = "rows",
+    format: Literal["json", "msgpack", "arrow"] = "json",
+    interval: BarInterval = "1d"
+):
     """
-    [GET] Retrieve 1-Year Historical Technical Data (MACD/RSI) from Cache.
+    [GET] Historical Technical Data (MACD/RSI) from Cache.
+    - ค่าเริ่มต้น: ย้อนหลัง 1 ปี แบบ rows (เหมือนเดิม)
+    - start / end / last_n: ช่วงวันที่ หรือ N วันล่าสุด
+    - fields: เลือกเฉพาะบาง field เช่น 'RSI,Hist' (Date มีเสมอ)
+    - shape=columns: {"Date": [...], "RSI": [...]} แทน list ของ row
+    - format=msgpack | arrow: Binary (Columnar เสมอ) ต้องติดตั้ง msgpack / pyarrow
+    - interval='5m' / '1h' ...: คำนวณสดจาก bar ระหว่างวันใน PriceStore (Date = 'YYYY-MM-DD HH:MM')
+      ค่าเริ่มต้นคืนทุก bar ที่ย้อนหลังได้ / Indicator ตาม fields (ว่าง = RSI + MACD + TEMA)
     """
     stock_key = symbol.upper().replace('.BK', '')
+    selected = _parse_fields(fields, technical_fields())
     
-    if stock_key not in TECHNICAL_CACHE:
-        raise HTTPException(status_code=404, detail="Data not in cache. Run POST /update_indicator_cache first.")
-        
-    full_history = TECHNICAL_CACHE[stock_key]
-    one_year_ago = (date.today() - relativedelta(years=1)).strftime('%Y-%m-%d')
+    if interval != "1d":
+        result = get_technical_history(stock_key, start and start.isoformat(), None, columnar=True,
+                                       indicators=indicators_for_fields(selected), interval=interval)
+        if result.get('status') != 'success':
+            raise HTTPException(status_code=404, detail=result.get('message'))
+        history, source = result['data'], "live"
+        period = "max" if start is None and end is None and last_n is None else "custom"
+    else:
+        if stock_key not in TECHNICAL_CACHE:
+            _count_cache("technical", "miss")
+            raise HTTPException(status_code=404, detail="Data not in cache. Run POST /update_indicator_cache first.")
+            
+        _count_cache("technical", "hit")
+        history, source = TECHNICAL_CACHE[stock_key], "cache"
+        period = "1 year" if start is None and end is None and last_n is None else "custom"
+        if start is None and last_n is None:
+            start = date.today() - relativedelta(years=1)
     
-    filtered_data = [r for r in full_history if r['Date'] >= one_year_ago]
+    columns = slice_history(
+        history,
+        start=start and start.isoformat(), end=end and end.isoformat(),
+        last_n=last_n, fields=selected
+    )
     
-    return {
-        "status": "success", "symbol": stock_key, "source": "cache",
-        "period": "1 year", "data": filtered_data
-    }
+    if format != "json":
+        try:
+            payload, media_type = encode_columns(columns, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return Response(content=payload, media_type=media_type)
+    
+    # ข้อมูลเป็น JSON-native อยู่แล้ว -> ส่งตรงด้วย JSONResponse (ข้าม jsonable_encoder ที่ช้ากับ list ยาว ๆ)
+    return JSONResponse({
+        "status": "success", "symbol": stock_key, "source": source, "interval": interval, "period": period,
+        "start": columns['Date'][0] if columns['Date'] else None,
+        "end": columns['Date'][-1] if columns['Date'] else None,
+        "count": len(columns['Date']),
+        "data": columns if shape == "columns" else columns_to_rows(columns)
+    })
 
 # ======================================================
 # 8. VALUATION (GGM)
@@ -282,12 +707,8 @@ def api_update_ggm_cache(payload: GGMInput, background_tasks: BackgroundTasks):
     task_payload = payload.model_dump()
     task_payload['tickers'] = None
 
-    background_tasks.add_task(_run_ggm_batch_task, payload_dict=task_payload)
-
-    return {
-        "status": "processing", 
-        "message": f"GGM Valuation analysis started (Years={payload.years}) for ALL SET50 in background."
-    }
+    return _queue_refresh(background_tasks, "ggm", task_payload,
+                          f"GGM Valuation analysis started (Years={payload.years}) for ALL SET50 in background.")
 
 @app.get("/main_app/valuation_ggm/{symbol}", tags=["Valuation (GGM)"])
 def api_get_ggm_result(symbol: str):
@@ -296,140 +717,388 @@ def api_get_ggm_result(symbol: str):
     - symbol: ใส่ชื่อหุ้น (เช่น 'ADVANC') หรือ 'SET50' เพื่อดูทั้งหมด
     """
     if not CACHE_GGM:
+        _count_cache("ggm", "miss")
         raise HTTPException(status_code=400, detail="Cache empty. Please run POST /update_ggm_cache first.")
     
     symbol_upper = symbol.upper().replace('.BK', '')
     
     if symbol_upper == 'SET50':
+        _count_cache("ggm", "hit")
         all_results = list(CACHE_GGM.values())
-        all_results.sort(key=lambda x: x['Diff_Percent'], reverse=True)
+        all_results.sort(key=lambda x: x.diff_percent, reverse=True)
         return {
             "status": "success", 
             "source": "cache", 
             "count": len(all_results), 
-            "data": all_results
+            "data": all_results,
+            "failed": CACHE_GGM.failed()
         }
     
 
     if symbol_upper in CACHE_GGM:
+        _count_cache("ggm", "hit")
         return {
             "status": "success", 
             "source": "cache", 
             "data": CACHE_GGM[symbol_upper]
         }
     
+    _count_cache("ggm", "miss")
+    ggm_failed = CACHE_GGM.failed()
+    if symbol_upper in ggm_failed:
+        raise HTTPException(status_code=404, detail=f"Stock '{symbol_upper}' not valued: {ggm_failed[symbol_upper]}")
+    
+    raise HTTPException(status_code=404, detail=f"Stock '{symbol_upper}' not found in cache.")
+
+@app.post("/main_app/update_ggm_mc_cache", tags=["Valuation (GGM)"])
+def api_update_ggm_mc_cache(payload: GGMMonteCarloInput, background_tasks: BackgroundTasks):
+    """
+    [POST] Trigger Background Task: Monte Carlo DDM (Bootstrap ปันผล + ราคา) สำหรับ SET50 ทั้งหมด
+    """
+    return _queue_refresh(background_tasks, "ggm_mc", payload.model_dump(),
+                          f"Monte Carlo DDM started ({payload.n_paths} paths/stock, seed={payload.seed}) in background.")
+
+@app.get("/main_app/valuation_ggm_mc/{symbol}", tags=["Valuation (GGM)"])
+def api_get_ggm_mc_result(symbol: str):
+    """
+    [GET] ดึงผล Monte Carlo DDM (Percentile Target Prices) จาก Cache
+    - symbol: ใส่ชื่อหุ้น หรือ 'SET50' เพื่อดูทั้งหมด
+    """
+    if not CACHE_GGM_MC:
+        _count_cache("ggm_mc", "miss")
+        raise HTTPException(status_code=400, detail="Cache empty. Please run POST /update_ggm_mc_cache first.")
+    
+    symbol_upper = symbol.upper().replace('.BK', '')
+    
+    if symbol_upper == 'SET50':
+        _count_cache("ggm_mc", "hit")
+        all_results = sorted(CACHE_GGM_MC.values(), key=lambda x: x['Expected_Diff_Percent'], reverse=True)
+        return {"status": "success", "source": "cache", "count": len(all_results), "data": all_results}
+    
+    if symbol_upper in CACHE_GGM_MC:
+        _count_cache("ggm_mc", "hit")
+        return {"status": "success", "source": "cache", "data": CACHE_GGM_MC[symbol_upper]}
+    
+    _count_cache("ggm_mc", "miss")
     raise HTTPException(status_code=404, detail=f"Stock '{symbol_upper}' not found in cache.")
 
 # ======================================================
-# INTERNAL HELPER FUNCTIONS (Background Tasks & Utils)
+# 9. CORRELATION & COVARIANCE (Cross-sectional)
+# ======================================================
+def _require_correlation():
+    if not len(CORRELATION):
+        raise HTTPException(status_code=404, detail="Correlation not ready. Run POST /update_indicator_cache first.")
+
+@app.get("/main_app/correlation/peers/{symbol}", tags=["Correlation & Covariance"])
+def api_correlation_peers(symbol: str, n: int = Query(default=5, ge=1, le=50), least: bool = False):
+    """
+    [GET] หุ้นที่ผลตอบแทนเคลื่อนไหวไปด้วยกันมากที่สุดกับ symbol (least=true -> น้อยที่สุด / ตัวช่วยกระจายความเสี่ยง)
+    """
+    _require_correlation()
+    stock_key = symbol.upper().replace('.BK', '')
+    peers = CORRELATION.peers(stock_key, n=n, ascending=least)
+    if peers is None:
+        _count_cache("correlation", "miss")
+        raise HTTPException(status_code=404, detail=f"Stock '{stock_key}' not in correlation matrix.")
+    _count_cache("correlation", "hit")
+    return {"status": "success", "symbol": stock_key, **CORRELATION.status(), "data": peers}
+
+@app.get("/main_app/correlation/matrix", tags=["Correlation & Covariance"])
+def api_correlation_matrix(symbols: Optional[str] = None, kind: Literal["corr", "cov"] = "corr", annualize: bool = False):
+    """
+    [GET] Correlation / Covariance matrix (rolling window ผลตอบแทนรายวัน)
+    - symbols: comma-separated (ว่าง = ทั้ง Universe)
+    - annualize: covariance × 252 (ใช้กับ kind=cov)
+    """
+    _require_correlation()
+    selected = [s.strip().upper().replace('.BK', '') for s in symbols.split(',') if s.strip()] if symbols else None
+    _count_cache("correlation", "hit")
+    return {"status": "success", **CORRELATION.matrix(kind, selected, annualize)}
+
+@app.get("/main_app/correlation/clusters", tags=["Correlation & Covariance"])
+def api_cluster_diversification():
+    """
+    [GET] ต่อ Cluster_Name (จาก Scoring Cache): avg correlation ภายในกลุ่ม vs นอกกลุ่ม
+    """
+    _require_correlation()
+    if not CACHE_SCORING:
+        raise HTTPException(status_code=404, detail="Scoring cache is empty. Run POST /update_scoring_cache first.")
+    clusters = {key: row.cluster_name for key, row in CACHE_SCORING.items()}
+    return {"status": "success", **CORRELATION.status(), "data": CORRELATION.cluster_diversification(clusters)}
+
+# ======================================================
+# 10. PORTFOLIO OPTIMIZER
 # ======================================================
+@app.post("/main_app/portfolio/optimize", tags=["Portfolio Optimizer"])
+def api_optimize_portfolio(payload: PortfolioInput):
+    """
+    [POST] จัดสรรน้ำหนักพอร์ตจาก Cache: Total_Score / Cluster (Scoring), Upside + Yield (GGM),
+    เดือนที่ได้รับปันผล (Seasonality) และ Covariance (Correlation service)
+    - ตัวเลขเปอร์เซ็นต์ทั้งหมดเป็นต่อปี, Solver warm-start จากคำตอบก่อนหน้า -> ปรับ constraint แบบ what-if ได้เร็ว
+    """
+    _require_correlation()
+    if not CACHE_SCORING:
+        raise HTTPException(status_code=404, detail="Scoring cache is empty. Run POST /update_scoring_cache first.")
+
+    symbols = [s.upper().replace('.BK', '') for s in payload.symbols] if payload.symbols else None
+    exclude = sorted(payload.exclude_clusters)
+    key = (CACHE_SCORING.version, CACHE_GGM.version, CACHE_SEASONALITY.version, CORRELATION.version,
+           tuple(symbols or ()), tuple(exclude))
+
+    def _build():
+        cov_tickers, cov = CORRELATION.covariance(annualize=True)
+        return build_universe(CACHE_SCORING.snapshot(), CACHE_GGM.snapshot(), CACHE_SEASONALITY.snapshot(),
+                              cov_tickers, cov, symbols=symbols, exclude_clusters=exclude)
+
+    universe = PORTFOLIO_OPTIMIZER.universe(key, _build)
+    pct = lambda v: None if v is None else v / 100
+    result = PORTFOLIO_OPTIMIZER.optimize(
+        universe, objective=payload.objective, risk_aversion=payload.risk_aversion,
+        min_yield=pct(payload.min_yield), max_volatility=pct(payload.max_volatility),
+        min_upside=pct(payload.min_upside), max_weight=pct(payload.max_weight),
+        max_cluster_weight=pct(payload.max_cluster_weight), max_month_share=pct(payload.max_month_share),
+        capital=payload.capital
+    )
+    if result['status'] != 'success':
+        raise HTTPException(status_code=422, detail=result)
+    return {**result, "as_of": CORRELATION.status()['as_of']}
+
+# ======================================================
+# 11. RESEARCH EXPORT (Streaming จาก Cache)
+# ======================================================
+ExportDataset = Literal["tdts", "tema", "technical", "ggm"]   # Func_app/export.py
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+EXPORT_CACHES = {"tdts": CACHE_TDTS, "tema": CACHE_TEMA, "technical": TECHNICAL_CACHE, "ggm": CACHE_GGM}
 
-def _run_scoring_batch_analysis(payload_dict: Dict):
-    """Background Task: Run Clustering & Update Scoring Caches"""
-    global CACHE_SCORING, CACHE_TDTS, CACHE_TEMA
+def _export_response(names: List[str], format: str, symbols: Optional[str], combined: bool):
+    """StreamingResponse จาก snapshot ของแต่ละ Cache (ตรวจ format / Cache ว่างก่อนเริ่ม stream)"""
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # (data, version) จาก state เดียวกันต่อ Cache -> X-Cache-Versions ตรงกับข้อมูลที่ stream จริง
+    snapshots = {name: EXPORT_CACHES[name].versioned_snapshot() for name in names}
+    ready = [name for name in names if snapshots[name][0]]
+    for name in names:
+        _count_cache(name, "hit" if name in ready else "miss")
+    if not ready or (not combined and len(ready) < len(names)):
+        raise HTTPException(status_code=404, detail=f"Cache empty for {[n for n in names if n not in ready]}. Run POST /update_* first.")
     
+    selected = [s.strip().upper().replace('.BK', '') for s in symbols.split(',') if s.strip()] if symbols else None
+    versions = ",".join(f"{name}={snapshots[name][1]}" for name in ready)
+    datasets = [build_dataset(name, snapshots[name][0], selected) for name in ready]
+    chunks, media_type, filename = stream_datasets(datasets, format) if combined else stream_dataset(datasets[0], format)
+    return StreamingResponse(chunks, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Cache-Versions": versions
+    })
+
+@app.get("/main_app/export", tags=["Research Export"])
+def api_export_all(format: ExportFormat = "ndjson", datasets: Optional[str] = None, symbols: Optional[str] = None):
+    """
+    [GET] Research dataset ทั้งชุดใน request เดียว (ข้าม dataset ที่ Cache ยังว่าง)
+    - format=ndjson: ทุก dataset ต่อกัน แต่ละแถวมี "Dataset" / csv, parquet: ZIP 1 ไฟล์ต่อ dataset
+    - datasets='tdts,technical' (ว่าง = tdts, tema, technical, ggm) / symbols='PTT,AOT' (ว่าง = ทุกหุ้น)
+    - X-Cache-Versions: version ของแต่ละ Cache ที่ export
+    """
+    names = list(dict.fromkeys(d.strip() for d in datasets.split(',') if d.strip())) if datasets else list(EXPORT_CACHES)
+    unknown = [d for d in names if d not in EXPORT_CACHES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown datasets {unknown}. Choose from {list(EXPORT_CACHES)}.")
+    return _export_response(names, format, symbols, combined=True)
+
+@app.get("/main_app/export/{dataset}", tags=["Research Export"])
+def api_export_dataset(dataset: ExportDataset, format: ExportFormat = "ndjson", symbols: Optional[str] = None):
+    """
+    [GET] Stream ทั้งตารางของ dataset เดียวจาก Cache ทีละ chunk (memory คงที่ไม่ขึ้นกับจำนวนหุ้น / ความยาวประวัติ)
+    - tdts / tema: ทุก XD event + Outlier flag จากรอบ Batch / technical: แถวละ (Symbol, Date) / ggm: แถวละหุ้น
+    - format=parquet ต้องติดตั้ง pyarrow
+    """
+    return _export_response([dataset], format, symbols, combined=False)
+
+# ======================================================
+# INTERNAL HELPER FUNCTIONS (Background Tasks & Utils)
+# ======================================================
+
+def _queue_refresh(background_tasks: BackgroundTasks, job: str, payload_dict: Dict, message: str) -> Dict:
+    """
+    ส่งงาน refresh ให้ Scheduler รันใน background
+    - job เดียวกันกำลังรันอยู่ -> 409 (run_job จะข้ามงานนี้ -> params ใหม่หายเงียบ ๆ ถ้าตอบ processing)
+    """
+    if REFRESH_SCHEDULER.is_busy(job):
+        raise HTTPException(status_code=409, detail=f"Refresh '{job}' is already running. Retry after it finishes (see GET /main_app/cache_status).")
+    background_tasks.add_task(REFRESH_SCHEDULER.run_job, job, payload_dict)
+    return {"status": "processing", "message": message}
+
+def _cache_writer(cache: VersionedCache, payload_dict: Dict):
+    """Callback on_result ของ Analyzer: เขียนหุ้นแต่ละตัวลง Cache ทันทีที่คำนวณเสร็จ"""
+    return lambda key, value: cache.put(key, value, params=payload_dict)
+
+def _finish_refresh(cache: VersionedCache, label: str, failed: Dict[str, str], payload_dict: Dict,
+                    tickers: Optional[List[str]], started_at: datetime):
+    """หุ้นที่ล้มเหลวเข้า Retry queue (ค่าเดิมยังอยู่) / รอบเต็มเท่านั้นที่นับเป็น refresh ของทั้ง Cache"""
+    for key, reason in failed.items():
+        cache.mark_failed(key, reason)
+    if not tickers:
+        cache.mark_refreshed(payload_dict, started_at)
+    print(f"✅ CACHE UPDATED: {label} ({len(cache)} stocks, v{cache.version})")
+    if failed:
+        print(f"⚠️ {label} queued for retry ({len(failed)}): {failed}")
+
+def _run_scoring_batch_analysis(payload_dict: Dict, tickers: Optional[List[str]] = None):
+    """Background Task: Run Clustering & Update Scoring Caches (ต้องใช้ทั้ง Universe -> สลับทั้งชุด)"""
     payload = BatchInput(**payload_dict)
     result = process_cluster_and_score(
         tickers=None, 
         start_year=payload.start_year, end_year=payload.end_year,
-        window=payload.window, threshold=payload.threshold
+        window=payload.window, threshold=payload.threshold,
+        cluster_mode=payload.cluster_mode, outlier_method=payload.outlier_method
     )
     
     if result.get('status') == 'success':
         # Update Scoring Cache
-        CACHE_SCORING = {item['Stock']: item for item in result['data']}
-        
+        CACHE_SCORING.replace({item.stock: item for item in result['data']}, params=payload_dict)
+
         # Helper to group raw list by stock
         def group_by_stock(raw_list):
             grouped = {}
             for item in raw_list:
-                s = item['Stock'].upper().replace('.BK', '')
+                s = item.stock
                 if s not in grouped: grouped[s] = []
                 grouped[s].append(item)
             return grouped
 
-        CACHE_TDTS = group_by_stock(result.get('raw_tdts', []))
-        CACHE_TEMA = group_by_stock(result.get('raw_tema', []))
-        
+        CACHE_TDTS.replace(group_by_stock(result.get('raw_tdts', [])), params=payload_dict)
+        CACHE_TEMA.replace(group_by_stock(result.get('raw_tema', [])), params=payload_dict)
+
+        # History บันทึกหลัง Cache ทุกตัวสลับเสร็จ -> append ล้มเหลว (เช่น เวลาย้อนหลัง) ไม่ทำให้ Cache ค้างชุดเก่า
+        try:
+            SCORE_HISTORY.append(datetime.now(), result['data'])
+        except ValueError as e:
+            print(f"⚠️ SCORE HISTORY NOT SAVED: {e}")
+
         print(f"✅ CACHE UPDATED: Scoring ({len(CACHE_SCORING)})")
     else:
-        print(f"❌ CACHE UPDATE FAILED: {result.get('message')}")
+        raise RuntimeError(f"Scoring batch failed: {result.get('message')}")
 
-def _run_technical_batch_analysis(start_year: int):
-    """Background Task: Run Technical Analysis & Update Cache"""
-    global TECHNICAL_CACHE
-    result = analyze_technical_batch(start_year=start_year)
+def _run_technical_batch_analysis(payload_dict: Dict, tickers: Optional[List[str]] = None):
+    """Background Task: Run Technical Analysis & Update Cache ทีละหุ้น"""
+    started_at = market_now()
+    result = analyze_technical_batch(
+        start_year=payload_dict['start_year'], tickers=tickers,
+        on_result=_cache_writer(TECHNICAL_CACHE, payload_dict),
+        indicators=payload_dict.get('indicators')
+    )
     
     if result.get('status') == 'success':
-        TECHNICAL_CACHE = result['data']
-        print(f"✅ CACHE UPDATED: Technical ({len(TECHNICAL_CACHE)})")
+        _finish_refresh(TECHNICAL_CACHE, "Technical", result['failed'], payload_dict, tickers, started_at)
+        _refresh_correlation()
     else:
-        print(f"❌ CACHE UPDATE FAILED: {result.get('message')}")
+        raise RuntimeError(f"Technical batch failed: {result.get('message')}")
 
-def _format_cache_response(stock_key, raw_data, threshold, score_col):
-    """Format raw cache list into Clean/Unclean structure"""
-    df = pd.DataFrame(raw_data)
-    
-    if score_col == 'TEMA_Multi':
-        is_outlier = (df['Ret_Bf_TEMA (%)'].abs() > threshold) | (df['Ret_Af_TEMA (%)'].abs() > threshold)
+def _refresh_correlation():
+    """Correlation ใช้ราคาปิดจาก Technical Cache ที่ดึงมาแล้ว (bar ใหม่ต่อท้าย -> update แบบ rolling sums)"""
+    try:
+        update = CORRELATION.update(TECHNICAL_CACHE.snapshot())
+        print(f"✅ CORRELATION UPDATED: {update['mode']} (+{update['added']} bars, v{update.get('version')})")
+    except Exception as e:
+        print(f"❌ CORRELATION UPDATE FAILED: {str(e)}")
+
+# การกระจายของ event ทั้ง Universe ต่อ (Cache, method) -> (version, stats) สลับทั้ง tuple ด้วย assignment เดียว
+_OUTLIER_STATS: Dict[tuple, tuple] = {}
+
+def _universe_stats(name: str, snapshot: Dict, version: int, method: str):
+    """mean / median / quartile ของทุก event ใน snapshot (คำนวณใหม่เมื่อ Cache เปลี่ยน version เท่านั้น)"""
+    cached = _OUTLIER_STATS.get((name, method))
+    if cached and cached[0] == version:
+        return cached[1]
+    stats = distribution_stats(record_values([e for events in snapshot.values() for e in events]), method)
+    _OUTLIER_STATS[(name, method)] = (version, stats)
+    return stats
+
+def _format_cache_response(stock_key: str, cache: VersionedCache, threshold: float, method: str):
+    """
+    Format raw cache list (TdtsEvent / TemaEvent) into Clean/Unclean structure
+    - method + threshold ตรงกับรอบ Batch: ใช้ flag ที่คำนวณไว้ทั้ง Universe (record.outlier)
+    - absolute: mask ใหม่จาก event ของหุ้นตัวนี้ (ไม่ขึ้นกับการกระจาย)
+    - zscore / mad / iqr: วัดกับการกระจายของทั้ง Universe ใน Cache เหมือนรอบ Batch
+      (ไม่คิดสถิติจาก event ไม่กี่ตัวของหุ้นเดียว) / ไม่แก้ flag ใน Cache
+    """
+    snapshot, version = cache.versioned_snapshot()
+    events = snapshot[stock_key]
+    params = cache.params or {}
+    batch_method = params.get('outlier_method', 'absolute')
+    if method == batch_method and threshold == resolve_threshold(batch_method, params.get('threshold')):
+        source, data = "batch", split_outliers(events)
+    elif method == "absolute":
+        source, data = "request", split_outliers(events, outlier_mask(record_values(events), method, threshold))
     else:
-        is_outlier = (df[score_col] < -threshold) | (df[score_col] > threshold)
-        
+        stats = _universe_stats(cache.name, snapshot, version, method)
+        source, data = "universe", split_outliers(events, outlier_mask(record_values(events), method, threshold, stats))
+    outlier_filter = {"method": method, "threshold": threshold, "source": source}
     return {
         "status": "success", "source": "cache", "symbol": stock_key,
-        "data": {
-            "raw_data": df.to_dict(orient='records'),
-            "clean_data": df[~is_outlier].to_dict(orient='records'),
-            "unclean_data": df[is_outlier].to_dict(orient='records')
-        }
+        "outlier_filter": outlier_filter,
+        "data": data
     }
 
-def _run_seasonality_batch():
-    """Background Task"""
-    global CACHE_SEASONALITY
-    result = analyze_seasonality_batch()
+def _run_seasonality_batch(payload_dict: Dict, tickers: Optional[List[str]] = None):
+    """Background Task (อัปเดต Cache ทีละหุ้น)"""
+    started_at = market_now()
+    result = analyze_seasonality_batch(tickers=tickers, on_result=_cache_writer(CACHE_SEASONALITY, payload_dict))
     if result.get('status') == 'success':
-        CACHE_SEASONALITY = result['data']
-        print(f"✅ CACHE UPDATED: Seasonality ({len(CACHE_SEASONALITY)})")
+        _finish_refresh(CACHE_SEASONALITY, "Seasonality", result['failed'], payload_dict, tickers, started_at)
     else:
-        print("❌ CACHE UPDATE FAILED: Seasonality")
+        raise RuntimeError(f"Seasonality batch failed: {result.get('message')}")
 
 def get_seasonality_from_cache(symbol_input: str):
     if not CACHE_SEASONALITY:
+        _count_cache("seasonality", "miss")
         raise HTTPException(status_code=400, detail="Cache empty. Please run POST /update_seasonality_cache first.")
     
     key = symbol_input.upper().replace('.BK', '')
     
     if key == 'SET50':
+        _count_cache("seasonality", "hit")
         return list(CACHE_SEASONALITY.values())
     
     if key in CACHE_SEASONALITY:
+        _count_cache("seasonality", "hit")
         return CACHE_SEASONALITY[key]
     
+    _count_cache("seasonality", "miss")
     raise HTTPException(status_code=404, detail=f"Stock '{key}' not found in cache.")
 
-def _run_ggm_batch_task(payload_dict: Dict):
-    """Background Task: Run GGM Calculation & Update Cache"""
-    global CACHE_GGM
-    
-    
+def _run_ggm_batch_task(payload_dict: Dict, tickers: Optional[List[str]] = None):
+    """Background Task: Run GGM Calculation & Update Cache ทีละหุ้น (error -> Scheduler เก็บเป็น last_error)"""
     print(f"🔄 Starting GGM Calculation...")
+    started_at = market_now()
     
-    try:
-        results_list = analyze_ggm_batch(
-            tickers=payload_dict.get('tickers'),
-            years=payload_dict.get('years', 3),
-            r_expected=payload_dict.get('r_expected', 0.05),
-            growth_rate=payload_dict.get('growth_rate', 0.04)
-        )
-        
-        new_cache = {}
-        for item in results_list:
-            stock_key = item['Symbol'].upper().replace('.BK', '')
-            new_cache[stock_key] = item
-            
-        CACHE_GGM = new_cache
-        print(f"✅ CACHE UPDATED: GGM Valuation ({len(CACHE_GGM)} stocks)")
-        
-    except Exception as e:
-        print(f"❌ GGM CALCULATION FAILED: {str(e)}")
\ No newline at end of file
+    result = analyze_ggm_batch(
+        tickers=tickers or payload_dict.get('tickers'),
+        years=payload_dict.get('years', 3),
+        r_expected=payload_dict.get('r_expected', 0.05),
+        growth_rate=payload_dict.get('growth_rate', 0.04),
+        on_result=_cache_writer(CACHE_GGM, payload_dict)
+    )
+    _finish_refresh(CACHE_GGM, "GGM Valuation", result['failed'], payload_dict, tickers, started_at)
+
+def _run_ggm_mc_batch_task(payload_dict: Dict, tickers: Optional[List[str]] = None):
+    """Background Task: Run Monte Carlo DDM across cores & Update Cache ทีละหุ้นเมื่อผลกลับมา (error -> last_error)"""
+    print(f"🔄 Starting Monte Carlo DDM...")
+    started_at = market_now()
+    
+    result = analyze_ggm_monte_carlo_batch(
+        tickers=tickers, on_result=_cache_writer(CACHE_GGM_MC, payload_dict), **payload_dict
+    )
+    _finish_refresh(CACHE_GGM_MC, "GGM Monte Carlo", result['failed'], payload_dict, tickers, started_at)
+
+# ======================================================
+# AUTO REFRESH JOBS (ลำดับการ register = ลำดับ stagger ตอน start)
+# ======================================================
+REFRESH_SCHEDULER.register("technical", TECHNICAL_CACHE, _run_technical_batch_analysis, TechnicalBatchInput().model_dump())
+REFRESH_SCHEDULER.register("ggm", CACHE_GGM, _run_ggm_batch_task, GGMInput().model_dump())
+REFRESH_SCHEDULER.register("seasonality", CACHE_SEASONALITY, _run_seasonality_batch, {})
+REFRESH_SCHEDULER.register("scoring", CACHE_SCORING, _run_scoring_batch_analysis, BatchInput().model_dump())
+REFRESH_SCHEDULER.register("ggm_mc", CACHE_GGM_MC, _run_ggm_mc_batch_task, GGMMonteCarloInput().model_dump())
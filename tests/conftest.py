@@ -0,0 +1,35 @@
+import os
+import sys
+
+# ทุก test ใช้ข้อมูลจำลอง (deterministic, ไม่ต่อ network) และไม่เปิด background thread
+os.environ["STOCK_DATA_SOURCE"] = "synthetic"
+os.environ["STOCK_AUTO_REFRESH"] = "0"
+os.environ["STOCK_PRELOAD"] = "0"
+os.environ["SCORE_HISTORY_DIR"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def app_module():
+    """main_app พร้อม Cache ว่างทุกตัว (Cache เป็น global ของ module -> ล้างก่อนและหลังแต่ละ test)"""
+    import main_app
+    from Func_app.cache import VersionedCache, _Snapshot
+
+    def reset():
+        for value in vars(main_app).values():
+            if isinstance(value, VersionedCache):
+                value._state = _Snapshot({}, {}, None, None, None, 0)
+                value._retry = {}
+
+    reset()
+    yield main_app
+    reset()
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    with TestClient(app_module.app) as c:
+        yield c
@@ -0,0 +1,25 @@
+import json
+
+from benchmarks.run_benchmarks import STAGES, compare, measure
+from Func_app.DataSource.data_source import SyntheticSource, use_data_source
+from Func_app.DataSource.synthetic import synthetic_tickers
+
+
+def test_every_stage_succeeds_on_a_small_synthetic_universe():
+    tickers = synthetic_tickers(6)
+    with use_data_source(SyntheticSource().preload(tickers)):
+        for name, stage in STAGES.items():
+            result = measure(stage, tickers, repeat=1)
+            assert result["ok_count"] > 0, name
+            assert result["seconds_min"] >= 0 and result["peak_mb"] >= 0
+
+
+def test_compare_flags_regressions(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"meta": {"git_commit": "abc"}, "results": [
+        {"stage": "tdts", "n_tickers": 50, "seconds_min": 1.0},
+        {"stage": "tema", "n_tickers": 50, "seconds_min": 1.0}]}))
+    within = {"results": [{"stage": "tdts", "n_tickers": 50, "seconds_min": 1.1}]}
+    slower = {"results": [{"stage": "tema", "n_tickers": 50, "seconds_min": 1.5}]}
+    assert not compare(within, str(baseline), tolerance=0.2)
+    assert compare(slower, str(baseline), tolerance=0.2)
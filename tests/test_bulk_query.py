@@ -0,0 +1,23 @@
+from Func_app.records import GGMResult, ScoreRecord
+
+
+def test_bulk_query_reports_versions_of_returned_data(app_module, client):
+    app_module.CACHE_SCORING.replace({"PTT": ScoreRecord(stock="PTT", total_score=50.0, cluster_name="A")})
+    app_module.CACHE_GGM.replace({"PTT": GGMResult(symbol="PTT.BK", current_price=30.0, target_price=33.0,
+                                                   diff_percent=10.0, meaning="Undervalue", dividends_flow={})})
+    app_module.CACHE_GGM.put("AOT", GGMResult(symbol="AOT.BK", current_price=60.0, target_price=54.0,
+                                              diff_percent=-10.0, meaning="Overvalue", dividends_flow={}))
+    app_module.TECHNICAL_CACHE.replace({"PTT": {"Date": ["2026-01-02", "2026-01-05"], "Close": [30.0, 31.0],
+                                                "RSI": [50.0, 55.0], "Hist": [0.1, -0.1]}})
+
+    r = client.post("/main_app/bulk_query", json={
+        "symbols": ["ptt", "AOT.BK"], "metrics": ["scoring", "ggm", "technical"],
+        "technical_last_n": 1, "technical_fields": ["RSI", "Momentum"]
+    })
+    body = r.json()
+    assert r.status_code == 200
+    assert body["versions"] == {"scoring": 1, "ggm": 2, "technical": 1}
+    assert body["data"]["PTT"]["scoring"]["Total_Score (%)"] == 50.0
+    assert body["data"]["PTT"]["technical"] == {"Date": ["2026-01-05"], "RSI": [55.0], "Momentum": ["Bearish"]}
+    assert body["data"]["AOT"]["ggm"]["Meaning"] == "Overvalue"
+    assert body["missing"] == {"AOT": ["scoring", "technical"]}
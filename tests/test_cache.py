@@ -0,0 +1,82 @@
+import threading
+
+from Func_app.cache import VersionedCache
+
+
+def test_put_keeps_other_entries_and_bumps_version():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+    v1 = cache.replace({"PTT": 1, "AOT": 2}, params={"a": 1})
+    old = cache.snapshot()
+    v2 = cache.put("PTT", 10, params={"a": 1})
+    assert v2 == v1 + 1
+    assert dict(cache) == {"PTT": 10, "AOT": 2}
+    # snapshot เดิมไม่ถูกแก้ (copy-on-write)
+    assert old == {"PTT": 1, "AOT": 2}
+    assert cache.entry_meta("PTT")["fingerprint"] == cache.status()["fingerprint"]
+
+
+def test_failed_ticker_keeps_previous_value_and_backs_off():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+    cache.replace({"PTT": 1})
+    cache.mark_failed("PTT", "timeout")
+    cache.mark_failed("PTT", "timeout")
+    assert cache["PTT"] == 1
+    assert cache.failed() == {"PTT": "timeout"}
+    assert cache.status()["retry_queue"]["PTT"]["attempts"] == 2
+    assert cache.due_retries(now=0) == []
+    cache.put("PTT", 2)
+    assert cache.failed() == {}
+
+
+def test_readers_never_see_retry_queue_resizing():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            key = f"S{i % 200}"
+            cache.mark_failed(key, "timeout")
+            cache.put(key, i)
+            i += 1
+
+    def reader():
+        try:
+            for _ in range(3000):
+                cache.failed()
+                cache.due_retries()
+                cache.status()
+                sum(1 for _ in cache.items())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads[1:]:
+        t.join()
+    stop.set()
+    threads[0].join()
+    assert errors == []
+
+
+def test_versioned_snapshot_pairs_data_with_its_version():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+    stop = threading.Event()
+
+    def writer():
+        # ค่าที่เขียน = version ที่ put นั้นสร้าง (writer เดียว -> version ต่อเนื่อง)
+        version = cache.version
+        while not stop.is_set():
+            version = cache.put("PTT", version + 1)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(20000):
+            data, version = cache.versioned_snapshot()
+            assert data.get("PTT", 0) == version
+    finally:
+        stop.set()
+        thread.join()
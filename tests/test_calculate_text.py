@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from Func_app.calculate_text import (TAX_BRACKETS, calculate_thai_income_tax, optimize_dividend_tax,
+                                     tax_credit_ratio, tax_crossover_curve)
+
+
+def _loop_tax(income):
+    """ขั้นบันไดแบบวนทีละขั้น (อ้างอิง)"""
+    tax, lower = 0.0, 0.0
+    for limit, rate in TAX_BRACKETS:
+        if income > lower:
+            tax += (min(income, limit) - lower) * rate
+        lower = limit
+    return tax
+
+
+def test_vectorized_brackets_match_loop():
+    incomes = np.array([-5.0, 0.0, 150000.0, 150001.0, 300000.0, 420000.0, 999999.0, 2500000.0, 8000000.0])
+    np.testing.assert_allclose(calculate_thai_income_tax(incomes), [_loop_tax(max(i, 0)) for i in incomes])
+    assert calculate_thai_income_tax(500000.0) == pytest.approx(27500.0)
+    assert isinstance(calculate_thai_income_tax(500000.0), float)
+
+
+def test_tax_credit_ratio():
+    np.testing.assert_allclose(tax_credit_ratio([20.0, 0.0, 100.0]), [0.25, 0.0, 0.0])
+
+
+def test_batch_matches_single_profiles():
+    profiles = [(200000.0, 50000.0, 20.0), (3000000.0, 50000.0, 20.0), (600000.0, 10000.0, 0.0)]
+    batch = optimize_dividend_tax(*map(list, zip(*profiles)))
+    for i, profile in enumerate(profiles):
+        single = optimize_dividend_tax(*profile)
+        assert batch["difference"][i] == single["analysis"]["difference"]
+        assert batch["should_claim"][i] == (single["analysis"]["difference"] > 0)
+    assert batch["should_claim"][:2] == [True, False]
+
+
+def test_crossover_is_where_claiming_stops_paying():
+    curve = tax_crossover_curve(0.0, 3000000.0, 301, 100000.0, 20.0)
+    crossover = curve["crossover_income"]
+    assert crossover is not None
+    assert optimize_dividend_tax(crossover - 10000.0, 100000.0, 20.0)["analysis"]["difference"] > 0
+    assert optimize_dividend_tax(crossover, 100000.0, 20.0)["analysis"]["difference"] <= 0
+    assert len(curve["curve"]["difference"]) == 301
+
+
+def test_batch_endpoint(client):
+    r = client.post("/main_app/calculate_tax_batch", json={"profiles": [
+        {"base_net_income": 200000, "dividend_amount": 50000, "corporate_tax_rate": 20}] * 3})
+    assert r.status_code == 200
+    assert r.json()["count"] == 3 and len(r.json()["data"]["difference"]) == 3
+    assert client.post("/main_app/tax_crossover", json={"income_min": 10, "income_max": 5, "dividend_amount": 1,
+                                                        "corporate_tax_rate": 20}).status_code == 400
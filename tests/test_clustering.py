@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from Func_app.Scoring import main_scoring
+from Func_app.Scoring.main_scoring import fit_clusters, process_cluster_and_score, reset_cluster_state
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state():
+    reset_cluster_state()
+    yield
+    reset_cluster_state()
+
+
+def _blobs(rng, n=40):
+    centers = np.array([[0.0, 0.0, 0.0], [6.0, 0.0, 0.0], [0.0, 6.0, 0.0], [0.0, 0.0, 6.0]])
+    return np.concatenate([c + rng.normal(0, 0.3, (n, 3)) for c in centers])
+
+
+def test_warm_start_keeps_cluster_ids_between_runs():
+    rng = np.random.default_rng(0)
+    X = _blobs(rng)
+    labels, _, _ = fit_clusters(X, 4, mode="full")
+    assert main_scoring._CLUSTER_STATE["centroids"].shape == (4, 3)
+    for mode in ("warm", "minibatch"):
+        again, _, _ = fit_clusters(X + rng.normal(0, 0.05, X.shape), 4, mode=mode)
+        np.testing.assert_array_equal(again, labels)
+
+
+def test_warm_without_state_falls_back_to_full():
+    X = _blobs(np.random.default_rng(1))
+    full, _, _ = fit_clusters(X, 4, mode="full")
+    reset_cluster_state()
+    warm, _, _ = fit_clusters(X, 4, mode="warm")
+    np.testing.assert_array_equal(full, warm)
+
+
+def test_auto_uses_minibatch_for_large_universe(monkeypatch):
+    monkeypatch.setattr(main_scoring, "MINIBATCH_MIN_ROWS", 100)
+    used = []
+    real = main_scoring.MiniBatchKMeans
+    monkeypatch.setattr(main_scoring, "MiniBatchKMeans", lambda **kw: used.append(kw) or real(**kw))
+    fit_clusters(_blobs(np.random.default_rng(2), n=20), 4, mode="auto")
+    assert used == []
+    fit_clusters(_blobs(np.random.default_rng(2), n=40), 4, mode="auto")
+    assert len(used) == 1
+
+
+def test_scoring_batch_on_synthetic_universe():
+    tickers = ["PTT.BK", "AOT.BK", "KBANK.BK", "SCC.BK", "ADVANC.BK", "CPALL.BK"]
+    result = process_cluster_and_score(tickers, 2020, 2025, cluster_mode="warm")
+    assert result["status"] == "success"
+    assert result["params"]["cluster_mode"] == "warm"
+    names = {r.cluster_name for r in result["data"]}
+    assert names <= set(main_scoring.IDEAL_PROFILES)
+    scores = [r.total_score for r in result["data"]]
+    assert scores == sorted(scores, reverse=True)
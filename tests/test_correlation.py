@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from Func_app.DataSource.synthetic import synthetic_ticker_history
+from Func_app.Portfolio.correlation import CorrelationService, RollingMoments, close_matrix
+
+SYMBOLS = ["AOT", "CPALL", "KBANK", "PTT"]
+
+
+def _columns(rows=None, symbols=SYMBOLS):
+    """รูปแบบเดียวกับ Technical Cache: {symbol: {'Date': [...], 'Close': [...]}}"""
+    out = {}
+    for symbol in symbols:
+        hist = synthetic_ticker_history(symbol).iloc[-300:]
+        if rows is not None:
+            hist = hist.iloc[:rows]
+        out[symbol] = {"Date": [d.strftime('%Y-%m-%d') for d in hist.index], "Close": hist["Close"].tolist()}
+    return out
+
+
+def _log_returns(columns):
+    return np.log(close_matrix(columns)).diff().iloc[1:]
+
+
+def test_push_pop_matches_fresh_window():
+    returns = _log_returns(_columns()).to_numpy().copy()
+    returns[5:20, 1] = np.nan    # หุ้นพักการซื้อขายบางช่วง
+    window = 60
+    moments = RollingMoments.from_returns(returns[:window])
+    for i in range(window, len(returns)):
+        moments.push(returns[i])
+        moments.pop(returns[i - window])
+    fresh = RollingMoments.from_returns(returns[-window:])
+    np.testing.assert_allclose(moments.correlation(), fresh.correlation(), atol=1e-9)
+    np.testing.assert_allclose(moments.covariance(), fresh.covariance(), atol=1e-12)
+
+
+def test_pairwise_complete_matches_pandas():
+    returns = _log_returns(_columns())
+    returns.iloc[10:40, 0] = np.nan
+    moments = RollingMoments.from_returns(returns.to_numpy())
+    np.testing.assert_allclose(moments.correlation(), returns.corr().to_numpy(), atol=1e-9)
+    np.testing.assert_allclose(moments.covariance(), returns.cov().to_numpy(), atol=1e-12)
+
+
+def test_update_appends_new_bars_incrementally():
+    service = CorrelationService(window=120, min_periods=20)
+    first = service.update(_columns(rows=250))
+    assert first["mode"] == "rebuild" and first["added"] == 120
+
+    second = service.update(_columns())
+    assert second == {"mode": "incremental", "added": 50, "version": 2}
+    assert service.update(_columns())["mode"] == "unchanged"
+
+    expected = _log_returns(_columns()).iloc[-120:]
+    tickers, corr = service.correlation()
+    assert tickers == sorted(SYMBOLS)
+    np.testing.assert_allclose(corr, expected.corr().to_numpy(), atol=1e-9)
+    _, cov = service.covariance(annualize=True)
+    np.testing.assert_allclose(cov, expected.cov().to_numpy() * 252, atol=1e-10)
+    assert service.status()["as_of"] == expected.index[-1].strftime('%Y-%m-%d')
+
+
+def test_changed_universe_or_history_rebuilds():
+    service = CorrelationService(window=120, min_periods=20)
+    service.update(_columns(rows=250))
+    assert service.update(_columns(symbols=SYMBOLS[:3]))["mode"] == "rebuild"
+
+    revised = _columns()
+    revised["PTT"]["Close"][-100] *= 1.1   # ราคาย้อนหลังใน window เปลี่ยน (เช่น ปรับ split)
+    assert service.update(revised)["mode"] == "rebuild"
+
+
+def test_peers_and_matrix_read_the_cached_result():
+    service = CorrelationService(window=120, min_periods=20)
+    service.update(_columns())
+    tickers, corr = service.correlation()
+    i = tickers.index("PTT")
+
+    peers = service.peers("PTT", n=2)
+    order = [tickers[j] for j in np.argsort(-corr[i]) if j != i]
+    assert [p["Symbol"] for p in peers] == order[:2]
+    assert peers[0]["Observations"] == 120
+    assert service.peers("PTT", n=1, ascending=True)[0]["Symbol"] == order[-1]
+    assert service.peers("UNKNOWN") is None
+
+    subset = service.matrix("corr", symbols=["PTT", "AOT", "UNKNOWN"])
+    assert subset["tickers"] == ["PTT", "AOT"]
+    assert subset["data"][0][0] == 1.0
+    assert subset["data"][0][1] == pytest.approx(corr[i, tickers.index("AOT")], abs=1e-6)
+
+
+def test_cluster_diversification_groups_by_name():
+    service = CorrelationService(window=120, min_periods=20)
+    service.update(_columns())
+    result = service.cluster_diversification({"AOT": "A", "CPALL": "A", "KBANK": "B", "PTT": ""})
+    assert set(result) == {"A", "B", "Unclassified"}
+    assert result["A"]["Members"] == 2
+    _, corr = service.correlation(["AOT", "CPALL"])
+    assert result["A"]["Avg_Corr_Within"] == pytest.approx(corr[0, 1], abs=1e-4)
+    assert result["B"]["Avg_Corr_Within"] is None
+
+
+def test_endpoints_require_update(app_module, client, monkeypatch):
+    service = CorrelationService(window=120, min_periods=20)
+    monkeypatch.setattr(app_module, "CORRELATION", service)
+    assert client.get("/main_app/correlation/peers/PTT").status_code == 404
+
+    service.update(_columns())
+    r = client.get("/main_app/correlation/peers/PTT.BK", params={"n": 3})
+    assert r.status_code == 200
+    assert len(r.json()["data"]) == 3
+    assert client.get("/main_app/correlation/peers/UNKNOWN").status_code == 404
+    matrix = client.get("/main_app/correlation/matrix", params={"symbols": "PTT,AOT"}).json()
+    assert matrix["tickers"] == ["PTT", "AOT"]
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from Func_app.DataSource.data_source import DataSource, ReplaySource, SyntheticSource, create_data_source
+from Func_app.DataSource.replay import load_fixtures, save_fixture
+from Func_app.DataSource.synthetic import synthetic_ticker_history
+
+
+def test_synthetic_history_is_deterministic_per_ticker():
+    a = synthetic_ticker_history("PTT.BK", seed=42)
+    pd.testing.assert_frame_equal(a, synthetic_ticker_history("PTT.BK", seed=42))
+    assert not a["Close"].equals(synthetic_ticker_history("AOT.BK", seed=42)["Close"])
+    assert (a["Dividends"] > 0).any()
+
+
+def test_fixture_round_trip_replays_like_yfinance(tmp_path):
+    hist = synthetic_ticker_history("PTT.BK", start="2024-01-01")
+    save_fixture("PTT.BK", hist, str(tmp_path))
+    source = ReplaySource(fixtures_dir=str(tmp_path))
+    assert source.tickers() == ["PTT.BK"]
+    assert list(load_fixtures(str(tmp_path))) == ["PTT.BK"]
+
+    ticker = source.ticker("ptt.bk")
+    raw = ticker.history(start="2024-03-01", end="2024-04-01", auto_adjust=False)
+    adjusted = ticker.history(start="2024-03-01", end="2024-04-01")
+    assert raw.index.min() >= pd.Timestamp("2024-03-01", tz="Asia/Bangkok")
+    assert raw.index.max() < pd.Timestamp("2024-04-01", tz="Asia/Bangkok")
+    pd.testing.assert_series_equal(adjusted["Close"], raw["Adj Close"], check_names=False, rtol=1e-6)
+    assert "Adj Close" not in adjusted
+    assert (ticker.dividends > 0).all()
+    assert ticker.fast_info["last_price"] == float(hist["Close"].iloc[-1])
+
+
+def test_download_has_price_ticker_columns_and_skips_unknown():
+    source = SyntheticSource()
+    df = ReplaySource(frames={"PTT.BK": source._frame("PTT.BK")}).download(["PTT.BK", "NONE.BK"], period="5d")
+    assert {"Open", "High", "Low", "Close", "Volume"} <= set(df.columns.get_level_values(0))
+    assert list(df["Close"].columns) == ["PTT.BK"]
+    assert len(df) <= 5
+
+
+def test_unknown_source_name():
+    with pytest.raises(ValueError, match="Unknown data source"):
+        create_data_source("bloomberg")
+
+
+def test_incomplete_backend_fails_at_construction():
+    class TickerOnly(DataSource):
+        def ticker(self, symbol):
+            return None
+
+    with pytest.raises(TypeError):
+        TickerOnly()
+    with pytest.raises(TypeError):
+        DataSource()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import threading
+
+from Func_app.cache import VersionedCache
+from Func_app.events import CacheEventBus, diff_value, format_sse, stream_events
+from Func_app.records import ScoreRecord
+
+
+def test_diff_value_ops():
+    assert diff_value(None, {"a": 1}) == {"op": "set", "value": {"a": 1}}
+    assert diff_value({"a": 1}, None) == {"op": "delete"}
+    old = {"Date": ["2026-01-02", "2026-01-05"], "RSI": [40.0, 50.0]}
+    new = {"Date": ["2026-01-02", "2026-01-05", "2026-01-06"], "RSI": [40.0, 52.0, 55.0]}
+    # แถวสุดท้ายของค่าเดิมอาจถูกแก้ระหว่างวัน -> ส่งตั้งแต่แถวนั้น
+    assert diff_value(old, new) == {"op": "tail", "columns": {"Date": ["2026-01-05", "2026-01-06"], "RSI": [52.0, 55.0]}}
+    a = ScoreRecord(stock="PTT", total_score=50.0, cluster_name="A")
+    b = ScoreRecord(stock="PTT", total_score=55.0, cluster_name="A")
+    patch = diff_value(a, b)
+    assert patch["op"] == "patch" and patch["changed"] == {"Total_Score (%)": 55.0} and patch["removed"] == []
+
+
+def test_bus_delivers_filtered_diffs_from_writer_threads():
+    async def scenario():
+        bus = CacheEventBus()
+        cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+        bus.watch(cache)
+        sub = bus.subscribe(symbols=["ptt.bk"], caches=["unit"])
+        writer = threading.Thread(target=lambda: (cache.put("AOT", {"x": 1}), cache.put("PTT", {"x": 2}),
+                                                  cache.mark_refreshed({})))
+        writer.start()
+        writer.join()
+        events = [await asyncio.wait_for(sub.queue.get(), 1) for _ in range(2)]
+        bus.unsubscribe(sub)
+        return events, bus.subscriber_count()
+
+    events, remaining = asyncio.run(scenario())
+    assert events[0] == {"type": "update", "cache": "unit", "version": 2, "symbol": "PTT",
+                         "diff": {"op": "set", "value": {"x": 2}}}
+    assert events[1]["type"] == "refreshed" and events[1]["version"] == 3
+    assert remaining == 0
+
+
+def test_slow_client_gets_resync():
+    async def scenario():
+        bus = CacheEventBus(max_events=2)
+        cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+        bus.watch(cache)
+        sub = bus.subscribe()
+        for i in range(5):
+            cache.put("PTT", {"x": i})
+        await asyncio.sleep(0)
+        frames = stream_events(sub, is_disconnected=lambda: asyncio.sleep(0, result=True), heartbeat_seconds=0.01)
+        return [frame async for frame in frames]
+
+    frames = asyncio.run(scenario())
+    # event ที่ค้างอยู่ส่งจนหมดก่อน แล้วจึงบอกให้ client ดึง snapshot ใหม่
+    assert frames[0].startswith("retry:")
+    assert [f.split("\n")[0] for f in frames[1:3]] == ["id: unit:1", "id: unit:2"]
+    assert frames[3] == "event: resync\ndata: {}\n\n"
+
+
+def test_format_sse_frame():
+    frame = format_sse({"type": "update", "cache": "tdts", "version": 7, "symbol": "PTT"})
+    head, event, data, _, _ = frame.split("\n")
+    assert head == "id: tdts:7" and event == "event: update"
+    assert json.loads(data[len("data: "):])["symbol"] == "PTT"
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import zipfile
+
+from Func_app.records import GGMResult
+
+
+def _ggm(symbol, price):
+    return GGMResult(symbol=f"{symbol}.BK", current_price=price, target_price=price * 1.1,
+                     diff_percent=10.0, meaning="Undervalue", dividends_flow={"2026": 1.0})
+
+
+TECHNICAL = {"PTT": {"Date": ["2026-01-02", "2026-01-05"], "Close": [30.0, 31.0], "RSI": [50.0, float("nan")],
+                     "MACD": [0.1, 0.2], "Signal": [0.0, 0.1], "Hist": [0.1, 0.1]}}
+
+
+def test_export_technical_ndjson_one_row_per_date(app_module, client):
+    app_module.TECHNICAL_CACHE.replace(TECHNICAL)
+    r = client.get("/main_app/export/technical", params={"format": "ndjson"})
+    assert r.status_code == 200
+    assert r.headers["X-Cache-Versions"] == "technical=1"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [(row["Symbol"], row["Date"]) for row in rows] == [("PTT", "2026-01-02"), ("PTT", "2026-01-05")]
+    assert rows[1]["RSI"] is None
+
+
+def test_export_csv_filters_symbols(app_module, client):
+    app_module.CACHE_GGM.replace({"PTT": _ggm("PTT", 30.0), "AOT": _ggm("AOT", 60.0)})
+    r = client.get("/main_app/export/ggm", params={"format": "csv", "symbols": "aot.bk"})
+    assert r.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 1 and rows[0]["Symbol"] == "AOT.BK"
+
+
+def test_combined_export_skips_empty_caches_and_zips_csv(app_module, client):
+    app_module.TECHNICAL_CACHE.replace(TECHNICAL)
+    app_module.CACHE_GGM.replace({"PTT": _ggm("PTT", 30.0)})
+    r = client.get("/main_app/export", params={"format": "csv"})
+    assert r.status_code == 200
+    assert r.headers["X-Cache-Versions"] == "technical=1,ggm=1"
+    assert sorted(zipfile.ZipFile(io.BytesIO(r.content)).namelist()) == ["ggm.csv", "technical.csv"]
+    assert client.get("/main_app/export/tdts").status_code == 404
+    assert client.get("/main_app/export/ggm", params={"format": "xlsx"}).status_code in (400, 422)
+
+
+def test_combined_export_ignores_repeated_datasets(app_module, client):
+    app_module.TECHNICAL_CACHE.replace(TECHNICAL)
+    app_module.CACHE_GGM.replace({"PTT": _ggm("PTT", 30.0)})
+    r = client.get("/main_app/export", params={"format": "csv", "datasets": "ggm,technical,ggm"})
+    assert zipfile.ZipFile(io.BytesIO(r.content)).namelist() == ["ggm.csv", "technical.csv"]
+    r = client.get("/main_app/export", params={"datasets": "ggm,ggm"})
+    assert len(r.text.splitlines()) == 1
+
+
+def test_version_header_matches_exported_snapshot(app_module, client, monkeypatch):
+    """Writer สลับ version ระหว่างอ่าน version กับอ่านข้อมูล -> header ต้องเป็น version ของข้อมูลที่ stream จริง"""
+    cache = app_module.CACHE_GGM
+    cache.replace({"PTT": _ggm("PTT", 30.0)})
+    real_snapshot = cache.snapshot
+
+    def snapshot_during_refresh():
+        cache.put("AOT", _ggm("AOT", 60.0))
+        return real_snapshot()
+
+    monkeypatch.setattr(cache, "snapshot", snapshot_during_refresh)
+    r = client.get("/main_app/export/ggm")
+    symbols = [json.loads(line)["Symbol"] for line in r.text.splitlines()]
+    version = int(r.headers["X-Cache-Versions"].split("=")[1])
+    assert len(symbols) == version  # version 1 = PTT เท่านั้น / version 2 = PTT + AOT
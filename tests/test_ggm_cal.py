@@ -0,0 +1,13 @@
+from Func_app.GGM.ggm_cal import analyze_ggm_batch
+
+
+def test_retry_with_cache_keys_matches_full_run_symbols():
+    full = analyze_ggm_batch(["PTT.BK", "AOT.BK"], years=3, r_expected=0.05, growth_rate=0.04)
+    written = {}
+    retry = analyze_ggm_batch(["PTT", "aot.bk"], years=3, r_expected=0.05, growth_rate=0.04,
+                              on_result=written.__setitem__)
+    assert full["failed"] == retry["failed"] == {}
+    assert sorted(written) == ["AOT", "PTT"]
+    # retry ด้วย key ของ Cache ได้ Symbol รูปแบบเดียวกับรอบเต็ม ('PTT.BK') -> Cache / Export ไม่ปนกัน
+    assert sorted(r.symbol for r in retry["data"]) == sorted(r.symbol for r in full["data"]) == ["AOT.BK", "PTT.BK"]
+    assert [r.to_dict() for r in retry["data"]] == [r.to_dict() for r in full["data"]]
@@ -0,0 +1,38 @@
+from Func_app.GGM.ggm_monte_carlo import analyze_ggm_monte_carlo_batch, calculate_ddm_monte_carlo
+
+PARAMS = dict(years=3, r_expected=0.05, n_paths=500, seed=7, max_workers=1)
+
+
+def test_retry_subset_matches_full_run_and_single_stock():
+    full = analyze_ggm_monte_carlo_batch(["PTT.BK", "AOT.BK", "KBANK.BK"], **PARAMS)
+    retry = analyze_ggm_monte_carlo_batch(["KBANK.BK"], **PARAMS)
+    by_symbol = {row["Symbol"]: row for row in full["data"]}
+    assert full["failed"] == {}
+    assert retry["data"][0] == by_symbol["KBANK"]
+
+    # ราคาปัจจุบันจาก Quote snapshot ตัวเดียวกับ Batch
+    single = calculate_ddm_monte_carlo("KBANK.BK", 3, 0.05, n_paths=500, seed=7)
+    assert single["Target_Percentiles"] == by_symbol["KBANK"]["Target_Percentiles"]
+    assert single["Expected_Diff_Percent"] == by_symbol["KBANK"]["Expected_Diff_Percent"]
+
+
+def test_percentiles_are_ordered_and_seed_matters():
+    a = analyze_ggm_monte_carlo_batch(["PTT.BK"], **PARAMS)["data"][0]
+    b = analyze_ggm_monte_carlo_batch(["PTT.BK"], **{**PARAMS, "seed": 8})["data"][0]
+    values = list(a["Target_Percentiles"].values())
+    assert values == sorted(values)
+    assert 0 <= a["Prob_Upside (%)"] <= 100
+    assert a["Target_Percentiles"] != b["Target_Percentiles"]
+
+
+def test_process_pool_matches_single_worker():
+    tickers = ["PTT.BK", "AOT.BK", "KBANK.BK"]
+    single = analyze_ggm_monte_carlo_batch(tickers, **PARAMS)
+    pooled = analyze_ggm_monte_carlo_batch(tickers, **{**PARAMS, "max_workers": 2})
+    assert pooled["failed"] == {}
+    assert pooled["data"] == single["data"]
+
+
+def test_endpoint_rejects_out_of_range_params(client):
+    for bad in ({"years": 0}, {"years": 1000}, {"r_expected": -1}, {"max_workers": 0}):
+        assert client.post("/main_app/update_ggm_mc_cache", json=bad).status_code == 422
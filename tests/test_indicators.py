@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Func_app.DataSource.synthetic import synthetic_ticker_history
+from Func_app.TA import indicators
+from Func_app.TA.indicators import (INDICATORS, PRICE_FIELDS, compute_indicators, merge_states,
+                                    register_indicator, resolve_indicators, select_state)
+
+TICKERS = ["PTT", "AOT", "KBANK"]
+
+
+def _prices():
+    """
+    Price matrices (วันที่ x หุ้น) จากข้อมูลจำลอง — AOT เริ่มซื้อขายทีหลัง
+    + KBANK หยุดพักการซื้อขาย 2 ช่วง (ช่วงหลังคร่อมรอยต่อรอบ incremental ที่แถว 300)
+    """
+    frames = {t: synthetic_ticker_history(t).iloc[-400:] for t in TICKERS}
+    prices = {f: pd.DataFrame({t: df[f] for t, df in frames.items()}) for f in PRICE_FIELDS}
+    for df in prices.values():
+        df.iloc[:60, 1] = np.nan
+        df.iloc[200:205, 2] = np.nan
+        df.iloc[280:320, 2] = np.nan
+    return prices
+
+
+def _rows(prices, lo, hi=None):
+    return {f: df.iloc[lo:hi] for f, df in prices.items()}
+
+
+@pytest.mark.parametrize("name", sorted(INDICATORS))
+def test_incremental_matches_full_compute(name):
+    prices = _prices()
+    full, _ = compute_indicators(prices, [name])
+    first, state = compute_indicators(_rows(prices, 0, 300), [name])
+    for lo, hi in ((300, 301), (301, 350), (350, None)):
+        part, state = compute_indicators(_rows(prices, lo, hi), [name], state)
+        for col, df in part.items():
+            pd.testing.assert_frame_equal(df, full[col].iloc[lo:hi], check_exact=False, rtol=1e-9, check_names=False, check_freq=False)
+    assert set(first) == set(INDICATORS[name].outputs)
+
+
+@pytest.mark.parametrize("name", sorted(INDICATORS))
+def test_matrix_column_matches_single_stock(name):
+    prices = _prices()
+    matrix, _ = compute_indicators(prices, [name])
+    # เริ่มซื้อขายทีหลัง (AOT) / หยุดพักการซื้อขาย (KBANK): ทุก kernel ข้ามวันที่ไม่มีราคา
+    for ticker in ("AOT", "KBANK"):
+        alone, _ = compute_indicators({f: df[[ticker]].dropna() for f, df in prices.items()}, [name])
+        for col, df in alone.items():
+            pd.testing.assert_series_equal(matrix[col][ticker].loc[df.index], df[ticker],
+                                           check_exact=False, rtol=1e-9, check_names=False, check_freq=False)
+
+
+def test_per_stock_states_merge_back():
+    prices = _prices()
+    requested = {"rsi": {"period": 10}, "bollinger": {}, "obv": {}}
+    full, _ = compute_indicators(prices, requested)
+    _, state = compute_indicators(_rows(prices, 0, 300), requested)
+    # เก็บ state แยกต่อหุ้น (เรียงใหม่) แล้วรวมกลับเป็น Matrix เดียว
+    merged = merge_states([select_state(state, t) for t in reversed(TICKERS)])
+    order = list(reversed(TICKERS))
+    part, _ = compute_indicators({f: df[order] for f, df in _rows(prices, 300).items()}, requested, merged)
+    for col, df in part.items():
+        pd.testing.assert_frame_equal(df, full[col].iloc[300:][order], check_exact=False, rtol=1e-9, check_names=False, check_freq=False)
+
+
+def test_state_rejects_different_specs():
+    prices = _prices()
+    _, state = compute_indicators(_rows(prices, 0, 300), ["rsi"])
+    with pytest.raises(ValueError):
+        compute_indicators(_rows(prices, 300), {"rsi": {"period": 10}}, state)
+    _, other = compute_indicators(_rows(prices, 0, 300), ["rsi", "obv"])
+    with pytest.raises(ValueError):
+        merge_states([select_state(state, "PTT"), select_state(other, "AOT")])
+    empty, same = compute_indicators(_rows(prices, 0, 0), ["rsi"], state)
+    assert same is state and empty["RSI"].empty
+
+
+def test_resolve_validates_names_params_and_fields():
+    with pytest.raises(ValueError, match="Unknown indicator"):
+        resolve_indicators(["rsi", "ichimoku"])
+    with pytest.raises(ValueError, match="Unknown params"):
+        resolve_indicators({"rsi": {"window": 5}})
+    (ind, params), = resolve_indicators({"macd": {"fast": 5}})
+    assert params == {**ind.defaults, "fast": 5}
+    with pytest.raises(ValueError, match="Missing price fields"):
+        compute_indicators({"Close": _prices()["Close"]}, ["atr"])
+
+
+def test_registered_indicator_joins_the_fused_pass(monkeypatch):
+    monkeypatch.setattr(indicators, "INDICATORS", dict(INDICATORS))
+
+    @register_indicator("range_mean", ("High", "Low"), ("Range_Mean",), warmup=lambda window: window, window=5)
+    def _range_mean(ctx, state, window):
+        return {"Range_Mean": (ctx["High"] - ctx["Low"]).rolling(window).mean()}, None
+
+    prices = _prices()
+    out, _ = compute_indicators(prices, ["rsi", "range_mean"])
+    expected = (prices["High"] - prices["Low"]).rolling(5).mean()
+    pd.testing.assert_frame_equal(out["Range_Mean"], expected)
+    assert "range_mean" in {d["name"] for d in indicators.list_indicators()}
+
+
+def test_indicator_endpoints(app_module, client):
+    listed = client.get("/main_app/indicators").json()["data"]
+    assert {d["name"] for d in listed} == set(INDICATORS)
+    r = client.post("/main_app/update_indicator_cache", json={"indicators": ["rsi", "nope"]})
+    assert r.status_code == 400
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Func_app.DataSource.data_source import SyntheticSource, use_data_source
+from Func_app.DataSource.intervals import can_resample, check_interval, resample_bars
+from Func_app.DataSource.price_store import PriceStore
+
+
+class CountingSource(SyntheticSource):
+    def __init__(self):
+        super().__init__()
+        self.histories = []
+
+    def ticker(self, symbol):
+        source = super().ticker(symbol)
+        history = source.history
+
+        def counted(*args, **kwargs):
+            self.histories.append(kwargs.get("interval", "1d"))
+            return history(*args, **kwargs)
+
+        source.history = counted
+        return source
+
+
+def test_check_interval_and_resample_rules():
+    assert check_interval("5m") == "5m"
+    with pytest.raises(ValueError):
+        check_interval("2m")
+    assert can_resample("5m", "15m") and can_resample("5m", "1h") and can_resample("1m", "30m")
+    assert not can_resample("15m", "5m")
+    assert not can_resample("15m", "15m")
+    assert not can_resample("5m", "1d")
+
+
+def test_resample_aggregates_ohlcv_and_drops_empty_bins():
+    # 4 bar 5 นาที ช่วงท้ายภาคเช้า + 2 bar หลังพักเที่ยง
+    index = pd.DatetimeIndex(["2026-03-02 12:20", "2026-03-02 12:25", "2026-03-02 12:30", "2026-03-02 12:35",
+                              "2026-03-02 14:30", "2026-03-02 14:35"], tz="Asia/Bangkok")
+    bars = pd.DataFrame({"Open": [1, 2, 3, 4, 5, 6], "High": [2, 5, 4, 5, 7, 6], "Low": [1, 1, 0.5, 3, 5, 4],
+                         "Close": [2, 3, 4, 4.5, 6, 5], "Volume": [10, 20, 30, 40, 50, 60]}, index=index, dtype=float)
+    out = resample_bars(bars, "15m")
+    assert [t.strftime("%H:%M") for t in out.index] == ["12:15", "12:30", "14:30"]
+    np.testing.assert_allclose(out.loc[:, "Open"], [1, 3, 5])
+    np.testing.assert_allclose(out.loc[:, "High"], [5, 5, 7])
+    np.testing.assert_allclose(out.loc[:, "Low"], [1, 0.5, 4])
+    np.testing.assert_allclose(out.loc[:, "Close"], [3, 4.5, 5])
+    np.testing.assert_allclose(out.loc[:, "Volume"], [30, 70, 110])
+    assert resample_bars(bars.iloc[:0], "15m").empty
+
+
+def test_coarser_interval_is_resampled_from_cached_bars():
+    source = CountingSource()
+    store = PriceStore(intraday_size=4)
+    with use_data_source(source):
+        fine = store.bars("PTT", "5m")
+        coarse = store.bars("PTT", "15m")
+        assert source.histories == ["5m"]
+        fetched = source.ticker("PTT.BK").history(period="60d", interval="15m")[list(coarse.columns)]
+    pd.testing.assert_frame_equal(coarse, fetched.astype(float), check_freq=False, check_names=False)
+    assert len(coarse) * 3 == pytest.approx(len(fine), rel=0.01)
+    assert store.status()["intraday"]["entries"] == ["PTT.BK@5m"]
+
+
+def test_finer_bars_must_cover_requested_range():
+    source = CountingSource()
+    store = PriceStore(intraday_size=4)
+    with use_data_source(source):
+        fine = store.bars("PTT", "5m")
+        # 1h ย้อนหลังได้ 730 วัน -> bar 5m (60 วัน) ไม่พอ เว้นแต่ขอช่วงที่อยู่ใน 60 วันนั้น
+        recent = store.bars("PTT", "1h", start=fine.index[0].date())
+        assert source.histories == ["5m"]
+        assert recent.index[0] >= fine.index[0]
+        store.bars("PTT", "1h")
+        assert source.histories == ["5m", "1h"]
+
+
+def test_intraday_lru_evicts_least_recently_used():
+    source = CountingSource()
+    store = PriceStore(intraday_size=2)
+    with use_data_source(source):
+        store.bars("PTT", "5m")
+        store.bars("AOT", "5m")
+        store.bars("PTT", "5m")       # hit -> PTT ใหม่สุด
+        store.bars("KBANK", "5m")     # ไล่ AOT ออก
+        assert store.status()["intraday"]["entries"] == ["PTT.BK@5m", "KBANK.BK@5m"]
+        store.bars("AOT", "5m")
+    assert source.histories == ["5m", "5m", "5m", "5m"]
+
+
+def test_intraday_views_use_daily_factors():
+    store = PriceStore(intraday_size=2)
+    with use_data_source(SyntheticSource()):
+        split = store.bars("PTT", "30m")
+        adjusted = store.bars("PTT", "30m", "adjusted")
+        record = store.record("PTT")
+    day = split.index[-1].normalize()
+    factor = record.loc[record.index.normalize() == day, "Div_Factor"].iloc[0]
+    last_day = split.index.normalize() == day
+    np.testing.assert_allclose(adjusted.loc[last_day, "Close"], split.loc[last_day, "Close"] * factor)
+    np.testing.assert_allclose(adjusted["Volume"], split["Volume"])
+
+
+def test_sliced_intraday_range():
+    store = PriceStore()
+    with use_data_source(SyntheticSource()):
+        full = store.bars("PTT", "15m")
+        start = full.index[len(full) // 2].strftime("%Y-%m-%d")
+        part = store.bars("PTT", "15m", start=start)
+    assert part.index[0].strftime("%Y-%m-%d") == start
+    pd.testing.assert_frame_equal(part, full[full.index >= part.index[0]])
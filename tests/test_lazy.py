@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from Func_app.lazy import LazyAttr, lazy
+
+HEAVY = ("pandas", "numpy", "sklearn", "scipy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code):
+    env = {**os.environ, "STOCK_DATA_SOURCE": "synthetic", "STOCK_AUTO_REFRESH": "0", "STOCK_PRELOAD": "0"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def test_app_import_and_health_check_skip_heavy_modules():
+    loaded = _run(
+        "import sys, main_app\n"
+        "from fastapi.testclient import TestClient\n"
+        "body = TestClient(main_app.app).get('/').json()\n"
+        "assert body['status'] == 'Online' and body['analytics_ready'] is False\n"
+        f"print(sorted(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    assert loaded == "[]"
+
+
+def test_first_use_imports_the_module():
+    loaded = _run(
+        "import sys, main_app\n"
+        "main_app.optimize_dividend_tax(500000.0, 10000.0, 20.0)\n"
+        "print('numpy' in sys.modules, main_app.optimize_dividend_tax.loaded)"
+    )
+    assert loaded == "True True"
+
+
+def test_lazy_attr_proxies_the_target():
+    single = lazy("json", "dumps")
+    assert isinstance(single, LazyAttr)
+    assert single({"a": 1}) == '{"a": 1}'
+    path, sep = lazy("os", "path", "sep")
+    assert path.join("a", "b") == os.path.join("a", "b")
+    assert "/" in sep or "\\" in sep
+    assert repr(single).startswith("<lazy json.dumps")
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import load_test
+from benchmarks.load_test import compare, diff_cache_metrics, percentiles, summarize
+
+
+def test_summary_counts_errors_per_endpoint():
+    samples = [("GET /", 200, 0.010), ("GET /", 500, 0.030), ("GET /", 0, 0.020), ("POST /bulk_query", 200, 0.005)]
+    result = summarize(samples, seconds=2.0)
+    assert result["GET /"]["requests"] == 3
+    assert result["GET /"]["error_status"] == {"500": 1, "0": 1}
+    assert result["ALL"]["requests"] == 4 and result["ALL"]["errors"] == 2
+    assert result["ALL"]["rps"] == 2.0
+    assert result["POST /bulk_query"]["p95_ms"] == 5.0
+    assert percentiles([])["p50_ms"] is None
+    p = percentiles([i / 1000 for i in range(1, 101)])
+    assert p["p50_ms"] <= p["p95_ms"] <= p["p99_ms"] <= p["max_ms"] == 100.0
+
+
+def test_cache_metrics_are_scraped_and_diffed(monkeypatch):
+    text = "\n".join([
+        "# TYPE cache_swaps_total counter",
+        'cache_swaps_total{cache="scoring",kind="replace"} 2',
+        'cache_swaps_total{cache="scoring",kind="put"} 3',
+        'cache_lock_contended_total{cache="scoring"} 1',
+        'cache_lock_wait_seconds_sum{cache="scoring"} 0.004',
+        'http_requests_total{path="/"} 9',
+    ])
+
+    class StubClient:
+        def __init__(self, base_url):
+            pass
+
+        def request(self, method, path, body=None):
+            return 200, 0.0, text.encode()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(load_test, "Client", StubClient)
+    after = load_test.scrape_cache_metrics("http://stub")
+    assert after == {"scoring": {"cache_swaps_total": 5.0, "cache_lock_contended_total": 1.0,
+                                 "cache_lock_wait_seconds_sum": 0.004}}
+    before = {"scoring": {"cache_swaps_total": 1.0}}
+    assert diff_cache_metrics(before, after) == {"scoring": {"swaps": 4, "lock_contended": 1, "lock_wait_ms": 4.0}}
+    assert diff_cache_metrics(after, after) == {}
+
+
+def test_compare_flags_p95_and_throughput_regressions(tmp_path):
+    def report(p95, rps):
+        return {"meta": {"git_commit": "abc"}, "phases": {"read": {"endpoints": {
+            "GET /": {"p95_ms": p95, "rps": rps}, "ALL": {"p95_ms": p95, "rps": rps}}}}}
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report(10.0, 1000.0)))
+    assert not compare(report(11.0, 950.0), str(baseline), tolerance=0.25)
+    assert compare(report(14.0, 1000.0), str(baseline), tolerance=0.25)
+    assert compare(report(10.0, 700.0), str(baseline), tolerance=0.25)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="RSS probe reads /proc")
+def test_mixed_phase_against_real_server():
+    env = {**os.environ, "STOCK_AUTO_REFRESH": "0", "STOCK_PRELOAD": "1", "PYTHONPATH": os.getcwd(),
+           "STOCK_DATA_SOURCE": "synthetic"}
+    proc, base_url = load_test.start_server(env, timeout=60)
+    try:
+        load_test.warm_caches(base_url, timeout=120)
+        result = load_test.run_phase("mixed", base_url, proc.pid, readers=4, duration=1.0, seed=1,
+                                     with_refresh=True, refresh_timeout=60)
+    finally:
+        proc.terminate()
+        proc.wait()
+    endpoints = result["endpoints"]
+    assert endpoints["ALL"]["requests"] > 0
+    assert endpoints["ALL"]["errors"] == 0
+    assert result["refreshes"] and all(r["error"] is None for r in result["refreshes"])
+    assert result["cache"]["scoring"]["swaps"] >= 1
+    assert result["memory"]["rss_peak_mb"] > 0
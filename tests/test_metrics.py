@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+
+from Func_app.metrics import METRICS, MetricsRegistry, StageTimer
+
+
+def _stages(module):
+    hist = METRICS.snapshot()["histograms"].get("stage_duration_seconds", {})
+    return {dict(key)["stage"]: state for key, state in hist.items() if dict(key)["module"] == module}
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.describe("jobs_total", "Jobs")
+    registry.inc("jobs_total", kind="a")
+    registry.inc("jobs_total", 2, kind="a")
+    registry.observe("latency_seconds", 0.5, path="/x")
+    text = registry.render_prometheus()
+    assert "# HELP jobs_total Jobs" in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'latency_seconds_bucket{path="/x",le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{path="/x",le="1.0"} 1' in text
+    assert 'latency_seconds_count{path="/x"} 1' in text
+
+
+def test_stage_timer_laps_are_consecutive():
+    METRICS.reset()
+    timer = StageTimer("unit")
+    timer.lap("fetch")
+    timer.lap("compute")
+    assert set(_stages("unit")) == {"fetch", "compute"}
+
+
+def test_tema_aggregation_is_its_own_stage():
+    from Func_app.Scoring.tema_scoring import analyze_stock_tema
+    METRICS.reset()
+    result = analyze_stock_tema(["PTT.BK"], 2022, 2025)
+    assert result["status"] == "success"
+    stages = _stages("tema")
+    assert {"fetch", "compute", "outliers"} <= set(stages)
+    assert "serialize" not in stages
+
+
+def test_latency_recorded_when_handler_raises(app_module):
+    app = app_module.app
+
+    def boom():
+        raise RuntimeError("boom")
+
+    app.add_api_route("/_test/boom", boom)
+    try:
+        METRICS.reset()
+        with TestClient(app, raise_server_exceptions=False) as c:
+            assert c.get("/_test/boom").status_code == 500
+        hist = METRICS.snapshot()["histograms"]["http_request_duration_seconds"]
+        labels = [dict(key) for key in hist]
+        assert {"method": "GET", "path": "/_test/boom", "status": "500"} in labels
+    finally:
+        app.router.routes[:] = [r for r in app.router.routes if getattr(r, "path", None) != "/_test/boom"]
@@ -0,0 +1,78 @@
+import numpy as np
+
+from Func_app.records import TdtsEvent
+from Func_app.Scoring.outliers import (distribution_stats, flag_records, outlier_mask, record_values,
+                                       resolve_request_threshold, resolve_threshold)
+
+
+def _event(stock, year, t_dts):
+    return TdtsEvent(stock=stock, year=year, ex_date=f"{year}-03-01", dps=1.0, p_cum=30.0, p_ex=29.0,
+                     dy=3.0, pd=3.0, t_dts=t_dts, outlier=False)
+
+
+def _universe():
+    """หุ้น 20 ตัว T-DTS กระจายรอบ 0 + PTT ที่ทุก event สูงกว่าค่ากลางของตลาด"""
+    rng = np.random.default_rng(3)
+    data = {f"S{i:02d}": [_event(f"S{i:02d}", 2020 + y, float(v)) for y, v in enumerate(rng.normal(0, 2, 4))]
+            for i in range(20)}
+    data["PTT"] = [_event("PTT", 2020, 9.0), _event("PTT", 2021, 12.0), _event("PTT", 2022, 15.0)]
+    return data
+
+
+def test_default_thresholds():
+    assert resolve_threshold("absolute") == 20.0
+    assert resolve_request_threshold("absolute") == 10.0
+    assert resolve_request_threshold("zscore") == 3.0
+    assert resolve_request_threshold("iqr", 2.0) == 2.0
+
+
+def test_mask_with_precomputed_stats_matches_full_table():
+    values = record_values([e for events in _universe().values() for e in events])
+    for method in ("zscore", "mad", "iqr"):
+        np.testing.assert_array_equal(outlier_mask(values, method),
+                                      outlier_mask(values, method, stats=distribution_stats(values, method)))
+    assert distribution_stats(values, "absolute") is None
+
+
+def test_statistical_methods_need_a_distribution():
+    # 3 event ของหุ้นเดียว: ไม่มีตัวไหนห่างจาก mean ของตัวเองเกิน 3 std
+    assert not outlier_mask(np.array([9.0, 12.0, 15.0]), "zscore").any()
+
+
+def test_endpoint_default_is_absolute_10(app_module, client):
+    app_module.CACHE_TDTS.replace({"PTT": [_event("PTT", 2021, 5.0), _event("PTT", 2022, -15.0)]},
+                                  params={"outlier_method": "absolute", "threshold": 20.0})
+    body = client.get("/main_app/analyze_tdts/PTT").json()
+    assert body["outlier_filter"] == {"method": "absolute", "threshold": 10.0, "source": "request"}
+    assert [e["T-DTS"] for e in body["data"]["unclean_data"]] == [-15.0]
+
+
+def test_live_fallback_gets_endpoint_default(app_module, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "analyze_stock_tdts", lambda *args: calls.append(args) or {"status": "success"})
+    client.get("/main_app/analyze_tdts/PTT")
+    client.get("/main_app/analyze_tdts/PTT", params={"method": "mad"})
+    assert [args[3:] for args in calls] == [(10.0, "absolute"), (3.5, "mad")]
+
+
+def test_matching_batch_params_reuse_batch_flags(app_module, client):
+    data = _universe()
+    flag_records([e for events in data.values() for e in events], "zscore", None)
+    app_module.CACHE_TDTS.replace(data, params={"outlier_method": "zscore", "threshold": 3.0})
+    body = client.get("/main_app/analyze_tdts/PTT", params={"method": "zscore"}).json()
+    assert body["outlier_filter"]["source"] == "batch"
+    assert [e["T-DTS"] for e in body["data"]["unclean_data"]] == [e.t_dts for e in data["PTT"] if e.outlier] == [12.0, 15.0]
+
+
+def test_statistical_method_on_cache_uses_universe_distribution(app_module, client):
+    data = _universe()
+    app_module.CACHE_TDTS.replace(data, params={"outlier_method": "absolute", "threshold": 20.0})
+    all_events = [e for events in data.values() for e in events]
+    for method in ("zscore", "mad", "iqr"):
+        expected = outlier_mask(record_values(all_events), method)[-3:]
+        body = client.get("/main_app/analyze_tdts/PTT", params={"method": method}).json()
+        assert body["outlier_filter"] == {"method": method, "threshold": resolve_request_threshold(method),
+                                          "source": "universe"}
+        flagged = [e["T-DTS"] for e in body["data"]["unclean_data"]]
+        assert flagged == [e.t_dts for e, flag in zip(data["PTT"], expected) if flag]
+        assert flagged  # เทียบกับทั้งตลาด PTT สูงผิดปกติ (เทียบกับตัวเองจะไม่มี outlier)
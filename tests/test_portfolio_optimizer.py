@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from Func_app.DataSource.synthetic import synthetic_ticker_history
+from Func_app.Portfolio.correlation import CorrelationService
+from Func_app.Portfolio.optimizer import PortfolioOptimizer, build_universe, nearest_psd
+from Func_app.records import GGMResult, ScoreRecord, SeasonalityRecord, SeasonalityTag
+
+SYMBOLS = ["ADVANC", "AOT", "CPALL", "KBANK", "PTT", "SCB"]
+CLUSTERS = {"ADVANC": "Growth", "AOT": "Growth", "CPALL": "Growth", "KBANK": "Yield", "PTT": "Yield", "SCB": "Yield"}
+
+
+def _correlation():
+    service = CorrelationService(window=250, min_periods=60)
+    columns = {}
+    for symbol in SYMBOLS:
+        hist = synthetic_ticker_history(symbol).iloc[-300:]
+        columns[symbol] = {"Date": [d.strftime('%Y-%m-%d') for d in hist.index], "Close": hist["Close"].tolist()}
+    service.update(columns)
+    return service
+
+
+def _caches():
+    scoring = {s: ScoreRecord(stock=s, dy=2.0 + i, total_score=40.0 + 8 * i, cluster_name=CLUSTERS[s])
+               for i, s in enumerate(SYMBOLS)}
+    ggm = {s: GGMResult(symbol=s, current_price=100.0, diff_percent=10.0 * (i - 2),
+                        dividends_flow={"Div(Y-0)": 1.0 + i})
+           for i, s in enumerate(SYMBOLS[:4])}
+    tag = lambda month: SeasonalityTag(est_pay_date=f"2026-{month:02d}-15", est_dividend=1.0)
+    seasonality = {s: SeasonalityRecord(symbol=s, tag1=tag(3 + i % 2), tag2=tag(9) if i % 2 else None)
+                   for i, s in enumerate(SYMBOLS)}
+    return scoring, ggm, seasonality
+
+
+@pytest.fixture(scope="module")
+def universe():
+    tickers, cov = _correlation().covariance(annualize=True)
+    return build_universe(*_caches(), tickers, cov)
+
+
+def test_universe_inputs_from_caches(universe):
+    assert universe["tickers"] == SYMBOLS
+    # GGM: ปันผล 12 เดือน / ราคา, ไม่มี GGM: DY (%) × จำนวนงวดต่อปี
+    np.testing.assert_allclose(universe["yield"], [0.01, 0.02, 0.03, 0.04, 0.06, 0.14])
+    np.testing.assert_allclose(universe["upside"][:4], [-0.2, -0.1, 0.0, 0.1])
+    assert universe["missing"]["upside"] == ["PTT", "SCB"]
+    np.testing.assert_allclose(universe["month_share"][1, [3, 8]], [0.5, 0.5])
+    assert np.linalg.eigvalsh(universe["cov"]).min() > 0
+
+
+def test_universe_skips_with_reason():
+    scoring, ggm, seasonality = _caches()
+    tickers, cov = _correlation().covariance(["AOT", "PTT", "SCB"], annualize=True)
+    cov[2, 2] = np.nan
+    universe = build_universe(scoring, ggm, seasonality, tickers, cov,
+                              symbols=["AOT", "PTT", "SCB", "KBANK", "XYZ"], exclude_clusters=["Growth"])
+    assert universe["tickers"] == ["PTT"]
+    assert universe["skipped"] == {"AOT": "excluded cluster: Growth",
+                                   "SCB": "no covariance (not enough price history)",
+                                   "KBANK": "no covariance (not enough price history)",
+                                   "XYZ": "not in scoring cache"}
+
+
+def test_nearest_psd_clips_negative_eigenvalues():
+    cov = np.array([[1.0, 0.9, -0.9], [0.9, 1.0, 0.9], [-0.9, 0.9, 1.0]])
+    assert np.linalg.eigvalsh(cov).min() < 0
+    fixed = nearest_psd(cov)
+    assert np.linalg.eigvalsh(fixed).min() > -1e-12
+    np.testing.assert_allclose(fixed, fixed.T)
+
+
+def test_min_risk_beats_random_portfolios(universe):
+    result = PortfolioOptimizer().optimize(universe, objective="min_risk", max_weight=1.0)
+    assert result["status"] == "success"
+    weights = {row["Symbol"]: row["Weight (%)"] / 100 for row in result["allocation"]}
+    w = np.array([weights.get(t, 0.0) for t in universe["tickers"]])
+    assert w.sum() == pytest.approx(1.0, abs=1e-3)
+    best = w @ universe["cov"] @ w
+    samples = np.random.default_rng(0).dirichlet(np.ones(len(w)), 500)
+    assert best <= np.einsum("ij,jk,ik->i", samples, universe["cov"], samples).min() + 1e-6
+
+
+def test_constraints_are_respected(universe):
+    result = PortfolioOptimizer().optimize(universe, objective="max_score", max_weight=0.4,
+                                           min_yield=0.05, max_cluster_weight=0.6, capital=100_000)
+    assert result["status"] == "success"
+    summary = result["summary"]
+    assert summary["Yield (%)"] >= 5.0 - 1e-3
+    assert max(result["cluster_weights"].values()) <= 60.0 + 1e-2
+    assert all(row["Weight (%)"] <= 40.0 + 1e-2 for row in result["allocation"])
+    assert sum(row["Amount"] for row in result["allocation"]) == pytest.approx(100_000, rel=1e-3)
+
+
+def test_max_month_share_spreads_dividends(universe):
+    result = PortfolioOptimizer().optimize(universe, objective="max_yield", max_weight=0.5, max_month_share=0.5)
+    assert result["status"] == "success"
+    monthly = result["monthly_dividend_yield (%)"]
+    assert max(monthly.values()) <= 0.5 * sum(monthly.values()) + 1e-3
+
+
+def test_infeasible_constraints_stop_at_lp(universe):
+    result = PortfolioOptimizer().optimize(universe, min_yield=0.5)
+    assert result["status"] == "error"
+    assert "infeasible" in result["message"]
+    assert result["solver"]["iterations"] == 0
+
+
+def test_invalid_inputs(universe):
+    optimizer = PortfolioOptimizer()
+    assert "cannot reach 100%" in optimizer.optimize(universe, max_weight=0.1)["message"]
+    with pytest.raises(ValueError):
+        optimizer.optimize(universe, objective="max_sharpe")
+
+
+def test_warm_start_reuses_previous_solution(universe):
+    optimizer = PortfolioOptimizer()
+    first = optimizer.optimize(universe, objective="max_score", max_weight=0.5)
+    second = optimizer.optimize(universe, objective="max_score", max_weight=0.5)
+    assert not first["solver"]["warm_start"] and second["solver"]["warm_start"]
+    assert second["allocation"] == first["allocation"]
+    assert not optimizer.optimize(universe, objective="min_risk", max_weight=0.5)["solver"]["warm_start"]
+
+
+def test_universe_cached_per_key():
+    optimizer = PortfolioOptimizer()
+    builds = []
+    build = lambda: builds.append(1) or {"tickers": []}
+    assert optimizer.universe(("v1",), build) is optimizer.universe(("v1",), build)
+    optimizer.universe(("v2",), build)
+    assert len(builds) == 2
+
+
+def test_optimize_endpoint(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "CORRELATION", _correlation())
+    monkeypatch.setattr(app_module, "PORTFOLIO_OPTIMIZER", PortfolioOptimizer())
+    scoring, ggm, seasonality = _caches()
+    assert client.post("/main_app/portfolio/optimize", json={}).status_code == 404
+
+    app_module.CACHE_SCORING.replace(scoring)
+    app_module.CACHE_GGM.replace(ggm)
+    app_module.CACHE_SEASONALITY.replace(seasonality)
+    r = client.post("/main_app/portfolio/optimize", json={"objective": "min_risk", "max_weight": 50})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "success"
+    assert body["as_of"] == app_module.CORRELATION.status()["as_of"]
+
+    r = client.post("/main_app/portfolio/optimize", json={"min_yield": 50})
+    assert r.status_code == 422
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Func_app.DataSource.data_source import SyntheticSource, use_data_source
+from Func_app.DataSource.price_store import PriceStore, apply_view, build_record
+
+
+def _yahoo_history():
+    """Yahoo (auto_adjust=False): ราคา / ปันผลปรับ split แล้ว, split 1:2 วันที่ 3, XD 1.0 วันที่ 5"""
+    index = pd.date_range("2025-01-01", periods=6, freq="D", tz="Asia/Bangkok")
+    close = np.array([10.0, 10.0, 10.0, 10.0, 9.0, 9.5])
+    return pd.DataFrame({
+        "Open": close, "High": close, "Low": close, "Close": close,
+        "Volume": [200.0, 200.0, 100.0, 100.0, 100.0, 100.0],
+        "Dividends": [0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+        "Stock Splits": [0.0, 0.0, 2.0, 0.0, 0.0, 0.0],
+    }, index=index)
+
+
+def test_views_from_one_record():
+    record = build_record(_yahoo_history())
+    np.testing.assert_allclose(record["Split_Factor"], [2, 2, 1, 1, 1, 1])
+
+    raw = apply_view(record, "raw")
+    # ก่อนแตกพาร์ราคาที่ซื้อขายจริงสูงกว่า 2 เท่า + Volume ครึ่งหนึ่ง
+    np.testing.assert_allclose(raw["Close"], [20, 20, 10, 10, 9, 9.5])
+    np.testing.assert_allclose(raw["Volume"], [100, 100, 100, 100, 100, 100])
+
+    split = apply_view(record, "split")
+    np.testing.assert_allclose(split["Close"], _yahoo_history()["Close"])
+    np.testing.assert_allclose(split["Dividends"], _yahoo_history()["Dividends"])
+
+    adjusted = apply_view(record, "adjusted")
+    # Adj Close แบบ Yahoo: ก่อน XD คูณ (1 - D / P_cum) = 10 × (1 - 1 / 10)
+    np.testing.assert_allclose(adjusted["Close"], [9.0, 9.0, 9.0, 9.0, 9.0, 9.5])
+    pd.testing.assert_series_equal(adjusted["Dividends"], split["Dividends"])
+
+    with pytest.raises(ValueError, match="Unknown price view"):
+        apply_view(record, "total")
+
+
+class CountingSource(SyntheticSource):
+    def __init__(self):
+        super().__init__()
+        self.histories = []
+
+    def ticker(self, symbol):
+        self.histories.append(symbol)
+        return super().ticker(symbol)
+
+
+def test_store_fetches_once_for_every_view_and_refetches_after_invalidate():
+    source = CountingSource()
+    store = PriceStore(ttl_seconds=3600)
+    with use_data_source(source):
+        split = store.view("ptt", "split", period="1y")
+        adjusted = store.view("PTT.BK", "adjusted", start="2024-01-01", end="2024-02-01")
+        store.dividends("PTT")
+        assert source.histories == ["PTT.BK"]
+        assert adjusted.index.min() >= pd.Timestamp("2024-01-01", tz="Asia/Bangkok")
+        assert len(split) > 200
+        store.invalidate(["PTT"])
+        store.view("PTT", "raw")
+    assert source.histories == ["PTT.BK", "PTT.BK"]
+    assert store.status()["ticker_count"] == 1
+
+
+def test_switching_source_drops_records():
+    store = PriceStore(ttl_seconds=3600)
+    with use_data_source(SyntheticSource(seed=1)):
+        a = store.view("PTT", "raw")["Close"]
+    with use_data_source(SyntheticSource(seed=2)):
+        b = store.view("PTT", "raw")["Close"]
+    assert not a.equals(b)
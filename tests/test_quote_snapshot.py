@@ -0,0 +1,44 @@
+from Func_app.DataSource.data_source import SyntheticSource, use_data_source
+from Func_app.DataSource.quote_snapshot import QuoteSnapshot
+
+
+class CountingSource(SyntheticSource):
+    """จดจำนวน bulk download + ไม่มีข้อมูลของ 'DELISTED.BK'"""
+
+    def __init__(self):
+        super().__init__()
+        self.downloads = []
+
+    def _frame(self, symbol):
+        return None if symbol.upper() == "DELISTED.BK" else super()._frame(symbol)
+
+    def download(self, tickers, **kwargs):
+        self.downloads.append(list(tickers))
+        return super().download(tickers, **kwargs)
+
+
+def test_one_bulk_request_for_all_tickers_and_failures_recorded():
+    source = CountingSource()
+    snapshot = QuoteSnapshot(ttl_seconds=60)
+    with use_data_source(source):
+        prices = snapshot.get_prices(["PTT", "aot.bk", "DELISTED"])
+        again = snapshot.get_price("PTT.BK")
+    assert source.downloads == [["PTT.BK", "AOT.BK", "DELISTED.BK"]]
+    assert set(prices) == {"PTT", "AOT"}
+    assert again == prices["PTT"]
+    # ราคาไม่ปรับปันผล = Close ดิบของวันล่าสุด
+    assert prices["PTT"] == float(source._frame("PTT.BK")["Close"].iloc[-1])
+    assert snapshot.failed() == {"DELISTED": "no quote returned"}
+
+
+def test_expired_or_uncovered_snapshot_refetches_without_shrinking():
+    source = CountingSource()
+    snapshot = QuoteSnapshot(ttl_seconds=60)
+    with use_data_source(source):
+        snapshot.get_prices(["PTT"])
+        snapshot.get_prices(["KBANK"])
+        assert source.downloads[-1] == ["KBANK.BK", "PTT.BK"]
+        snapshot._fetched_at -= 61
+        snapshot.get_prices(["PTT"])
+    assert len(source.downloads) == 3
+    assert snapshot.status()["price_count"] == 2
@@ -0,0 +1,86 @@
+import json
+
+import pandas as pd
+import pytest
+
+from Func_app.records import (GGMResult, ScoreRecord, SeasonalityRecord, SeasonalityTag, TdtsEvent,
+                              from_frame, records_frame, split_outliers, to_plain)
+from Func_app.Scoring.tdts_scoring import analyze_stock_tdts
+
+
+def _event(year, t_dts, outlier=False):
+    return TdtsEvent("PTT", year, f"{year}-04-20", 1.0, 35.0, 34.0, 2.9, 2.9, t_dts, outlier)
+
+
+def test_record_reads_like_dict_with_external_keys():
+    row = _event(2024, 0.5)
+    assert row.t_dts == 0.5
+    assert row["T-DTS"] == 0.5
+    assert list(row) == ["Stock", "Year", "Ex_Date", "DPS", "P_cum", "P_ex", "DY (%)", "PD (%)", "T-DTS"]
+    assert "outlier" not in row.to_dict()   # flag ภายใน ไม่ส่งออกใน JSON
+    assert dict(row) == row.to_dict()
+    with pytest.raises(KeyError):
+        row["t_dts"]
+    assert not hasattr(row, "__dict__")
+
+
+def test_constructor_rejects_unknown_or_extra_values():
+    assert ScoreRecord(stock="PTT").total_score is None
+    with pytest.raises(TypeError):
+        ScoreRecord(stock="PTT", score=1.0)
+    with pytest.raises(TypeError):
+        GGMResult(*range(7))
+
+
+def test_nested_records_serialize_to_original_shape():
+    tag = SeasonalityTag(avg_date="04-20", data_points=3, next_xd_date="2026-04-20", est_dividend=1.2,
+                         est_pay_date="2026-05-10")
+    record = SeasonalityRecord(symbol="PTT", tag1=tag, tag2=None)
+    plain = to_plain(record)
+    assert plain["Tag1"]["Countdown"]["Est_Pay_Date"] == "2026-05-10"
+    assert plain["Tag1"]["Stats"]["Data_Points"] == 3
+    assert plain["Tag2"] is None
+    assert record.tags() == [tag]
+    json.dumps(to_plain([record, record]))
+    assert to_plain([]) == [] and to_plain(5) == 5
+
+
+def test_split_outliers_keeps_order_and_uses_flags_or_mask():
+    events = [_event(2021, 0.1), _event(2022, 9.0, True), _event(2023, 0.2), _event(2024, -8.0, True)]
+    data = split_outliers(events)
+    assert data["raw_data"] == events
+    assert [e.year for e in data["clean_data"]] == [2021, 2023]
+    assert [e.year for e in data["unclean_data"]] == [2022, 2024]
+
+    masked = split_outliers(events, [False, False, False, True])
+    assert [e.year for e in masked["unclean_data"]] == [2024]
+
+
+def test_frame_round_trip():
+    rows = [ScoreRecord("PTT", 4.2, 0.3, 1.0, -0.5, 1, 80.0, "Yield"),
+            ScoreRecord("AOT", 1.1, None, 2.0, 0.5, 0, 55.0, "Growth")]
+    df = records_frame(rows)
+    assert list(df.columns) == list(ScoreRecord.__slots__)
+    back = from_frame(ScoreRecord, df)
+    assert [r.to_dict() for r in back][0] == rows[0].to_dict()
+    assert pd.isna(back[1].t_dts)
+    assert records_frame([]).empty
+    assert list(records_frame([], TdtsEvent).columns) == list(TdtsEvent.__slots__)
+
+
+def test_analyzer_returns_records_on_synthetic_source():
+    result = analyze_stock_tdts("PTT.BK", 2020, 2024)
+    assert result["status"] == "success"
+    raw = result["data"]["raw_data"]
+    assert raw and all(isinstance(r, TdtsEvent) for r in raw)
+    assert result["summary"]["total_count"] == len(raw)
+    assert result["summary"]["unclean_count"] == sum(r.outlier for r in raw)
+    assert set(to_plain(raw)[0]) == {key for key, _ in TdtsEvent.FIELDS}
+
+
+def test_endpoint_serializes_cached_records(app_module, client):
+    events = [_event(2023, 0.2), _event(2024, 15.0, True)]
+    app_module.CACHE_TDTS.replace({"PTT": events})
+    body = client.get("/main_app/analyze_tdts/PTT").json()
+    assert body["data"]["raw_data"][1]["T-DTS"] == 15.0
+    assert [row["Year"] for row in body["data"]["unclean_data"]] == [2024]
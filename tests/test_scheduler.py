@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from Func_app.cache import VersionedCache
+from Func_app.market_hours import market_now
+from Func_app.scheduler import RefreshScheduler
+
+
+def _scheduler(*jobs):
+    scheduler = RefreshScheduler(poll_seconds=1, stagger_seconds=0)
+    for name, cache, fn in jobs:
+        scheduler.register(name, cache, fn, {"default": True})
+    return scheduler
+
+
+def test_tick_refreshes_stale_cache_with_default_params():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+    calls = []
+
+    def refresh(params, tickers=None):
+        calls.append((params, tickers))
+        cache.replace({"PTT": 1}, params=params)
+
+    scheduler = _scheduler(("unit", cache, refresh))
+    assert cache.is_stale()
+    assert scheduler.tick() == "unit"
+    assert calls == [({"default": True}, None)]
+    assert not cache.is_stale()
+    assert cache.is_stale(market_now() + timedelta(seconds=120))
+    # ไม่ stale -> ไม่รันซ้ำ
+    assert scheduler.tick() is None
+
+
+def test_run_job_records_errors_and_skips_when_busy():
+    cache = VersionedCache("unit", ttl_seconds=60, market_bound=False)
+
+    def failing(params, tickers=None):
+        raise RuntimeError("source down")
+
+    scheduler = _scheduler(("unit", cache, failing))
+    assert scheduler.run_job("unit") is True
+    status = scheduler.status()["jobs"]["unit"]
+    assert status["last_error"] == "source down"
+    assert status["runs"] == 1
+
+    job = scheduler._jobs["unit"]
+    job.lock.acquire()
+    try:
+        assert scheduler.is_busy("unit")
+        assert scheduler.run_job("unit") is False
+    finally:
+        job.lock.release()
+    assert not scheduler.is_busy("unit")
+
+
+def test_tick_runs_due_retries_only_for_failed_tickers():
+    cache = VersionedCache("unit", ttl_seconds=3600, market_bound=False)
+    cache.replace({"PTT": 1}, params={})
+    cache.mark_failed("AOT", "timeout")
+    cache._retry["AOT"]["next_retry_at"] = 0
+    calls = []
+    scheduler = _scheduler(("unit", cache, lambda params, tickers=None: calls.append(tickers)))
+    assert scheduler.tick() == "unit:retry"
+    assert calls == [["AOT"]]
+
+
+def test_update_endpoint_returns_409_while_job_runs(app_module, client):
+    job = app_module.REFRESH_SCHEDULER._jobs["seasonality"]
+    job.lock.acquire()
+    try:
+        r = client.post("/main_app/update_seasonality_cache")
+        assert r.status_code == 409
+        assert "already running" in r.json()["detail"]
+    finally:
+        job.lock.release()
+
+
+def test_failed_batch_is_reported_as_job_error(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "analyze_technical_batch", lambda **kwargs: {"status": "error", "message": "no prices"})
+    scheduler = app_module.REFRESH_SCHEDULER
+    assert scheduler.run_job("technical", app_module.TechnicalBatchInput().model_dump()) is True
+    assert "no prices" in scheduler.status()["jobs"]["technical"]["last_error"]
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from Func_app.records import ScoreRecord, TdtsEvent, TemaEvent
+from Func_app.Scoring.score_history import ScoreHistoryStore
+
+
+def _run(scores):
+    return [ScoreRecord(stock=s, total_score=score, cluster_name=cluster) for s, (score, cluster) in scores.items()]
+
+
+def test_runs_in_same_second_are_persisted_separately(tmp_path):
+    store = ScoreHistoryStore(str(tmp_path))
+    t = datetime(2026, 1, 5, 10, 0, 0)
+    store.append(t, _run({"PTT": (50.0, "A"), "AOT": (40.0, "B")}))
+    store.append(t, _run({"PTT": (55.0, "B"), "AOT": (41.0, "B")}))
+
+    assert len(list(tmp_path.glob("scores_*.npz"))) == 2
+    reloaded = ScoreHistoryStore(str(tmp_path))
+    assert len(reloaded) == 4
+    assert reloaded.trajectory("PTT")["Total_Score (%)"] == [50.0, 55.0]
+
+
+def test_append_only_and_transitions():
+    store = ScoreHistoryStore("")
+    store.append(datetime(2026, 1, 5), _run({"PTT": (50.0, "A"), "AOT": (40.0, "B")}))
+    store.append(datetime(2026, 2, 5), _run({"PTT": (55.0, "B"), "AOT": (41.0, "B")}))
+    with pytest.raises(ValueError):
+        store.append(datetime(2026, 1, 1), _run({"PTT": (1.0, "A")}))
+
+    traj = store.trajectory("PTT", start="2026-02-01")
+    assert traj["Cluster_Name"] == ["B"]
+    matrix = store.transition_matrix()
+    assert matrix["changed"] == ["PTT"]
+    assert matrix["stocks_compared"] == 2
+    assert store.trajectory("KBANK") is None
+
+
+def test_history_failure_does_not_block_cache_swap(app_module, monkeypatch):
+    result = {
+        "status": "success",
+        "data": _run({"PTT": (50.0, "A")}),
+        "raw_tdts": [TdtsEvent(stock="PTT", year=2025, ex_date="2025-04-01", t_dts=1.0, outlier=False)],
+        "raw_tema": [TemaEvent(stock="PTT", year=2025, ex_date="2025-04-01", ret_bf=1.0, ret_af=2.0, outlier=False)],
+    }
+    monkeypatch.setattr(app_module, "process_cluster_and_score", lambda **kwargs: result)
+
+    def broken_append(run_time, records):
+        raise ValueError("Score history is append-only: run_time must not go backwards.")
+
+    monkeypatch.setattr(app_module, "SCORE_HISTORY", type("Broken", (), {"append": staticmethod(broken_append)})())
+    app_module._run_scoring_batch_analysis(app_module.BatchInput().model_dump())
+
+    assert "PTT" in app_module.CACHE_SCORING
+    assert app_module.CACHE_TDTS["PTT"][0].t_dts == 1.0
+    assert app_module.CACHE_TEMA["PTT"][0].ret_af == 2.0
+
+
+def test_runs_in_same_second_stay_separate_snapshots(tmp_path):
+    store = ScoreHistoryStore(str(tmp_path))
+    store.append(datetime(2026, 1, 5, 10, 0, 0, 100), _run({"PTT": (50.0, "A"), "AOT": (40.0, "B")}))
+    store.append(datetime(2026, 1, 5, 10, 0, 0, 900), _run({"PTT": (55.0, "B"), "AOT": (41.0, "B")}))
+    for s in (store, ScoreHistoryStore(str(tmp_path))):
+        assert s.run_times() == ["2026-01-05T10:00:00.000100", "2026-01-05T10:00:00.000900"]
+        matrix = s.transition_matrix()
+        assert matrix["changed"] == ["PTT"]
+        assert matrix["from_run"] != matrix["to_run"]
+
+
+def test_loads_files_written_with_second_resolution(tmp_path):
+    np.savez(tmp_path / "scores_20260105T100000000000_000001.npz",
+             run_time=np.array(['2026-01-05T10:00:00'] * 2, dtype='datetime64[s]').astype('int64'),
+             score=np.array([50.0, 40.0], dtype=np.float32), stock=np.array(["PTT", "AOT"]), cluster=np.array(["A", "B"]))
+    store = ScoreHistoryStore(str(tmp_path))
+    store.append(datetime(2026, 1, 5, 10, 0, 0, 500), _run({"PTT": (55.0, "B"), "AOT": (41.0, "B")}))
+    assert store.run_times() == ["2026-01-05T10:00:00", "2026-01-05T10:00:00.000500"]
+    assert store.trajectory("PTT")["Total_Score (%)"] == [50.0, 55.0]
@@ -0,0 +1,25 @@
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.Predictor import predictor_XD
+from Func_app.Predictor.predictor_XD import analyze_seasonality_batch
+from Func_app.records import SeasonalityRecord
+
+
+class FaultyStore:
+    """BROKEN: ดึงราคาไม่สำเร็จ / NODIV: มีราคาแต่ไม่เคยจ่ายปันผล / ที่เหลือ: PRICE_STORE จริง"""
+
+    def view(self, symbol, kind="split", start=None, end=None, period=None):
+        if symbol.startswith("BROKEN"):
+            raise ConnectionError("timeout")
+        df = PRICE_STORE.view("PTT.BK" if symbol.startswith("NODIV") else symbol, kind, start=start, end=end, period=period)
+        if symbol.startswith("NODIV"):
+            df = df.assign(Dividends=0.0)
+        return df
+
+
+def test_batch_records_the_reason_for_each_failure(monkeypatch):
+    monkeypatch.setattr(predictor_XD, "PRICE_STORE", FaultyStore())
+    written = {}
+    result = analyze_seasonality_batch(["PTT.BK", "BROKEN.BK", "NODIV"], on_result=written.__setitem__)
+    assert list(written) == ["PTT"] and isinstance(written["PTT"], SeasonalityRecord)
+    assert result["count"] == 1
+    assert result["failed"] == {"BROKEN": "timeout", "NODIV": "no dividend history"}
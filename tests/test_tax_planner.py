@@ -0,0 +1,116 @@
+import threading
+from datetime import date
+
+import pytest
+
+from Func_app import tax_planner
+from Func_app.calculate_text import optimize_dividend_tax
+from Func_app.records import GGMResult, SeasonalityRecord, SeasonalityTag
+from Func_app.tax_planner import (build_payout_schedule, payout_schedule, plan_portfolio_dividend_tax,
+                                  project_dividend_calendar)
+
+
+def _record(symbol, xd, pay, dps):
+    tag = SeasonalityTag(next_xd_date=xd, est_pay_date=pay, est_dividend=dps)
+    return SeasonalityRecord(symbol=symbol, tag1=tag, tag2=None)
+
+
+SEASONALITY = {
+    "PTT": _record("PTT", "2026-02-20", "2026-03-10", 1.2),
+    "AOT": _record("AOT", "2026-11-25", "2026-12-15", 0.5),
+}
+
+
+def test_calendar_projects_monthly_cash_flow_and_repeats_yearly():
+    schedule = build_payout_schedule(SEASONALITY, today=date(2026, 1, 15))
+    data = project_dividend_calendar(
+        [{"symbol": "PTT.BK", "shares": 1000}, {"symbol": "aot", "shares": 2000, "cit_rate": 0.0},
+         {"symbol": "XYZ", "shares": 10}], schedule, months=15)
+
+    months = {row["Month"]: row for row in data["calendar"]}
+    assert len(data["calendar"]) == 15
+    assert months["2026-03"]["Gross_Dividend"] == 1200.0
+    assert months["2026-03"]["Withholding_Tax"] == 120.0
+    assert months["2026-03"]["Net_Dividend"] == 1080.0
+    assert months["2026-03"]["Tax_Credit"] == 300.0  # 20 / 80
+    assert months["2026-12"]["Gross_Dividend"] == 1000.0
+    assert months["2026-12"]["Tax_Credit"] == 0.0
+    # ปีถัดไปใช้วันและปันผลเดิมซ้ำ
+    assert months["2027-03"]["Payments"][0]["Pay_Date"] == "2027-03-10"
+    assert data["totals"]["gross_dividend"] == 3400.0
+    assert data["missing"] == ["XYZ"]
+
+
+def test_past_payments_roll_over_to_next_year():
+    schedule = build_payout_schedule(SEASONALITY, today=date(2026, 4, 1), horizon_months=6)
+    assert list(schedule["pay_date"]) == []
+    schedule = build_payout_schedule(SEASONALITY, today=date(2026, 4, 1), horizon_months=12)
+    assert list(schedule["pay_date"]) == ["2026-12-15", "2027-03-10"]
+    assert list(schedule["month"]) == [8, 11]
+
+
+@pytest.fixture
+def reset_schedule():
+    tax_planner._SCHEDULE = (None, None)
+    yield
+    tax_planner._SCHEDULE = (None, None)
+
+
+def test_payout_schedule_is_memoized_per_version(reset_schedule):
+    first = payout_schedule((SEASONALITY, 1))
+    assert payout_schedule((SEASONALITY, 1)) is first
+    changed = {"PTT": SEASONALITY["PTT"]}
+    second = payout_schedule((changed, 2))
+    assert second is not first
+    assert second["symbols"] == ["PTT"]
+
+
+def test_concurrent_requests_build_schedule_once(reset_schedule, monkeypatch):
+    builds = []
+    real_build = tax_planner.build_payout_schedule
+
+    def counting_build(data, today=None):
+        builds.append(today)
+        return real_build(data, today=today)
+
+    monkeypatch.setattr(tax_planner, "build_payout_schedule", counting_build)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(payout_schedule((SEASONALITY, 7)))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_dividend_calendar_endpoint_uses_seasonality_cache(app_module, client):
+    assert client.post("/main_app/dividend_calendar", json={"holdings": [{"symbol": "PTT", "shares": 100}]}).status_code == 400
+    app_module.CACHE_SEASONALITY.replace(SEASONALITY)
+    r = client.post("/main_app/dividend_calendar", json={"holdings": [{"symbol": "PTT", "shares": 100}], "months": 36})
+    assert r.status_code == 200
+    assert r.json()["data"]["missing"] == []
+
+
+GGM = {"KBANK": GGMResult(symbol="KBANK.BK", current_price=150.0, target_price=160.0, diff_percent=6.7,
+                          meaning="Undervalue", dividends_flow={"Div(Y-1)": 3.0, "Div(Y-0)": 4.0})}
+
+
+def test_portfolio_plan_sums_holdings_and_falls_back_between_sources():
+    holdings = [{"symbol": "PTT.BK", "shares": 1000}, {"symbol": "KBANK", "shares": 100, "cit_rate": 0.0},
+                {"symbol": "XYZ", "shares": 5}]
+    plan = plan_portfolio_dividend_tax(holdings, 400000.0, SEASONALITY, GGM, income_levels=[100000.0, 5000000.0])
+
+    rows = {row["Symbol"]: row for row in plan["holdings"]}
+    assert rows["PTT"]["DPS_Source"] == "seasonality" and rows["PTT"]["Gross_Dividend"] == 1200.0
+    assert rows["KBANK"]["DPS_Source"] == "ggm" and rows["KBANK"]["Gross_Dividend"] == 400.0
+    assert plan["missing"] == ["XYZ"]
+    assert plan["totals"] == {"gross_dividend": 1600.0, "tax_credit_amount": 300.0, "withholding_tax": 160.0}
+    # ทั้งพอร์ต = โปรไฟล์เดียวที่มีปันผลรวม / เครดิตรวม
+    assert plan["scenarios"]["should_claim"] == [True, False]
+    assert plan["option1_final_tax"]["net_wealth"] == optimize_dividend_tax(400000.0, 1600.0, 0.0)["option1_final_tax"]["net_wealth"]
+
+
+def test_ggm_source_is_preferred_when_requested():
+    plan = plan_portfolio_dividend_tax([{"symbol": "KBANK", "shares": 10}], 0.0, SEASONALITY, GGM, source="ggm")
+    assert plan["holdings"][0]["DPS"] == 4.0
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Func_app.DataSource.data_source import SyntheticSource, use_data_source
+from Func_app.DataSource.price_store import PRICE_STORE
+from Func_app.TA import technical_analysis
+from Func_app.TA.technical_analysis import (analyze_technical_batch, calculate_macd, calculate_rsi,
+                                            get_technical_history, slice_history)
+
+INCREMENTAL_TICKERS = ["PTT", "AOT", "KBANK"]
+INCREMENTAL_INDICATORS = ["bollinger", "atr", "obv", "adx"]
+
+
+@pytest.fixture(autouse=True)
+def _clear_batch_state():
+    technical_analysis._BATCH_STATE.clear()
+    yield
+    technical_analysis._BATCH_STATE.clear()
+
+
+class TruncatedStore:
+    """PriceStore ที่เห็นราคาถึงแค่ cutoff (จำลอง bar ใหม่ที่เข้ามาระหว่างรอบ refresh) + ปรับราคาย้อนหลังได้ (scale)"""
+
+    def __init__(self, cutoff, scale=1.0):
+        self.cutoff = pd.Timestamp(cutoff)
+        self.scale = scale
+
+    def view(self, symbol, kind="split", start=None, end=None, period=None):
+        df = PRICE_STORE.view(symbol, kind, start=start, end=end, period=period)
+        df = df[df.index.tz_localize(None) <= self.cutoff] if df.index.tz is not None else df[df.index <= self.cutoff]
+        if self.scale != 1.0:
+            df = df.copy()
+            df[["Open", "High", "Low", "Close"]] *= self.scale
+        return df
+
+
+class HaltedStore:
+    """KBANK หยุดพักการซื้อขาย 3 วัน (ไม่มีแถวในช่วงนั้น) -> Matrix ของ Batch มีแถว NaN"""
+
+    def view(self, symbol, kind="split", start=None, end=None, period=None):
+        df = PRICE_STORE.view(symbol, kind, start=start, end=end, period=period)
+        if symbol.startswith("KBANK"):
+            df = df.drop(df.index[-60:-57])
+        return df
+
+
+def _run_batch(monkeypatch, store):
+    monkeypatch.setattr(technical_analysis, "PRICE_STORE", store)
+    return analyze_technical_batch(2024, tickers=INCREMENTAL_TICKERS, indicators=INCREMENTAL_INDICATORS)
+
+
+class SuffixOnlySource(SyntheticSource):
+    """เหมือน Yahoo: รู้จักเฉพาะ 'PTT.BK' (ชื่อที่ไม่มี .BK = ไม่มีข้อมูล) + จดชื่อที่ถูกขอ"""
+
+    def __init__(self):
+        super().__init__()
+        self.requested = []
+
+    def _frame(self, symbol):
+        self.requested.append(symbol.upper())
+        if not symbol.upper().endswith(".BK"):
+            return None
+        return super()._frame(symbol)
+
+
+def test_retry_with_cache_keys_fetches_bk_tickers():
+    source = SuffixOnlySource()
+    written = {}
+    with use_data_source(source):
+        result = analyze_technical_batch(2024, tickers=["PTT", "aot.bk"], on_result=written.__setitem__)
+    assert result["failed"] == {}
+    assert sorted(written) == ["AOT", "PTT"]
+    assert all(t.endswith(".BK") for t in source.requested)
+    assert len(written["PTT"]["Date"]) == len(written["PTT"]["RSI"]) > 100
+
+
+def test_batch_matches_single_stock_history():
+    batch = analyze_technical_batch(2024, tickers=["PTT.BK"])["data"]["PTT"]
+    single = get_technical_history("PTT", "2024-01-01", None, columnar=True)["data"]
+    n = min(len(batch["Date"]), len(single["Date"]))
+    assert batch["Date"][:n] == single["Date"][:n]
+    for field in ("Close", "RSI", "MACD", "Signal", "Hist"):
+        np.testing.assert_allclose(batch[field][:n], single[field][:n], atol=1e-2)
+
+
+def test_reference_kernels():
+    close = pd.Series(np.linspace(10, 20, 60))
+    rsi = calculate_rsi(close)
+    assert rsi.iloc[:13].isna().all()
+    assert rsi.iloc[-1] == pytest.approx(100.0)
+    macd, signal, hist = calculate_macd(close)
+    np.testing.assert_allclose(hist, macd - signal)
+
+
+def test_slice_history_range_and_projection():
+    columns = {"Date": ["2026-01-02", "2026-01-05", "2026-01-06"], "RSI": [40.0, 50.0, 60.0], "Hist": [-1.0, 0.0, 1.0]}
+    out = slice_history(columns, start="2026-01-05", fields=["RSI", "Momentum"])
+    assert out == {"Date": ["2026-01-05", "2026-01-06"], "RSI": [50.0, 60.0], "Momentum": ["Neutral", "Bullish"]}
+    assert slice_history(columns, end="2026-01-05", last_n=1)["Date"] == ["2026-01-05"]
+
+
+def _assert_same_columns(a, b):
+    assert list(a) == list(b)
+    assert a["Date"] == b["Date"]
+    for field in a:
+        if field != "Date":
+            np.testing.assert_allclose(a[field], b[field], atol=1e-4)
+
+
+def test_incremental_refresh_appends_new_bars(monkeypatch):
+    first = _run_batch(monkeypatch, TruncatedStore("2025-06-30"))
+    assert first["incremental"] == []
+    before = {key: {col: list(values) for col, values in columns.items()} for key, columns in first["data"].items()}
+
+    second = _run_batch(monkeypatch, TruncatedStore("2025-09-30"))
+    assert sorted(second["incremental"]) == sorted(INCREMENTAL_TICKERS)
+    # ไม่แก้ list เดิมที่ Cache ถืออยู่
+    assert {key: {col: list(values) for col, values in columns.items()} for key, columns in first["data"].items()} == before
+
+    technical_analysis._BATCH_STATE.clear()
+    full = _run_batch(monkeypatch, TruncatedStore("2025-09-30"))
+    assert full["incremental"] == []
+    for key in INCREMENTAL_TICKERS:
+        assert len(second["data"][key]["Date"]) > len(first["data"][key]["Date"])
+        _assert_same_columns(second["data"][key], full["data"][key])
+
+
+def test_adjusted_history_change_forces_full_recompute(monkeypatch):
+    _run_batch(monkeypatch, TruncatedStore("2025-06-30"))
+    # ปันผลใหม่ -> ราคา adjusted ย้อนหลังถูกปรับทั้งเส้น
+    rescaled = _run_batch(monkeypatch, TruncatedStore("2025-09-30", scale=0.97))
+    assert rescaled["incremental"] == []
+    technical_analysis._BATCH_STATE.clear()
+    full = _run_batch(monkeypatch, TruncatedStore("2025-09-30", scale=0.97))
+    for key in INCREMENTAL_TICKERS:
+        _assert_same_columns(rescaled["data"][key], full["data"][key])
+
+
+def test_changed_indicators_do_not_reuse_state(monkeypatch):
+    _run_batch(monkeypatch, TruncatedStore("2025-06-30"))
+    monkeypatch.setattr(technical_analysis, "PRICE_STORE", TruncatedStore("2025-09-30"))
+    result = analyze_technical_batch(2024, tickers=INCREMENTAL_TICKERS, indicators=["vwap"])
+    assert result["incremental"] == []
+    assert "VWAP" in result["data"]["PTT"] and "BB_Mid" not in result["data"]["PTT"]
+
+
+def test_halted_stock_keeps_every_traded_row_with_rolling_indicators(monkeypatch):
+    monkeypatch.setattr(technical_analysis, "PRICE_STORE", HaltedStore())
+    rolling = ["bollinger", "stochastic", "vwap", "volatility"]
+    batch = analyze_technical_batch(2024, tickers=INCREMENTAL_TICKERS, indicators=rolling)["data"]["KBANK"]
+    technical_analysis._BATCH_STATE.clear()
+    alone = analyze_technical_batch(2024, tickers=["KBANK"], indicators=rolling)["data"]["KBANK"]
+    _assert_same_columns(batch, alone)
@@ -0,0 +1,61 @@
+import pytest
+
+from Func_app.serialization import encode_columns
+
+HISTORY = {
+    "Date": ["2026-01-02", "2026-01-05", "2026-01-06", "2026-01-07"],
+    "Close": [30.0, 31.0, 30.5, 32.0],
+    "RSI": [45.0, 55.0, 50.0, 60.0],
+    "MACD": [0.1, 0.2, 0.15, 0.3],
+    "Signal": [0.05, 0.1, 0.12, 0.2],
+    "Hist": [0.05, 0.1, 0.03, -0.1],
+}
+
+
+@pytest.fixture
+def cached(app_module):
+    app_module.TECHNICAL_CACHE.replace({"PTT": HISTORY})
+
+
+def test_rows_shape_by_default(client, cached):
+    body = client.get("/main_app/technical_history/PTT.BK", params={"start": "2026-01-05", "end": "2026-01-06"}).json()
+    assert body["period"] == "custom" and body["count"] == 2
+    assert body["data"][0] == {"Date": "2026-01-05", "Close": 31.0, "RSI": 55.0, "MACD": 0.2, "Signal": 0.1,
+                               "Hist": 0.1, "Momentum": "Bullish"}
+
+
+def test_columns_shape_with_projection_and_last_n(client, cached):
+    body = client.get("/main_app/technical_history/ptt",
+                      params={"shape": "columns", "fields": "RSI,Momentum", "last_n": 2}).json()
+    assert body["data"] == {"Date": ["2026-01-06", "2026-01-07"], "RSI": [50.0, 60.0], "Momentum": ["Bullish", "Bearish"]}
+    assert (body["start"], body["end"]) == ("2026-01-06", "2026-01-07")
+
+
+def test_unknown_field_and_missing_symbol(client, cached):
+    assert client.get("/main_app/technical_history/PTT", params={"fields": "RSI,Foo"}).status_code == 400
+    assert client.get("/main_app/technical_history/AOT").status_code == 404
+
+
+def test_binary_formats_are_columnar(client, cached):
+    msgpack = pytest.importorskip("msgpack")
+    r = client.get("/main_app/technical_history/PTT", params={"format": "msgpack", "fields": "RSI", "last_n": 1})
+    assert r.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(r.content) == {"Date": ["2026-01-07"], "RSI": [60.0]}
+
+
+def test_missing_optional_dependency_is_a_400(client, cached, monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, *args, **kwargs):
+        if name == "pyarrow":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_pyarrow)
+    with pytest.raises(ValueError, match="requires the 'pyarrow' package"):
+        encode_columns({"Date": []}, "arrow")
+    with pytest.raises(ValueError, match="Unknown format"):
+        encode_columns({"Date": []}, "xml")
+    r = client.get("/main_app/technical_history/PTT", params={"format": "arrow"})
+    assert r.status_code == 400 and "pyarrow" in r.json()["detail"]